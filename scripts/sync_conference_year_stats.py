@@ -17,8 +17,6 @@ from pathlib import Path
 from typing import Any, Dict, Iterable, List, Mapping, Tuple
 from urllib.parse import urlparse
 
-import requests
-
 
 ROOT_DIR = Path(__file__).resolve().parents[1]
 SRC_DIR = ROOT_DIR / "src"
@@ -26,6 +24,7 @@ if str(SRC_DIR) not in sys.path:
     sys.path.insert(0, str(SRC_DIR))
 
 from local_env import load_local_env
+from supabase_http import request_with_retries
 
 
 DEFAULT_OUTPUT = ROOT_DIR / "app" / "conference-stats.json"
@@ -220,7 +219,8 @@ def fetch_table_rows(
     rows: List[Dict[str, Any]] = []
     offset = 0
     while True:
-        response = requests.get(
+        response = request_with_retries(
+            "GET",
             endpoint,
             params={
                 "select": "id,source,published",
@@ -229,6 +229,7 @@ def fetch_table_rows(
             },
             headers=rest_headers(service_key, schema),
             timeout=timeout,
+            log_prefix=f"[stats] {table}",
         )
         response.raise_for_status()
         chunk = response.json() or []
@@ -283,11 +284,14 @@ def apply_sql_schema(*, supabase_url: str, access_token: str, project_ref: str =
     if not resolved_ref:
         raise RuntimeError("无法解析 Supabase project ref")
     sql = SQL_PATH.read_text(encoding="utf-8")
-    response = requests.post(
+    response = request_with_retries(
+        "POST",
         management_query_url(resolved_ref),
         headers={"Authorization": f"Bearer {access_token}", "Content-Type": "application/json"},
         json={"query": sql, "read_only": False},
         timeout=timeout,
+        retries=0,
+        log_prefix="[stats] apply sql",
     )
     response.raise_for_status()
     print(f"[stats] applied {SQL_PATH.relative_to(ROOT_DIR)}", flush=True)
@@ -304,12 +308,14 @@ def upsert_stats_rows(
     if not rows:
         return
     endpoint = f"{rest_base_url(supabase_url)}/conference_year_stats"
-    response = requests.post(
+    response = request_with_retries(
+        "POST",
         endpoint,
         params={"on_conflict": "id"},
         headers={**rest_headers(service_key, schema, prefer="resolution=merge-duplicates"), "Content-Type": "application/json"},
         json=rows,
         timeout=timeout,
+        log_prefix="[stats] upsert",
     )
     response.raise_for_status()
     print(f"[stats] upserted conference_year_stats: {len(rows)} rows", flush=True)
@@ -331,11 +337,13 @@ def verify_stats_table(*, supabase_url: str, anon_key: str, schema: str = "publi
     if not anon_key:
         print("[stats] skip anon verify: SUPABASE_ANON_KEY missing", flush=True)
         return 0
-    response = requests.get(
+    response = request_with_retries(
+        "GET",
         f"{rest_base_url(supabase_url)}/conference_year_stats",
         params={"select": "id,conference_key,year,stored_total_count,official_accepted_count", "limit": "1"},
         headers=rest_headers(anon_key, schema, prefer="count=exact"),
         timeout=timeout,
+        log_prefix="[stats] verify",
     )
     response.raise_for_status()
     content_range = response.headers.get("content-range", "")
@@ -0,0 +1,62 @@
+-- ============================================================
+-- 服务端按保留期清理旧论文 RPC（配合 src/maintain/cleanup.py）
+-- ============================================================
+-- 背景：
+--   旧的清理流程每批先 GET 一批 id（order=published），再用 id=in.(...)
+--   的超长 URL 发 DELETE，每批两次往返；保留期内几十万行要跑上千轮。
+--
+-- 设计：
+--   1) 一次调用删除 published < cutoff 的最旧 max_rows 行（ctid 子查询限量），
+--      返回实际删除行数；客户端循环调用直到返回值 < max_rows；
+--   2) 只允许清理 allowed_schemas 中的 schema 下以 papers 结尾的表，防止误删其它表；
+--      论文表放在 public 以外的 schema（cleanup.py --schema）时，把该 schema 加入
+--      allowed_schemas 后重新执行本文件；函数本身始终建在 public 下；
+--   3) 仅 service_role 可执行。
+--
+-- 使用方式：
+--   在 Supabase SQL Editor 中执行本文件；RPC 不存在时 cleanup.py 自动回退到
+--   按 published 时间段直接 DELETE（published=lt.<cutoff>，分段并统计删除数）。
+-- ============================================================
+
+-- 旧版本没有 target_schema 参数；先删除，避免与新签名形成重载
+drop function if exists public.cleanup_old_papers(text, timestamptz, int);
+
+create or replace function public.cleanup_old_papers(
+  target_table text,
+  cutoff timestamptz,
+  max_rows int default 20000,
+  target_schema text default 'public'
+)
+returns int
+language plpgsql
+set statement_timeout = '120s'
+as $$
+declare
+  deleted int := 0;
+  allowed_schemas constant text[] := array['public'];
+begin
+  if target_schema is null or not (target_schema = any(allowed_schemas)) then
+    raise exception 'cleanup_old_papers: unsupported schema %', target_schema;
+  end if;
+  if target_table !~ '^[a-z0-9_]*papers$' or to_regclass(format('%I.%I', target_schema, target_table)) is null then
+    raise exception 'cleanup_old_papers: unsupported table %', target_table;
+  end if;
+
+  execute format(
+    'delete from %I.%I where ctid in ('
+    '  select ctid from %I.%I where published < $1 order by published limit $2'
+    ')',
+    target_schema,
+    target_table,
+    target_schema,
+    target_table
+  )
+  using cutoff, greatest(coalesce(max_rows, 1), 1);
+
+  get diagnostics deleted = row_count;
+  return deleted;
+end;
+$$;
+
+revoke all on function public.cleanup_old_papers(text, timestamptz, int, text) from public, anon, authenticated;
+grant execute on function public.cleanup_old_papers(text, timestamptz, int, text) to service_role;
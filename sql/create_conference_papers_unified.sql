@@ -456,13 +456,9 @@ begin
               p.pdf_url,
               p.source,
               0::float8 as similarity,
-              ts_rank_cd(
-                to_tsvector('english', coalesce(p.title, '') || ' ' || coalesce(p.abstract, '')),
-                plainto_tsquery('english', $1)
-              )::float8 as score
+              ts_rank_cd(p.fts, plainto_tsquery('english', $1))::float8 as score
             from public.%I p
-            where to_tsvector('english', coalesce(p.title, '') || ' ' || coalesce(p.abstract, ''))
-                  @@ plainto_tsquery('english', $1)
+            where p.fts @@ plainto_tsquery('english', $1)
               and %L = (%L || ':' || (%s)::text)
             order by score desc
             limit greatest($2, 1)
@@ -488,13 +484,9 @@ begin
             p.pdf_url,
             p.source,
             0::float8 as similarity,
-            ts_rank_cd(
-              to_tsvector('english', coalesce(p.title, '') || ' ' || coalesce(p.abstract, '')),
-              plainto_tsquery('english', $1)
-            )::float8 as score
+            ts_rank_cd(p.fts, plainto_tsquery('english', $1))::float8 as score
           from public.%I p
-          where to_tsvector('english', coalesce(p.title, '') || ' ' || coalesce(p.abstract, ''))
-                @@ plainto_tsquery('english', $1)
+          where p.fts @@ plainto_tsquery('english', $1)
           order by score desc
           limit greatest($2, 1)
         ) q
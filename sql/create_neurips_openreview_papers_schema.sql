@@ -31,6 +31,23 @@ create index if not exists neurips_openreview_papers_source_published_idx
 create index if not exists neurips_openreview_papers_published_idx
   on public.neurips_openreview_papers (published desc);
 
-create index if not exists neurips_openreview_papers_title_abstract_fts_idx
+-- 本地论文缓存按 updated_at 增量同步（updated_at >= last_sync）
+create index if not exists neurips_openreview_papers_updated_at_idx
+  on public.neurips_openreview_papers (updated_at);
+
+-- maintain/sync.py 按内容哈希跳过未变化的行（不重复编码 / 上传）
+alter table public.neurips_openreview_papers
+  add column if not exists content_hash text;
+
+-- 预先存储 tsvector：BM25 检索直接读列，不再逐行重算 to_tsvector
+alter table public.neurips_openreview_papers
+  add column if not exists fts tsvector
+  generated always as (
+    to_tsvector('english', coalesce(title, '') || ' ' || coalesce(abstract, ''))
+  ) stored;
+
+drop index if exists public.neurips_openreview_papers_title_abstract_fts_idx;
+
+create index if not exists neurips_openreview_papers_fts_idx
   on public.neurips_openreview_papers
-  using gin (to_tsvector('english', coalesce(title, '') || ' ' || coalesce(abstract, '')));
+  using gin (fts);
@@ -31,9 +31,26 @@ create index if not exists papers_source_published_idx
 create index if not exists papers_published_idx
   on public.papers (published desc);
 
-create index if not exists papers_title_abstract_fts_idx
+-- 本地论文缓存按 updated_at 增量同步（updated_at >= last_sync）
+create index if not exists papers_updated_at_idx
+  on public.papers (updated_at);
+
+-- maintain/sync.py 按内容哈希跳过未变化的行（不重复编码 / 上传）
+alter table public.papers
+  add column if not exists content_hash text;
+
+-- 预先存储 tsvector：BM25 检索直接读列，不再逐行重算 to_tsvector
+alter table public.papers
+  add column if not exists fts tsvector
+  generated always as (
+    to_tsvector('english', coalesce(title, '') || ' ' || coalesce(abstract, ''))
+  ) stored;
+
+drop index if exists public.papers_title_abstract_fts_idx;
+
+create index if not exists papers_fts_idx
   on public.papers
-  using gin (to_tsvector('english', coalesce(title, '') || ' ' || coalesce(abstract, '')));
+  using gin (fts);
 
 create index if not exists papers_embedding_hnsw_idx
   on public.papers
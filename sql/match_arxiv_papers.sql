@@ -131,13 +131,9 @@ AS $$
     p.pdf_url,
     p.source,
     0::float8 AS similarity,
-    ts_rank_cd(
-      to_tsvector('english', coalesce(p.title, '') || ' ' || coalesce(p.abstract, '')),
-      plainto_tsquery('english', query_text)
-    ) AS score
+    ts_rank_cd(p.fts, plainto_tsquery('english', query_text)) AS score
   FROM arxiv_papers p
-  WHERE to_tsvector('english', coalesce(p.title, '') || ' ' || coalesce(p.abstract, ''))
-        @@ plainto_tsquery('english', query_text)
+  WHERE p.fts @@ plainto_tsquery('english', query_text)
     AND (filter_published_start IS NULL OR p.published >= filter_published_start)
     AND (filter_published_end   IS NULL OR p.published <  filter_published_end)
   ORDER BY score DESC
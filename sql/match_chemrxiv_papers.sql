@@ -77,13 +77,9 @@ as $$
     p.pdf_url,
     p.source,
     0::float8 as similarity,
-    ts_rank_cd(
-      to_tsvector('english', coalesce(p.title, '') || ' ' || coalesce(p.abstract, '')),
-      plainto_tsquery('english', query_text)
-    ) as score
+    ts_rank_cd(p.fts, plainto_tsquery('english', query_text)) as score
   from public.chemrxiv_papers p
-  where to_tsvector('english', coalesce(p.title, '') || ' ' || coalesce(p.abstract, ''))
-        @@ plainto_tsquery('english', query_text)
+  where p.fts @@ plainto_tsquery('english', query_text)
     and (filter_published_start is null or p.published >= filter_published_start)
     and (filter_published_end is null or p.published < filter_published_end)
   order by score desc
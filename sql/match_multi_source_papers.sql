@@ -31,7 +31,8 @@ select
   p.embedding_model,
   p.embedding_dim,
   p.embedding_updated_at,
-  p.updated_at
+  p.updated_at,
+  p.fts
 from public.arxiv_papers p
 
 union all
@@ -54,7 +55,8 @@ select
   p.embedding_model,
   p.embedding_dim,
   p.embedding_updated_at,
-  p.updated_at
+  p.updated_at,
+  p.fts
 from public.biorxiv_papers p;
 
 
@@ -148,13 +150,9 @@ as $$
     p.pdf_url,
     p.source,
     0::float8 as similarity,
-    ts_rank_cd(
-      to_tsvector('english', coalesce(p.title, '') || ' ' || coalesce(p.abstract, '')),
-      plainto_tsquery('english', query_text)
-    ) as score
+    ts_rank_cd(p.fts, plainto_tsquery('english', query_text)) as score
   from selected p
-  where to_tsvector('english', coalesce(p.title, '') || ' ' || coalesce(p.abstract, ''))
-        @@ plainto_tsquery('english', query_text)
+  where p.fts @@ plainto_tsquery('english', query_text)
   order by score desc
   limit match_count;
 $$;
@@ -0,0 +1,292 @@
+-- ============================================================
+-- 批量多查询向量检索 RPC（与 match_multi_source_papers.sql 配套）
+-- ============================================================
+-- 背景：
+--   每个 intent query 单独调用一次 *_exact RPC，30+ 个查询就是 30+ 次串行
+--   往返，且每次都重新扫描同一批按 published 过滤后的行。
+--
+-- 设计：
+--   1) query_embeddings 以 jsonb 数组传入（[[0.1, ...], [0.2, ...]]），
+--      match_counts 为每个查询各自的返回条数（缺省时使用 match_count）；
+--   2) 先把时间窗口 / 来源过滤后的候选行 materialize 一次；
+--   3) 再对每个查询做 lateral exact 排序，返回 (query_index, id, ..., similarity)。
+--   query_index 从 0 开始，与客户端传入顺序一致。
+--
+-- 使用方式：
+--   在 Supabase SQL Editor 中执行本文件；客户端在 source backend 配置
+--   use_batch_rpc: true（或设置 DPR_SUPABASE_BATCH_RPC=1）后启用，
+--   RPC 不存在时自动回退到逐查询调用。
+-- ============================================================
+
+-- 1. 单表批量 exact 检索：为每张论文表生成 match_<table>_exact_batch
+do $do$
+declare
+  tbl text;
+begin
+  foreach tbl in array array[
+    'arxiv_papers',
+    'biorxiv_papers',
+    'medrxiv_papers',
+    'chemrxiv_papers',
+    'neurips_openreview_papers',
+    'icml_openreview_papers',
+    'iclr_openreview_papers',
+    'aaai_papers',
+    'acl_papers',
+    'emnlp_papers',
+    'cvpr_papers',
+    'eccv_papers',
+    'ijcai_papers',
+    'osdi_papers',
+    'sosp_papers',
+    'ieee_sp_papers',
+    'ndss_papers'
+  ]
+  loop
+    if to_regclass('public.' || tbl) is null then
+      continue;
+    end if;
+    execute format($fn$
+      create or replace function public.%1$I(
+        query_embeddings jsonb,
+        match_counts int[] default null,
+        match_count int default 50,
+        filter_published_start timestamptz default null,
+        filter_published_end timestamptz default null
+      )
+      returns table (
+        query_index int,
+        id text,
+        title text,
+        abstract text,
+        authors jsonb,
+        primary_category text,
+        categories jsonb,
+        published timestamptz,
+        link text,
+        pdf_url text,
+        source text,
+        similarity float8
+      )
+      language sql stable
+      as $body$
+        with queries as (
+          select
+            (q.ordinality - 1)::int as query_index,
+            (q.value::text)::vector as embedding,
+            greatest(coalesce(match_counts[q.ordinality::int], match_count), 1) as k
+          from jsonb_array_elements(query_embeddings) with ordinality as q(value, ordinality)
+        ),
+        selected as materialized (
+          select
+            p.id, p.title, p.abstract, p.authors, p.primary_category, p.categories,
+            p.published, p.link, p.pdf_url, p.source, p.embedding
+          from public.%2$I p
+          where p.embedding is not null
+            and (filter_published_start is null or p.published >= filter_published_start)
+            and (filter_published_end is null or p.published < filter_published_end)
+        )
+        select
+          q.query_index,
+          s.id, s.title, s.abstract, s.authors, s.primary_category, s.categories,
+          s.published, s.link, s.pdf_url, s.source, s.similarity
+        from queries q
+        cross join lateral (
+          select c.*, 1 - (c.embedding <=> q.embedding) as similarity
+          from selected c
+          order by c.embedding <=> q.embedding
+          limit q.k
+        ) s
+        order by q.query_index, s.similarity desc;
+      $body$;
+    $fn$, 'match_' || tbl || '_exact_batch', tbl);
+    execute format(
+      'grant execute on function public.%I(jsonb, int[], int, timestamptz, timestamptz) to anon, authenticated',
+      'match_' || tbl || '_exact_batch'
+    );
+  end loop;
+end;
+$do$;
+
+
+-- 2. 多源视图批量 exact 检索（filter_sources 对本批所有查询生效；
+--    客户端会按查询的来源集合分组调用）
+create or replace function public.match_multi_source_papers_exact_batch(
+  query_embeddings jsonb,
+  match_counts int[] default null,
+  match_count int default 50,
+  filter_sources text[] default null,
+  filter_published_start timestamptz default null,
+  filter_published_end timestamptz default null
+)
+returns table (
+  query_index int,
+  id text,
+  title text,
+  abstract text,
+  authors jsonb,
+  primary_category text,
+  categories jsonb,
+  published timestamptz,
+  link text,
+  pdf_url text,
+  source text,
+  similarity float8
+)
+language sql stable
+as $$
+  with queries as (
+    select
+      (q.ordinality - 1)::int as query_index,
+      (q.value::text)::vector as embedding,
+      greatest(coalesce(match_counts[q.ordinality::int], match_count), 1) as k
+    from jsonb_array_elements(query_embeddings) with ordinality as q(value, ordinality)
+  ),
+  selected as materialized (
+    select
+      p.id, p.title, p.abstract, p.authors, p.primary_category, p.categories,
+      p.published, p.link, p.pdf_url, p.source, p.embedding
+    from public.multi_source_papers p
+    where p.embedding is not null
+      and (filter_sources is null or p.source = any(filter_sources))
+      and (filter_published_start is null or p.published >= filter_published_start)
+      and (filter_published_end is null or p.published < filter_published_end)
+  )
+  select
+    q.query_index,
+    s.id, s.title, s.abstract, s.authors, s.primary_category, s.categories,
+    s.published, s.link, s.pdf_url, s.source, s.similarity
+  from queries q
+  cross join lateral (
+    select c.*, 1 - (c.embedding <=> q.embedding) as similarity
+    from selected c
+    order by c.embedding <=> q.embedding
+    limit q.k
+  ) s
+  order by q.query_index, s.similarity desc;
+$$;
+
+grant execute on function public.match_multi_source_papers_exact_batch(jsonb, int[], int, text[], timestamptz, timestamptz) to anon, authenticated;
+
+
+-- 3. 统一会议批量 exact 检索（语义同 match_conference_papers_exact：
+--    p.conference_pair = any(filter_pairs)，但所有查询共享一次候选扫描）
+create or replace function public.match_conference_papers_exact_batch(
+  query_embeddings jsonb,
+  match_counts int[] default null,
+  match_count int default 50,
+  filter_pairs text[] default null
+)
+returns table (
+  query_index int,
+  conference_key text,
+  conference_year int,
+  conference_pair text,
+  source_table text,
+  id text,
+  title text,
+  abstract text,
+  authors jsonb,
+  primary_category text,
+  categories jsonb,
+  published timestamptz,
+  link text,
+  pdf_url text,
+  source text,
+  similarity float8
+)
+language plpgsql stable
+set statement_timeout = '60s'
+as $$
+declare
+  spec record;
+  pair text;
+  active_pairs text[] := array[]::text[];
+  has_pair_filter boolean := false;
+  selects text[] := array[]::text[];
+  sql text;
+  year_expr text := 'coalesce(nullif(substring(p.source from ''((?:19|20)[0-9]{2})''), '''')::int, extract(year from p.published)::int)';
+begin
+  if filter_pairs is not null then
+    select array_agg(distinct lower(trim(item)))
+    into active_pairs
+    from unnest(filter_pairs) as item
+    where trim(item) <> '';
+    active_pairs := coalesce(active_pairs, array[]::text[]);
+  end if;
+  has_pair_filter := cardinality(active_pairs) > 0;
+
+  for spec in
+    select *
+    from (values
+      ('neurips', 'neurips_openreview_papers'),
+      ('icml', 'icml_openreview_papers'),
+      ('iclr', 'iclr_openreview_papers'),
+      ('aaai', 'aaai_papers'),
+      ('acl', 'acl_papers'),
+      ('emnlp', 'emnlp_papers'),
+      ('cvpr', 'cvpr_papers'),
+      ('eccv', 'eccv_papers'),
+      ('ijcai', 'ijcai_papers'),
+      ('osdi', 'osdi_papers'),
+      ('sosp', 'sosp_papers'),
+      ('ieee_sp', 'ieee_sp_papers'),
+      ('ndss', 'ndss_papers')
+    ) as s(conference_key, source_table)
+  loop
+    if has_pair_filter then
+      foreach pair in array active_pairs loop
+        if pair !~ '^[a-z0-9_]+:[0-9]{4}$' or split_part(pair, ':', 1) <> spec.conference_key then
+          continue;
+        end if;
+        selects := array_append(selects, format($fmt$
+          select
+            %L::text as conference_key,
+            split_part(%L, ':', 2)::int as conference_year,
+            %L::text as conference_pair,
+            %L::text as source_table,
+            p.id, p.title, p.abstract, p.authors, p.primary_category, p.categories,
+            p.published, p.link, p.pdf_url, p.source, p.embedding
+          from public.%I p
+          where p.embedding is not null
+            and %L = (%L || ':' || (%s)::text)
+        $fmt$, spec.conference_key, pair, pair, spec.source_table, spec.source_table, pair, spec.conference_key, year_expr));
+      end loop;
+    else
+      selects := array_append(selects, format($fmt$
+        select
+          %L::text as conference_key,
+          (%s) as conference_year,
+          %L || ':' || (%s)::text as conference_pair,
+          %L::text as source_table,
+          p.id, p.title, p.abstract, p.authors, p.primary_category, p.categories,
+          p.published, p.link, p.pdf_url, p.source, p.embedding
+        from public.%I p
+        where p.embedding is not null
+      $fmt$, spec.conference_key, year_expr, spec.conference_key, year_expr, spec.source_table, spec.source_table));
+    end if;
+  end loop;
+
+  if cardinality(selects) = 0 then
+    return;
+  end if;
+
+  sql := 'with queries as ('
+    || '  select (q.ordinality - 1)::int as query_index,'
+    || '         (q.value::text)::vector as embedding,'
+    || '         greatest(coalesce($2[q.ordinality::int], $3), 1) as k'
+    || '  from jsonb_array_elements($1) with ordinality as q(value, ordinality)'
+    || '), selected as materialized ('
+    || array_to_string(selects, ' union all ')
+    || ') select q.query_index, s.conference_key, s.conference_year, s.conference_pair, s.source_table,'
+    || '  s.id, s.title, s.abstract, s.authors, s.primary_category, s.categories,'
+    || '  s.published, s.link, s.pdf_url, s.source, s.similarity'
+    || ' from queries q cross join lateral ('
+    || '  select c.*, 1 - (c.embedding <=> q.embedding) as similarity'
+    || '  from selected c order by c.embedding <=> q.embedding limit q.k'
+    || ') s order by q.query_index, s.similarity desc';
+  return query execute sql using query_embeddings, match_counts, match_count;
+end;
+$$;
+
+grant execute on function public.match_conference_papers_exact_batch(jsonb, int[], int, text[]) to anon, authenticated;
@@ -11,8 +11,10 @@ import json
 import math
 import os
 import re
+import time
 from datetime import datetime, timedelta, timezone
 from dataclasses import dataclass, field
+from functools import partial
 from typing import Dict, List, Set, Any, Iterable
 
 from query_boolean import (
@@ -31,10 +33,16 @@ except Exception:  # pragma: no cover - 兼容 package 导入路径
   from src.source_config import ARXIV_SOURCE_KEY, get_source_backend, load_config_with_source_migration, normalize_source_list
 from subscription_plan import build_pipeline_inputs
 from supabase_source import (
+  batch_rpc_enabled,
   count_papers_by_date_range,
   get_supabase_read_config,
+  is_missing_rpc_message,
   match_papers_by_bm25,
+  match_papers_by_bm25_batch,
+  resolve_batch_rpc_name,
 )
+from supabase_fanout import fan_out, is_statement_timeout_message, rpc_slot
+from supabase_shard_tuner import get_shard_tuner, tuner_key, window_span_days
 
 
 # 当前脚本位于 src/ 下，config.yaml 在上一级目录
@@ -358,6 +366,12 @@ def merge_supabase_bm25_rows(
   return merged
 
 
+def _window_timed_out(result: tuple[list[list[Dict[str, Any]]], int, list[str]]) -> bool:
+  """分片（含超时拆分后的子分片）全部失败且原因是 57014：后续分片大概率同样超时，停止派发。"""
+  _, success_count, failures = result
+  return success_count <= 0 and any(is_statement_timeout_message(msg) for msg in failures)
+
+
 def _query_supabase_bm25_window(
   *,
   url: str,
@@ -373,19 +387,30 @@ def _query_supabase_bm25_window(
   min_shard_days: int = 1,
   depth: int = 0,
   filter_sources: List[str] | None = None,
+  size_key: str = "",
 ) -> tuple[list[list[Dict[str, Any]]], int, list[str]]:
-  rows, msg = match_papers_by_bm25(
-    url=url,
-    api_key=api_key,
-    rpc_name=rpc_name,
-    query_text=query_text,
-    match_count=match_count,
-    schema=schema,
-    start_dt=start_dt,
-    end_dt=end_dt,
-    time_fields=time_fields,
-    filter_sources=filter_sources,
-  )
+  started = time.time()
+  with rpc_slot():
+    rows, msg = match_papers_by_bm25(
+      url=url,
+      api_key=api_key,
+      rpc_name=rpc_name,
+      query_text=query_text,
+      match_count=match_count,
+      schema=schema,
+      start_dt=start_dt,
+      end_dt=end_dt,
+      time_fields=time_fields,
+      filter_sources=filter_sources,
+    )
+  if size_key and (msg.startswith("rpc 查询成功") or is_statement_timeout_message(msg)):
+    get_shard_tuner().record(
+      size_key,
+      span_days=window_span_days(start_dt, end_dt),
+      elapsed=time.time() - started,
+      timed_out=is_statement_timeout_message(msg),
+    )
+
   window = f"{start_dt.isoformat()} ~ {end_dt.isoformat()}"
   log(
     "[Supabase BM25] "
@@ -438,22 +463,31 @@ def _query_supabase_bm25_window(
   rows_per_shard: list[list[Dict[str, Any]]] = []
   success_count = 0
   failure_messages: list[str] = []
-  for sub_start, sub_end in sub_shards:
-    sub_rows, sub_success, sub_failures = _query_supabase_bm25_window(
-      url=url,
-      api_key=api_key,
-      rpc_name=rpc_name,
-      query_text=query_text,
-      match_count=match_count,
-      schema=schema,
-      start_dt=sub_start,
-      end_dt=sub_end,
-      time_fields=time_fields,
-      shard_days=next_shard_days,
-      min_shard_days=safe_min_shard_days,
-      depth=depth + 1,
-      filter_sources=filter_sources,
-    )
+  window_results = fan_out(
+    [
+      partial(
+        _query_supabase_bm25_window,
+        url=url,
+        api_key=api_key,
+        rpc_name=rpc_name,
+        query_text=query_text,
+        match_count=match_count,
+        schema=schema,
+        start_dt=sub_start,
+        end_dt=sub_end,
+        time_fields=time_fields,
+        shard_days=next_shard_days,
+        min_shard_days=safe_min_shard_days,
+        depth=depth + 1,
+        filter_sources=filter_sources,
+        size_key=size_key,
+      )
+      for sub_start, sub_end in sub_shards
+    ],
+  )
+  # 拆分后的子分片全部派发：单个子分片超时不影响兄弟分片（只在顶层分片扇出时停止派发）
+  for window_result in window_results:
+    sub_rows, sub_success, sub_failures = window_result
     rows_per_shard.extend(sub_rows)
     success_count += sub_success
     failure_messages.extend(sub_failures)
@@ -473,25 +507,29 @@ def query_supabase_bm25_with_shards(
   start_dt: datetime | None,
   end_dt: datetime | None,
   time_fields: tuple[str, ...],
-  shard_days: int = SUPABASE_BM25_SHARD_DAYS,
+  shard_days: int | None = None,
   filter_sources: List[str] | None = None,
 ) -> tuple[list[Dict[str, Any]], str]:
   safe_start = _normalize_utc_datetime(start_dt)
   safe_end = _normalize_utc_datetime(end_dt)
   if safe_start is None or safe_end is None or safe_end <= safe_start:
-    return match_papers_by_bm25(
-      url=url,
-      api_key=api_key,
-      rpc_name=rpc_name,
-      query_text=query_text,
-      match_count=match_count,
-      schema=schema,
-      start_dt=start_dt,
-      end_dt=end_dt,
-      time_fields=time_fields,
-      filter_sources=filter_sources,
-    )
+    with rpc_slot():
+      return match_papers_by_bm25(
+        url=url,
+        api_key=api_key,
+        rpc_name=rpc_name,
+        query_text=query_text,
+        match_count=match_count,
+        schema=schema,
+        start_dt=start_dt,
+        end_dt=end_dt,
+        time_fields=time_fields,
+        filter_sources=filter_sources,
+      )
 
+  size_key = tuner_key("bm25", rpc_name)
+  if shard_days is None:
+    shard_days = get_shard_tuner().shard_days(size_key)
   shards = split_supabase_time_window(
     safe_start,
     safe_end,
@@ -504,20 +542,32 @@ def query_supabase_bm25_with_shards(
   success_count = 0
   failure_messages: list[str] = []
 
-  for shard_start, shard_end in shards:
-    sub_rows, sub_success, sub_failures = _query_supabase_bm25_window(
-      url=url,
-      api_key=api_key,
-      rpc_name=rpc_name,
-      query_text=query_text,
-      match_count=match_count,
-      schema=schema,
-      start_dt=shard_start,
-      end_dt=shard_end,
-      time_fields=time_fields,
-      shard_days=max(int(shard_days or 1), 1),
-      filter_sources=filter_sources,
-    )
+  window_results = fan_out(
+    [
+      partial(
+        _query_supabase_bm25_window,
+        url=url,
+        api_key=api_key,
+        rpc_name=rpc_name,
+        query_text=query_text,
+        match_count=match_count,
+        schema=schema,
+        start_dt=shard_start,
+        end_dt=shard_end,
+        time_fields=time_fields,
+        shard_days=max(int(shard_days or 1), 1),
+        filter_sources=filter_sources,
+        size_key=size_key,
+      )
+      for shard_start, shard_end in shards
+    ],
+    stop_when=_window_timed_out,
+  )
+  for window_result in window_results:
+    if window_result is None:
+      failure_messages.append("前序分片语句超时 (57014)，未派发")
+      continue
+    sub_rows, sub_success, sub_failures = window_result
     rows_per_shard.extend(sub_rows)
     success_count += sub_success
     failure_messages.extend(sub_failures)
@@ -539,6 +589,216 @@ def query_supabase_bm25_with_shards(
   return (merged_rows, summary)
 
 
+def _query_supabase_bm25_batch_shard(
+  *,
+  url: str,
+  api_key: str,
+  rpc_name: str,
+  query_texts: list[str],
+  match_count: int,
+  schema: str,
+  start_dt: datetime | None,
+  end_dt: datetime | None,
+  time_fields: tuple[str, ...],
+  filter_sources: List[str] | None = None,
+  size_key: str = "",
+) -> tuple[list[list[Dict[str, Any]]], str]:
+  started = time.time()
+  with rpc_slot():
+    rows_by_query, msg = match_papers_by_bm25_batch(
+      url=url,
+      api_key=api_key,
+      rpc_name=rpc_name,
+      query_texts=query_texts,
+      match_count=match_count,
+      schema=schema,
+      start_dt=start_dt,
+      end_dt=end_dt,
+      time_fields=time_fields,
+      filter_sources=filter_sources,
+    )
+  if size_key and isinstance(start_dt, datetime) and isinstance(end_dt, datetime) and (
+    msg.startswith("rpc 查询成功") or is_statement_timeout_message(msg)
+  ):
+    get_shard_tuner().record(
+      size_key,
+      span_days=window_span_days(start_dt, end_dt),
+      elapsed=time.time() - started,
+      timed_out=is_statement_timeout_message(msg),
+    )
+  window = (
+    f"{start_dt.isoformat()} ~ {end_dt.isoformat()}"
+    if isinstance(start_dt, datetime) and isinstance(end_dt, datetime)
+    else "N/A"
+  )
+  log(f"[Supabase BM25:batch] rpc={rpc_name} window={window} {msg}")
+  return (rows_by_query, msg)
+
+
+def query_supabase_bm25_batch(
+  *,
+  url: str,
+  api_key: str,
+  rpc_name: str,
+  query_texts: list[str],
+  match_count: int,
+  schema: str,
+  start_dt: datetime | None,
+  end_dt: datetime | None,
+  time_fields: tuple[str, ...],
+  shard_days: int | None = None,
+  filter_sources: List[str] | None = None,
+  fallback_rpc_name: str = "",
+) -> tuple[list[tuple[list[Dict[str, Any]], str]] | None, str]:
+  """
+  批量 BM25 RPC：每个时间分片只调用一次，服务本组全部查询；分片经 fan_out 并发派发，
+  每次调用占用一个 rpc_slot。返回与 query_texts 对齐的 (rows, msg)。
+  个别分片失败时只对该分片逐查询回退（fallback_rpc_name，含超时拆分），已成功的分片结果保留；
+  批量 RPC 未部署或未提供 fallback_rpc_name 时返回 None，由调用方整体回退到逐查询路径。
+  """
+  size_key = tuner_key("bm25", rpc_name)
+  if shard_days is None:
+    shard_days = get_shard_tuner().shard_days(size_key)
+  safe_start = _normalize_utc_datetime(start_dt)
+  safe_end = _normalize_utc_datetime(end_dt)
+  if safe_start is not None and safe_end is not None and safe_end > safe_start:
+    shards: list[tuple[datetime | None, datetime | None]] = list(
+      split_supabase_time_window(safe_start, safe_end, shard_days=shard_days)
+    )
+  else:
+    shards = [(start_dt, end_dt)]
+
+  shard_results = fan_out(
+    [
+      partial(
+        _query_supabase_bm25_batch_shard,
+        url=url,
+        api_key=api_key,
+        rpc_name=rpc_name,
+        query_texts=query_texts,
+        match_count=match_count,
+        schema=schema,
+        start_dt=shard_start,
+        end_dt=shard_end,
+        time_fields=time_fields,
+        filter_sources=filter_sources,
+        size_key=size_key,
+      )
+      for shard_start, shard_end in shards
+    ],
+  )
+  failed = [i for i, (_, msg) in enumerate(shard_results) if not msg.startswith("rpc 查询成功")]
+  if failed and (not fallback_rpc_name or any(is_missing_rpc_message(shard_results[i][1]) for i in failed)):
+    return (None, shard_results[failed[0]][1])
+
+  rows_per_query: list[list[list[Dict[str, Any]]]] = [[] for _ in query_texts]
+  for shard_idx, (rows_by_query, _msg) in enumerate(shard_results):
+    if shard_idx in failed:
+      continue
+    for q_idx, rows in enumerate(rows_by_query):
+      rows_per_query[q_idx].append(rows)
+
+  # 失败的分片逐查询回退：query × 失败分片扇出，已成功的分片不重跑
+  fallback_tasks = [(q_idx, shard_idx) for shard_idx in failed for q_idx in range(len(query_texts))]
+  if fallback_tasks:
+    log(
+      f"[Supabase BM25:batch] {len(failed)}/{len(shards)} 个分片批量查询失败，"
+      f"仅对这些分片逐查询回退（{len(fallback_tasks)} 次调用）。"
+    )
+  fallback_results = fan_out(
+    [
+      partial(
+        query_supabase_bm25_with_shards,
+        url=url,
+        api_key=api_key,
+        rpc_name=fallback_rpc_name,
+        query_text=query_texts[q_idx],
+        match_count=match_count,
+        schema=schema,
+        start_dt=shards[shard_idx][0],
+        end_dt=shards[shard_idx][1],
+        time_fields=time_fields,
+        shard_days=shard_days,
+        filter_sources=filter_sources,
+      )
+      for q_idx, shard_idx in fallback_tasks
+    ],
+  )
+  successes = [len(shards) - len(failed) for _ in query_texts]
+  failures: list[list[str]] = [[] for _ in query_texts]
+  for (q_idx, _shard_idx), (rows, msg) in zip(fallback_tasks, fallback_results):
+    if msg.startswith(("rpc 查询成功", "rpc 分片查询成功")):
+      rows_per_query[q_idx].append(rows)
+      successes[q_idx] += 1
+    else:
+      failures[q_idx].append(msg)
+
+  summary = f"rpc 批量查询成功：queries={len(query_texts)} shards={len(shards)}"
+  if failed:
+    summary += f" fallback_shards={len(failed)}"
+  results: list[tuple[list[Dict[str, Any]], str]] = []
+  for q_idx, shard_rows in enumerate(rows_per_query):
+    if successes[q_idx] <= 0:
+      detail = " | ".join(failures[q_idx][:2]) if failures[q_idx] else "所有分片均失败"
+      results.append(([], f"rpc 分片查询失败：success=0/{len(shards)} | {detail}"))
+      continue
+    merged = merge_supabase_bm25_rows(shard_rows, top_k=max(int(match_count or 1), 1))
+    msg = f"{summary} hits={len(merged)}"
+    if failures[q_idx]:
+      msg += f" | partial_failures={len(failures[q_idx])}"
+    results.append((merged, msg))
+  return (results, summary)
+
+
+def _rank_bm25_queries_in_batches(
+  *,
+  queries: List[dict],
+  top_k: int,
+  supabase_conf: Dict[str, Any],
+  rpc_name: str,
+  start_dt: datetime | None,
+  end_dt: datetime | None,
+  time_fields: tuple[str, ...],
+  query_filter_sources: bool,
+) -> Dict[int, tuple[list[Dict[str, Any]], str]]:
+  """
+  按 filter_sources 分组调用批量 BM25 RPC，返回 {query_idx: (rows, msg)}。
+  批量 RPC 不存在或失败时返回空 dict（或缺失对应查询），调用方逐查询回退。
+  """
+  groups: Dict[tuple[str, ...], List[int]] = {}
+  for idx, q in enumerate(queries):
+    if not _query_text_for_supabase_bm25(q):
+      continue
+    sources = tuple(normalize_source_list(q.get("paper_sources"))) if query_filter_sources else ()
+    groups.setdefault(sources, []).append(idx)
+
+  batch_rpc = resolve_batch_rpc_name(supabase_conf, rpc_name, key="bm25_rpc_batch")
+  out: Dict[int, tuple[list[Dict[str, Any]], str]] = {}
+  for sources, indices in groups.items():
+    results, msg = query_supabase_bm25_batch(
+      url=str(supabase_conf.get("url") or "").strip(),
+      api_key=str(supabase_conf.get("anon_key") or "").strip(),
+      rpc_name=batch_rpc,
+      query_texts=[_query_text_for_supabase_bm25(queries[idx]) for idx in indices],
+      match_count=max(int(top_k or 1), 1),
+      schema=str(supabase_conf.get("schema") or "public").strip(),
+      start_dt=start_dt,
+      end_dt=end_dt,
+      time_fields=time_fields,
+      filter_sources=list(sources) if sources else None,
+      fallback_rpc_name=rpc_name,
+    )
+    if results is None:
+      if is_missing_rpc_message(msg):
+        log(f"[Supabase BM25:batch] 未部署批量 RPC {batch_rpc}，回退逐查询调用。")
+        return {}
+      log(f"[Supabase BM25:batch] 批量查询失败，本组 {len(indices)} 个查询回退逐查询调用。")
+      continue
+    for idx, (rows, query_msg) in zip(indices, results):
+      out[idx] = (rows, f"{query_msg} | batch_rpc={batch_rpc}")
+  return out
+
+
 def load_paper_pool(path: str) -> List[Paper]:
   """
   读取 arxiv_fetch_raw.py 生成的 JSON：
@@ -662,6 +922,40 @@ def rank_papers_for_queries_via_supabase(
   id_to_paper: Dict[str, Paper] = {}
   results_per_query: List[dict] = []
   total_hits = 0
+  batched: Dict[int, tuple[list[Dict[str, Any]], str]] = {}
+  if batch_rpc_enabled(supabase_conf):
+    batched = _rank_bm25_queries_in_batches(
+      queries=queries,
+      top_k=top_k,
+      supabase_conf=supabase_conf,
+      rpc_name=rpc_name,
+      start_dt=start_dt,
+      end_dt=end_dt,
+      time_fields=time_fields,
+      query_filter_sources=query_filter_sources,
+    )
+
+  # 未被批量 RPC 覆盖的查询：query × 分片有界并发扇出；每个查询都会派发，57014 只影响该查询自身的分片
+  pending_indices = [
+    idx for idx, q in enumerate(queries)
+    if idx not in batched and _query_text_for_supabase_bm25(q)
+  ]
+
+  def _fetch(q: dict) -> tuple[list[Dict[str, Any]], str]:
+    return query_supabase_bm25_with_shards(
+      url=url,
+      api_key=api_key,
+      rpc_name=rpc_name,
+      query_text=_query_text_for_supabase_bm25(q),
+      match_count=max(int(top_k or 1), 1),
+      schema=schema,
+      start_dt=start_dt,
+      end_dt=end_dt,
+      time_fields=time_fields,
+      filter_sources=normalize_source_list(q.get("paper_sources")) if query_filter_sources else None,
+    )
+
+  fetched = dict(zip(pending_indices, fan_out([partial(_fetch, queries[idx]) for idx in pending_indices])))
 
   for q_idx, q in enumerate(queries, start=1):
     q_text = _query_text_for_supabase_bm25(q)
@@ -683,18 +977,10 @@ def rank_papers_for_queries_via_supabase(
       f"time_fields={window_fields}"
     )
 
-    rows, msg = query_supabase_bm25_with_shards(
-      url=url,
-      api_key=api_key,
-      rpc_name=rpc_name,
-      query_text=q_text,
-      match_count=max(int(top_k or 1), 1),
-      schema=schema,
-      start_dt=start_dt,
-      end_dt=end_dt,
-      time_fields=time_fields,
-      filter_sources=normalize_source_list(q.get("paper_sources")) if query_filter_sources else None,
-    )
+    if q_idx - 1 in batched:
+      rows, msg = batched[q_idx - 1]
+    else:
+      rows, msg = fetched[q_idx - 1]
     log(f"[Supabase BM25] {msg} | tag={q.get('tag') or ''}")
 
     sim_scores: Dict[str, Dict[str, float | int]] = {}
@@ -1240,5 +1526,16 @@ def main() -> None:
       process_single_file(input_path, output_path)
 
 
+def save_shard_state() -> None:
+  try:
+    if get_shard_tuner().save():
+      log(f"[Supabase] 分片大小已记录：{get_shard_tuner().path}")
+  except Exception as e:
+    log(f"[WARN] 保存分片状态失败：{e}")
+
+
 if __name__ == "__main__":
-  main()
+  try:
+    main()
+  finally:
+    save_shard_state()
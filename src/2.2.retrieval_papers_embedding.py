@@ -13,8 +13,10 @@ import math
 import hashlib
 from datetime import datetime, timedelta, timezone
 from dataclasses import dataclass, field
+from functools import partial
 from typing import Dict, List, Set, Any, Optional, Callable
 import re
+import time
 
 import numpy as np
 
@@ -27,10 +29,16 @@ except Exception:  # pragma: no cover - 兼容 package 导入路径
   from src.source_config import ARXIV_SOURCE_KEY, get_source_backend, load_config_with_source_migration, normalize_source_list
 from subscription_plan import build_pipeline_inputs
 from supabase_source import (
+  batch_rpc_enabled,
   count_papers_by_date_range,
   get_supabase_read_config,
+  is_missing_rpc_message,
   match_papers_by_embedding,
+  match_papers_by_embedding_batch,
+  resolve_batch_rpc_name,
 )
+from supabase_fanout import fan_out, is_statement_timeout_message, rpc_slot
+from supabase_shard_tuner import get_shard_tuner, tuner_key, window_span_days
 
 
 # 当前脚本位于 src/ 下，config.yaml 在上一级目录
@@ -595,6 +603,12 @@ def merge_supabase_vector_rows(
   return merged
 
 
+def _window_timed_out(result: tuple[list[list[Dict[str, Any]]], int, list[str]]) -> bool:
+  """分片（含超时拆分后的子分片）全部失败且原因是 57014：后续分片大概率同样超时，停止派发。"""
+  _, success_count, failures = result
+  return success_count <= 0 and any(is_statement_timeout_message(msg) for msg in failures)
+
+
 def _query_supabase_vector_window(
   *,
   url: str,
@@ -611,19 +625,30 @@ def _query_supabase_vector_window(
   depth: int = 0,
   rpc_mode: str = "exact",
   filter_sources: List[str] | None = None,
+  size_key: str = "",
 ) -> tuple[list[list[Dict[str, Any]]], int, list[str]]:
-  rows, msg = match_papers_by_embedding(
-    url=url,
-    api_key=api_key,
-    rpc_name=rpc_name,
-    query_embedding=query_embedding,
-    match_count=match_count,
-    schema=schema,
-    start_dt=start_dt,
-    end_dt=end_dt,
-    time_fields=time_fields,
-    filter_sources=filter_sources,
-  )
+  started = time.time()
+  with rpc_slot():
+    rows, msg = match_papers_by_embedding(
+      url=url,
+      api_key=api_key,
+      rpc_name=rpc_name,
+      query_embedding=query_embedding,
+      match_count=match_count,
+      schema=schema,
+      start_dt=start_dt,
+      end_dt=end_dt,
+      time_fields=time_fields,
+      filter_sources=filter_sources,
+    )
+  if size_key and (msg.startswith("rpc 查询成功") or is_statement_timeout_message(msg)):
+    get_shard_tuner().record(
+      size_key,
+      span_days=window_span_days(start_dt, end_dt),
+      elapsed=time.time() - started,
+      timed_out=is_statement_timeout_message(msg),
+    )
+
   window = f"{start_dt.isoformat()} ~ {end_dt.isoformat()}"
   log(
     f"[Supabase Vector:{rpc_mode}] "
@@ -676,23 +701,32 @@ def _query_supabase_vector_window(
   rows_per_shard: list[list[Dict[str, Any]]] = []
   success_count = 0
   failure_messages: list[str] = []
-  for sub_start, sub_end in sub_shards:
-    sub_rows, sub_success, sub_failures = _query_supabase_vector_window(
-      url=url,
-      api_key=api_key,
-      rpc_name=rpc_name,
-      query_embedding=query_embedding,
-      match_count=match_count,
-      schema=schema,
-      start_dt=sub_start,
-      end_dt=sub_end,
-      time_fields=time_fields,
-      shard_days=next_shard_days,
-      min_shard_days=safe_min_shard_days,
-      depth=depth + 1,
-      rpc_mode=rpc_mode,
-      filter_sources=filter_sources,
-    )
+  window_results = fan_out(
+    [
+      partial(
+        _query_supabase_vector_window,
+        url=url,
+        api_key=api_key,
+        rpc_name=rpc_name,
+        query_embedding=query_embedding,
+        match_count=match_count,
+        schema=schema,
+        start_dt=sub_start,
+        end_dt=sub_end,
+        time_fields=time_fields,
+        shard_days=next_shard_days,
+        min_shard_days=safe_min_shard_days,
+        depth=depth + 1,
+        rpc_mode=rpc_mode,
+        filter_sources=filter_sources,
+        size_key=size_key,
+      )
+      for sub_start, sub_end in sub_shards
+    ],
+  )
+  # 拆分后的子分片全部派发：单个子分片超时不影响兄弟分片（只在顶层分片扇出时停止派发）
+  for window_result in window_results:
+    sub_rows, sub_success, sub_failures = window_result
     rows_per_shard.extend(sub_rows)
     success_count += sub_success
     failure_messages.extend(sub_failures)
@@ -713,26 +747,30 @@ def query_supabase_vector_with_shards(
   start_dt: datetime | None,
   end_dt: datetime | None,
   time_fields: tuple[str, ...],
-  shard_days: int = SUPABASE_VECTOR_SHARD_DAYS,
+  shard_days: int | None = None,
   rpc_mode: str = "exact",
   filter_sources: List[str] | None = None,
 ) -> tuple[list[Dict[str, Any]], str]:
   safe_start = _normalize_utc_datetime(start_dt)
   safe_end = _normalize_utc_datetime(end_dt)
   if safe_start is None or safe_end is None or safe_end <= safe_start:
-    return match_papers_by_embedding(
-      url=url,
-      api_key=api_key,
-      rpc_name=rpc_name,
-      query_embedding=query_embedding,
-      match_count=match_count,
-      schema=schema,
-      start_dt=start_dt,
-      end_dt=end_dt,
-      time_fields=time_fields,
-      filter_sources=filter_sources,
-    )
+    with rpc_slot():
+      return match_papers_by_embedding(
+        url=url,
+        api_key=api_key,
+        rpc_name=rpc_name,
+        query_embedding=query_embedding,
+        match_count=match_count,
+        schema=schema,
+        start_dt=start_dt,
+        end_dt=end_dt,
+        time_fields=time_fields,
+        filter_sources=filter_sources,
+      )
 
+  size_key = tuner_key("vector", rpc_name)
+  if shard_days is None:
+    shard_days = get_shard_tuner().shard_days(size_key)
   shards = split_supabase_time_window(
     safe_start,
     safe_end,
@@ -745,21 +783,33 @@ def query_supabase_vector_with_shards(
   success_count = 0
   failure_messages: list[str] = []
 
-  for shard_start, shard_end in shards:
-    sub_rows, sub_success, sub_failures = _query_supabase_vector_window(
-      url=url,
-      api_key=api_key,
-      rpc_name=rpc_name,
-      query_embedding=query_embedding,
-      match_count=match_count,
-      schema=schema,
-      start_dt=shard_start,
-      end_dt=shard_end,
-      time_fields=time_fields,
-      shard_days=max(int(shard_days or 1), 1),
-      rpc_mode=rpc_mode,
-      filter_sources=filter_sources,
-    )
+  window_results = fan_out(
+    [
+      partial(
+        _query_supabase_vector_window,
+        url=url,
+        api_key=api_key,
+        rpc_name=rpc_name,
+        query_embedding=query_embedding,
+        match_count=match_count,
+        schema=schema,
+        start_dt=shard_start,
+        end_dt=shard_end,
+        time_fields=time_fields,
+        shard_days=max(int(shard_days or 1), 1),
+        rpc_mode=rpc_mode,
+        filter_sources=filter_sources,
+        size_key=size_key,
+      )
+      for shard_start, shard_end in shards
+    ],
+    stop_when=_window_timed_out,
+  )
+  for window_result in window_results:
+    if window_result is None:
+      failure_messages.append("前序分片语句超时 (57014)，未派发")
+      continue
+    sub_rows, sub_success, sub_failures = window_result
     rows_per_shard.extend(sub_rows)
     success_count += sub_success
     failure_messages.extend(sub_failures)
@@ -781,6 +831,235 @@ def query_supabase_vector_with_shards(
   return (merged_rows, summary)
 
 
+def _query_supabase_vector_batch_shard(
+  *,
+  url: str,
+  api_key: str,
+  rpc_name: str,
+  query_embeddings: list[list[float]],
+  match_count: int,
+  schema: str,
+  start_dt: datetime | None,
+  end_dt: datetime | None,
+  time_fields: tuple[str, ...],
+  rpc_mode: str = "exact",
+  filter_sources: List[str] | None = None,
+  size_key: str = "",
+) -> tuple[list[list[Dict[str, Any]]], str]:
+  started = time.time()
+  with rpc_slot():
+    rows_by_query, msg = match_papers_by_embedding_batch(
+      url=url,
+      api_key=api_key,
+      rpc_name=rpc_name,
+      query_embeddings=query_embeddings,
+      match_count=match_count,
+      schema=schema,
+      start_dt=start_dt,
+      end_dt=end_dt,
+      time_fields=time_fields,
+      filter_sources=filter_sources,
+    )
+  if size_key and isinstance(start_dt, datetime) and isinstance(end_dt, datetime) and (
+    msg.startswith("rpc 查询成功") or is_statement_timeout_message(msg)
+  ):
+    get_shard_tuner().record(
+      size_key,
+      span_days=window_span_days(start_dt, end_dt),
+      elapsed=time.time() - started,
+      timed_out=is_statement_timeout_message(msg),
+    )
+  window = (
+    f"{start_dt.isoformat()} ~ {end_dt.isoformat()}"
+    if isinstance(start_dt, datetime) and isinstance(end_dt, datetime)
+    else "N/A"
+  )
+  log(f"[Supabase Vector:{rpc_mode}:batch] rpc={rpc_name} window={window} {msg}")
+  return (rows_by_query, msg)
+
+
+def query_supabase_vector_batch(
+  *,
+  url: str,
+  api_key: str,
+  rpc_name: str,
+  query_embeddings: list[list[float]],
+  match_count: int,
+  schema: str,
+  start_dt: datetime | None,
+  end_dt: datetime | None,
+  time_fields: tuple[str, ...],
+  shard_days: int | None = None,
+  rpc_mode: str = "exact",
+  filter_sources: List[str] | None = None,
+  fallback_rpc_name: str = "",
+) -> tuple[list[tuple[list[Dict[str, Any]], str]] | None, str]:
+  """
+  批量向量 RPC：每个时间分片只调用一次，服务本组全部查询；分片经 fan_out 并发派发，
+  每次调用占用一个 rpc_slot。返回与 query_embeddings 对齐的 (rows, msg)。
+  个别分片失败时只对该分片逐查询回退（fallback_rpc_name，exact 模式含超时拆分），已成功的分片结果保留；
+  批量 RPC 未部署或未提供 fallback_rpc_name 时返回 None，由调用方整体回退到逐查询路径。
+  """
+  size_key = tuner_key("vector", rpc_name)
+  if shard_days is None:
+    shard_days = get_shard_tuner().shard_days(size_key)
+  safe_start = _normalize_utc_datetime(start_dt)
+  safe_end = _normalize_utc_datetime(end_dt)
+  if rpc_mode == "exact" and safe_start is not None and safe_end is not None and safe_end > safe_start:
+    shards: list[tuple[datetime | None, datetime | None]] = list(
+      split_supabase_time_window(safe_start, safe_end, shard_days=shard_days)
+    )
+  else:
+    shards = [(start_dt, end_dt)]
+
+  shard_results = fan_out(
+    [
+      partial(
+        _query_supabase_vector_batch_shard,
+        url=url,
+        api_key=api_key,
+        rpc_name=rpc_name,
+        query_embeddings=query_embeddings,
+        match_count=match_count,
+        schema=schema,
+        start_dt=shard_start,
+        end_dt=shard_end,
+        time_fields=time_fields,
+        rpc_mode=rpc_mode,
+        filter_sources=filter_sources,
+        size_key=size_key,
+      )
+      for shard_start, shard_end in shards
+    ],
+  )
+  failed = [i for i, (_, msg) in enumerate(shard_results) if not msg.startswith("rpc 查询成功")]
+  if failed and (not fallback_rpc_name or any(is_missing_rpc_message(shard_results[i][1]) for i in failed)):
+    return (None, shard_results[failed[0]][1])
+
+  rows_per_query: list[list[list[Dict[str, Any]]]] = [[] for _ in query_embeddings]
+  for shard_idx, (rows_by_query, _msg) in enumerate(shard_results):
+    if shard_idx in failed:
+      continue
+    for q_idx, rows in enumerate(rows_by_query):
+      rows_per_query[q_idx].append(rows)
+
+  def _fallback(q_idx: int, shard_idx: int) -> tuple[list[Dict[str, Any]], str]:
+    shard_start, shard_end = shards[shard_idx]
+    if rpc_mode == "exact":
+      return query_supabase_vector_with_shards(
+        url=url,
+        api_key=api_key,
+        rpc_name=fallback_rpc_name,
+        query_embedding=query_embeddings[q_idx],
+        match_count=match_count,
+        schema=schema,
+        start_dt=shard_start,
+        end_dt=shard_end,
+        time_fields=time_fields,
+        shard_days=shard_days,
+        rpc_mode=rpc_mode,
+        filter_sources=filter_sources,
+      )
+    with rpc_slot():
+      return match_papers_by_embedding(
+        url=url,
+        api_key=api_key,
+        rpc_name=fallback_rpc_name,
+        query_embedding=query_embeddings[q_idx],
+        match_count=match_count,
+        schema=schema,
+        start_dt=shard_start,
+        end_dt=shard_end,
+        time_fields=time_fields,
+        filter_sources=filter_sources,
+      )
+
+  # 失败的分片逐查询回退：query × 失败分片扇出，已成功的分片不重跑
+  fallback_tasks = [(q_idx, shard_idx) for shard_idx in failed for q_idx in range(len(query_embeddings))]
+  if fallback_tasks:
+    log(
+      f"[Supabase Vector:{rpc_mode}:batch] {len(failed)}/{len(shards)} 个分片批量查询失败，"
+      f"仅对这些分片逐查询回退（{len(fallback_tasks)} 次调用）。"
+    )
+  fallback_results = fan_out([partial(_fallback, q_idx, shard_idx) for q_idx, shard_idx in fallback_tasks])
+  successes = [len(shards) - len(failed) for _ in query_embeddings]
+  failures: list[list[str]] = [[] for _ in query_embeddings]
+  for (q_idx, _shard_idx), (rows, msg) in zip(fallback_tasks, fallback_results):
+    if msg.startswith(("rpc 查询成功", "rpc 分片查询成功")):
+      rows_per_query[q_idx].append(rows)
+      successes[q_idx] += 1
+    else:
+      failures[q_idx].append(msg)
+
+  summary = f"rpc 批量查询成功：queries={len(query_embeddings)} shards={len(shards)}"
+  if failed:
+    summary += f" fallback_shards={len(failed)}"
+  results: list[tuple[list[Dict[str, Any]], str]] = []
+  for q_idx, shard_rows in enumerate(rows_per_query):
+    if successes[q_idx] <= 0:
+      detail = " | ".join(failures[q_idx][:2]) if failures[q_idx] else "所有分片均失败"
+      results.append(([], f"rpc 分片查询失败：success=0/{len(shards)} | {detail}"))
+      continue
+    merged = merge_supabase_vector_rows(shard_rows, top_k=max(int(match_count or 1), 1))
+    msg = f"{summary} hits={len(merged)}"
+    if failures[q_idx]:
+      msg += f" | partial_failures={len(failures[q_idx])}"
+    results.append((merged, msg))
+  return (results, summary)
+
+
+def _rank_vector_queries_in_batches(
+  *,
+  queries: List[dict],
+  q_embs: List[np.ndarray],
+  top_k: int,
+  supabase_conf: Dict[str, Any],
+  rpc_name: str,
+  start_dt: datetime | None,
+  end_dt: datetime | None,
+  time_fields: tuple[str, ...],
+  rpc_mode: str,
+  query_filter_sources: bool,
+) -> Dict[int, tuple[list[Dict[str, Any]], str]]:
+  """
+  按 filter_sources 分组调用批量 RPC，返回 {query_idx: (rows, msg)}。
+  批量 RPC 不存在或失败时返回空 dict（或缺失对应查询），调用方逐查询回退。
+  """
+  groups: Dict[tuple[str, ...], List[int]] = {}
+  for idx, q in enumerate(queries):
+    if not str(q.get("query_text") or "").strip() or q_embs[idx].size == 0:
+      continue
+    sources = tuple(normalize_source_list(q.get("paper_sources"))) if query_filter_sources else ()
+    groups.setdefault(sources, []).append(idx)
+
+  batch_rpc = resolve_batch_rpc_name(supabase_conf, rpc_name)
+  out: Dict[int, tuple[list[Dict[str, Any]], str]] = {}
+  for sources, indices in groups.items():
+    results, msg = query_supabase_vector_batch(
+      url=str(supabase_conf.get("url") or "").strip(),
+      api_key=str(supabase_conf.get("anon_key") or "").strip(),
+      rpc_name=batch_rpc,
+      query_embeddings=[q_embs[idx].tolist() for idx in indices],
+      match_count=max(int(top_k or 1), 1),
+      schema=str(supabase_conf.get("schema") or "public").strip(),
+      start_dt=start_dt,
+      end_dt=end_dt,
+      time_fields=time_fields,
+      rpc_mode=rpc_mode,
+      filter_sources=list(sources) if sources else None,
+      fallback_rpc_name=rpc_name,
+    )
+    if results is None:
+      if is_missing_rpc_message(msg):
+        log(f"[Supabase Vector:{rpc_mode}:batch] 未部署批量 RPC {batch_rpc}，回退逐查询调用。")
+        return {}
+      log(f"[Supabase Vector:{rpc_mode}:batch] 批量查询失败，本组 {len(indices)} 个查询回退逐查询调用。")
+      continue
+    for idx, (rows, query_msg) in zip(indices, results):
+      out[idx] = (rows, f"{query_msg} | batch_rpc={batch_rpc}")
+  return out
+
+
 def parse_embedding_value(value: Any) -> Optional[np.ndarray]:
   if isinstance(value, np.ndarray):
     vec = value.astype(np.float32)
@@ -990,6 +1269,60 @@ def rank_papers_for_queries_via_supabase(
     for local_idx, query_idx in enumerate(missing_indices):
       q_embs[query_idx] = np.asarray(encoded_missing[local_idx], dtype=np.float32)
 
+  batched: Dict[int, tuple[list[Dict[str, Any]], str]] = {}
+  if batch_rpc_enabled(supabase_conf):
+    batched = _rank_vector_queries_in_batches(
+      queries=queries,
+      q_embs=q_embs,
+      top_k=top_k,
+      supabase_conf=supabase_conf,
+      rpc_name=rpc_name,
+      start_dt=start_dt,
+      end_dt=end_dt,
+      time_fields=time_fields,
+      rpc_mode=rpc_mode,
+      query_filter_sources=query_filter_sources,
+    )
+
+  # 未被批量 RPC 覆盖的查询：query × 分片有界并发扇出；每个查询都会派发，57014 只影响该查询自身的分片
+  pending_indices = [
+    idx for idx, q in enumerate(queries)
+    if idx not in batched and str(q.get("query_text") or "").strip()
+  ]
+
+  def _fetch(idx: int) -> tuple[list[Dict[str, Any]], str]:
+    q = queries[idx]
+    filter_sources = normalize_source_list(q.get("paper_sources")) if query_filter_sources else None
+    if rpc_mode == "exact":
+      return query_supabase_vector_with_shards(
+        url=url,
+        api_key=api_key,
+        rpc_name=rpc_name,
+        query_embedding=q_embs[idx].tolist(),
+        match_count=max(int(top_k or 1), 1),
+        schema=schema,
+        start_dt=start_dt,
+        end_dt=end_dt,
+        time_fields=time_fields,
+        rpc_mode=rpc_mode,
+        filter_sources=filter_sources,
+      )
+    with rpc_slot():
+      return match_papers_by_embedding(
+        url=url,
+        api_key=api_key,
+        rpc_name=rpc_name,
+        query_embedding=q_embs[idx].tolist(),
+        match_count=max(int(top_k or 1), 1),
+        schema=schema,
+        start_dt=start_dt,
+        end_dt=end_dt,
+        time_fields=time_fields,
+        filter_sources=filter_sources,
+      )
+
+  fetched = dict(zip(pending_indices, fan_out([partial(_fetch, idx) for idx in pending_indices])))
+
   id_to_paper: Dict[str, Paper] = {}
   results_per_query: List[dict] = []
   total_hits = 0
@@ -1016,41 +1349,15 @@ def rank_papers_for_queries_via_supabase(
       f"time_fields={window_fields}"
     )
 
-    q_vec = q_embs[idx]
-    query_embedding = q_vec.tolist()
-    if rpc_mode == "exact":
-      rows, msg = query_supabase_vector_with_shards(
-        url=url,
-        api_key=api_key,
-        rpc_name=rpc_name,
-        query_embedding=query_embedding,
-        match_count=max(int(top_k or 1), 1),
-        schema=schema,
-        start_dt=start_dt,
-        end_dt=end_dt,
-        time_fields=time_fields,
-        rpc_mode=rpc_mode,
-        filter_sources=normalize_source_list(q.get("paper_sources")) if query_filter_sources else None,
-      )
+    if idx in batched:
+      rows, msg = batched[idx]
     else:
-      rows, msg = match_papers_by_embedding(
-        url=url,
-        api_key=api_key,
-        rpc_name=rpc_name,
-        query_embedding=query_embedding,
-        match_count=max(int(top_k or 1), 1),
-        schema=schema,
-        start_dt=start_dt,
-        end_dt=end_dt,
-        time_fields=time_fields,
-        filter_sources=normalize_source_list(q.get("paper_sources")) if query_filter_sources else None,
-      )
+      rows, msg = fetched[idx]
     log(f"[Supabase Vector:{rpc_mode}] {msg} | tag={q.get('tag') or ''}")
 
-    # 语句超时（57014）是服务端配置限制，后续批次也会超时，直接跳过
-    if not rows and "57014" in msg:
-      log(f"[Supabase Vector:{rpc_mode}] 检测到数据库语句超时，跳过剩余批次。")
-      break
+    # 语句超时（57014）是服务端配置限制：本查询不计入结果
+    if not rows and is_statement_timeout_message(msg):
+      continue
 
     sim_scores: Dict[str, Dict[str, float | int]] = {}
     for rank_idx, row in enumerate(rows, start=1):
@@ -1539,5 +1846,16 @@ def main() -> None:
       process_single_file(input_path, output_path)
 
 
+def save_shard_state() -> None:
+  try:
+    if get_shard_tuner().save():
+      log(f"[Supabase] 分片大小已记录：{get_shard_tuner().path}")
+  except Exception as e:
+    log(f"[WARN] 保存分片状态失败：{e}")
+
+
 if __name__ == "__main__":
-  main()
+  try:
+    main()
+  finally:
+    save_shard_state()
@@ -5,15 +5,19 @@ import argparse
 import json
 import os
 import random
+import time
 from datetime import datetime, timezone
 from typing import Any, Dict, List, Optional, Tuple
 
+from metrics import REGISTRY as METRICS, configure_run_metrics
+
 SCRIPT_DIR = os.path.dirname(__file__)
 ROOT_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))
 TODAY_STR = str(os.getenv("DPR_RUN_DATE") or "").strip() or datetime.now(timezone.utc).strftime("%Y%m%d")
 ARCHIVE_DIR = os.path.join(ROOT_DIR, "archive", TODAY_STR)
 FILTERED_DIR = os.path.join(ARCHIVE_DIR, "filtered")
 RANKED_DIR = os.path.join(ARCHIVE_DIR, "rank")
+METRICS_PATH = os.path.join(ARCHIVE_DIR, "metrics", "step3.json")
 
 MAX_CHARS_PER_DOC = 850
 BATCH_SIZE = 100
@@ -547,6 +551,8 @@ def process_file(
     data["generated_at"] = meta_generated_at
     save_json(data, output_path)
     return
+  started_at = time.time()
+  reranked_docs = 0
   encoder = build_token_encoder()
   effective_batch_size = resolve_effective_rerank_batch_size(reranker)
   group_start(f"Step 3 - rerank {os.path.basename(input_path)}")
@@ -588,12 +594,16 @@ def process_file(
         log(
           f"[INFO] 发送批次 {batch_idx}/{len(batches)} | docs={len(batch_docs)}"
         )
+        batch_started = time.time()
         response = reranker.rerank(
           query=q_text,
           documents=batch_docs,
           top_n=len(batch_docs),
           model=rerank_model,
         )
+        METRICS.observe("rerank_batch_seconds", time.time() - batch_started, model=rerank_model)
+        METRICS.inc("rerank_docs", len(batch_docs), model=rerank_model)
+        reranked_docs += len(batch_docs)
         if isinstance(response, dict) and "output" in response:
           results = response.get("output", {}).get("results", [])
         else:
@@ -648,6 +658,19 @@ def process_file(
   data["reranked_at"] = datetime.now(timezone.utc).isoformat()
   data["generated_at"] = meta_generated_at
 
+  elapsed = time.time() - started_at
+  METRICS.set_info(
+    "step3",
+    {
+      "input": os.path.basename(input_path),
+      "queries": len(queries),
+      "papers": len(papers_list),
+      "global_pool": len(global_candidate_ids),
+      "reranked_docs": reranked_docs,
+      "elapsed_seconds": round(elapsed, 3),
+      "docs_per_second": round(reranked_docs / elapsed, 3) if elapsed > 0 else 0.0,
+    },
+  )
   save_json(data, output_path)
   group_end()
 
@@ -730,6 +753,7 @@ def main() -> None:
   )
 
   args = parser.parse_args()
+  configure_run_metrics("step3", METRICS_PATH)
 
   input_path = args.input
   if not os.path.isabs(input_path):
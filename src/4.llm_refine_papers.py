@@ -1,16 +1,18 @@
 #!/usr/bin/env python
 
 import argparse
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import hashlib
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ThreadPoolExecutor, as_completed, wait
 import json
 import os
 import random
 import re
 import time
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from typing import Any, Callable, Dict, List
 
-from llm import DeepSeekClient, resolve_max_output_tokens
+from llm import DeepSeekClient, resolve_max_output_tokens, resolve_stream_enabled
+from metrics import REGISTRY as METRICS, configure_run_metrics
 from subscription_plan import build_pipeline_inputs
 
 SCRIPT_DIR = os.path.dirname(__file__)
@@ -18,7 +20,11 @@ ROOT_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))
 TODAY_STR = str(os.getenv("DPR_RUN_DATE") or "").strip() or datetime.now(timezone.utc).strftime("%Y%m%d")
 ARCHIVE_DIR = os.path.join(ROOT_DIR, "archive", TODAY_STR)
 RANKED_DIR = os.path.join(ARCHIVE_DIR, "rank")
+METRICS_PATH = os.path.join(ARCHIVE_DIR, "metrics", "step4.json")
 CONFIG_FILE = os.getenv("DPR_CONFIG_FILE") or os.path.join(ROOT_DIR, "config.yaml")
+FILTER_MEMO_PATH = os.path.join(ROOT_DIR, "archive", "filter_memo.json")
+FILTER_MEMO_VERSION = 1
+FILTER_MEMO_TTL_DAYS = 30
 
 DEFAULT_FILTER_MODEL = (
     os.getenv("DEEPSEEK_FILTER_MODEL")
@@ -34,6 +40,11 @@ MAX_FILTER_RETRIES = 3
 class FilterOutputTruncatedError(ValueError):
     """LLM 输出被截断时触发，优先拆小批次而不是重复请求同一批。"""
 
+    def __init__(self, message: str, partial_results: List[Dict[str, Any]] | None = None):
+        super().__init__(message)
+        # 流式解析到的已完整条目；重试时只需要覆盖剩余论文
+        self.partial_results = list(partial_results or [])
+
 
 def log(message: str) -> None:
     ts = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
@@ -326,6 +337,7 @@ def call_filter(
     debug_dir: str,
     debug_tag: str,
     retry_note: str = "",
+    stream: bool = False,
 ) -> List[Dict[str, Any]]:
     schema = {
         "type": "object",
@@ -388,7 +400,9 @@ def call_filter(
                 req_lines.append(f"{idx}. {desc} [tag={req_tag}]")
             else:
                 req_lines.append(f"{idx}. {desc}")
-    user_prompt = (
+    # 前缀缓存友好：system + 需求/评分规则在同一需求集合下逐字节稳定，所有并发批次共享；
+    # 每批不同的论文内容与重试说明放在最后一条消息。
+    instruction_prompt = (
         "User requirements list:\n"
         f"{chr(10).join(req_lines)}\n\n"
         "SCORING RUBRIC:\n"
@@ -406,8 +420,6 @@ def call_filter(
         "6) Some requirements may be profile-level composite requirements built from multiple keywords. "
         "Use them when a paper is clearly central to the overall theme but does not fit a narrower requirement cleanly.\n"
         "7) Do not over-score generic LLM-for-science or infrastructure papers under a composite requirement unless they materially advance the core task.\n\n"
-        "Papers:\n"
-        f"{json.dumps(docs, ensure_ascii=False)}\n\n"
         "Output JSON format example:\n"
         "{\"results\": [{\"id\": \"paper_id\", \"matched_requirement_index\": 1, \"evidence_en\": \"short English phrase\", \"evidence_cn\": \"简短中文短语\", \"tldr_en\": \"one-sentence TLDR\", \"tldr_cn\": \"中文摘要式 TLDR\", \"title_zh\": \"中文论文标题\", \"motivation_cn\": \"中文研究动机\", \"method_cn\": \"中文方法概括\", \"result_cn\": \"中文结果概括\", \"conclusion_cn\": \"中文结论\", \"score\": 7}]}\n\n"
         "Requirement: You MUST return exactly one result for every input paper. "
@@ -443,24 +455,27 @@ def call_filter(
         "motivation_cn=\"不相关\", method_cn=\"不相关\", result_cn=\"不相关\", conclusion_cn=\"不相关\", "
         "score 0, matched_requirement_index=0, while keeping title_zh as the translated paper title."
     )
+    papers_prompt = f"Papers:\n{json.dumps(docs, ensure_ascii=False)}"
     if retry_note:
-        user_prompt += f"\n\nRetry correction note:\n{retry_note}"
-    repeated_user_prompt = build_repeated_user_prompt(user_prompt)
+        papers_prompt += f"\n\nRetry correction note:\n{retry_note}"
 
     messages = [
         {"role": "system", "content": system_prompt},
+        {"role": "user", "content": build_repeated_user_prompt(instruction_prompt)},
         {
             "role": "user",
-            "content": repeated_user_prompt
+            "content": build_repeated_user_prompt(papers_prompt)
             + "\n\nOutput must be strict JSON only, no markdown, no fences, no extra text.",
         },
     ]
+    stream_kwargs: Dict[str, Any] = {"stream": True, "array_key": "results"} if stream else {}
     resp = client.chat_structured(
         messages=messages,
         schema_name="rerank_batch",
         schema=schema,
         strict=True,
         allow_json_object_fallback=True,
+        **stream_kwargs,
     )
     content = str(resp.get("content") or "")
     try:
@@ -469,7 +484,7 @@ def call_filter(
         if resp.get("finish_reason") not in (None, "stop"):
             msg = f"unexpected finish_reason: {resp.get('finish_reason')}"
             if resp.get("finish_reason") == "length":
-                raise FilterOutputTruncatedError(msg)
+                raise FilterOutputTruncatedError(msg, resp.get("streamed_items"))
             raise ValueError(msg)
         if resp.get("parse_error") is not None:
             raise resp["parse_error"]
@@ -490,6 +505,8 @@ def call_filter(
         msg = f"JSON parse failed: {exc}. raw={preview}"
         if debug_path:
             msg = f"{msg} | saved={debug_path}"
+        if isinstance(exc, FilterOutputTruncatedError):
+            raise FilterOutputTruncatedError(msg, exc.partial_results)
         raise ValueError(msg)
     results = payload.get("results", [])
     if not isinstance(results, list):
@@ -597,50 +614,263 @@ def build_filter_retry_note(
     )
 
 
-def recover_filter_results(
+def salvage_partial_filter_results(
     batch_docs: List[Dict[str, str]],
-    runner: Callable[[List[Dict[str, str]], int, str], List[Dict[str, Any]]],
-    max_attempts: int = MAX_FILTER_RETRIES,
-    debug_tag: str = "batch",
+    partial_results: Any,
 ) -> List[Dict[str, Any]]:
-    if not batch_docs:
-        return []
+    """
+    从截断输出中挑出可用条目：只保留属于本批次、未重复、带 id 的结果，按输入顺序返回。
+    """
+    expected_ids = [_norm_text(doc.get("id")) for doc in batch_docs if _norm_text(doc.get("id"))]
+    expected_set = set(expected_ids)
+    normalized_by_id: Dict[str, Dict[str, Any]] = {}
+    for item in partial_results or []:
+        if not isinstance(item, dict):
+            continue
+        normalized = _normalize_filter_result_item(item)
+        pid = normalized["id"]
+        if pid in expected_set and pid not in normalized_by_id:
+            normalized_by_id[pid] = normalized
+    return [normalized_by_id[pid] for pid in expected_ids if pid in normalized_by_id]
 
+
+def _order_like_docs(
+    batch_docs: List[Dict[str, str]],
+    results: List[Dict[str, Any]],
+) -> List[Dict[str, Any]]:
+    order = {_norm_text(doc.get("id")): idx for idx, doc in enumerate(batch_docs)}
+    return sorted(results, key=lambda item: order.get(_norm_text(item.get("id")), len(order)))
+
+
+def _attempt_filter_results(
+    batch_docs: List[Dict[str, str]],
+    runner: Callable[[List[Dict[str, str]], int, str], List[Dict[str, Any]]],
+    max_attempts: int,
+    debug_tag: str,
+) -> tuple[List[Dict[str, Any]], List[Dict[str, str]], Exception | None]:
+    """
+    对同一批次做最多 max_attempts 次请求，不拆分：
+    - 返回 (results, remaining_docs, last_error)，remaining_docs 为空即全部成功
+    - 截断输出中已完整的条目会被保留，后续尝试只请求剩余论文
+    - 多篇批次遇到截断且没有任何进展时提前放弃，交给调用方拆分
+    """
+    salvaged: List[Dict[str, Any]] = []
+    remaining = list(batch_docs)
     last_error: Exception | None = None
     for attempt in range(1, max(1, max_attempts) + 1):
-        retry_note = build_filter_retry_note(batch_docs, attempt, last_error) if last_error else ""
+        retry_note = build_filter_retry_note(remaining, attempt, last_error) if last_error else ""
         try:
-            raw_results = runner(batch_docs, attempt, retry_note)
-            return validate_filter_results(batch_docs, raw_results)
+            raw_results = runner(remaining, attempt, retry_note)
+            return _order_like_docs(batch_docs, salvaged + validate_filter_results(remaining, raw_results)), [], None
         except Exception as exc:
             last_error = exc
             log(f"[WARN] filter {debug_tag} attempt {attempt}/{max_attempts} invalid: {exc}")
-            if isinstance(exc, FilterOutputTruncatedError) and len(batch_docs) > 1:
+            if not isinstance(exc, FilterOutputTruncatedError):
+                continue
+            partial = salvage_partial_filter_results(remaining, exc.partial_results)
+            if partial:
+                done_ids = {item["id"] for item in partial}
+                salvaged.extend(partial)
+                remaining = [doc for doc in remaining if _norm_text(doc.get("id")) not in done_ids]
+                log(
+                    f"[INFO] filter {debug_tag} kept {len(partial)} streamed results, "
+                    f"retry tail docs={len(remaining)}"
+                )
+                if not remaining:
+                    return _order_like_docs(batch_docs, salvaged), [], None
+                continue
+            if len(remaining) > 1:
                 break
+    return _order_like_docs(batch_docs, salvaged), remaining, last_error
+
 
-    if len(batch_docs) == 1:
+def recover_filter_results(
+    batch_docs: List[Dict[str, str]],
+    runner: Callable[[List[Dict[str, str]], int, str], List[Dict[str, Any]]],
+    max_attempts: int = MAX_FILTER_RETRIES,
+    debug_tag: str = "batch",
+) -> List[Dict[str, Any]]:
+    if not batch_docs:
+        return []
+
+    results, remaining, last_error = _attempt_filter_results(batch_docs, runner, max_attempts, debug_tag)
+    if not remaining:
+        return results
+
+    if len(remaining) == 1:
         raise ValueError(f"{debug_tag} failed after {max_attempts} attempts: {last_error}")
 
-    mid = max(1, len(batch_docs) // 2)
-    left_docs = batch_docs[:mid]
-    right_docs = batch_docs[mid:]
+    mid = max(1, len(remaining) // 2)
+    left_docs = remaining[:mid]
+    right_docs = remaining[mid:]
     log(
         f"[WARN] filter {debug_tag} split recovery: "
         f"{len(left_docs)} + {len(right_docs)} docs"
     )
-    return recover_filter_results(
-        left_docs,
-        runner,
-        max_attempts=max_attempts,
-        debug_tag=f"{debug_tag}_left",
-    ) + recover_filter_results(
-        right_docs,
-        runner,
-        max_attempts=max_attempts,
-        debug_tag=f"{debug_tag}_right",
+    return _order_like_docs(
+        batch_docs,
+        results
+        + recover_filter_results(
+            left_docs,
+            runner,
+            max_attempts=max_attempts,
+            debug_tag=f"{debug_tag}_left",
+        )
+        + recover_filter_results(
+            right_docs,
+            runner,
+            max_attempts=max_attempts,
+            debug_tag=f"{debug_tag}_right",
+        ),
     )
 
 
+def recover_docs_concurrently(
+    executor: Executor,
+    recovery_docs: List[Dict[str, str]],
+    runner_factory: Callable[[str], Callable[[List[Dict[str, str]], int, str], List[Dict[str, Any]]]],
+    batch_size: int,
+    max_attempts: int = MAX_FILTER_RETRIES,
+    debug_tag: str = "recover",
+) -> tuple[List[Dict[str, Any]], List[str]]:
+    """
+    并发补救主流程中失败/缺失的论文：
+    - 先按 batch_size 重新打包，所有批次同时提交到同一个有界线程池
+    - 多篇批次只尝试一次，失败后把两半重新提交（只二分失败的部分）
+    - 单篇批次才使用完整的 max_attempts 重试
+    总耗时约为 log2(batch_size) 轮请求，而不是 O(缺失篇数) 次串行请求。
+    返回 (results, failed_ids)。
+    """
+    if not recovery_docs:
+        return [], []
+
+    def _job(
+        job_docs: List[Dict[str, str]],
+        job_tag: str,
+    ) -> tuple[List[Dict[str, Any]], List[Dict[str, str]], Exception | None]:
+        attempts = max_attempts if len(job_docs) == 1 else 1
+        return _attempt_filter_results(job_docs, runner_factory(job_tag), attempts, job_tag)
+
+    pending: Dict[Future, tuple[List[Dict[str, str]], str]] = {}
+
+    def _submit(job_docs: List[Dict[str, str]], job_tag: str) -> None:
+        pending[executor.submit(_job, job_docs, job_tag)] = (job_docs, job_tag)
+
+    for idx, chunk in enumerate(chunk_list(recovery_docs, max(1, batch_size)), start=1):
+        _submit(chunk, f"{debug_tag}_{idx:03d}")
+
+    recovered: List[Dict[str, Any]] = []
+    failed_ids: List[str] = []
+    while pending:
+        done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+        for future in done:
+            job_docs, job_tag = pending.pop(future)
+            try:
+                results, remaining, last_error = future.result()
+            except Exception as exc:
+                results, remaining, last_error = [], job_docs, exc
+            recovered.extend(results)
+            if not remaining:
+                continue
+            if len(job_docs) == 1:
+                doc_id = _norm_text(job_docs[0].get("id"))
+                log(f"[WARN] single-doc recovery failed for {doc_id}: {last_error}")
+                failed_ids.append(doc_id)
+                continue
+            if len(remaining) == 1:
+                _submit(remaining, f"{job_tag}_tail")
+                continue
+            mid = max(1, len(remaining) // 2)
+            log(
+                f"[WARN] filter {job_tag} split recovery: "
+                f"{mid} + {len(remaining) - mid} docs"
+            )
+            _submit(remaining[:mid], f"{job_tag}_left")
+            _submit(remaining[mid:], f"{job_tag}_right")
+    return recovered, failed_ids
+
+
+def _sha256_text(text: str) -> str:
+    return hashlib.sha256(str(text or "").encode("utf-8")).hexdigest()
+
+
+def requirement_set_hash(requirements: List[Dict[str, str]]) -> str:
+    """
+    需求集合指纹：顺序敏感（matched_requirement_index 依赖顺序），字段取进入 prompt 的部分。
+    """
+    payload = [
+        {
+            "id": _norm_text(req.get("id")),
+            "query": _norm_text(req.get("query")),
+            "tag": _norm_text(req.get("tag")),
+            "kind": _norm_text(req.get("kind")),
+            "description_en": _norm_text(req.get("description_en")),
+        }
+        for req in requirements or []
+    ]
+    return _sha256_text(json.dumps(payload, ensure_ascii=False, sort_keys=True))
+
+
+def filter_memo_key(paper_id: str, content: str, requirements_hash: str, model: str) -> str:
+    return _sha256_text(
+        json.dumps(
+            [_norm_text(paper_id), _sha256_text(content), requirements_hash, _norm_text(model)],
+            ensure_ascii=False,
+        )
+    )
+
+
+def load_filter_memo(memo_path: str) -> Dict[str, Dict[str, Any]]:
+    if not memo_path or not os.path.exists(memo_path):
+        return {}
+    try:
+        with open(memo_path, "r", encoding="utf-8") as f:
+            payload = json.load(f)
+    except Exception as exc:
+        log(f"[WARN] failed to read filter memo, start empty: {exc}")
+        return {}
+    if not isinstance(payload, dict) or payload.get("version") != FILTER_MEMO_VERSION:
+        return {}
+    entries = payload.get("entries")
+    if not isinstance(entries, dict):
+        return {}
+    return {
+        str(key): entry
+        for key, entry in entries.items()
+        if isinstance(entry, dict) and isinstance(entry.get("result"), dict)
+    }
+
+
+def save_filter_memo(
+    memo: Dict[str, Dict[str, Any]],
+    memo_path: str,
+    today: str = TODAY_STR,
+    ttl_days: int = FILTER_MEMO_TTL_DAYS,
+) -> None:
+    """写回 memo，并淘汰超过 ttl_days 未被使用的条目，避免文件无限增长。"""
+    try:
+        cutoff = (datetime.strptime(today, "%Y%m%d") - timedelta(days=max(1, ttl_days))).strftime("%Y%m%d")
+    except ValueError:
+        cutoff = ""
+    kept = {
+        key: entry
+        for key, entry in memo.items()
+        if not cutoff or str(entry.get("used_at") or "") >= cutoff
+    }
+    os.makedirs(os.path.dirname(memo_path) or ".", exist_ok=True)
+    tmp_path = f"{memo_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(
+            {"version": FILTER_MEMO_VERSION, "entries": kept},
+            f,
+            ensure_ascii=False,
+            separators=(",", ":"),
+            sort_keys=True,
+        )
+    os.replace(tmp_path, memo_path)
+    log(f"[INFO] filter memo saved: entries={len(kept)} dropped={len(memo) - len(kept)} path={memo_path}")
+
+
 def _make_filter_client(api_key: str, model: str, max_output_tokens: int) -> DeepSeekClient:
     client = DeepSeekClient(api_key=api_key, model=model, base_url=DEFAULT_DEEPSEEK_BASE_URL)
     client.kwargs.update({"temperature": 0.1, "max_tokens": max_output_tokens})
@@ -652,6 +882,7 @@ def _make_filter_runner(
     all_requirements: List[Dict[str, str]],
     debug_dir: str,
     base_tag: str,
+    stream: bool = False,
 ) -> Callable[[List[Dict[str, str]], int, str], List[Dict[str, Any]]]:
     def _runner(
         docs: List[Dict[str, str]],
@@ -665,6 +896,7 @@ def _make_filter_runner(
             debug_dir=debug_dir,
             debug_tag=f"{base_tag}_attempt_{attempt:02d}",
             retry_note=retry_note,
+            stream=stream,
         )
 
     return _runner
@@ -742,6 +974,7 @@ def _filter_batch(
     filter_model: str,
     max_output_tokens: int,
     debug_dir: str,
+    stream: bool = False,
 ) -> tuple[int, List[Dict[str, str]], List[Dict[str, Any]]]:
     client = _make_filter_client(api_key, filter_model, max_output_tokens)
     runner = _make_filter_runner(
@@ -749,17 +982,19 @@ def _filter_batch(
         all_requirements=all_requirements,
         debug_dir=debug_dir,
         base_tag=f"batch_{batch_idx:03d}",
+        stream=stream,
     )
-    return (
-        batch_idx,
-        batch,
-        recover_filter_results(
+    started = time.time()
+    try:
+        results = recover_filter_results(
             batch,
             runner,
             max_attempts=MAX_FILTER_RETRIES,
             debug_tag=f"batch_{batch_idx:03d}",
-        ),
-    )
+        )
+    finally:
+        METRICS.observe("filter_batch_seconds", time.time() - started, model=filter_model)
+    return batch_idx, batch, results
 
 
 def process_file(
@@ -772,6 +1007,8 @@ def process_file(
     filter_model: str,
     max_output_tokens: int,
     filter_concurrency: int,
+    stream: bool = False,
+    memo_path: str | None = FILTER_MEMO_PATH,
 ) -> None:
     # 检查输入文件是否存在，如果不存在说明今天没有新论文，优雅退出
     if not os.path.exists(input_path):
@@ -797,11 +1034,12 @@ def process_file(
     if not api_key:
         raise RuntimeError("missing DEEPSEEK_API_KEY or SUMMARY_API_KEY")
 
+    started_at = time.time()
     group_start(f"Step 4 - llm refine {os.path.basename(input_path)}")
     log(
         f"[INFO] start filter: queries={len(queries)}, papers={len(papers)}, "
         f"min_star={min_star}, batch_size={batch_size}, max_chars={max_chars}, "
-        f"concurrency={filter_concurrency}"
+        f"concurrency={filter_concurrency}, stream={stream}"
     )
 
     candidate_ids: List[str] = []
@@ -837,14 +1075,32 @@ def process_file(
         group_end()
         return
 
-    random.shuffle(docs)
-    batches = chunk_list(docs, batch_size)
+    merged: Dict[str, Dict[str, Any]] = {}
+    memo = load_filter_memo(memo_path) if memo_path else {}
+    requirements_hash = requirement_set_hash(user_requirements)
+    memo_key_by_id = {
+        doc["id"]: filter_memo_key(doc["id"], doc["content"], requirements_hash, filter_model)
+        for doc in docs
+    }
+    llm_docs: List[Dict[str, str]] = []
+    for doc in docs:
+        entry = memo.get(memo_key_by_id[doc["id"]])
+        if entry:
+            merged[doc["id"]] = dict(entry["result"])
+            entry["used_at"] = TODAY_STR
+        else:
+            llm_docs.append(doc)
+    memo_reused = len(docs) - len(llm_docs)
+    if memo_path:
+        log(f"[INFO] filter memo: reused={memo_reused} | to_llm={len(llm_docs)} | memo_entries={len(memo)}")
+
+    random.shuffle(llm_docs)
+    batches = chunk_list(llm_docs, batch_size)
     log(
         f"[INFO] global candidates={len(docs)} batches={len(batches)} "
         f"| user_requirements={len(user_requirements)}"
     )
 
-    merged: Dict[str, Dict[str, Any]] = {}
     debug_dir = os.path.join(RANKED_DIR, "debug")
     requirement_by_index = {i + 1: r for i, r in enumerate(user_requirements)}
     pending = {}
@@ -863,6 +1119,7 @@ def process_file(
                 filter_model,
                 max_output_tokens,
                 debug_dir,
+                stream,
             )] = (idx, batch)
         for future in as_completed(pending):
             idx, batch = pending[future]
@@ -876,39 +1133,76 @@ def process_file(
             for item in results:
                 merge_filter_result(merged, item, requirement_by_index)
 
-    missing_docs = [doc for doc in docs if _norm_text(doc.get("id")) not in merged]
-    if failed_docs or missing_docs:
-        recovery_map = {
-            _norm_text(doc.get("id")): doc
-            for doc in (failed_docs + missing_docs)
-            if _norm_text(doc.get("id"))
-        }
-        recovery_docs = list(recovery_map.values())
-        recovery_client = _make_filter_client(api_key, filter_model, max_output_tokens)
-        log(
-            f"[WARN] start missing-doc recovery: failed_batches_docs={len(failed_docs)} "
-            f"| missing_after_merge={len(missing_docs)} | recover_docs={len(recovery_docs)}"
-        )
-        for index, doc in enumerate(recovery_docs, start=1):
-            doc_id = _norm_text(doc.get("id")) or f"missing-{index}"
-            runner = _make_filter_runner(
-                recovery_client,
-                all_requirements=user_requirements,
-                debug_dir=debug_dir,
-                base_tag=f"recover_{_slug(doc_id, fallback=f'doc-{index}')}",
+        missing_docs = [doc for doc in llm_docs if _norm_text(doc.get("id")) not in merged]
+        if failed_docs or missing_docs:
+            recovery_map = {
+                _norm_text(doc.get("id")): doc
+                for doc in (failed_docs + missing_docs)
+                if _norm_text(doc.get("id"))
+            }
+            recovery_docs = list(recovery_map.values())
+            log(
+                f"[WARN] start missing-doc recovery: failed_batches_docs={len(failed_docs)} "
+                f"| missing_after_merge={len(missing_docs)} | recover_docs={len(recovery_docs)}"
             )
-            try:
-                recovered_results = recover_filter_results(
-                    [doc],
-                    runner,
-                    max_attempts=MAX_FILTER_RETRIES,
-                    debug_tag=f"recover_{doc_id}",
+
+            def _recovery_runner(tag: str):
+                return _make_filter_runner(
+                    _make_filter_client(api_key, filter_model, max_output_tokens),
+                    all_requirements=user_requirements,
+                    debug_dir=debug_dir,
+                    base_tag=tag,
+                    stream=stream,
                 )
-            except Exception as exc:
-                log(f"[WARN] single-doc recovery failed for {doc_id}: {exc}")
-                continue
+
+            recovered_results, unrecovered_ids = recover_docs_concurrently(
+                executor,
+                recovery_docs,
+                _recovery_runner,
+                batch_size=batch_size,
+                max_attempts=MAX_FILTER_RETRIES,
+            )
             for item in recovered_results:
                 merge_filter_result(merged, item, requirement_by_index)
+            log(
+                f"[INFO] missing-doc recovery done: recovered={len(recovered_results)} "
+                f"| unrecovered={len(unrecovered_ids)}"
+            )
+
+    if memo_path:
+        for doc in llm_docs:
+            result = merged.get(doc["id"])
+            if result:
+                memo[memo_key_by_id[doc["id"]]] = {
+                    "paper_id": doc["id"],
+                    "model": filter_model,
+                    "used_at": TODAY_STR,
+                    "result": result,
+                }
+        try:
+            save_filter_memo(memo, memo_path)
+        except Exception as exc:
+            log(f"[WARN] failed to save filter memo: {exc}")
+    data["llm_memo"] = {
+        "enabled": bool(memo_path),
+        "reused": memo_reused,
+        "judged": len([doc for doc in llm_docs if doc["id"] in merged]),
+        "requirements_hash": requirements_hash,
+    }
+    elapsed = time.time() - started_at
+    METRICS.set_info(
+        "step4",
+        {
+            "input": os.path.basename(input_path),
+            "candidates": len(docs),
+            "llm_docs": len(llm_docs),
+            "memo_reused": memo_reused,
+            "batches": total_batches,
+            "results": len(merged),
+            "elapsed_seconds": round(elapsed, 3),
+            "docs_per_second": round(len(llm_docs) / elapsed, 3) if elapsed > 0 else 0.0,
+        },
+    )
 
     if not merged:
         log("[WARN] no llm results returned.")
@@ -982,8 +1276,26 @@ def main() -> None:
         default=DEFAULT_FILTER_CONCURRENCY,
         help="concurrent LLM filter requests.",
     )
+    parser.add_argument(
+        "--stream",
+        action=argparse.BooleanOptionalAction,
+        default=resolve_stream_enabled(),
+        help="stream filter output and keep completed results when truncated (env DPR_LLM_STREAM).",
+    )
+    parser.add_argument(
+        "--memo-path",
+        type=str,
+        default=FILTER_MEMO_PATH,
+        help="cross-day memo of filter results keyed by paper/content/requirements/model.",
+    )
+    parser.add_argument(
+        "--no-memo",
+        action="store_true",
+        help="judge every candidate with the LLM and do not read/write the filter memo.",
+    )
 
     args = parser.parse_args()
+    configure_run_metrics("step4", METRICS_PATH)
 
     input_path = args.input
     if not os.path.isabs(input_path):
@@ -997,6 +1309,10 @@ def main() -> None:
     if not os.path.isabs(config_path):
         config_path = os.path.abspath(os.path.join(ROOT_DIR, config_path))
 
+    memo_path = args.memo_path
+    if memo_path and not os.path.isabs(memo_path):
+        memo_path = os.path.abspath(os.path.join(ROOT_DIR, memo_path))
+
     process_file(
         input_path=input_path,
         output_path=output_path,
@@ -1007,6 +1323,8 @@ def main() -> None:
         filter_model=args.filter_model,
         max_output_tokens=args.max_output_tokens,
         filter_concurrency=args.filter_concurrency,
+        stream=args.stream,
+        memo_path=None if args.no_memo else memo_path,
     )
 
 
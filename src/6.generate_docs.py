@@ -7,18 +7,19 @@ import json
 import math
 import os
 import sys
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
 import re
-import tempfile
+import threading
 import time
 import xml.etree.ElementTree as ET
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import nullcontext
 from urllib.parse import quote_plus
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Set, Tuple
+from typing import Any, Callable, Dict, List, Sequence, Set, Tuple
 
-import fitz  # PyMuPDF
 import requests
-from llm import DeepSeekClient
+from llm import DeepSeekClient, resolve_stream_enabled
 
 SCRIPT_DIR = os.path.dirname(__file__)
 ROOT_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))
@@ -35,9 +36,56 @@ from daily_report_state import (
 )
 
 try:
-    from paper_figures import ensure_paper_media
+    from paper_figures import ensure_paper_media, extract_pdf_text, paper_media_meta_paths
 except Exception:  # pragma: no cover
-    from src.paper_figures import ensure_paper_media
+    from src.paper_figures import ensure_paper_media, extract_pdf_text, paper_media_meta_paths
+
+try:
+    from cpu_pool import CPU_TASK_METRIC, resolve_cpu_workers, run_cpu
+except Exception:  # pragma: no cover
+    from src.cpu_pool import CPU_TASK_METRIC, resolve_cpu_workers, run_cpu
+
+try:
+    from stage_pipeline import Stage, format_stage_stats, run_stages
+except Exception:  # pragma: no cover
+    from src.stage_pipeline import Stage, format_stage_stats, run_stages
+
+try:
+    from build_manifest import BuildManifest, build_manifest_path, hash_payload
+except Exception:  # pragma: no cover
+    from src.build_manifest import BuildManifest, build_manifest_path, hash_payload
+
+try:
+    from metrics import REGISTRY as METRICS, configure_run_metrics
+except Exception:  # pragma: no cover
+    from src.metrics import REGISTRY as METRICS, configure_run_metrics
+
+try:
+    from paper_cache import lookup_cached_papers
+except Exception:  # pragma: no cover
+    from src.paper_cache import lookup_cached_papers
+
+try:
+    from pdf_cache import pdf_file, prefetch_pdf
+except Exception:  # pragma: no cover
+    from src.pdf_cache import pdf_file, prefetch_pdf
+
+try:
+    from sidebar_store import SidebarStore, extract_day_block_papers as _extract_day_block_papers, sidebar_item_href
+except Exception:  # pragma: no cover
+    from src.sidebar_store import SidebarStore, extract_day_block_papers as _extract_day_block_papers, sidebar_item_href
+
+try:
+    from docs_catalog import DocsCatalog
+    from search_index import update_search_index
+except Exception:  # pragma: no cover
+    from src.docs_catalog import DocsCatalog
+    from src.search_index import update_search_index
+
+try:
+    from jina_reader import fetch_markdown as fetch_jina_markdown
+except Exception:  # pragma: no cover
+    from src.jina_reader import fetch_markdown as fetch_jina_markdown
 
 CONFIG_FILE = os.path.join(ROOT_DIR, "config.yaml")
 HOME_TEMPLATE_DIR = os.path.join(ROOT_DIR, "docs_init")
@@ -64,6 +112,16 @@ def create_llm_client() -> DeepSeekClient | None:
 LLM_CLIENT = create_llm_client()
 
 DEFAULT_DOCS_CONCURRENCY = 4
+# 批量翻译 / 速览：每个请求最多几篇、估算 token 上限（输入 + 预期输出，需低于结构化输出的 max_tokens）
+DEFAULT_LLM_BATCH_SIZE = 8
+DEFAULT_LLM_BATCH_TOKENS = 12000
+BATCH_GLANCE_OUTPUT_TOKENS = 400
+BATCH_ITEM_OVERHEAD_TOKENS = 40
+# 论文页模板版本：修改 build_markdown_content 等页面结构时递增，使增量构建清单整体失效
+STEP6_TEMPLATE_VERSION = "1"
+# 各阶段忙碌时长：文本拉取 / 图表抽取按 stage 记在这里，LLM 调用由 llm.py 记在 llm_latency_seconds
+STEP6_STAGE_METRIC = "step6_stage_seconds"
+LLM_LATENCY_METRIC = "llm_latency_seconds"
 
 
 def call_llm_text(
@@ -90,19 +148,29 @@ def call_llm_structured_json(
     schema: Dict[str, Any],
     temperature: float,
     max_tokens: int,
+    on_item: Callable[[Any], None] | None = None,
+    array_key: str | None = None,
 ) -> Dict[str, Any] | None:
+    """
+    on_item 非空时走流式输出：顶层字段（或 array_key 指定数组的元素）每完整一个即回调，
+    截断时已到达的部分不会丢失。
+    """
     client.kwargs.update(
         {
             "temperature": float(temperature),
             "max_tokens": int(max_tokens),
         }
     )
+    stream_kwargs: Dict[str, Any] = (
+        {"stream": True, "on_item": on_item, "array_key": array_key} if on_item is not None else {}
+    )
     resp = client.chat_structured(
         messages=messages,
         schema_name=schema_name,
         schema=schema,
         strict=True,
         allow_json_object_fallback=True,
+        **stream_kwargs,
     )
     if resp.get("refusal"):
         log(f"[WARN] Structured output refusal: {resp.get('refusal')}")
@@ -123,6 +191,29 @@ def log(message: str) -> None:
     ts = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
     print(f"[{ts}] {message}", flush=True)
 
+def snapshot_stage_busy_seconds() -> Dict[str, float]:
+    """汇总当前各阶段累计忙碌秒数：LLM、文本拉取、图表抽取，以及进程池内各 CPU 任务。"""
+    busy: Dict[str, float] = {"llm": METRICS.histogram_sum(LLM_LATENCY_METRIC)}
+    for stage, seconds in METRICS.histogram_sums_by(STEP6_STAGE_METRIC, "stage").items():
+        busy[stage] = seconds
+    for task, seconds in METRICS.histogram_sums_by(CPU_TASK_METRIC, "task").items():
+        busy[f"cpu:{task}"] = seconds
+    return busy
+
+
+def format_stage_overlap(section: str, wall_seconds: float, before: Dict[str, float], after: Dict[str, float]) -> str:
+    """
+    输出某个分区的阶段耗时：各阶段忙碌秒数之和 / 墙钟时间 即并行重叠倍数。
+    cpu:* 已包含在 media / text_fetch 的墙钟里，只单独展示、不重复计入重叠倍数。
+    """
+    deltas = {key: max(after.get(key, 0.0) - before.get(key, 0.0), 0.0) for key in after}
+    parts = [f"{key}={value:.1f}s" for key, value in sorted(deltas.items()) if value > 0]
+    overlapped = sum(value for key, value in deltas.items() if not key.startswith("cpu:"))
+    ratio = overlapped / wall_seconds if wall_seconds > 0 else 0.0
+    detail = " ".join(parts) if parts else "-"
+    return f"[INFO] {section} 阶段耗时：wall={wall_seconds:.1f}s {detail} overlap={ratio:.2f}x"
+
+
 def log_substep(code: str, name: str, phase: str) -> None:
     """
     用于前端解析的子步骤标记。
@@ -174,38 +265,11 @@ def slugify(title: str) -> str:
     return s or "paper"
 
 
-def extract_pdf_text(pdf_path: str) -> str:
-    doc = fitz.open(pdf_path)
-    texts = []
-    try:
-        for page in doc:
-            texts.append(page.get_text("text"))
-    finally:
-        doc.close()
-    return "\n\n".join(texts)
-
-
 def fetch_paper_markdown_via_jina(pdf_url: str, max_retries: int = 3) -> str | None:
+    """通过共享 Jina 客户端（限流 / 磁盘缓存 / 失败冷却）把 PDF 转成 Markdown；失败返回 None。"""
     if not pdf_url:
         return None
-    base = "https://r.jina.ai/"
-    full_url = base + pdf_url
-    for attempt in range(1, max_retries + 1):
-        try:
-            log(f"[JINA] 第 {attempt} 次请求：{full_url}")
-            resp = requests.get(full_url, timeout=60)
-            if resp.status_code != 200:
-                log(f"[JINA][WARN] 状态码 {resp.status_code}，响应前 100 字符：{(resp.text or '')[:100]}")
-            else:
-                text = (resp.text or "").strip()
-                if text:
-                    log("[JINA] 获取到结构化 Markdown 文本，将直接用作 .txt 内容。")
-                    return text
-        except Exception as e:
-            log(f"[JINA][WARN] 请求失败（第 {attempt} 次）：{e}")
-        time.sleep(2 * attempt)
-    log("[JINA][ERROR] 多次请求失败，将回退到 PyMuPDF 抽取。")
-    return None
+    return fetch_jina_markdown(pdf_url, max_retries=max_retries)
 
 
 def normalize_arxiv_id(value: str) -> str:
@@ -284,13 +348,38 @@ def parse_arxiv_xml_feed(xml_text: str) -> Dict[str, Any]:
     }
 
 
+def paper_meta_from_cache_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """把本地论文缓存中的 Supabase 行转换成与 parse_arxiv_xml_feed 相同的字段。"""
+    pid = str(row.get("id") or "").strip()
+    link = str(row.get("link") or "").strip()
+    pdf_url = str(row.get("pdf_url") or "").strip()
+    if not pdf_url:
+        pdf_url = link.replace("/abs/", "/pdf/", 1) if "/abs/" in link else link
+    published = str(row.get("published") or "").strip()
+    return {
+        "id": pid,
+        "title": " ".join(str(row.get("title") or "").split()),
+        "abstract": " ".join(str(row.get("abstract") or "").split()),
+        "published": published.split("T", 1)[0].replace("-", "") if published else "",
+        "authors": [str(a).strip() for a in (row.get("authors") or []) if str(a).strip()],
+        "link": pdf_url,
+        "pdf_url": pdf_url,
+        "source": str(row.get("source") or "").strip(),
+    }
+
+
 def fetch_arxiv_paper_meta(arxiv_id: str) -> Dict[str, Any]:
     """
-    通过 arXiv API 拉取单篇论文元数据，用于单篇补生成。
+    拉取单篇论文元数据，用于单篇补生成：优先读本地论文缓存（DPR_PAPER_CACHE_PATH），
+    未命中时再请求 arXiv API。
     """
     pid = normalize_arxiv_id(arxiv_id)
     if not pid:
         raise ValueError("paper id 不能为空")
+    cached = lookup_cached_papers([pid]).get(pid)
+    if cached and str(cached.get("title") or "").strip():
+        log(f"[INFO] 命中本地论文缓存：{pid}")
+        return paper_meta_from_cache_row(cached)
     url = f"https://export.arxiv.org/api/query?id_list={quote_plus(pid)}"
     log(f"[INFO] 拉取 arXiv 元数据：{url}")
     resp = requests.get(url, timeout=30)
@@ -320,15 +409,16 @@ def translate_title_and_abstract_to_zh(
     user_text = json.dumps(payload, ensure_ascii=False)
 
     user_prompt = (
-        "请将上面的 JSON 中的 title 与 abstract 翻译成中文，并严格输出 JSON：\n"
+        "请将下面的 JSON 中的 title 与 abstract 翻译成中文，并严格输出 JSON：\n"
         "{\"title_zh\": \"...\", \"abstract_zh\": \"...\"}\n"
         "要求：只输出 JSON，不要输出任何其它说明文字。\n"
         "Output must be strict JSON only, no markdown, no fences, no extra text."
     )
+    # 固定的系统/指令文本在前（跨论文共享前缀缓存），论文内容放最后
     messages = [
         {"role": "system", "content": system_prompt},
-        {"role": "user", "content": user_text},
         {"role": "user", "content": user_prompt},
+        {"role": "user", "content": user_text},
     ]
     try:
         schema = {
@@ -548,16 +638,19 @@ def generate_deep_summary(
     txt_file_path: str,
     max_retries: int = 3,
     client: DeepSeekClient | None = None,
+    md_content: str | None = None,
 ) -> str | None:
+    """md_content 非空时直接用它作为论文元数据（流水线渲染前先总结，不必先落盘再读回）。"""
     active_client = client or LLM_CLIENT
     if active_client is None:
         log("[WARN] 未配置 DEEPSEEK_API_KEY 或 SUMMARY_API_KEY，跳过精读总结。")
         return None
-    if not os.path.exists(md_file_path):
-        return None
-
-    with open(md_file_path, "r", encoding="utf-8") as f:
-        paper_md_content = strip_auto_sections(f.read())
+    if md_content is None:
+        if not os.path.exists(md_file_path):
+            return None
+        with open(md_file_path, "r", encoding="utf-8") as f:
+            md_content = f.read()
+    paper_md_content = strip_auto_sections(md_content)
 
     paper_txt_content = ""
     if os.path.exists(txt_file_path):
@@ -582,11 +675,13 @@ def generate_deep_summary(
         "要求：最后单独输出一行“（完）”作为结束标记。"
     )
 
-    messages = [{"role": "system", "content": system_prompt}]
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt},
+    ]
     if paper_txt_content:
         messages.append({"role": "user", "content": f"### 论文 PDF 提取文本 ###\n{paper_txt_content}"})
     messages.append({"role": "user", "content": f"### 论文 Markdown 元数据 ###\n{paper_md_content}"})
-    messages.append({"role": "user", "content": user_prompt})
 
     last = ""
     for attempt in range(1, max_retries + 1):
@@ -619,6 +714,27 @@ def generate_deep_summary(
     return last or None
 
 
+GLANCE_FIELDS = ["tldr", "motivation", "method", "result", "conclusion"]
+GLANCE_REQUIREMENTS = (
+    "- tldr：150-220个中文字符，不是一句话口号；通常写成3-4个短句，按“问题背景→核心方法→关键结果→贡献意义”的顺序组织\n"
+    "- motivation/method/result/conclusion：每个字段30-70个中文字符，通常一句话；对标论文页速览卡片，简洁但必须包含具体信息\n"
+    "- 不要把英文句子放进中文字段；可保留必要英文术语或模型名\n"
+)
+
+
+def format_glance_overview(fields: Dict[str, str]) -> str:
+    """把五个速览字段渲染成论文页 `## 速览` 区块使用的 Markdown。"""
+    return "\n".join(
+        [
+            f"**TLDR**：{ensure_single_sentence_end(fields['tldr'])} \\",
+            f"**Motivation**：{ensure_single_sentence_end(fields['motivation'])} \\",
+            f"**Method**：{ensure_single_sentence_end(fields['method'])} \\",
+            f"**Result**：{ensure_single_sentence_end(fields['result'])} \\",
+            f"**Conclusion**：{ensure_single_sentence_end(fields['conclusion'])}",
+        ]
+    )
+
+
 def generate_glance_overview(
     title: str,
     abstract: str,
@@ -637,36 +753,41 @@ def generate_glance_overview(
     system_prompt = "你是论文速览助手，请用中文生成信息密度高、但不冗长的论文速览。"
     payload = {"title": title, "abstract": abstract}
     user_text = json.dumps(payload, ensure_ascii=False)
-    user_prompt = (
-        "请基于上面的 JSON 中的 title 和 abstract，输出一个中文速览摘要，严格返回 JSON（不要输出任何其它文字）：\n"
-        "{\"tldr\":\"...\",\"motivation\":\"...\",\"method\":\"...\",\"result\":\"...\",\"conclusion\":\"...\"}\n"
-        "要求：\n"
-        "- tldr：150-220个中文字符，不是一句话口号；通常写成3-4个短句，按“问题背景→核心方法→关键结果→贡献意义”的顺序组织\n"
-        "- motivation/method/result/conclusion：每个字段30-70个中文字符，通常一句话；对标论文页速览卡片，简洁但必须包含具体信息\n"
-        "- 不要把英文句子放进中文字段；可保留必要英文术语或模型名\n"
-        "Output must be strict JSON only, no markdown, no fences, no extra text."
-    )
+    fields = GLANCE_FIELDS
+    collected: Dict[str, str] = {}
 
-    schema = {
-        "type": "object",
-        "properties": {
-            "tldr": {"type": "string"},
-            "motivation": {"type": "string"},
-            "method": {"type": "string"},
-            "result": {"type": "string"},
-            "conclusion": {"type": "string"},
-        },
-        "required": ["tldr", "motivation", "method", "result", "conclusion"],
-        "additionalProperties": False,
-    }
+    def collect_field(item: Any) -> None:
+        if not isinstance(item, dict):
+            return
+        for key, value in item.items():
+            text = str(value or "").strip() if key in fields else ""
+            if text:
+                collected[key] = text
 
-    messages = [
-        {"role": "system", "content": system_prompt},
-        {"role": "user", "content": user_text},
-        {"role": "user", "content": user_prompt},
-    ]
+    on_item = collect_field if resolve_stream_enabled() else None
 
     for attempt in range(1, max_retries + 1):
+        # 截断/缺字段时只重新请求尚未拿到的字段
+        missing = [name for name in fields if not collected.get(name)]
+        json_template = "{" + ",".join(f'"{name}":"..."' for name in missing) + "}"
+        user_prompt = (
+            "请基于下面的 JSON 中的 title 和 abstract，输出一个中文速览摘要，严格返回 JSON（不要输出任何其它文字）：\n"
+            f"{json_template}\n"
+            "要求：\n"
+            f"{GLANCE_REQUIREMENTS}"
+            "Output must be strict JSON only, no markdown, no fences, no extra text."
+        )
+        schema = {
+            "type": "object",
+            "properties": {name: {"type": "string"} for name in missing},
+            "required": list(missing),
+            "additionalProperties": False,
+        }
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+            {"role": "user", "content": user_text},
+        ]
         try:
             parsed = call_llm_structured_json(
                 active_client,
@@ -675,26 +796,12 @@ def generate_glance_overview(
                 schema=schema,
                 temperature=0.2,
                 max_tokens=STEP6_STRUCTURED_MAX_TOKENS,
+                on_item=on_item,
             )
-            if not isinstance(parsed, dict):
-                continue
-            obj = parsed
-            tldr = str(obj.get("tldr") or "").strip()
-            motivation = str(obj.get("motivation") or "").strip()
-            method = str(obj.get("method") or "").strip()
-            result = str(obj.get("result") or "").strip()
-            conclusion = str(obj.get("conclusion") or "").strip()
-            if not (tldr and motivation and method and result and conclusion):
+            collect_field(parsed)
+            if any(not collected.get(name) for name in fields):
                 continue
-            return "\n".join(
-                [
-                    f"**TLDR**：{ensure_single_sentence_end(tldr)} \\",
-                    f"**Motivation**：{ensure_single_sentence_end(motivation)} \\",
-                    f"**Method**：{ensure_single_sentence_end(method)} \\",
-                    f"**Result**：{ensure_single_sentence_end(result)} \\",
-                    f"**Conclusion**：{ensure_single_sentence_end(conclusion)}",
-                ]
-            )
+            return format_glance_overview(collected)
         except Exception as e:
             # 额度不足等“硬失败”不必重试，直接降级
             msg = str(e)
@@ -711,6 +818,193 @@ def generate_glance_overview(
     return None
 
 
+def estimate_text_tokens(text: str) -> int:
+    """粗略估算 token 数：ASCII 约 4 字符 / token，中日韩等非 ASCII 字符约 1 字符 / token。"""
+    if not text:
+        return 0
+    non_ascii = sum(1 for ch in text if ord(ch) > 127)
+    return (len(text) - non_ascii) // 4 + non_ascii + 1
+
+
+def estimate_batch_item_tokens(title: str, abstract: str, *, with_translation: bool) -> int:
+    """单篇在批量请求里的预算：输入（标题 + 摘要）+ 预期输出（中文译文约与原文等长 + 速览约 400）。"""
+    source = estimate_text_tokens(title) + estimate_text_tokens(abstract)
+    output = BATCH_GLANCE_OUTPUT_TOKENS + (source if with_translation else 0)
+    return source + output + BATCH_ITEM_OVERHEAD_TOKENS
+
+
+def pack_llm_batches(costs: List[int], *, token_budget: int, max_items: int) -> List[List[int]]:
+    """
+    按顺序贪心装箱，返回每批的下标列表：每批估算 token 之和不超过 token_budget、条数不超过 max_items。
+    单篇就超预算的论文独占一批（由单篇路径兜底，不会被丢弃）。
+    """
+    batches: List[List[int]] = []
+    current: List[int] = []
+    used = 0
+    limit = max(int(max_items or 1), 1)
+    for index, cost in enumerate(costs):
+        if current and (used + cost > token_budget or len(current) >= limit):
+            batches.append(current)
+            current, used = [], 0
+        current.append(index)
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+def validate_batch_llm_item(item: Any, *, with_translation: bool) -> Dict[str, str] | None:
+    """校验批量返回中的单篇结果：需要的字段必须都是非空字符串，否则整篇交给单篇调用重做。"""
+    if not isinstance(item, dict):
+        return None
+    required = list(GLANCE_FIELDS) + (["title_zh", "abstract_zh"] if with_translation else [])
+    out: Dict[str, str] = {}
+    for key in required:
+        value = item.get(key)
+        text = value.strip() if isinstance(value, str) else ""
+        if not text:
+            return None
+        out[key] = text
+    return out
+
+
+def batch_translate_and_glance(
+    papers: List[Tuple[str, str, str]],
+    *,
+    client: DeepSeekClient | None = None,
+    with_translation: bool = True,
+) -> Dict[str, Dict[str, str]]:
+    """
+    一次请求为多篇论文生成 {id, title_zh, abstract_zh, glance}（papers 为 (id, title, abstract)）。
+    返回通过校验的 {id: {title_zh, abstract_zh, tldr, ...}}；缺失 / 不合格的条目由调用方退回单篇调用。
+    流式解析数组元素，输出被截断时已完整到达的条目仍然可用。
+    """
+    active_client = client or LLM_CLIENT
+    if active_client is None or not papers:
+        return {}
+    known = {pid for pid, _, _ in papers}
+    results: Dict[str, Dict[str, str]] = {}
+    results_lock = threading.Lock()
+
+    def collect_item(item: Any) -> None:
+        pid = str(item.get("id") or "").strip() if isinstance(item, dict) else ""
+        if pid not in known:
+            return
+        valid = validate_batch_llm_item(item, with_translation=with_translation)
+        if valid is not None:
+            with results_lock:
+                results[pid] = valid
+
+    item_fields = (["title_zh", "abstract_zh"] if with_translation else []) + list(GLANCE_FIELDS)
+    item_schema = {
+        "type": "object",
+        "properties": {"id": {"type": "string"}, **{name: {"type": "string"} for name in item_fields}},
+        "required": ["id", *item_fields],
+        "additionalProperties": False,
+    }
+    schema = {
+        "type": "object",
+        "properties": {"items": {"type": "array", "items": item_schema}},
+        "required": ["items"],
+        "additionalProperties": False,
+    }
+    item_template = "{" + ",".join(f'"{name}":"..."' for name in ["id", *item_fields]) + "}"
+    translation_rule = (
+        "- title_zh/abstract_zh：把 title 与 abstract 翻译为自然、准确的中文，保持学术风格，保留专有名词，不添加评论\n"
+        if with_translation
+        else ""
+    )
+    system_prompt = (
+        "你是熟悉机器学习与自然科学论文的学术助手，负责把英文论文翻译成中文，"
+        "并用中文生成信息密度高、但不冗长的论文速览。"
+    )
+    user_prompt = (
+        "下面的 JSON 数组中每个元素是一篇论文（id、title、abstract）。请逐篇处理，严格返回 JSON：\n"
+        f"{{\"items\": [{item_template}, ...]}}\n"
+        "要求：\n"
+        "- items 中每篇论文恰好一个元素，id 原样回填，不要遗漏、合并或新增论文\n"
+        f"{translation_rule}"
+        f"{GLANCE_REQUIREMENTS}"
+        "Output must be strict JSON only, no markdown, no fences, no extra text."
+    )
+    payload = [{"id": pid, "title": title, "abstract": abstract} for pid, title, abstract in papers]
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt},
+        {"role": "user", "content": json.dumps(payload, ensure_ascii=False)},
+    ]
+    try:
+        parsed = call_llm_structured_json(
+            active_client,
+            messages,
+            schema_name="batch_translate_glance",
+            schema=schema,
+            temperature=0.2,
+            max_tokens=STEP6_STRUCTURED_MAX_TOKENS,
+            on_item=collect_item if resolve_stream_enabled() else None,
+            array_key="items",
+        )
+    except Exception as e:
+        log(f"[WARN] 批量翻译 / 速览失败（{len(papers)} 篇，将逐篇重试）：{e}")
+        parsed = None
+    if isinstance(parsed, dict) and isinstance(parsed.get("items"), list):
+        for item in parsed["items"]:
+            collect_item(item)
+    METRICS.inc("step6_llm_batches")
+    METRICS.inc("step6_llm_batch_items", len(results), outcome="ok")
+    METRICS.inc("step6_llm_batch_items", len(papers) - len(results), outcome="fallback")
+    return results
+
+
+def start_batched_llm_prefill(
+    jobs: List["PaperJob"],
+    *,
+    batch_size: int,
+    token_budget: int,
+    workers: int,
+    llm_slots: threading.Semaphore | None = None,
+) -> ThreadPoolExecutor | None:
+    """
+    为新论文预先发起批量翻译 / 速览请求，与下载、抽取阶段并行；每篇的结果放进 job.batched，
+    stage_llm 等待该 Future，拿不到（批量失败或该篇未通过校验）时退回单篇调用。
+    llm_slots 与 LLM 阶段共用（见 build_paper_stages），同时在途的 LLM 请求不超过 --docs-concurrency。
+    返回需要在流水线结束后关闭的线程池；未启用批量时返回 None。
+    """
+    if batch_size <= 1 or LLM_CLIENT is None:
+        return None
+    targets = [job for job in jobs if not job.existing and (job.title or job.abstract_en)]
+    if len(targets) < 2:
+        return None
+    with_translation = not targets[0].glance_only
+    costs = [
+        estimate_batch_item_tokens(job.title, job.abstract_en, with_translation=with_translation)
+        for job in targets
+    ]
+    batches = pack_llm_batches(costs, token_budget=token_budget, max_items=batch_size)
+    for job in targets:
+        job.batched = Future()
+
+    def _run_batch(members: List[PaperJob]) -> None:
+        results: Dict[str, Dict[str, str]] = {}
+        try:
+            if len(members) > 1:
+                with llm_slots or nullcontext():
+                    results = batch_translate_and_glance(
+                        [(job.paper_id, job.title, job.abstract_en) for job in members],
+                        client=create_llm_client(),
+                        with_translation=with_translation,
+                    )
+        finally:
+            for job in members:
+                job.batched.set_result(results.get(job.paper_id))
+
+    log(f"[INFO] 批量翻译 / 速览：{len(targets)} 篇分为 {len(batches)} 个请求（预算 {token_budget} tokens / 批）")
+    executor = ThreadPoolExecutor(max_workers=max(int(workers or 1), 1), thread_name_prefix="step6-llm-batch")
+    for batch in batches:
+        executor.submit(_run_batch, [targets[i] for i in batch])
+    return executor
+
+
 def build_glance_fallback(paper: Dict[str, Any]) -> str:
     """
     当 LLM 额度不足/不可用时的降级速览：
@@ -1430,24 +1724,30 @@ def merge_daily_run_results(
     return state, merged_deep, merged_quick, merged_evidence, state_file
 
 
-def ensure_text_content(pdf_url: str, txt_path: str) -> str:
-    if os.path.exists(txt_path):
-        with open(txt_path, "r", encoding="utf-8") as f:
-            return f.read()
-    text_content = fetch_paper_markdown_via_jina(pdf_url)
+def fetch_text_content(pdf_url: str) -> str | None:
+    """全文获取的网络部分：Jina 转 Markdown；失败返回 None，由 store_text_content 走 PDF 兜底。"""
+    with METRICS.timer(STEP6_STAGE_METRIC, stage="text_fetch"):
+        return fetch_paper_markdown_via_jina(pdf_url)
+
+
+def store_text_content(pdf_url: str, txt_path: str, text_content: str | None) -> str:
     if text_content is None and pdf_url:
-        resp = requests.get(pdf_url, timeout=60)
-        resp.raise_for_status()
-        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=True) as tmp_pdf:
-            tmp_pdf.write(resp.content)
-            tmp_pdf.flush()
-            text_content = extract_pdf_text(tmp_pdf.name)
+        # 与图表抽取共用 PDF 缓存，同一篇论文只下载一次；逐页抽文本在进程池中执行
+        with pdf_file(pdf_url, timeout=60) as pdf_path:
+            text_content = run_cpu("pdf_text", extract_pdf_text, pdf_path)
     os.makedirs(os.path.dirname(txt_path), exist_ok=True)
     with open(txt_path, "w", encoding="utf-8") as f:
         f.write(text_content or "")
     return text_content or ""
 
 
+def ensure_text_content(pdf_url: str, txt_path: str) -> str:
+    if os.path.exists(txt_path):
+        with open(txt_path, "r", encoding="utf-8") as f:
+            return f.read()
+    return store_text_content(pdf_url, txt_path, fetch_text_content(pdf_url))
+
+
 def yaml_escape_value(s: str) -> str:
     if not s:
         return '""'
@@ -1472,6 +1772,16 @@ def maybe_generate_paper_figures(
     return figures
 
 
+def paper_media_source(paper: Dict[str, Any], *, paper_id: str, pdf_url: str) -> Tuple[str, str] | None:
+    """需要抽取图表的论文返回 (source_key, asset_key)；非 arXiv / bioRxiv 或无 PDF 时返回 None。"""
+    source_key = str(paper.get("source") or "").strip().lower()
+    if source_key not in {"arxiv", "biorxiv"}:
+        return None
+    if not str(pdf_url or "").strip():
+        return None
+    return source_key, str(paper.get("id") or paper_id.replace("/", "-")).strip()
+
+
 def maybe_generate_paper_media(
     paper: Dict[str, Any],
     *,
@@ -1479,20 +1789,19 @@ def maybe_generate_paper_media(
     paper_id: str,
     pdf_url: str,
 ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
-    source_key = str(paper.get("source") or "").strip().lower()
-    if source_key not in {"arxiv", "biorxiv"}:
-        return [], []
-    if not str(pdf_url or "").strip():
+    media_source = paper_media_source(paper, paper_id=paper_id, pdf_url=pdf_url)
+    if media_source is None:
         return [], []
 
-    asset_key = str(paper.get("id") or paper_id.replace("/", "-")).strip()
+    source_key, asset_key = media_source
     try:
-        return ensure_paper_media(
-            pdf_url=pdf_url,
-            docs_dir=docs_dir,
-            source_key=source_key,
-            asset_key=asset_key,
-        )
+        with METRICS.timer(STEP6_STAGE_METRIC, stage="media"):
+            return ensure_paper_media(
+                pdf_url=pdf_url,
+                docs_dir=docs_dir,
+                source_key=source_key,
+                asset_key=asset_key,
+            )
     except Exception as e:
         log(f"[WARN] 论文图表提取失败：{asset_key}: {e}")
         return [], []
@@ -1665,7 +1974,14 @@ def process_paper(
     docs_dir: str,
     glance_only: bool = False,
     force_glance: bool = False,
+    *,
+    repair_assets: bool = True,
 ) -> Tuple[str, str]:
+    """
+    生成或修复单篇论文页面。repair_assets=False 用于分阶段流水线：已有 md 的全文 / 图表补齐
+    已由 fetch / extract / media 阶段完成（图表结果放在 paper["_figure_assets"] / ["_table_assets"]），
+    这里只做 LLM 相关的修复，不再下载 PDF。
+    """
     title = (paper.get("title") or "").strip()
     arxiv_id = str(paper.get("id") or paper.get("paper_id") or "").strip()
     md_path, txt_path, paper_id = prepare_paper_paths(docs_dir, date_str, title, arxiv_id)
@@ -1676,8 +1992,8 @@ def process_paper(
     glance = ""
 
     if os.path.exists(md_path):
-        # 即使是 glance-only，也要确保生成/补齐 .txt（用于前端聊天上下文等）
-        if glance_only and pdf_url:
+        # 确保生成/补齐 .txt（用于前端聊天上下文等；含 glance-only），缺失时不记入构建清单
+        if repair_assets and pdf_url:
             try:
                 ensure_text_content(pdf_url, txt_path)
             except Exception:
@@ -1694,12 +2010,16 @@ def process_paper(
         has_figures_json = bool(str(existing_meta.get("figures_json") or "").strip()) if existing_meta else False
         has_tables_json = bool(str(existing_meta.get("tables_json") or "").strip()) if existing_meta else False
         if not has_figures_json or not has_tables_json:
-            figures, tables = maybe_generate_paper_media(
-                paper,
-                docs_dir=docs_dir,
-                paper_id=paper_id,
-                pdf_url=pdf_url,
-            )
+            if repair_assets:
+                figures, tables = maybe_generate_paper_media(
+                    paper,
+                    docs_dir=docs_dir,
+                    paper_id=paper_id,
+                    pdf_url=pdf_url,
+                )
+            else:
+                figures = paper.get("_figure_assets") if isinstance(paper.get("_figure_assets"), list) else []
+                tables = paper.get("_table_assets") if isinstance(paper.get("_table_assets"), list) else []
             if figures and not has_figures_json:
                 paper["_figure_assets"] = figures
                 updated, changed = upsert_front_matter_field(
@@ -1846,6 +2166,10 @@ def process_paper(
                 return paper_id, title
 
             # 生成详细总结
+            if not repair_assets and not os.path.exists(txt_path):
+                # 全文在 fetch / extract 阶段未能取得：本次不总结，下次运行继续补齐
+                log(f"[WARN] 缺少全文，暂不生成详细总结：{paper_id}")
+                return paper_id, title
             pdf_url = str(paper.get("pdf_url") or paper.get("link") or "").strip()
             ensure_text_content(pdf_url, txt_path)
             summary = generate_deep_summary(md_path, txt_path, client=paper_llm_client)
@@ -1919,32 +2243,267 @@ def process_paper(
     return paper_id, title
 
 
-def _extract_paper_href(line: str) -> str | None:
-    m = re.search(r'href="([^"]+)"', line)
-    return m.group(1) if m else None
+@dataclass
+class PaperJob:
+    """流水线中流转的一篇论文：各阶段把中间结果写回这里，render 阶段统一落盘。"""
+
+    paper: Dict[str, Any]
+    section: str
+    date_str: str
+    docs_dir: str
+    glance_only: bool
+    force_glance: bool
+    title: str
+    abstract_en: str
+    pdf_url: str
+    md_path: str
+    txt_path: str
+    paper_id: str
+    # md 已存在：全文 / 图表在 fetch / extract / media 阶段补齐，LLM 阶段只走 process_paper 的 LLM 修复
+    existing: bool
+    text_content: str | None = None
+    content: str = ""
+    summary: str | None = None
+    input_hash: str = ""
+    # 批量翻译 / 速览的结果（start_batched_llm_prefill 设置）；None 表示走单篇调用
+    batched: Future | None = None
+    # 需要图表抽取：arXiv / bioRxiv 的新论文，或 md 中缺少 figures_json / tables_json 的已有论文
+    needs_media: bool = False
+
+
+def missing_paper_outputs(
+    md_text: str,
+    section: str,
+    *,
+    glance_only: bool = False,
+    has_abstract: bool = True,
+    txt_path: str = "",
+    media_meta_paths: Sequence[str] = (),
+) -> List[str]:
+    """
+    检查已生成 md 中缺失的产物（未配置 API Key、翻译 / 总结失败、全文或图表下载失败等降级情况）。
+    txt_path 非空时要求全文 .txt 存在；media_meta_paths 非空时要求 md 已写入图表字段，
+    或至少有一份图 / 表 meta.json（抽取完成但无结果）。
+    返回缺失项列表；非空时不应记入构建清单，以便下次运行由 process_paper 的补齐逻辑修复。
+    """
+    if not md_text:
+        return ["md"]
+    missing: List[str] = []
+    meta = _parse_front_matter(md_text) or {}
+    if not glance_only:
+        leading_h1 = 0
+        for line in md_text.splitlines()[:6]:
+            if line.startswith("# "):
+                leading_h1 += 1
+            elif line.strip():
+                break
+        if not str(meta.get("title_zh") or "").strip() and leading_h1 < 2:
+            missing.append("title_zh")
+        if has_abstract and "## 摘要" not in md_text:
+            missing.append("abstract_zh")
+        if section == "deep" and not extract_section_tail(md_text, "论文详细总结（自动生成）"):
+            missing.append("deep_summary")
+    if txt_path and not os.path.exists(txt_path):
+        missing.append("txt")
+    if media_meta_paths:
+        has_media_fields = any(str(meta.get(key) or "").strip() for key in ("figures_json", "tables_json"))
+        if not has_media_fields and not any(os.path.exists(path) for path in media_meta_paths):
+            missing.append("media")
+    return missing
+
+
+def expected_paper_outputs(job: PaperJob) -> Dict[str, Any]:
+    """missing_paper_outputs 的文件类参数：有 PDF 时需要 .txt，arXiv / bioRxiv 论文需要图表抽取结果。"""
+    media_source = paper_media_source(job.paper, paper_id=job.paper_id, pdf_url=job.pdf_url)
+    return {
+        "txt_path": job.txt_path if job.pdf_url else "",
+        "media_meta_paths": paper_media_meta_paths(job.docs_dir, *media_source) if media_source else (),
+    }
+
+
+def paper_input_hash(paper: Dict[str, Any], section: str, *, glance_only: bool = False) -> str:
+    """单篇论文的输入哈希：recommend 条目（含上游 LLM 打分 / 标签 / 证据）+ 分区 + 模式 + 模板版本。"""
+    return hash_payload(
+        {
+            "paper": paper,
+            "section": section,
+            "glance_only": bool(glance_only),
+            "template": STEP6_TEMPLATE_VERSION,
+        }
+    )
+
+
+def prepare_paper_job(
+    paper: Dict[str, Any],
+    section: str,
+    date_str: str,
+    docs_dir: str,
+    glance_only: bool = False,
+    force_glance: bool = False,
+) -> PaperJob:
+    title = (paper.get("title") or "").strip()
+    arxiv_id = str(paper.get("id") or paper.get("paper_id") or "").strip()
+    md_path, txt_path, paper_id = prepare_paper_paths(docs_dir, date_str, title, arxiv_id)
+    pdf_url = str(paper.get("pdf_url") or paper.get("link") or "").strip()
+    existing = os.path.exists(md_path)
+    needs_media = paper_media_source(paper, paper_id=paper_id, pdf_url=pdf_url) is not None
+    if needs_media and existing:
+        try:
+            with open(md_path, "r", encoding="utf-8") as f:
+                meta = _parse_front_matter(f.read()) or {}
+        except OSError:
+            meta = {}
+        needs_media = not all(str(meta.get(key) or "").strip() for key in ("figures_json", "tables_json"))
+    return PaperJob(
+        paper=paper,
+        section=section,
+        date_str=date_str,
+        docs_dir=docs_dir,
+        glance_only=glance_only,
+        force_glance=force_glance,
+        title=title,
+        abstract_en=(paper.get("abstract") or "").strip(),
+        pdf_url=pdf_url,
+        md_path=md_path,
+        txt_path=txt_path,
+        paper_id=paper_id,
+        existing=existing,
+        input_hash=paper_input_hash(paper, section, glance_only=glance_only),
+        needs_media=needs_media,
+    )
+
+
+def stage_fetch(job: PaperJob) -> PaperJob:
+    """
+    下载阶段（I/O）：Jina 全文；Jina 失败或需要抽图表时把 PDF 预取进缓存。
+    已有 md 的论文只补缺失的 .txt / 图表，失败时不中断（该论文不记入构建清单，下次运行重试）。
+    """
+    if not job.pdf_url:
+        return job
+    if not os.path.exists(job.txt_path):
+        try:
+            job.text_content = fetch_text_content(job.pdf_url)
+        except Exception as e:
+            if not job.glance_only and not job.existing:
+                raise
+            log(f"[WARN] 全文拉取失败（{'补齐' if job.existing else '速览模式'}继续）：{job.paper_id}: {e}")
+    needs_pdf = job.text_content is None and not os.path.exists(job.txt_path)
+    if needs_pdf or job.needs_media:
+        try:
+            prefetch_pdf(job.pdf_url, timeout=60)
+        except Exception as e:
+            # 预取只是加速；真正失败时 extract / media 阶段会按原逻辑报错或降级
+            log(f"[WARN] PDF 预取失败：{job.paper_id}: {e}")
+    return job
+
+
+def stage_extract(job: PaperJob) -> PaperJob:
+    """抽取阶段（CPU）：Jina 失败时从 PDF 抽文本（进程池），写出 .txt。"""
+    if not job.pdf_url or os.path.exists(job.txt_path):
+        return job
+    try:
+        store_text_content(job.pdf_url, job.txt_path, job.text_content)
+    except Exception as e:
+        if not job.glance_only and not job.existing:
+            raise
+        if job.existing:
+            log(f"[WARN] 全文补齐失败：{job.paper_id}: {e}")
+    return job
 
 
-def _extract_day_block_papers(block_lines: List[str]) -> Tuple[List[str], List[str]]:
-    """Extract paper link lines from a sidebar day block, grouped by section.
+def stage_media(job: PaperJob) -> PaperJob:
+    """图表阶段：PaperCropper / PyMuPDF 抽图（PDF 已在缓存中）。"""
+    if not job.needs_media:
+        return job
+    figures, tables = maybe_generate_paper_media(
+        job.paper,
+        docs_dir=job.docs_dir,
+        paper_id=job.paper_id,
+        pdf_url=job.pdf_url,
+    )
+    if figures:
+        job.paper["_figure_assets"] = figures
+    if tables:
+        job.paper["_table_assets"] = tables
+    return job
 
-    Returns (deep_lines, quick_lines).
+
+def stage_llm(job: PaperJob, llm_slots: threading.Semaphore | None = None) -> PaperJob:
     """
-    deep_lines: List[str] = []
-    quick_lines: List[str] = []
-    current = "deep"
-    for line in block_lines:
-        if "精读区" in line:
-            current = "deep"
-            continue
-        if "速读区" in line:
-            current = "quick"
-            continue
-        if 'href="#/' in line and line.strip().startswith("*"):
-            if current == "quick":
-                quick_lines.append(line)
-            else:
-                deep_lines.append(line)
-    return deep_lines, quick_lines
+    LLM 阶段：翻译、速览、精读总结；已有 md 的论文在这里走 process_paper 的 LLM 修复（不再下载）。
+    先等批量预取结果再占用 llm_slots，避免占着名额等待批量请求造成死锁。
+    """
+    if job.existing:
+        with llm_slots or nullcontext():
+            process_paper(
+                job.paper,
+                job.section,
+                job.date_str,
+                job.docs_dir,
+                job.glance_only,
+                job.force_glance,
+                repair_assets=False,
+            )
+        return job
+    prefilled = job.batched.result() if job.batched is not None else None
+    with llm_slots or nullcontext():
+        return _stage_llm_new_paper(job, prefilled)
+
+
+def _stage_llm_new_paper(job: PaperJob, prefilled: Dict[str, str] | None) -> PaperJob:
+    client = create_llm_client()
+    zh_title, zh_abstract = "", ""
+    glance = ""
+    if prefilled:
+        zh_title, zh_abstract = prefilled.get("title_zh", ""), prefilled.get("abstract_zh", "")
+        glance = format_glance_overview(prefilled)
+    elif not job.glance_only:
+        zh_title, zh_abstract = translate_title_and_abstract_to_zh(job.title, job.abstract_en, client=client)
+    if not glance:
+        glance = generate_glance_overview(job.title, job.abstract_en, client=client) or build_glance_fallback(job.paper)
+    if glance:
+        job.paper["_glance_overview"] = glance
+    tags_list = build_tags_list(job.section, job.paper.get("llm_tags") or [])
+    job.content = build_markdown_content(job.paper, job.section, zh_title, zh_abstract, tags_list)
+    if job.section == "deep" and not job.glance_only:
+        job.summary = generate_deep_summary(job.md_path, job.txt_path, client=client, md_content=job.content)
+    return job
+
+
+def stage_render(job: PaperJob) -> PaperJob:
+    """渲染阶段：写出 Markdown，并追加精读总结块。"""
+    if job.existing:
+        return job
+    os.makedirs(os.path.dirname(job.md_path), exist_ok=True)
+    with open(job.md_path, "w", encoding="utf-8") as f:
+        f.write(job.content)
+    if job.summary:
+        upsert_auto_block(job.md_path, "论文详细总结（自动生成）", job.summary)
+    return job
+
+
+def build_paper_stages(
+    *,
+    llm_workers: int,
+    fetch_workers: int | None = None,
+    extract_workers: int | None = None,
+    media_workers: int | None = None,
+    llm_slots: threading.Semaphore | None = None,
+) -> List[Stage]:
+    """
+    Step 6 的分阶段流水线：fetch（I/O）→ extract（CPU 进程池）→ media → llm → render。
+    默认下载并发是 LLM 的两倍，抽取 / 图表按 CPU 进程数，渲染单线程。
+    llm_slots 与 start_batched_llm_prefill 共用时，批量请求与 LLM 阶段合计不超过名额数。
+    """
+    llm_workers = max(int(llm_workers or 1), 1)
+    cpu_workers = max(resolve_cpu_workers(), 1)
+    return [
+        Stage("fetch", stage_fetch, max(int(fetch_workers or llm_workers * 2), 1)),
+        Stage("extract", stage_extract, max(int(extract_workers or cpu_workers), 1)),
+        Stage("media", stage_media, max(int(media_workers or cpu_workers), 1)),
+        Stage("llm", lambda job: stage_llm(job, llm_slots), llm_workers),
+        Stage("render", stage_render, 1),
+    ]
 
 
 def update_sidebar(
@@ -1962,7 +2521,7 @@ def update_sidebar(
         tags: List[Tuple[str, str]],
         route_href: str,
         evidence: str = "",
-    ) -> str:
+    ) -> Dict[str, Any]:
         score_text = "-"
         clean_tags: List[Dict[str, str]] = []
         for kind, label in (tags or []):
@@ -1989,115 +2548,39 @@ def update_sidebar(
         safe_evidence = str(evidence or "").strip()
         if safe_evidence:
             payload["evidence"] = safe_evidence
-        return html.escape(json.dumps(payload, ensure_ascii=False), quote=True)
+        return payload
 
     effective_label = (date_label or "").strip() or format_date_str(date_str)
-    # 用隐藏 marker 做稳定定位，避免“展示标题”变更导致无法覆盖更新
-    marker = f"<!--dpr-date:{date_str}-->"
-    day_heading = f"  * {effective_label} {marker}\n"
-    legacy_day_heading = f"  * {format_date_str(date_str)}\n"
-
-    lines: List[str] = []
-    if os.path.exists(sidebar_path):
-        with open(sidebar_path, "r", encoding="utf-8") as f:
-            lines = f.readlines()
-
-    daily_idx = -1
-    for i, line in enumerate(lines):
-        if line.strip().startswith("* Daily Papers"):
-            daily_idx = i
-            break
-    if daily_idx == -1:
-        if not any("[首页]" in line for line in lines):
-            lines.append("* [首页](/)\n")
-        lines.append("* Daily Papers\n")
-        daily_idx = len(lines) - 1
-
-    day_idx = -1
-    for i in range(daily_idx + 1, len(lines)):
-        line = lines[i]
-        if line.startswith("* "):
-            break
-        # 优先按 marker 精准匹配
-        if marker in line:
-            day_idx = i
-            break
-        # 兼容历史格式（没有 marker）
-        if line == legacy_day_heading:
-            day_idx = i
-            break
-
-    existing_deep_lines: List[str] = []
-    existing_quick_lines: List[str] = []
-    if day_idx != -1:
-        end = day_idx + 1
-        while end < len(lines):
-            if lines[end].startswith("  * ") and not lines[end].startswith("    * "):
-                break
-            end += 1
-        existing_deep_lines, existing_quick_lines = _extract_day_block_papers(
-            lines[day_idx + 1 : end]
-        )
-        del lines[day_idx:end]
-
-    new_hrefs: Set[str] = set()
-    for pid, _, _ in deep_entries:
-        new_hrefs.add(f"#/{pid}")
-    for pid, _, _ in quick_entries:
-        new_hrefs.add(f"#/{pid}")
-    extra_deep = [] if replace_existing else [
-        line
-        for line in existing_deep_lines
-        if _extract_paper_href(line) not in new_hrefs
-    ]
-    extra_quick = [] if replace_existing else [
-        line
-        for line in existing_quick_lines
-        if _extract_paper_href(line) not in new_hrefs
-    ]
-
-    block: List[str] = [day_heading]
-    if deep_entries or extra_deep:
-        block.append("    * 精读区\n")
-        for paper_id, title, tags in deep_entries:
-            safe_title = html.escape((title or "").strip() or paper_id)
-            href = f"#/{paper_id}"
-            evidence = paper_evidence_by_id.get(str(paper_id).strip(), "")
-            payload_json = build_sidebar_item_payload(paper_id, title, tags, href, evidence)
-            block.append(
-                "      * "
-                f'<a class="dpr-sidebar-item-link dpr-sidebar-item-structured" href="{href}" data-sidebar-item="{payload_json}">{safe_title}</a>\n'
-            )
-        block.extend(extra_deep)
-    if quick_entries or extra_quick:
-        block.append("    * 速读区\n")
-        for paper_id, title, tags in quick_entries:
-            safe_title = html.escape((title or "").strip() or paper_id)
+    # 每天一个分片（docs/_sidebar/daily/<date>.json），只改本日分片后重新组装 _sidebar.md
+    store = SidebarStore(sidebar_path)
+    store.ensure_migrated()
+    existing = store.load("daily", date_str) or {}
+
+    def build_items(entries: List[Tuple[str, str, List[Tuple[str, str]]]]) -> List[Dict[str, Any]]:
+        items: List[Dict[str, Any]] = []
+        for paper_id, title, tags in entries:
             href = f"#/{paper_id}"
             evidence = paper_evidence_by_id.get(str(paper_id).strip(), "")
-            payload_json = build_sidebar_item_payload(paper_id, title, tags, href, evidence)
-            block.append(
-                "      * "
-                f'<a class="dpr-sidebar-item-link dpr-sidebar-item-structured" href="{href}" data-sidebar-item="{payload_json}">{safe_title}</a>\n'
+            items.append(
+                {
+                    "href": href,
+                    "title": (title or "").strip() or paper_id,
+                    "payload": build_sidebar_item_payload(paper_id, title, tags, href, evidence),
+                }
             )
-        block.extend(extra_quick)
-
-    insert_idx = daily_idx + 1
-    lines[insert_idx:insert_idx] = block
-
-    # 清理历史 Sidebar 中遗留的“日报”入口
-    i = daily_idx + 1
-    while i < len(lines):
-        line = lines[i]
-        if line.startswith("* "):
-            break
-        if lines[i].startswith("    * [日报]("):
-            del lines[i]
-            continue
-        i += 1
+        return items
 
-    with open(sidebar_path, "w", encoding="utf-8") as f:
-        f.writelines(lines)
+    new_hrefs: Set[str] = {f"#/{pid}" for pid, _, _ in list(deep_entries) + list(quick_entries)}
+    fragment: Dict[str, Any] = {"date": date_str, "label": effective_label}
+    for section, entries in (("deep", deep_entries), ("quick", quick_entries)):
+        extra = [] if replace_existing else [
+            item
+            for item in (existing.get(section) or [])
+            if sidebar_item_href(item) not in new_hrefs
+        ]
+        fragment[section] = build_items(entries) + extra
+    store.save("daily", date_str, fragment)
+    store.assemble()
 
 
 def build_day_report_markdown(
@@ -2204,36 +2687,19 @@ def write_day_report_readme(
     return day_readme
 
 
-def list_day_report_links(docs_dir: str) -> List[Tuple[str, str]]:
+def list_day_report_links(docs_dir: str, catalog: DocsCatalog | None = None) -> List[Tuple[str, str]]:
+    """已有日报 README 的日期（区间目录在前，其后单日目录，均按日期倒序），基于 docs 目录索引。"""
     out: List[Tuple[str, str]] = []
     if not os.path.isdir(docs_dir):
         return out
-    # 1) 区间目录：YYYYMMDD-YYYYMMDD
-    range_dirs = sorted(
-        [d for d in os.listdir(docs_dir) if RANGE_DATE_RE.fullmatch(d)],
-        reverse=True,
-    )
-    for rd in range_dirs:
-        readme = os.path.join(docs_dir, rd, "README.md")
-        if not os.path.exists(readme):
-            continue
-        out.append((format_date_str(rd), build_docsify_id_href(f"{rd}/README")))
-
-    # 2) 单日目录：docs/YYYYMM/DD
-    ym_dirs = sorted([d for d in os.listdir(docs_dir) if re.fullmatch(r"\d{6}", d)], reverse=True)
-    for ym in ym_dirs:
-        ym_path = os.path.join(docs_dir, ym)
-        if not os.path.isdir(ym_path):
+    active = catalog or DocsCatalog.open(docs_dir)
+    keys = active.day_keys()
+    # 1) 区间目录：YYYYMMDD-YYYYMMDD；2) 单日目录：docs/YYYYMM/DD
+    for key in [k for k in keys if RANGE_DATE_RE.fullmatch(k)] + [k for k in keys if not RANGE_DATE_RE.fullmatch(k)]:
+        entry = active.days[key]
+        if not entry.get("readme"):
             continue
-        day_dirs = sorted([d for d in os.listdir(ym_path) if re.fullmatch(r"\d{2}", d)], reverse=True)
-        for day in day_dirs:
-            readme = os.path.join(ym_path, day, "README.md")
-            if not os.path.exists(readme):
-                continue
-            date8 = f"{ym}{day}"
-            label = format_date_str(date8)
-            href = build_docsify_id_href(f"{ym}/{day}/README")
-            out.append((label, href))
+        out.append((format_date_str(key), build_docsify_id_href(f"{entry['path']}/README")))
     return out
 
 
@@ -2345,67 +2811,53 @@ def write_run_daily_log(
     return out_path
 
 
-def backfill_history_day_reports(docs_dir: str) -> int:
+def backfill_history_day_reports(docs_dir: str, catalog: DocsCatalog | None = None) -> int:
     """
     为历史日期目录补齐 README.md（若不存在），便于首页左右切换日报。
     该补齐不依赖 LLM，只基于已存在的论文 markdown 文件生成简版日报。
+    缺 README 的日期与论文文件名取自 docs 目录索引，不再逐个扫描日期目录。
     """
     if not os.path.isdir(docs_dir):
         return 0
 
+    active = catalog or DocsCatalog.open(docs_dir)
     created = 0
-    ym_dirs = sorted(
-        [d for d in os.listdir(docs_dir) if re.fullmatch(r"\d{6}", d)],
-        reverse=True,
-    )
-    for ym in ym_dirs:
-        ym_path = os.path.join(docs_dir, ym)
-        if not os.path.isdir(ym_path):
+    for date8 in active.day_keys():
+        entry = active.days[date8]
+        if entry.get("readme") or not re.fullmatch(r"\d{8}", date8):
+            continue
+        ym, day = date8[:6], date8[6:]
+        day_path = os.path.join(docs_dir, ym, day)
+        readme_path = os.path.join(day_path, "README.md")
+        if os.path.exists(readme_path):
+            active.refresh_day(date8)
             continue
-        day_dirs = sorted(
-            [d for d in os.listdir(ym_path) if re.fullmatch(r"\d{2}", d)],
-            reverse=True,
-        )
-        for day in day_dirs:
-            day_path = os.path.join(ym_path, day)
-            if not os.path.isdir(day_path):
-                continue
-            readme_path = os.path.join(day_path, "README.md")
-            if os.path.exists(readme_path):
-                continue
-
-            paper_files = sorted(
-                [
-                    fn
-                    for fn in os.listdir(day_path)
-                    if fn.lower().endswith(".md")
-                    and fn.upper() != "README.MD"
-                    and not fn.startswith("_")
-                ]
-            )
 
-            date8 = f"{ym}{day}"
-            date_label = format_date_str(date8)
-            lines = [f"# 日报 · {date_label}", ""]
-            lines.append("- 该日报为历史补齐版本（由已有文档自动生成）。")
-            lines.append(f"- 论文数量：{len(paper_files)}")
-            lines.append("")
-            lines.append("## 论文列表")
-            if paper_files:
-                for idx, fn in enumerate(paper_files, start=1):
-                    base = fn[:-3]
-                    # 尽量从文件名恢复标题（保留 slug，可点击）
-                    title_guess = re.sub(r"^[0-9]{4}\.[0-9]{5}v[0-9]-", "", base).replace("-", " ").strip()
-                    title_guess = title_guess or base
-                    lines.append(f"{idx}. [{title_guess}]({build_docsify_id_href(f'{ym}/{day}/{base}')})")
-            else:
-                lines.append("- 当天目录暂无论文文档。")
-            lines.append("")
+        paper_files = list(entry.get("papers") or [])
+        date_label = format_date_str(date8)
+        lines = [f"# 日报 · {date_label}", ""]
+        lines.append("- 该日报为历史补齐版本（由已有文档自动生成）。")
+        lines.append(f"- 论文数量：{len(paper_files)}")
+        lines.append("")
+        lines.append("## 论文列表")
+        if paper_files:
+            for idx, fn in enumerate(paper_files, start=1):
+                base = fn[:-3]
+                # 尽量从文件名恢复标题（保留 slug，可点击）
+                title_guess = re.sub(r"^[0-9]{4}\.[0-9]{5}v[0-9]-", "", base).replace("-", " ").strip()
+                title_guess = title_guess or base
+                lines.append(f"{idx}. [{title_guess}]({build_docsify_id_href(f'{ym}/{day}/{base}')})")
+        else:
+            lines.append("- 当天目录暂无论文文档。")
+        lines.append("")
 
-            with open(readme_path, "w", encoding="utf-8") as f:
-                f.write("\n".join(lines))
-            created += 1
+        with open(readme_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines))
+        active.refresh_day(date8)
+        created += 1
 
+    if catalog is None:
+        active.save()
     return created
 
 
@@ -2673,10 +3125,25 @@ def write_day_meta_index_json(
     quick_list: List[Dict[str, Any]],
     merged_deep_entries: List[Tuple[str, str, List[Tuple[str, str]]]] | None = None,
     merged_quick_entries: List[Tuple[str, str, List[Tuple[str, str]]]] | None = None,
+    manifest: BuildManifest | None = None,
 ) -> str:
     """
     在对应的 docs 日期目录下生成索引 JSON 文件，供前端一键下载。
+    传入 manifest 时，md 内容未变化的论文直接复用上次解析出的条目；
+    条目与上次完全一致时不重写文件（避免仅 generated_at 变化产生无意义的提交）。
     """
+
+    def _meta_item(md_path: str, route: str, section: str, selection_source: str, abstract: str) -> Dict[str, Any]:
+        if manifest is None:
+            return _parse_generated_md_to_meta(md_path, route, section, selection_source, abstract)
+        key = hash_payload([manifest.content_hash(route, md_path), section, selection_source, abstract])
+        cached = manifest.cached_meta(route, key)
+        if cached is not None:
+            return cached
+        item = _parse_generated_md_to_meta(md_path, route, section, selection_source, abstract)
+        manifest.store_meta(route, key, item)
+        return item
+
     if RANGE_DATE_RE.match(date_str):
         target_dir = os.path.join(docs_dir, date_str)
     else:
@@ -2708,7 +3175,7 @@ def write_day_meta_index_json(
                 source = source_by_route.get(route) or {}
                 md_path = os.path.join(docs_dir, f"{route}.md")
                 try:
-                    item = _parse_generated_md_to_meta(
+                    item = _meta_item(
                         md_path,
                         route,
                         section,
@@ -2727,7 +3194,7 @@ def write_day_meta_index_json(
                     title = (paper.get("title") or "").strip()
                     arxiv_id = str(paper.get("id") or paper.get("paper_id") or "").strip()
                     md_path, _, pid = prepare_paper_paths(docs_dir, date_str, title, arxiv_id)
-                    item = _parse_generated_md_to_meta(
+                    item = _meta_item(
                         md_path,
                         pid,
                         section,
@@ -2752,6 +3219,15 @@ def write_day_meta_index_json(
         "errors": errors,
     }
 
+    try:
+        with open(out_path, "r", encoding="utf-8") as f:
+            previous = json.load(f)
+        unchanged = all(previous.get(k) == payload[k] for k in ("label", "date", "count", "papers", "errors"))
+    except Exception:
+        unchanged = False
+    if unchanged:
+        return out_path
+
     with open(out_path, "w", encoding="utf-8") as f:
         # 索引文件用于下载：保持可读的 JSON pretty 格式（每个 paper 一个对象块）
         json.dump(payload, f, ensure_ascii=False, indent=2)
@@ -2818,11 +3294,53 @@ def main() -> None:
         "--docs-concurrency",
         type=int,
         default=DEFAULT_DOCS_CONCURRENCY,
-        help="step6 每篇论文并发生成数量。",
+        help="step6 LLM 阶段（翻译 / 速览 / 精读总结）的并发数量。",
+    )
+    parser.add_argument(
+        "--force-rebuild",
+        action="store_true",
+        help="忽略增量构建清单（_build_manifest.json），重新生成当天全部论文。",
+    )
+    parser.add_argument(
+        "--rebuild-catalog",
+        action="store_true",
+        help="全量重建 docs 目录索引（docs/_catalog.json），用于索引与磁盘不一致时。",
+    )
+    parser.add_argument(
+        "--fetch-concurrency",
+        type=int,
+        default=None,
+        help="step6 下载阶段（Jina 全文 / PDF 预取）的并发数量，默认是 LLM 并发的两倍。",
+    )
+    parser.add_argument(
+        "--media-concurrency",
+        type=int,
+        default=None,
+        help="step6 图表抽取阶段的并发数量，默认等于 CPU 进程池大小。",
+    )
+    parser.add_argument(
+        "--llm-batch-size",
+        type=int,
+        default=DEFAULT_LLM_BATCH_SIZE,
+        help="新论文的标题摘要翻译与速览合并为批量请求，每批最多几篇；1 表示逐篇调用。",
+    )
+    parser.add_argument(
+        "--llm-batch-tokens",
+        type=int,
+        default=DEFAULT_LLM_BATCH_TOKENS,
+        help="每个批量请求的估算 token 上限（输入 + 预期输出）。",
+    )
+    parser.add_argument(
+        "--stage-queue-size",
+        type=int,
+        default=None,
+        help="step6 各阶段之间的队列长度上限，默认是 LLM 并发的两倍。",
     )
     args = parser.parse_args()
 
     date_str = args.date or TODAY_STR
+    configure_run_metrics("step6", os.path.join(ROOT_DIR, "archive", date_str, "metrics", "step6.json"))
+    step6_started_at = time.time()
     mode = args.mode
     if not mode:
         config = load_config()
@@ -2832,9 +3350,13 @@ def main() -> None:
         mode = mode.split(",", 1)[0].strip()
 
     docs_dir = args.docs_dir or resolve_docs_dir()
-    created_reports = backfill_history_day_reports(docs_dir)
+    catalog = DocsCatalog.open(docs_dir, rebuild=args.rebuild_catalog)
+    if args.rebuild_catalog:
+        log(f"[INFO] 已重建 docs 目录索引：{len(catalog.days)} 个日期")
+    created_reports = backfill_history_day_reports(docs_dir, catalog=catalog)
     if created_reports > 0:
         log(f"[INFO] 已补齐历史日报 README：{created_reports} 个")
+    catalog.save()
 
     if args.paper_id:
         log_substep("6.p", "单篇论文生成", "START")
@@ -2864,6 +3386,8 @@ def main() -> None:
                 glance_only=args.glance_only,
                 force_glance=args.force_glance,
             )
+            catalog.refresh_day(single_date)
+            catalog.save()
             log(f"[OK] 单篇论文已生成：{paper_title}（{paper_id}），date={single_date}，section={section}")
             log_substep("6.p", "单篇论文生成", "END")
             return
@@ -2934,6 +3458,37 @@ def main() -> None:
     quick_entries: List[Tuple[str, str, List[Tuple[str, str]]]] = []
     docs_concurrency = max(1, int(args.docs_concurrency))
 
+    # 增量构建：输入哈希与产物指纹都未变化的论文不再进入流水线；整天未变化则直接结束
+    manifest: BuildManifest | None = None
+    day_input_hash = ""
+    if not args.sidebar_only and not args.force_glance and not args.force_rebuild:
+        manifest = BuildManifest(
+            build_manifest_path(docs_dir, date_str),
+            docs_dir=docs_dir,
+            template_version=STEP6_TEMPLATE_VERSION,
+        )
+        day_input_hash = hash_payload(
+            {
+                "recommend": payload,
+                "mode": mode,
+                "glance_only": bool(args.glance_only),
+                "sidebar_date_label": args.sidebar_date_label or "",
+                "template": STEP6_TEMPLATE_VERSION,
+            }
+        )
+        papers_fresh = all(
+            manifest.paper_is_fresh(
+                prepare_paper_paths(docs_dir, date_str, (p.get("title") or "").strip(), _paper_id(p))[2],
+                paper_input_hash(p, section, glance_only=args.glance_only),
+            )
+            for section, lst in (("deep", deep_list), ("quick", quick_list))
+            for p in lst
+        )
+        if papers_fresh and manifest.day_is_fresh(day_input_hash):
+            log(f"[SKIP] {date_str} 的 recommend 与已生成页面均未变化（{manifest.path}），跳过 Step 6。")
+            METRICS.set_info("step6", {"date": date_str, "mode": mode, "skipped": True})
+            return
+
     def _process_section(
         section: str,
         papers: List[Dict[str, Any]],
@@ -2941,33 +3496,90 @@ def main() -> None:
     ) -> List[Tuple[str, str, List[Tuple[str, str]]]]:
         if not papers:
             return []
-        max_workers = max(1, docs_concurrency)
-        futures: Dict[Any, Tuple[int, Dict[str, Any]]] = {}
+        busy_before = snapshot_stage_busy_seconds()
+        section_started = time.perf_counter()
         results: List[Tuple[int, Tuple[str, str, List[Tuple[str, str]]]]] = []
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            for index, paper in enumerate(papers):
-                future = executor.submit(
-                    process_paper,
-                    paper,
-                    section,
-                    date_str,
-                    docs_dir,
-                    args.glance_only,
-                    args.force_glance,
-                )
-                futures[future] = (index, paper)
+        results_lock = threading.Lock()
 
-            for future in as_completed(futures):
-                index, paper = futures[future]
-                try:
-                    pid, title = future.result()
-                except Exception as e:
-                    log(f"[WARN] 生成{section}论文失败：{e}")
-                    continue
-                paper_evidence_by_id[str((pid or "").strip())] = get_paper_sidebar_evidence(paper)
-                section_tags = extract_sidebar_tags(paper)
-                results.append((index, (pid, title, section_tags)))
+        def _add_result(index: int, job: PaperJob) -> None:
+            section_tags = extract_sidebar_tags(job.paper)
+            with results_lock:
+                paper_evidence_by_id[str((job.paper_id or "").strip())] = get_paper_sidebar_evidence(job.paper)
+                results.append((index, (job.paper_id, job.title, section_tags)))
 
+        def _on_result(index: int, job: PaperJob) -> None:
+            METRICS.inc("step6_papers", section=section)
+            if manifest is not None:
+                try:
+                    with open(job.md_path, "r", encoding="utf-8") as f:
+                        md_text = f.read()
+                except OSError:
+                    md_text = ""
+                missing = missing_paper_outputs(
+                    md_text,
+                    job.section,
+                    glance_only=job.glance_only,
+                    has_abstract=bool(job.abstract_en),
+                    **expected_paper_outputs(job),
+                )
+                if missing:
+                    # 产物不完整（LLM 降级、全文 / 图表下载失败）：不记入清单，下次运行继续走补齐逻辑
+                    METRICS.inc("step6_papers_incomplete", section=section)
+                    log(f"[INFO] {job.paper_id} 缺少 {', '.join(missing)}，暂不记入构建清单")
+                else:
+                    manifest.record_paper(job.paper_id, job.input_hash, {"md": job.md_path, "txt": job.txt_path})
+            _add_result(index, job)
+
+        def _on_error(index: int, job: PaperJob, stage_name: str, exc: BaseException) -> None:
+            log(f"[WARN] 生成{section}论文失败（{stage_name}）：{exc}")
+            METRICS.inc("step6_papers_failed", section=section)
+
+        # 批量预取与 LLM 阶段共用一组名额：同时在途的 LLM 请求不超过 --docs-concurrency
+        llm_slots = threading.BoundedSemaphore(docs_concurrency)
+        stages = build_paper_stages(
+            llm_workers=docs_concurrency,
+            fetch_workers=args.fetch_concurrency,
+            media_workers=args.media_concurrency,
+            llm_slots=llm_slots,
+        )
+        jobs = [
+            prepare_paper_job(paper, section, date_str, docs_dir, args.glance_only, args.force_glance)
+            for paper in papers
+        ]
+        pending: List[PaperJob] = []
+        for index, job in enumerate(jobs):
+            if manifest is not None and manifest.paper_is_fresh(job.paper_id, job.input_hash):
+                METRICS.inc("step6_papers_skipped", section=section)
+                _add_result(index, job)
+            else:
+                pending.append(job)
+        if len(pending) < len(jobs):
+            log(f"[INFO] {section}：{len(jobs) - len(pending)} 篇输入与产物均未变化，跳过重新生成")
+        index_of = {id(job): index for index, job in enumerate(jobs)}
+
+        if pending:
+            batch_executor = start_batched_llm_prefill(
+                pending,
+                batch_size=args.llm_batch_size,
+                token_budget=args.llm_batch_tokens,
+                workers=docs_concurrency,
+                llm_slots=llm_slots,
+            )
+            try:
+                stage_stats = run_stages(
+                    pending,
+                    stages,
+                    queue_size=args.stage_queue_size or docs_concurrency * 2,
+                    on_result=lambda _pos, job: _on_result(index_of[id(job)], job),
+                    on_error=lambda _pos, job, stage_name, exc: _on_error(index_of[id(job)], job, stage_name, exc),
+                    pipeline=f"step6_{section}",
+                )
+            finally:
+                if batch_executor is not None:
+                    batch_executor.shutdown(wait=True)
+            section_wall = time.perf_counter() - section_started
+            log(f"[INFO] {section} 流水线：{format_stage_stats(stage_stats, section_wall)}")
+            log(format_stage_overlap(section, section_wall, busy_before, snapshot_stage_busy_seconds()))
         results.sort(key=lambda item: item[0])
         return [v for _, v in results]
 
@@ -3048,6 +3660,9 @@ def main() -> None:
         generated_at=merged_generated_at,
         summary=daily_summary,
     )
+    # 本日论文与日报 README 已落盘：只重扫当天目录更新索引
+    catalog.refresh_day(date_str)
+    catalog.save()
     home_readme = sync_home_readme_from_day_report(
         docs_dir=docs_dir,
         date_str=date_str,
@@ -3094,10 +3709,38 @@ def main() -> None:
             quick_list,
             merged_deep_entries=deep_entries,
             merged_quick_entries=quick_entries,
+            manifest=manifest,
         )
         log(f"[OK] meta index saved: {out_path}")
+        if (
+            manifest is not None
+            and not METRICS.counter_total("step6_papers_failed")
+            and not METRICS.counter_total("step6_papers_incomplete")
+        ):
+            # 侧边栏只记录本日分片：共享的 _sidebar.md 会随其它日期 / 会议的运行变化
+            manifest.record_day(
+                day_input_hash,
+                {
+                    "readme": day_readme,
+                    "meta": out_path,
+                    "state": state_path,
+                    "sidebar": SidebarStore(sidebar_path).fragment_path("daily", date_str),
+                },
+            )
     except Exception as e:
         log(f"[WARN] 生成元数据索引失败：{e}")
+    if manifest is not None and manifest.save():
+        log(f"[OK] build manifest saved: {manifest.path}")
+    try:
+        rebuilt_months = update_search_index(
+            docs_dir,
+            catalog=catalog,
+            changed_days=[date_str],
+            rehash_all=args.rebuild_catalog,
+        )
+        log(f"[OK] search index updated: shards={','.join(rebuilt_months) or '无变化'}")
+    except Exception as e:
+        log(f"[WARN] 更新搜索索引失败：{e}")
     log_substep("6.6", "生成可下载元数据索引（JSON）", "END")
 
     log_substep("6.7", "写入运行日志（日报）", "START")
@@ -3115,6 +3758,22 @@ def main() -> None:
     log(f"[OK] daily report log saved: {run_log}")
     log_substep("6.7", "写入运行日志（日报）", "END")
 
+    step6_elapsed = time.time() - step6_started_at
+    generated_papers = int(METRICS.counter_total("step6_papers"))
+    METRICS.set_info(
+        "step6",
+        {
+            "date": date_str,
+            "mode": mode,
+            "deep": len(deep_entries),
+            "quick": len(quick_entries),
+            "generated_papers": generated_papers,
+            "failed_papers": int(METRICS.counter_total("step6_papers_failed")),
+            "docs_concurrency": docs_concurrency,
+            "elapsed_seconds": round(step6_elapsed, 3),
+            "papers_per_minute": round(generated_papers / step6_elapsed * 60, 3) if step6_elapsed > 0 else 0.0,
+        },
+    )
     log(f"[OK] docs updated: {docs_dir}")
 
 
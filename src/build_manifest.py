@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+# Step 6 增量构建清单：记录每篇论文的输入哈希与产物指纹，未变化的论文 / 日期直接跳过
+
+"""
+清单与 _daily_state.json 放在同一个日期目录下（docs/<YYYYMM>/<DD>/_build_manifest.json），
+随 docs 一起提交，因此跨 workflow 运行可复用：
+
+- papers[route].input_hash：recommend 条目（含 Step 4/5 的 LLM 打分、标签、证据）、分区、
+  生成模式与模板版本的哈希；下划线开头的运行期字段不参与
+- papers[route].outputs：产物文件（md / txt）的 sha256 + size + mtime_ns；校验时先比 stat，
+  不一致才重新计算 sha256，避免每次都读全部文件
+- meta[route]：papers.meta.json 中该论文条目的解析结果，按 md 内容哈希失效，
+  省去对未变化 md 的重复解析
+- day：整天的输入哈希与日级产物（日报 README、papers.meta.json、侧边栏等）指纹；
+  全部命中时 Step 6 直接跳过当天
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+MANIFEST_VERSION = 1
+MANIFEST_FILENAME = "_build_manifest.json"
+
+
+def build_manifest_path(docs_dir: str, date_str: str) -> str:
+    token = str(date_str or "").strip()
+    if re.fullmatch(r"\d{8}", token):
+        return os.path.join(docs_dir, token[:6], token[6:8], MANIFEST_FILENAME)
+    return os.path.join(docs_dir, token, MANIFEST_FILENAME)
+
+
+def _strip_runtime_keys(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {str(k): _strip_runtime_keys(v) for k, v in value.items() if not str(k).startswith("_")}
+    if isinstance(value, (list, tuple)):
+        return [_strip_runtime_keys(v) for v in value]
+    return value
+
+
+def hash_payload(value: Any) -> str:
+    """对任意 JSON 兼容对象做稳定哈希（键排序；忽略下划线开头的运行期字段）。"""
+    canonical = json.dumps(_strip_runtime_keys(value), ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_fingerprint(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        st = os.stat(path)
+        return {"sha256": _sha256_file(path), "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    except OSError:
+        return None
+
+
+class BuildManifest:
+    def __init__(self, path: str, *, docs_dir: str, template_version: str) -> None:
+        self.path = path
+        self.docs_dir = docs_dir
+        self.template_version = str(template_version)
+        self._lock = threading.Lock()
+        self._dirty = False
+        self.data = self._load()
+
+    def _empty(self) -> Dict[str, Any]:
+        return {"version": MANIFEST_VERSION, "template_version": self.template_version, "papers": {}, "meta": {}, "day": {}}
+
+    def _load(self) -> Dict[str, Any]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception:
+            return self._empty()
+        if (
+            not isinstance(data, dict)
+            or data.get("version") != MANIFEST_VERSION
+            or str(data.get("template_version")) != self.template_version
+        ):
+            # 模板升级后旧清单整体作废，所有页面按新模板重建
+            return self._empty()
+        for key in ("papers", "meta", "day"):
+            if not isinstance(data.get(key), dict):
+                data[key] = {}
+        return data
+
+    # ---- 产物指纹 ----
+    def _abs(self, rel_path: str) -> str:
+        return os.path.join(self.docs_dir, rel_path)
+
+    def _rel(self, abs_path: str) -> str:
+        return os.path.relpath(abs_path, self.docs_dir).replace(os.sep, "/")
+
+    def _output_matches(self, rel_path: str, recorded: Dict[str, Any]) -> bool:
+        try:
+            st = os.stat(self._abs(rel_path))
+        except OSError:
+            return False
+        if st.st_size != recorded.get("size"):
+            return False
+        if st.st_mtime_ns == recorded.get("mtime_ns"):
+            return True
+        return _sha256_file(self._abs(rel_path)) == recorded.get("sha256")
+
+    def _outputs_match(self, outputs: Any) -> bool:
+        if not isinstance(outputs, dict) or not outputs:
+            return False
+        return all(isinstance(fp, dict) and self._output_matches(rel, fp) for rel, fp in outputs.items())
+
+    def _fingerprints(self, files: Dict[str, str]) -> Dict[str, Dict[str, Any]]:
+        out: Dict[str, Dict[str, Any]] = {}
+        for abs_path in files.values():
+            fp = file_fingerprint(abs_path) if abs_path else None
+            if fp is not None:
+                out[self._rel(abs_path)] = fp
+        return out
+
+    def content_hash(self, route: str, abs_path: str) -> str:
+        """返回 route 某个产物的 sha256；若清单里记录的 stat 未变则直接复用记录值。"""
+        rel = self._rel(abs_path)
+        with self._lock:
+            entry = self.data["papers"].get(route) or {}
+            recorded = (entry.get("outputs") or {}).get(rel)
+        if recorded:
+            try:
+                st = os.stat(abs_path)
+                if st.st_size == recorded.get("size") and st.st_mtime_ns == recorded.get("mtime_ns"):
+                    return str(recorded.get("sha256") or "")
+            except OSError:
+                return ""
+        try:
+            return _sha256_file(abs_path)
+        except OSError:
+            return ""
+
+    # ---- 论文级 ----
+    def paper_is_fresh(self, route: str, input_hash: str) -> bool:
+        with self._lock:
+            entry = self.data["papers"].get(route)
+        if not isinstance(entry, dict) or entry.get("input_hash") != input_hash:
+            return False
+        return self._outputs_match(entry.get("outputs"))
+
+    def record_paper(self, route: str, input_hash: str, files: Dict[str, str]) -> None:
+        outputs = self._fingerprints(files)
+        with self._lock:
+            self.data["papers"][route] = {
+                "input_hash": input_hash,
+                "outputs": outputs,
+                "built_at": datetime.now(timezone.utc).isoformat(),
+            }
+            self._dirty = True
+
+    # ---- papers.meta.json 条目缓存 ----
+    def cached_meta(self, route: str, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self.data["meta"].get(route)
+        if isinstance(entry, dict) and entry.get("key") == key and isinstance(entry.get("item"), dict):
+            return dict(entry["item"])
+        return None
+
+    def store_meta(self, route: str, key: str, item: Dict[str, Any]) -> None:
+        with self._lock:
+            self.data["meta"][route] = {"key": key, "item": dict(item)}
+            self._dirty = True
+
+    # ---- 日级 ----
+    def day_is_fresh(self, input_hash: str) -> bool:
+        with self._lock:
+            day = dict(self.data.get("day") or {})
+        return day.get("input_hash") == input_hash and self._outputs_match(day.get("outputs"))
+
+    def record_day(self, input_hash: str, files: Dict[str, str]) -> None:
+        outputs = self._fingerprints(files)
+        with self._lock:
+            self.data["day"] = {
+                "input_hash": input_hash,
+                "outputs": outputs,
+                "built_at": datetime.now(timezone.utc).isoformat(),
+            }
+            self._dirty = True
+
+    def save(self) -> bool:
+        with self._lock:
+            if not self._dirty:
+                return False
+            payload = json.dumps(self.data, ensure_ascii=False, indent=2, sort_keys=True)
+            self._dirty = False
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".build_manifest.", suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(payload + "\n")
+        os.replace(tmp_path, self.path)
+        return True
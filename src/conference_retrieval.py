@@ -38,7 +38,15 @@ from filter import E5_QUERY_PREFIX, encode_queries  # noqa: E402
 from model_loader import load_sentence_transformer  # noqa: E402
 from source_config import get_source_backend, get_supabase_shared_config  # noqa: E402
 from subscription_plan import build_pipeline_inputs  # noqa: E402
-from supabase_source import match_papers_by_bm25, match_papers_by_embedding  # noqa: E402
+from supabase_source import (  # noqa: E402
+    batch_rpc_enabled,
+    is_missing_rpc_message,
+    match_papers_by_bm25,
+    match_papers_by_bm25_batch,
+    match_papers_by_embedding,
+    match_papers_by_embedding_batch,
+    resolve_batch_rpc_name,
+)
 
 
 CONFERENCE_DEFAULTS: Dict[str, Dict[str, str]] = {
@@ -461,6 +469,109 @@ def score_from_row(row: Dict[str, Any], mode: str) -> float:
         return 0.0
 
 
+def _query_embedding_list(query: Dict[str, Any]) -> List[float]:
+    raw_embedding = query.get("query_embedding")
+    if isinstance(raw_embedding, np.ndarray):
+        return raw_embedding.astype(np.float32).tolist()
+    return [float(x) for x in (raw_embedding or [])]
+
+
+def prefetch_rpc_batches(
+    *,
+    mode: str,
+    queries: List[Dict[str, Any]],
+    conferences: List[str],
+    years: List[int],
+    config: Dict[str, Any],
+    top_k: int,
+    filter_pairs: List[str] | None = None,
+) -> Dict[Tuple[str, int], List[List[Dict[str, Any]]]]:
+    """
+    批量 RPC 预取（mode=embedding / bm25）：每个检索目标（统一会议入口，或 会议×年份）只发一次请求，
+    返回 {(conference_key, year): 每个查询的结果列表}；统一入口的 key 为 ("*", 0)。
+    未启用 / 未部署 / 失败的目标不在结果中，调用方按原逐查询路径处理。
+    """
+    if mode == "bm25":
+        indexed = [
+            (idx, str(query.get("query_text") or "").strip())
+            for idx, query in enumerate(queries)
+        ]
+    else:
+        indexed = [
+            (idx, _query_embedding_list(query))
+            for idx, query in enumerate(queries)
+            if str(query.get("query_text") or "").strip()
+        ]
+    indexed = [(idx, item) for idx, item in indexed if item]
+    if not indexed:
+        return {}
+
+    def _run(backend: Dict[str, Any], base_rpc: str, **kwargs: Any) -> List[List[Dict[str, Any]]] | None:
+        common = {
+            "url": str(backend.get("url") or ""),
+            "api_key": str(backend.get("anon_key") or ""),
+            "match_count": top_k,
+            "schema": str(backend.get("schema") or "public"),
+            **kwargs,
+        }
+        if mode == "bm25":
+            batch_rpc = resolve_batch_rpc_name(backend, base_rpc, key="bm25_rpc_batch")
+            rows_by_query, msg = match_papers_by_bm25_batch(
+                rpc_name=batch_rpc,
+                query_texts=[text for _, text in indexed],
+                **common,
+            )
+        else:
+            batch_rpc = resolve_batch_rpc_name(backend, base_rpc)
+            rows_by_query, msg = match_papers_by_embedding_batch(
+                rpc_name=batch_rpc,
+                query_embeddings=[vec for _, vec in indexed],
+                **common,
+            )
+        log(f"[Supabase Conference {mode}:batch] rpc={batch_rpc} queries={len(indexed)} | {msg}")
+        if not msg.startswith("rpc 查询成功"):
+            if is_missing_rpc_message(msg):
+                log(f"[INFO] 未部署批量 RPC {batch_rpc}，回退逐查询调用。")
+            return None
+        aligned: List[List[Dict[str, Any]]] = [[] for _ in queries]
+        for (idx, _), rows in zip(indexed, rows_by_query):
+            aligned[idx] = rows
+        return aligned
+
+    def _base_rpc(backend: Dict[str, Any], defaults: Dict[str, str]) -> str:
+        if mode == "bm25":
+            return str(backend.get("bm25_rpc") or defaults["bm25_rpc"])
+        return str(backend.get("vector_rpc_exact") or backend.get("vector_rpc") or defaults["vector_rpc_exact"])
+
+    out: Dict[Tuple[str, int], List[List[Dict[str, Any]]]] = {}
+    active_filter_pairs = [str(item).strip() for item in (filter_pairs or []) if str(item).strip()]
+    if active_filter_pairs:
+        backend = resolve_unified_conference_backend(config)
+        if not batch_rpc_enabled(backend):
+            return {}
+        aligned = _run(
+            backend,
+            _base_rpc(backend, UNIFIED_CONFERENCE_BACKEND),
+            extra_payload={"filter_pairs": active_filter_pairs},
+        )
+        if aligned is not None:
+            out[("*", 0)] = aligned
+        return out
+
+    for conference_key in conferences:
+        backend = resolve_conference_backend(config, conference_key)
+        if not batch_rpc_enabled(backend):
+            continue
+        base_rpc = _base_rpc(backend, CONFERENCE_DEFAULTS[conference_key])
+        for year in years:
+            start_dt, end_dt = year_window(year)
+            aligned = _run(backend, base_rpc, start_dt=start_dt, end_dt=end_dt, time_fields=("published",))
+            if aligned is None:
+                break
+            out[(conference_key, year)] = aligned
+    return out
+
+
 def build_result_for_queries(
     *,
     mode: str,
@@ -474,6 +585,15 @@ def build_result_for_queries(
     id_to_paper: Dict[str, PaperHit] = {}
     output_queries: List[Dict[str, Any]] = []
     total_rpc_hits = 0
+    batched = prefetch_rpc_batches(
+        mode=mode,
+        queries=queries,
+        conferences=conferences,
+        years=years,
+        config=config,
+        top_k=top_k,
+        filter_pairs=filter_pairs,
+    )
 
     for q_idx, query in enumerate(queries, start=1):
         q_text = str(query.get("query_text") or "").strip()
@@ -487,7 +607,10 @@ def build_result_for_queries(
             backend = resolve_unified_conference_backend(config)
             if not backend.get("url") or not backend.get("anon_key"):
                 raise RuntimeError("统一会议检索缺少 Supabase url/anon_key。")
-            if mode == "bm25":
+            if ("*", 0) in batched:
+                rows = batched[("*", 0)][q_idx - 1]
+                msg = f"批量 RPC 结果：{len(rows)} 条"
+            elif mode == "bm25":
                 rows, msg = match_papers_by_bm25(
                     url=str(backend.get("url") or ""),
                     api_key=str(backend.get("anon_key") or ""),
@@ -498,11 +621,7 @@ def build_result_for_queries(
                     extra_payload={"filter_pairs": active_filter_pairs},
                 )
             else:
-                raw_embedding = query.get("query_embedding")
-                if isinstance(raw_embedding, np.ndarray):
-                    query_embedding = raw_embedding.astype(np.float32).tolist()
-                else:
-                    query_embedding = [float(x) for x in (raw_embedding or [])]
+                query_embedding = _query_embedding_list(query)
                 rows, msg = match_papers_by_embedding(
                     url=str(backend.get("url") or ""),
                     api_key=str(backend.get("anon_key") or ""),
@@ -537,7 +656,10 @@ def build_result_for_queries(
                 for year in years:
                     start_dt, end_dt = year_window(year)
                     label = CONFERENCE_DEFAULTS[conference_key]["label"]
-                    if mode == "bm25":
+                    if (conference_key, year) in batched:
+                        rows = batched[(conference_key, year)][q_idx - 1]
+                        msg = f"批量 RPC 结果：{len(rows)} 条"
+                    elif mode == "bm25":
                         rows, msg = match_papers_by_bm25(
                             url=str(backend.get("url") or ""),
                             api_key=str(backend.get("anon_key") or ""),
@@ -550,11 +672,7 @@ def build_result_for_queries(
                             time_fields=("published",),
                         )
                     else:
-                        raw_embedding = query.get("query_embedding")
-                        if isinstance(raw_embedding, np.ndarray):
-                            query_embedding = raw_embedding.astype(np.float32).tolist()
-                        else:
-                            query_embedding = [float(x) for x in (raw_embedding or [])]
+                        query_embedding = _query_embedding_list(query)
                         rows, msg = match_papers_by_embedding(
                             url=str(backend.get("url") or ""),
                             api_key=str(backend.get("anon_key") or ""),
@@ -4,7 +4,6 @@
 from __future__ import annotations
 
 import argparse
-import fcntl
 import hashlib
 import html
 import importlib.util
@@ -14,11 +13,14 @@ import sys
 from pathlib import Path
 from typing import Any, Dict, Iterable, List, Tuple
 
+try:
+    from sidebar_store import SidebarStore, parse_conference_block, render_conference_block
+except Exception:  # pragma: no cover
+    from src.sidebar_store import SidebarStore, parse_conference_block, render_conference_block
 
 ROOT_DIR = Path(__file__).resolve().parent.parent
 DEFAULT_SIDEBAR_PATH = ROOT_DIR / "docs" / "_sidebar.md"
 DEFAULT_DOCS_DIR = ROOT_DIR / "docs"
-CONFERENCE_HEADING = "* Conference Papers\n"
 CONFERENCE_DISPLAY_MIN_SCORE = 4.0
 CONFERENCE_DEEP_MIN_SCORE = 4.0
 CONFERENCE_DOC_FILENAME_MAX_BYTES = 255
@@ -415,6 +417,19 @@ def ensure_conference_media(
         return [], []
 
 
+def lookup_cached_papers(paper_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """结果文件 papers 中缺失的论文，从本地论文缓存（DPR_PAPER_CACHE_PATH）按 id 补全。"""
+    try:
+        try:
+            from paper_cache import lookup_cached_papers as _lookup
+        except Exception:
+            from src.paper_cache import lookup_cached_papers as _lookup
+        return _lookup(paper_ids)
+    except Exception as exc:
+        print(f"[WARN] 本地论文缓存查询失败：{exc}", flush=True)
+        return {}
+
+
 def is_generated_deep_summary(text: str) -> bool:
     summary = norm_text(text)
     if not summary:
@@ -698,6 +713,9 @@ def build_conference_block(
         if isinstance(item, dict) and norm_text(item.get("id"))
     }
     ranked = collect_ranked_ids(data, limit, min_score=display_min_score)
+    missing_ids = [norm_text(item.get("paper_id")) for item in ranked if norm_text(item.get("paper_id")) not in papers]
+    if missing_ids:
+        papers.update(lookup_cached_papers(missing_ids))
     route_by_id = write_conference_docs(
         docs_dir,
         papers,
@@ -728,72 +746,6 @@ def build_conference_block(
     return lines
 
 
-def find_conference_heading(lines: List[str]) -> int:
-    for idx, line in enumerate(lines):
-        if line.strip() == "* Conference Papers":
-            return idx
-    return -1
-
-
-def remove_existing_conference_block(lines: List[str], marker: str) -> None:
-    heading_idx = find_conference_heading(lines)
-    if heading_idx < 0:
-        return
-    block_idx = -1
-    for idx in range(heading_idx + 1, len(lines)):
-        if lines[idx].startswith("* "):
-            break
-        if marker in lines[idx]:
-            block_idx = idx
-            break
-    if block_idx < 0:
-        return
-    end = block_idx + 1
-    while end < len(lines):
-        if lines[end].startswith("  * ") and not lines[end].startswith("    * "):
-            break
-        if lines[end].startswith("* "):
-            break
-        end += 1
-    del lines[block_idx:end]
-
-
-def find_conference_block(lines: List[str], marker: str) -> Tuple[int, int]:
-    heading_idx = find_conference_heading(lines)
-    if heading_idx < 0:
-        return -1, -1
-    block_idx = -1
-    for idx in range(heading_idx + 1, len(lines)):
-        if lines[idx].startswith("* "):
-            break
-        if marker in lines[idx]:
-            block_idx = idx
-            break
-    if block_idx < 0:
-        return -1, -1
-    end = block_idx + 1
-    while end < len(lines):
-        if lines[end].startswith("  * ") and not lines[end].startswith("    * "):
-            break
-        if lines[end].startswith("* "):
-            break
-        end += 1
-    return block_idx, end
-
-
-def extract_conference_paper_lines(lines: List[str], marker: str) -> List[str]:
-    block_idx, block_end = find_conference_block(lines, marker)
-    if block_idx < 0:
-        return []
-
-    paper_lines: List[str] = []
-    for line in lines[block_idx + 1:block_end]:
-        if "dpr-sidebar-item-link" not in line:
-            continue
-        paper_lines.append(line)
-    return paper_lines
-
-
 def sidebar_line_keys(line: str) -> List[str]:
     href_re = re.compile(r'href="([^"]+)"')
     link_re = re.compile(r'&quot;link&quot;:\s*&quot;([^&]+)&quot;')
@@ -896,72 +848,6 @@ def merge_conference_paper_lines(
     return merged
 
 
-def ensure_conference_heading(lines: List[str]) -> int:
-    heading_idx = find_conference_heading(lines)
-    if heading_idx >= 0:
-        return heading_idx
-
-    daily_idx = -1
-    for idx, line in enumerate(lines):
-        if line.strip() == "* Daily Papers":
-            daily_idx = idx
-            break
-    insert_idx = daily_idx if daily_idx >= 0 else len(lines)
-    if insert_idx > 0 and lines[insert_idx - 1].strip():
-        lines.insert(insert_idx, "\n")
-        insert_idx += 1
-    lines.insert(insert_idx, CONFERENCE_HEADING)
-    return insert_idx
-
-
-def _conference_block_sort_key(block: List[str]) -> Tuple[str, int, int, int, str]:
-    header = block[0] if block else ""
-    marker_match = re.search(r"<!--dpr-conference:([^>]+)-->", header)
-    marker = marker_match.group(1) if marker_match else ""
-    label = re.sub(r"<!--.*?-->", "", header)
-    label = re.sub(r"^\s*\*\s*", "", label).strip()
-    conf = marker.split("-")[0] if marker else label.split()[0] if label else ""
-    years = [int(item) for item in re.findall(r"(?:19|20)\d{2}", marker or label)]
-    latest_year = max(years) if years else 0
-    earliest_year = min(years) if years else 0
-    is_range = 1 if len(set(years)) > 1 else 0
-    return (conf.upper(), -latest_year, is_range, -earliest_year, marker or label)
-
-
-def sort_conference_blocks(lines: List[str]) -> None:
-    heading_idx = find_conference_heading(lines)
-    if heading_idx < 0:
-        return
-
-    block_start = heading_idx + 1
-    block_end = block_start
-    while block_end < len(lines) and not lines[block_end].startswith("* "):
-        block_end += 1
-
-    prefix: List[str] = []
-    conference_lines = lines[block_start:block_end]
-    blocks: List[List[str]] = []
-    current: List[str] = []
-    for line in conference_lines:
-        if line.startswith("  * ") and not line.startswith("    * "):
-            if current:
-                blocks.append(current)
-            current = [line]
-        elif current:
-            current.append(line)
-        else:
-            prefix.append(line)
-    if current:
-        blocks.append(current)
-    if not blocks:
-        return
-
-    sorted_lines: List[str] = []
-    for block in sorted(blocks, key=_conference_block_sort_key):
-        sorted_lines.extend(block)
-    lines[block_start:block_end] = prefix + sorted_lines
-
-
 def update_sidebar_with_conference(
     sidebar_path: Path,
     result_path: Path,
@@ -972,7 +858,7 @@ def update_sidebar_with_conference(
 ) -> None:
     sidebar_path.parent.mkdir(parents=True, exist_ok=True)
     conference, years = parse_conference_result_name(result_path)
-    marker = build_conference_marker(conference, years)
+    key = build_conference_key(conference, years)
 
     block = build_conference_block(
         result_path,
@@ -982,20 +868,18 @@ def update_sidebar_with_conference(
         display_min_score=display_min_score,
     )
 
-    lock_path = sidebar_path.parent / ".sidebar.lock"
-    with open(lock_path, "w") as lock_fd:
-        fcntl.flock(lock_fd, fcntl.LOCK_EX)
-        try:
-            lines = sidebar_path.read_text(encoding="utf-8").splitlines(keepends=True) if sidebar_path.exists() else []
-            existing_paper_lines = extract_conference_paper_lines(lines, marker)
-            remove_existing_conference_block(lines, marker)
-            heading_idx = ensure_conference_heading(lines)
-            block = merge_conference_paper_lines(block, existing_paper_lines, conference, years)
-            lines[heading_idx + 1:heading_idx + 1] = block
-            sort_conference_blocks(lines)
-            sidebar_path.write_text("".join(lines), encoding="utf-8")
-        finally:
-            fcntl.flock(lock_fd, fcntl.LOCK_UN)
+    # 每个会议一个分片（docs/_sidebar/conference/<key>.json）；不同会议的工作流互不阻塞
+    store = SidebarStore(str(sidebar_path))
+    store.ensure_migrated()
+    existing = store.load("conference", key)
+    existing_paper_lines = [
+        line for line in (render_conference_block(existing) if existing else []) if "dpr-sidebar-item-link" in line
+    ]
+    block = merge_conference_paper_lines(block, existing_paper_lines, conference, years)
+    fragment = parse_conference_block(block) if block else None
+    if fragment:
+        store.save("conference", key, fragment)
+    store.assemble()
 
 
 def choose_result_file(paths: Iterable[Path]) -> Path:
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# CPU 密集任务的共享进程池（PDF 文本抽取 / 图片解码与 WEBP 编码）
+
+"""
+Step 6 用 ThreadPoolExecutor 并发处理论文，这对 LLM / HTTP 这类 I/O 等待足够；
+但 PyMuPDF 逐页抽文本、图片解码与 WEBP(method=6) 编码是纯 CPU 工作，在线程里会被
+GIL 串行化，拖慢同批其它论文。这里把这类任务交给按核数开的进程池：
+
+- run_cpu(task, fn, *args)：在 I/O 线程里提交并等待结果；fn 必须是可 pickle 的模块级函数
+- 进程池用 spawn 启动（父进程已有多线程，fork 不安全），进程内懒加载、退出时关闭
+- DPR_CPU_WORKERS 控制进程数（默认 CPU 核数；0 表示在调用线程内直接执行）
+- 进程池不可用（无法 pickle / 子进程崩溃）时退回当前线程执行，并记录回退次数
+- 指标：cpu_task_seconds（子进程内实际执行时长）、cpu_queue_wait_seconds（排队 + 传输）
+"""
+
+from __future__ import annotations
+
+import atexit
+import multiprocessing
+import os
+import pickle
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Tuple
+
+try:
+    from metrics import REGISTRY as METRICS
+except Exception:  # pragma: no cover - 兼容 package 导入路径
+    from src.metrics import REGISTRY as METRICS
+
+
+CPU_TASK_METRIC = "cpu_task_seconds"
+CPU_WAIT_METRIC = "cpu_queue_wait_seconds"
+
+_pool_lock = threading.Lock()
+_pool: ProcessPoolExecutor | None = None
+_pool_workers = 0
+
+
+def resolve_cpu_workers() -> int:
+    raw = os.getenv("DPR_CPU_WORKERS")
+    if raw is None or not str(raw).strip():
+        return max(os.cpu_count() or 1, 1)
+    try:
+        return max(int(raw), 0)
+    except Exception:
+        return max(os.cpu_count() or 1, 1)
+
+
+def _timed_call(fn: Callable[..., Any], args: Tuple[Any, ...], kwargs: dict) -> Tuple[Any, float]:
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def get_cpu_pool() -> ProcessPoolExecutor | None:
+    """返回进程内共享的进程池；DPR_CPU_WORKERS=0 时返回 None（调用方内联执行）。"""
+    global _pool, _pool_workers
+    workers = resolve_cpu_workers()
+    if workers <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _pool_workers = workers
+        return _pool
+
+
+def reset_cpu_pool() -> None:
+    """关闭并丢弃共享进程池（测试或进程退出时使用）。"""
+    global _pool, _pool_workers
+    with _pool_lock:
+        pool, _pool, _pool_workers = _pool, None, 0
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+atexit.register(reset_cpu_pool)
+
+
+def run_cpu(task: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """
+    在共享进程池里执行 fn(*args, **kwargs) 并阻塞等待结果。
+    fn 自身抛出的异常原样向上抛；只有进程池层面的故障才退回内联执行。
+    """
+    pool = get_cpu_pool()
+    submitted = time.perf_counter()
+    if pool is not None:
+        try:
+            result, elapsed = pool.submit(_timed_call, fn, args, kwargs).result()
+        except (BrokenProcessPool, pickle.PicklingError, AttributeError, TypeError) as exc:
+            if not isinstance(exc, (BrokenProcessPool, pickle.PicklingError)) and "pickle" not in str(exc):
+                raise
+            print(f"[WARN] CPU 进程池不可用，退回线程内执行（{task}）：{exc}", flush=True)
+            METRICS.inc("cpu_pool_fallbacks", task=task)
+            if isinstance(exc, BrokenProcessPool):
+                reset_cpu_pool()
+        else:
+            METRICS.observe(CPU_TASK_METRIC, elapsed, task=task)
+            METRICS.observe(CPU_WAIT_METRIC, max(time.perf_counter() - submitted - elapsed, 0.0), task=task)
+            return result
+
+    result, elapsed = _timed_call(fn, args, kwargs)
+    METRICS.observe(CPU_TASK_METRIC, elapsed, task=task)
+    return result
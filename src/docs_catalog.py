@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# docs 目录的日期目录索引：记录每天的论文文件与日报 README 是否存在，按目录修改时间增量校验
+
+"""
+Step 6 启动时的历史日报补齐（backfill_history_day_reports）与日报列表（list_day_report_links）
+原先每次都对 docs/YYYYMM/DD 逐个 listdir / exists，归档越久启动越慢。这里维护一份
+持久化的目录索引 docs/_catalog.json（随 docs 一起提交，跨 workflow 运行复用）：
+
+- days[key]：{"path", "papers": [论文 md 文件名], "readme": bool}
+  key 为单日 YYYYMMDD 或区间 YYYYMMDD-YYYYMMDD
+- 写入方（Step 6 生成论文 / 日报、历史补齐）写完某天后调用 refresh_day 只重扫这一天
+- 打开时 sync 只列 docs/ 与各月份目录（每月一次 listdir），发现索引里没有的日期才扫描该日期目录，
+  已删除的日期从索引移除；已知日期只 stat 日期目录，目录 mtime 不早于索引文件的保存时间
+  （期间有文件增删，如手工修改、rebase 并行运行的结果）时才重扫
+- 不在索引里逐日记录 mtime：git checkout 会重置 mtime，记录了反而每次运行都改写整份索引；
+  以索引文件自身的 mtime 为基准，checkout 后最多多扫一次，内容不变时索引文件字节不变
+- 索引与磁盘不一致时可用 rebuild 全量重建（Step 6 的 --rebuild-catalog）
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import tempfile
+from typing import Any, Dict, List, Optional, Set
+
+CATALOG_VERSION = 2
+CATALOG_FILENAME = "_catalog.json"
+_MONTH_RE = re.compile(r"\d{6}")
+_DAY_RE = re.compile(r"\d{2}")
+_RANGE_RE = re.compile(r"\d{8}-\d{8}")
+
+
+def day_key_path(key: str) -> str:
+    """日期 key → 相对 docs 的目录（YYYYMMDD → YYYYMM/DD；区间 key 原样）。"""
+    token = str(key or "").strip()
+    if re.fullmatch(r"\d{8}", token):
+        return f"{token[:6]}/{token[6:]}"
+    return token
+
+
+def is_paper_markdown(name: str) -> bool:
+    return name.lower().endswith(".md") and name.upper() != "README.MD" and not name.startswith("_")
+
+
+class DocsCatalog:
+    def __init__(self, docs_dir: str, path: Optional[str] = None) -> None:
+        self.docs_dir = docs_dir
+        self.path = path or os.path.join(docs_dir, CATALOG_FILENAME)
+        self._dirty = False
+        self.days: Dict[str, Dict[str, Any]] = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception:
+            return {}
+        if not isinstance(data, dict) or data.get("version") != CATALOG_VERSION or not isinstance(data.get("days"), dict):
+            return {}
+        return {str(k): v for k, v in data["days"].items() if isinstance(v, dict)}
+
+    @classmethod
+    def open(cls, docs_dir: str, *, rebuild: bool = False) -> "DocsCatalog":
+        catalog = cls(docs_dir)
+        if rebuild or not catalog.days:
+            catalog.rebuild()
+        else:
+            catalog.sync()
+        return catalog
+
+    # ---- 扫描 ----
+    def _listdir(self, path: str) -> List[str]:
+        try:
+            return os.listdir(path)
+        except OSError:
+            return []
+
+    def _discover_keys(self) -> Set[str]:
+        keys: Set[str] = set()
+        for name in self._listdir(self.docs_dir):
+            if _RANGE_RE.fullmatch(name):
+                if os.path.isdir(os.path.join(self.docs_dir, name)):
+                    keys.add(name)
+            elif _MONTH_RE.fullmatch(name):
+                for day in self._listdir(os.path.join(self.docs_dir, name)):
+                    if _DAY_RE.fullmatch(day):
+                        keys.add(f"{name}{day}")
+        return keys
+
+    def refresh_day(self, key: str) -> Optional[Dict[str, Any]]:
+        """重新扫描某一天的目录并更新索引；目录不存在时移除该日期。"""
+        day_dir = os.path.join(self.docs_dir, day_key_path(key))
+        papers: List[str] = []
+        readme = False
+        try:
+            with os.scandir(day_dir) as it:
+                for entry in it:
+                    if not entry.is_file():
+                        continue
+                    if entry.name.upper() == "README.MD":
+                        readme = True
+                    elif is_paper_markdown(entry.name):
+                        papers.append(entry.name)
+        except OSError:
+            if self.days.pop(key, None) is not None:
+                self._dirty = True
+            return None
+        entry_data = {"path": day_key_path(key), "papers": sorted(papers), "readme": readme}
+        if self.days.get(key) != entry_data:
+            self.days[key] = entry_data
+            self._dirty = True
+        return entry_data
+
+    def _saved_at(self) -> Optional[int]:
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def sync(self) -> int:
+        """
+        对齐磁盘上新增 / 删除的日期目录，并重扫索引保存后有改动的已知日期，返回重扫 / 移除的日期数。
+        """
+        saved_at = self._saved_at()
+        on_disk = self._discover_keys()
+        known = set(self.days)
+        stale: List[str] = []
+        for key in sorted(on_disk & known):
+            try:
+                modified = os.stat(os.path.join(self.docs_dir, day_key_path(key))).st_mtime_ns
+            except OSError:
+                continue
+            if saved_at is None or modified >= saved_at:
+                stale.append(key)
+        for key in sorted(on_disk - known) + stale:
+            self.refresh_day(key)
+        if stale:
+            # 重写索引文件以推进基准时间，避免内容未变的日期下次再被重扫
+            self._dirty = True
+        for key in known - on_disk:
+            del self.days[key]
+            self._dirty = True
+        return len(on_disk ^ known) + len(stale)
+
+    def rebuild(self) -> int:
+        """全量重建：逐个扫描全部日期目录，返回日期数。"""
+        self.days = {}
+        self._dirty = True
+        for key in sorted(self._discover_keys()):
+            self.refresh_day(key)
+        return len(self.days)
+
+    # ---- 查询 / 更新 ----
+    def day_keys(self, *, newest_first: bool = True) -> List[str]:
+        return sorted(self.days, reverse=newest_first)
+
+    def save(self) -> bool:
+        if not self._dirty:
+            return False
+        payload = json.dumps({"version": CATALOG_VERSION, "days": self.days}, ensure_ascii=False, indent=1, sort_keys=True)
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".catalog.", suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(payload + "\n")
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+        return True
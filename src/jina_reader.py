@@ -0,0 +1,340 @@
+#!/usr/bin/env python
+# Jina Reader（r.jina.ai）共享客户端：连接复用 + 并发 / 速率限制 + 失败短期缓存 + 磁盘 Markdown 缓存
+
+"""
+日报 Step 6 与会议精读都通过 ensure_text_content 用 Jina 把 PDF 转成 Markdown。
+原先每次都是裸 requests.get + 固定退避，--docs-concurrency 调高后会同时打满 r.jina.ai，
+被 429 后又全部回退到 PDF 下载。这里统一成一个进程内共享的客户端：
+
+- 复用 keep-alive Session，连接池大小与并发上限一致
+- 全局并发上限（信号量）+ 请求速率上限（按每分钟请求数均匀放行）；429 时按 Retry-After
+  或指数退避整体推迟后续请求，而不是各线程各自重试
+- 成功结果按规范化 PDF URL 存到磁盘（md/<sha1>.md），跨 workflow 运行复用
+- 近期失败的 URL 记入负缓存（negative/<sha1>.json），TTL 内直接返回 None 走 PDF 兜底
+- 同一 URL 并发请求只发一次
+
+环境变量：
+- DPR_JINA_CACHE_DIR：缓存目录（默认 ~/.cache/dpr/jina；设为 off 关闭磁盘缓存）
+- DPR_JINA_CACHE_TTL_DAYS：Markdown 缓存有效期，默认 30
+- DPR_JINA_NEGATIVE_TTL_MINUTES：失败 URL 的冷却时间，默认 60
+- DPR_JINA_CONCURRENCY：同时在途请求数，默认 4
+- DPR_JINA_RPM：每分钟请求数上限，默认 20（配置 JINA_API_KEY 时默认 200）
+- DPR_JINA_TIMEOUT：单次请求超时秒数，默认 60
+- JINA_API_KEY：可选，作为 Bearer token 发送
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    from metrics import REGISTRY as METRICS
+    from pdf_cache import KeyedLocks, normalize_pdf_url
+    from supabase_http import backoff_delay
+except Exception:  # pragma: no cover - 兼容 package 导入路径
+    from src.metrics import REGISTRY as METRICS
+    from src.pdf_cache import KeyedLocks, normalize_pdf_url
+    from src.supabase_http import backoff_delay
+
+
+DEFAULT_BASE_URL = "https://r.jina.ai/"
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "dpr", "jina")
+DEFAULT_CACHE_TTL_DAYS = 30
+DEFAULT_NEGATIVE_TTL_MINUTES = 60
+DEFAULT_CONCURRENCY = 4
+DEFAULT_RPM = 20
+DEFAULT_RPM_WITH_KEY = 200
+DEFAULT_TIMEOUT = 60
+DEFAULT_RETRY_WAIT_SECONDS = 2.0
+JINA_REQUEST_METRIC = "jina_request_seconds"
+
+
+def _env_int(name: str, default: int) -> int:
+    raw = os.getenv(name)
+    if not raw:
+        return default
+    try:
+        return max(int(raw), 0)
+    except Exception:
+        return default
+
+
+def _log(message: str) -> None:
+    print(f"[JINA] {message}", flush=True)
+
+
+class RateLimiter:
+    """按每分钟请求数均匀放行；penalize 会把下一次放行时间整体推后（用于 429）。"""
+
+    def __init__(self, per_minute: int) -> None:
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_at = 0.0
+
+    def acquire(self) -> float:
+        """阻塞到允许发出下一次请求，返回等待秒数。"""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next_at, now)
+            self._next_at = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+        return max(delay, 0.0)
+
+    def penalize(self, seconds: float) -> None:
+        with self._lock:
+            self._next_at = max(self._next_at, time.monotonic() + max(float(seconds), 0.0))
+
+
+class JinaReader:
+    def __init__(
+        self,
+        *,
+        cache_dir: str | None = None,
+        base_url: str = DEFAULT_BASE_URL,
+        api_key: str = "",
+        concurrency: int = DEFAULT_CONCURRENCY,
+        per_minute: int = DEFAULT_RPM,
+        timeout: int = DEFAULT_TIMEOUT,
+        cache_ttl_seconds: float = DEFAULT_CACHE_TTL_DAYS * 86400,
+        negative_ttl_seconds: float = DEFAULT_NEGATIVE_TTL_MINUTES * 60,
+        retry_wait_seconds: float = DEFAULT_RETRY_WAIT_SECONDS,
+        session: requests.Session | None = None,
+    ) -> None:
+        self.base_url = base_url
+        self.api_key = str(api_key or "").strip()
+        self.timeout = max(int(timeout or 1), 1)
+        self.cache_ttl_seconds = max(float(cache_ttl_seconds), 0.0)
+        self.negative_ttl_seconds = max(float(negative_ttl_seconds), 0.0)
+        self.retry_wait_seconds = max(float(retry_wait_seconds), 0.0)
+        self.limiter = RateLimiter(per_minute)
+        pool_size = max(int(concurrency or 1), 1)
+        self._slots = threading.BoundedSemaphore(pool_size)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update({"Connection": "keep-alive"})
+        self.session = session
+        self.cache_dir = cache_dir
+        self._negative: Dict[str, float] = {}
+        self._key_locks = KeyedLocks()
+        if cache_dir:
+            for sub in ("md", "negative"):
+                os.makedirs(os.path.join(cache_dir, sub), exist_ok=True)
+            self.prune()
+
+    # ---- 磁盘缓存 ----
+    def _key(self, pdf_url: str) -> str:
+        return hashlib.sha1(normalize_pdf_url(pdf_url).encode("utf-8")).hexdigest()
+
+    def _md_path(self, key: str) -> str:
+        return os.path.join(str(self.cache_dir), "md", f"{key}.md")
+
+    def _negative_path(self, key: str) -> str:
+        return os.path.join(str(self.cache_dir), "negative", f"{key}.json")
+
+    def _write_atomic(self, path: str, text: str) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+    def cached_markdown(self, pdf_url: str) -> Optional[str]:
+        if not self.cache_dir:
+            return None
+        path = self._md_path(self._key(pdf_url))
+        try:
+            if time.time() - os.path.getmtime(path) > self.cache_ttl_seconds:
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+        except OSError:
+            return None
+        return text or None
+
+    def _store_markdown(self, key: str, text: str) -> None:
+        if self.cache_dir:
+            try:
+                self._write_atomic(self._md_path(key), text)
+            except OSError as exc:
+                _log(f"[WARN] Markdown 缓存写入失败：{exc}")
+
+    def recently_failed(self, pdf_url: str) -> bool:
+        key = self._key(pdf_url)
+        failed_at = self._negative.get(key)
+        if failed_at is None and self.cache_dir:
+            try:
+                with open(self._negative_path(key), "r", encoding="utf-8") as f:
+                    failed_at = float((json.load(f) or {}).get("failed_at") or 0)
+            except Exception:
+                failed_at = None
+        return failed_at is not None and time.time() - failed_at < self.negative_ttl_seconds
+
+    def _mark_failed(self, key: str, pdf_url: str, reason: str) -> None:
+        now = time.time()
+        self._negative[key] = now
+        if self.cache_dir and self.negative_ttl_seconds > 0:
+            try:
+                payload = {"url": normalize_pdf_url(pdf_url), "failed_at": now, "reason": reason[:200]}
+                self._write_atomic(self._negative_path(key), json.dumps(payload, ensure_ascii=False))
+            except OSError:
+                pass
+
+    def _clear_failed(self, key: str) -> None:
+        self._negative.pop(key, None)
+        if self.cache_dir:
+            try:
+                os.remove(self._negative_path(key))
+            except OSError:
+                pass
+
+    def prune(self) -> int:
+        """删除过期的 Markdown 与负缓存文件，返回删除个数。"""
+        if not self.cache_dir:
+            return 0
+        removed = 0
+        now = time.time()
+        for sub, ttl in (("md", self.cache_ttl_seconds), ("negative", self.negative_ttl_seconds)):
+            directory = os.path.join(self.cache_dir, sub)
+            for name in os.listdir(directory):
+                path = os.path.join(directory, name)
+                try:
+                    if now - os.path.getmtime(path) > ttl:
+                        os.remove(path)
+                        removed += 1
+                except OSError:
+                    continue
+        return removed
+
+    # ---- 请求 ----
+    def _headers(self) -> Dict[str, str]:
+        headers = {"Accept": "text/plain"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        return headers
+
+    @staticmethod
+    def _retry_after(resp: Any) -> float | None:
+        raw = (getattr(resp, "headers", None) or {}).get("Retry-After")
+        try:
+            return max(float(raw), 0.0) if raw is not None else None
+        except (TypeError, ValueError):
+            return None
+
+    def fetch(self, pdf_url: str, *, max_retries: int = 3) -> Optional[str]:
+        """
+        返回 PDF 的 Markdown 文本；失败返回 None（调用方回退 PyMuPDF）。
+        429 / 5xx / 网络异常按指数退避重试；其它 4xx 视为该 URL 无法转换，直接记入负缓存。
+        """
+        url = str(pdf_url or "").strip()
+        if not url:
+            return None
+        key = self._key(url)
+        with self._key_locks.hold(key):
+            cached = self.cached_markdown(url)
+            if cached is not None:
+                METRICS.inc("jina_requests", outcome="cache_hit")
+                return cached
+            if self.recently_failed(url):
+                METRICS.inc("jina_requests", outcome="negative_hit")
+                _log(f"近期请求失败，冷却期内跳过：{url}")
+                return None
+
+            reason = ""
+            attempts = max(int(max_retries or 1), 1)
+            for attempt in range(1, attempts + 1):
+                wait = backoff_delay(attempt, self.retry_wait_seconds)
+                with self._slots:
+                    self.limiter.acquire()
+                    started = time.perf_counter()
+                    try:
+                        _log(f"第 {attempt} 次请求：{self.base_url}{url}")
+                        resp = self.session.get(self.base_url + url, headers=self._headers(), timeout=self.timeout)
+                    except Exception as exc:
+                        resp = None
+                        reason = str(exc)
+                    METRICS.observe(JINA_REQUEST_METRIC, time.perf_counter() - started)
+                if resp is None:
+                    METRICS.inc("jina_requests", outcome="error")
+                    _log(f"[WARN] 请求失败（第 {attempt} 次）：{reason}")
+                else:
+                    status = int(resp.status_code or 0)
+                    METRICS.inc("jina_requests", outcome=str(status))
+                    text = (resp.text or "").strip() if status == 200 else ""
+                    if text:
+                        self._store_markdown(key, text)
+                        self._clear_failed(key)
+                        _log("获取到结构化 Markdown 文本，将直接用作 .txt 内容。")
+                        return text
+                    reason = f"status={status}" if status != 200 else "empty body"
+                    _log(f"[WARN] 状态码 {status}，响应前 100 字符：{(resp.text or '')[:100]}")
+                    if status == 429:
+                        # 限流是全局的：推迟所有线程的下一次请求
+                        self.limiter.penalize(self._retry_after(resp) or wait)
+                        wait = 0.0
+                    elif 400 <= status < 500:
+                        break
+                if attempt < attempts and wait > 0:
+                    time.sleep(wait)
+
+            self._mark_failed(key, url, reason)
+            _log("[ERROR] 多次请求失败，将回退到 PyMuPDF 抽取。")
+            return None
+
+
+_reader_lock = threading.Lock()
+_reader: JinaReader | None = None
+
+
+def get_jina_reader() -> JinaReader:
+    """进程内共享的 Jina 客户端（首次调用时按环境变量构建）。"""
+    global _reader
+    with _reader_lock:
+        if _reader is None:
+            raw_dir = str(os.getenv("DPR_JINA_CACHE_DIR") or "").strip()
+            cache_dir: str | None = os.path.expanduser(raw_dir) if raw_dir else DEFAULT_CACHE_DIR
+            if raw_dir.lower() in ("0", "off", "false", "none"):
+                cache_dir = None
+            api_key = str(os.getenv("JINA_API_KEY") or "").strip()
+            kwargs: Dict[str, Any] = dict(
+                api_key=api_key,
+                concurrency=_env_int("DPR_JINA_CONCURRENCY", DEFAULT_CONCURRENCY) or DEFAULT_CONCURRENCY,
+                per_minute=_env_int("DPR_JINA_RPM", DEFAULT_RPM_WITH_KEY if api_key else DEFAULT_RPM),
+                timeout=_env_int("DPR_JINA_TIMEOUT", DEFAULT_TIMEOUT) or DEFAULT_TIMEOUT,
+                cache_ttl_seconds=_env_int("DPR_JINA_CACHE_TTL_DAYS", DEFAULT_CACHE_TTL_DAYS) * 86400,
+                negative_ttl_seconds=_env_int("DPR_JINA_NEGATIVE_TTL_MINUTES", DEFAULT_NEGATIVE_TTL_MINUTES) * 60,
+            )
+            try:
+                _reader = JinaReader(cache_dir=cache_dir, **kwargs)
+            except OSError as exc:
+                print(f"[WARN] Jina 缓存目录不可用（{cache_dir}），不使用磁盘缓存：{exc}", flush=True)
+                _reader = JinaReader(cache_dir=None, **kwargs)
+        return _reader
+
+
+def reset_jina_reader() -> None:
+    """关闭并丢弃共享客户端（测试或环境变量变化后使用）。"""
+    global _reader
+    with _reader_lock:
+        reader, _reader = _reader, None
+    if reader is not None:
+        try:
+            reader.session.close()
+        except Exception:
+            pass
+
+
+def fetch_markdown(pdf_url: str, *, max_retries: int = 3) -> Optional[str]:
+    return get_jina_reader().fetch(pdf_url, max_retries=max_retries)
@@ -1,11 +1,17 @@
 import json
 import os
 import re
+import threading
 import time
-from typing import List, Dict, Tuple, Any, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import requests
 
+try:
+    from metrics import REGISTRY as METRICS
+except Exception:  # pragma: no cover
+    from src.metrics import REGISTRY as METRICS
+
 """
 统一的 LLM 客户端封装。
 
@@ -13,7 +19,6 @@ import requests
 当前运行链路仅支持 DeepSeek；本地 reranker 不走 LLM API。
 """
 
-# 单次实验级别的全局 token 统计（需由调用方在实验开始前手动 reset）
 DEFAULT_MAX_OUTPUT_TOKENS = 393216
 
 
@@ -27,48 +32,151 @@ def resolve_max_output_tokens(default: int = DEFAULT_MAX_OUTPUT_TOKENS) -> int:
         return default
 
 
-GLOBAL_TOKENS = {
-    'prompt': 0,    # 提示词（prompt）部分 token
-    'thinking': 0,  # 推理/思维链部分 token（reasoning_tokens）
-    'content': 0,   # 可见输出部分 token（completion_tokens - reasoning_tokens）
-    'total': 0,     # provider 返回的总 token（通常含 prompt + completion）
+def resolve_stream_enabled(default: bool = False) -> bool:
+    raw = (os.getenv("DPR_LLM_STREAM") or os.getenv("LLM_STREAM") or "").strip().lower()
+    if raw in ("1", "true", "yes", "on"):
+        return True
+    if raw in ("0", "false", "no", "off"):
+        return False
+    return default
+
+
+class StreamingJsonItemParser:
+    """
+    增量解析流式返回的 JSON，按到达顺序吐出已完整的条目。
+
+    - array_key 非空：跟踪顶层对象中该 key 对应的数组（或顶层数组），每个元素闭合即产出
+    - array_key 为空且顶层为对象：每个成员（逗号分隔）闭合即产出 {key: value}
+    截断时 items 中只包含已完整的条目，调用方只需重试剩余部分。
+    """
+
+    def __init__(
+        self,
+        array_key: str | None = None,
+        on_item: Optional[Callable[[Any], None]] = None,
+    ):
+        self.array_key = array_key
+        self.on_item = on_item
+        self.items: List[Any] = []
+        self._buffer = ""
+        self._pos = 0
+        self._stack: List[str] = []
+        self._in_str = False
+        self._escaped = False
+        self._str_start = -1
+        self._last_key = ""
+        self._target_depth = 0
+        self._member_mode = False
+        self._seg_start = -1
+
+    def feed(self, text: str) -> None:
+        if not text:
+            return
+        self._buffer += text
+        buf = self._buffer
+        while self._pos < len(buf):
+            idx = self._pos
+            ch = buf[idx]
+            self._pos += 1
+            if self._in_str:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_str = False
+                    if len(self._stack) == 1 and self._stack[0] == "{":
+                        self._last_key = buf[self._str_start + 1:idx]
+                continue
+            if ch == '"':
+                self._in_str = True
+                self._str_start = idx
+            elif ch in "{[":
+                if not self._stack and not self._target_depth:
+                    if ch == "[" or self.array_key is None:
+                        self._open_target(ch, idx, depth=1)
+                elif (
+                    ch == "["
+                    and not self._target_depth
+                    and self.array_key is not None
+                    and len(self._stack) == 1
+                    and self._stack[0] == "{"
+                    and self._last_key == self.array_key
+                ):
+                    self._open_target(ch, idx, depth=2)
+                self._stack.append(ch)
+            elif ch in "}]":
+                if self._stack:
+                    if self._target_depth and len(self._stack) == self._target_depth:
+                        self._emit_segment(idx)
+                        self._target_depth = -1
+                    self._stack.pop()
+            elif ch == "," and self._target_depth > 0 and len(self._stack) == self._target_depth:
+                self._emit_segment(idx)
+                self._seg_start = idx + 1
+
+    def _open_target(self, ch: str, idx: int, depth: int) -> None:
+        self._target_depth = depth
+        self._member_mode = ch == "{"
+        self._seg_start = idx + 1
+
+    def _emit_segment(self, end: int) -> None:
+        segment = self._buffer[self._seg_start:end].strip()
+        if not segment:
+            return
+        try:
+            item = json.loads("{" + segment + "}" if self._member_mode else segment)
+        except Exception:
+            return
+        self.items.append(item)
+        if self.on_item is not None:
+            self.on_item(item)
+
+
+# 全局 token/耗时统计统一记入线程安全的 metrics 注册表（按 provider/model/stage 分桶）。
+# 以下函数保留旧接口：汇总所有分桶，需由调用方在实验开始前手动 reset。
+GLOBAL_TOKEN_METRICS = {
+    'prompt': 'llm_tokens_prompt',          # 提示词（prompt）部分 token
+    'thinking': 'llm_tokens_thinking',      # 推理/思维链部分 token（reasoning_tokens）
+    'content': 'llm_tokens_content',        # 可见输出部分 token（completion_tokens - reasoning_tokens）
+    'total': 'llm_tokens_total',            # provider 返回的总 token（通常含 prompt + completion）
+    'cache_hit': 'llm_tokens_cache_hit',    # prompt 中命中前缀缓存的 token（DeepSeek prompt_cache_hit_tokens）
+    'cache_miss': 'llm_tokens_cache_miss',  # prompt 中未命中缓存的 token（DeepSeek prompt_cache_miss_tokens）
 }
-# 单次实验级别的全局时间统计（秒）
-GLOBAL_TIME_SECONDS: float = 0.0
+LLM_LATENCY_METRIC = 'llm_latency_seconds'
 
 DEFAULT_DEEPSEEK_BASE_URL = "https://api.deepseek.com"
 
 
 def reset_global_tokens():
     """重置本次实验的全局 token 统计。"""
-    GLOBAL_TOKENS['prompt'] = 0
-    GLOBAL_TOKENS['thinking'] = 0
-    GLOBAL_TOKENS['content'] = 0
-    GLOBAL_TOKENS['total'] = 0
+    METRICS.reset(list(GLOBAL_TOKEN_METRICS.values()))
 
 
 def get_global_tokens() -> Dict[str, int]:
-    """获取本次实验的全局 token 统计（thinking/content/total）。"""
-    return dict(GLOBAL_TOKENS)
+    """获取本次实验的全局 token 统计（thinking/content/total/cache_hit/cache_miss）。"""
+    return {key: int(METRICS.counter_total(name)) for key, name in GLOBAL_TOKEN_METRICS.items()}
 
 
 def reset_global_time():
     """重置本次实验的大模型总耗时统计（秒）。"""
-    global GLOBAL_TIME_SECONDS
-    GLOBAL_TIME_SECONDS = 0.0
+    METRICS.reset([LLM_LATENCY_METRIC])
 
 
 def get_global_time() -> float:
     """获取本次实验的大模型总耗时（秒）。"""
-    return float(GLOBAL_TIME_SECONDS)
+    return float(METRICS.histogram_sum(LLM_LATENCY_METRIC))
 
 
 class LLMClient:
+    _tokens_lock = threading.Lock()
     tokens = {
         'prompt': 0,
         'content': 0,
         'reasoning': 0,
         'total': 0,
+        'cache_hit': 0,
+        'cache_miss': 0,
     }
 
     def __init__(self, api_key: str, model: str, base_url: str):
@@ -90,9 +198,13 @@ class LLMClient:
             'thinking': 0,
             'content': 0,
             'total': 0,
+            'cache_hit': 0,
+            'cache_miss': 0,
         }
         # 实例级别的累计耗时（秒）
         self._cum_time_seconds: float = 0.0
+        # Step 4/6 会在多个线程中共享同一个 client，实例累计统计需加锁
+        self._stats_lock = threading.Lock()
         self.kwargs: Dict[str, Any] = {
             'max_tokens': resolve_max_output_tokens(),
             'temperature': 0.6,
@@ -488,12 +600,105 @@ class LLMClient:
             return True
         return False
 
-    def chat(self, messages: List[Dict[str, str]], response_format: Optional[Dict[str, Any]] = None) -> dict:
+    @staticmethod
+    def _extract_prompt_cache_tokens(usage: Dict[str, Any], prompt_tokens: int) -> Tuple[int, int]:
+        """
+        解析 prompt 前缀缓存命中情况，返回 (hit, miss)。
+
+        DeepSeek 返回 prompt_cache_hit_tokens / prompt_cache_miss_tokens；
+        OpenAI 兼容端点返回 prompt_tokens_details.cached_tokens。
+        """
+        if not isinstance(usage, dict):
+            return 0, 0
+        hit = usage.get('prompt_cache_hit_tokens')
+        miss = usage.get('prompt_cache_miss_tokens')
+        if hit is None:
+            details = usage.get('prompt_tokens_details')
+            if isinstance(details, dict):
+                hit = details.get('cached_tokens')
+        try:
+            hit_int = int(hit or 0)
+        except (TypeError, ValueError):
+            hit_int = 0
+        try:
+            miss_int = int(miss) if miss is not None else max(0, int(prompt_tokens or 0) - hit_int)
+        except (TypeError, ValueError):
+            miss_int = 0
+        return hit_int, miss_int
+
+    def _read_stream_response(
+        self,
+        response: Any,
+        on_delta: Optional[Callable[[str], None]] = None,
+    ) -> Dict[str, Any]:
+        """
+        读取 SSE 流式响应，并拼装成与非流式相同结构的 response_data。
+        每收到一段 content 增量即回调 on_delta。
+        """
+        content_parts: List[str] = []
+        reasoning_parts: List[str] = []
+        finish_reason = None
+        usage: Dict[str, Any] = {}
+        for raw_line in response.iter_lines(decode_unicode=True):
+            if isinstance(raw_line, bytes):
+                raw_line = raw_line.decode("utf-8", errors="replace")
+            line = str(raw_line or "").strip()
+            if not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
+            try:
+                chunk = json.loads(data)
+            except ValueError:
+                continue
+            if isinstance(chunk, dict) and 'error' in chunk:
+                return chunk
+            if isinstance(chunk.get('usage'), dict):
+                usage = chunk['usage']
+            for choice in chunk.get('choices') or []:
+                if not isinstance(choice, dict):
+                    continue
+                delta = choice.get('delta') or {}
+                piece = self._extract_text_content(delta.get('content'))
+                if piece:
+                    content_parts.append(piece)
+                    if on_delta is not None:
+                        on_delta(piece)
+                reasoning_piece = self._extract_text_content(delta.get('reasoning_content'))
+                if reasoning_piece:
+                    reasoning_parts.append(reasoning_piece)
+                if choice.get('finish_reason'):
+                    finish_reason = choice.get('finish_reason')
+        return {
+            "choices": [
+                {
+                    "message": {
+                        "role": "assistant",
+                        "content": "".join(content_parts),
+                        "reasoning_content": "".join(reasoning_parts),
+                    },
+                    "finish_reason": finish_reason,
+                }
+            ],
+            "usage": usage,
+        }
+
+    def chat(
+        self,
+        messages: List[Dict[str, str]],
+        response_format: Optional[Dict[str, Any]] = None,
+        *,
+        stream: bool = False,
+        on_delta: Optional[Callable[[str], None]] = None,
+    ) -> dict:
         """
         统一 Chat Completions 请求。
 
         :param messages: OpenAI 格式的消息列表
         :param response_format: 可选，结构化输出配置（DeepSeek JSON mode）
+        :param stream: 是否使用 SSE 流式返回；返回结构与非流式一致
+        :param on_delta: 流式模式下每段 content 增量的回调
         """
         headers = {
             "Authorization": f"Bearer {self.api_key}",
@@ -525,6 +730,9 @@ class LLMClient:
                     payload[k] = v
         if response_format is not None:
             payload['response_format'] = response_format
+        if stream:
+            payload['stream'] = True
+            payload['stream_options'] = {'include_usage': True}
 
         # 对输出 token 上限做保护；DeepSeek V4 支持更长输出，默认按 384K 预留。
         try:
@@ -537,20 +745,32 @@ class LLMClient:
         start_time = time.time()
         request_bases = self._iter_retry_bases(total_attempts=6)
         last_error: Exception | None = None
+        delivered = {'count': 0}
+
+        def _forward_delta(piece: str) -> None:
+            delivered['count'] += 1
+            if on_delta is not None:
+                on_delta(piece)
+
         for attempt_idx, req_base in enumerate(request_bases, start=1):
             request_url = self._build_chat_completions_url(req_base)
             try:
-                response = requests.post(request_url, headers=headers, json=payload, timeout=120)
-                response.raise_for_status()
-                try:
-                    response_data = response.json()
-                except ValueError:
-                    print("API 响应无法解析为 JSON，原始文本预览:", response.text[:500])
-                    raise
+                if stream:
+                    response = requests.post(request_url, headers=headers, json=payload, timeout=120, stream=True)
+                    response.raise_for_status()
+                    response_data = self._read_stream_response(response, _forward_delta)
+                else:
+                    response = requests.post(request_url, headers=headers, json=payload, timeout=120)
+                    response.raise_for_status()
+                    try:
+                        response_data = response.json()
+                    except ValueError:
+                        print("API 响应无法解析为 JSON，原始文本预览:", response.text[:500])
+                        raise
 
                 debug_raw = os.getenv("LLM_DEBUG_RAW") == "1"
                 if debug_raw:
-                    print("[DEBUG] LLM 原始响应包:", response.text)
+                    print("[DEBUG] LLM 原始响应包:", json.dumps(response_data, ensure_ascii=False) if stream else response.text)
 
                 if isinstance(response_data, dict) and 'error' in response_data:
                     err = response_data.get('error') or {}
@@ -579,50 +799,59 @@ class LLMClient:
                 reasoning_tokens = 0
                 if 'completion_tokens_details' in usage:
                     reasoning_tokens = usage['completion_tokens_details'].get('reasoning_tokens', 0)
-
-                self.tokens['prompt'] += prompt_tokens
-                self.tokens['content'] += completion_tokens - reasoning_tokens
-                self.tokens['reasoning'] += reasoning_tokens
-                self.tokens['total'] += total_tokens
+                cache_hit_tokens, cache_miss_tokens = self._extract_prompt_cache_tokens(usage, prompt_tokens)
+
+                content_tokens = int(completion_tokens - reasoning_tokens)
+                elapsed = time.time() - start_time
+                provider = self._provider_name(req_base)
+                with LLMClient._tokens_lock:
+                    self.tokens['prompt'] += prompt_tokens
+                    self.tokens['content'] += content_tokens
+                    self.tokens['reasoning'] += reasoning_tokens
+                    self.tokens['total'] += total_tokens
+                    self.tokens['cache_hit'] += cache_hit_tokens
+                    self.tokens['cache_miss'] += cache_miss_tokens
 
                 try:
-                    GLOBAL_TOKENS['prompt'] += int(prompt_tokens)
-                    GLOBAL_TOKENS['thinking'] += int(reasoning_tokens)
-                    GLOBAL_TOKENS['content'] += int(completion_tokens - reasoning_tokens)
-                    GLOBAL_TOKENS['total'] += int(total_tokens)
+                    labels = {"provider": provider, "model": self.model}
+                    METRICS.inc("llm_calls", **labels)
+                    for key, value in (
+                        ('prompt', prompt_tokens),
+                        ('thinking', reasoning_tokens),
+                        ('content', content_tokens),
+                        ('total', total_tokens),
+                        ('cache_hit', cache_hit_tokens),
+                        ('cache_miss', cache_miss_tokens),
+                    ):
+                        METRICS.inc(GLOBAL_TOKEN_METRICS[key], int(value or 0), **labels)
+                    METRICS.observe(LLM_LATENCY_METRIC, elapsed, **labels)
                 except Exception:
                     pass
 
                 try:
-                    elapsed = time.time() - start_time
-                    self._cum_time_seconds += float(elapsed)
-                    try:
-                        global GLOBAL_TIME_SECONDS
-                        GLOBAL_TIME_SECONDS += float(elapsed)
-                    except Exception:
-                        pass
-
-                    self._call_index += 1
-                    self._cum_tokens['prompt'] += int(prompt_tokens)
-                    self._cum_tokens['thinking'] += int(reasoning_tokens)
-                    self._cum_tokens['content'] += int(completion_tokens - reasoning_tokens)
-                    self._cum_tokens['total'] += int(total_tokens)
-
-                    provider = self._provider_name(req_base)
-                    header = f"[{provider}][{self.model}] 第{self._call_index}次"
-                    line_cur = (
-                        f"本次 tokens：prompt={int(prompt_tokens)}, thinking={int(reasoning_tokens)}, "
-                        f"content={int(completion_tokens - reasoning_tokens)}, total={int(total_tokens)}"
-                    )
-                    line_cum = (
-                        f"累计 tokens：prompt={self._cum_tokens['prompt']}, thinking={self._cum_tokens['thinking']}, "
-                        f"content={self._cum_tokens['content']}, total={self._cum_tokens['total']}"
-                    )
-                    line_time = (
-                        f"本次用时：{elapsed:.2f}s，"
-                        f"累计用时：{self._cum_time_seconds:.2f}s"
+                    with self._stats_lock:
+                        self._cum_time_seconds += float(elapsed)
+                        self._call_index += 1
+                        call_index = self._call_index
+                        self._cum_tokens['prompt'] += int(prompt_tokens)
+                        self._cum_tokens['thinking'] += int(reasoning_tokens)
+                        self._cum_tokens['content'] += content_tokens
+                        self._cum_tokens['total'] += int(total_tokens)
+                        self._cum_tokens['cache_hit'] += cache_hit_tokens
+                        self._cum_tokens['cache_miss'] += cache_miss_tokens
+                        cum_total = self._cum_tokens['total']
+                        cum_time = self._cum_time_seconds
+
+                    # 单行输出，避免多线程并发时多行日志互相穿插
+                    print(
+                        f"[{provider}][{self.model}] 第{call_index}次 "
+                        f"tokens：prompt={int(prompt_tokens)}, thinking={int(reasoning_tokens)}, "
+                        f"content={content_tokens}, total={int(total_tokens)}, "
+                        f"cache_hit={cache_hit_tokens}, cache_miss={cache_miss_tokens} | "
+                        f"用时 {elapsed:.2f}s | 累计 total={cum_total}, 用时 {cum_time:.2f}s",
+                        flush=True,
                     )
-                    print(header + "\n" + line_cur + "\n" + line_cum + "\n" + line_time)
+                    METRICS.maybe_log_summary()
                 except Exception:
                     pass
 
@@ -636,14 +865,20 @@ class LLMClient:
                     "raw_response": response_data,
                     "tokens": {
                         "prompt": prompt_tokens,
-                        "content": completion_tokens - reasoning_tokens,
+                        "content": content_tokens,
                         "reasoning": reasoning_tokens,
-                        "total": total_tokens
+                        "total": total_tokens,
+                        "cache_hit": cache_hit_tokens,
+                        "cache_miss": cache_miss_tokens,
                     }
                 }
 
             except Exception as e:
                 last_error = e
+                try:
+                    METRICS.inc("llm_errors", provider=self._provider_name(req_base), model=self.model)
+                except Exception:
+                    pass
                 if self._is_authentication_error(e):
                     print(
                         "LLM 鉴权失败：当前 API Key 无效或无权限，请在本地配置中更新 DeepSeek API Key 后重试。"
@@ -659,6 +894,10 @@ class LLMClient:
                     raise
                 if response_format is not None and self._is_structured_output_unsupported_error(e):
                     raise
+                if delivered['count']:
+                    # 流式增量已交给调用方，换 base 重放会导致条目重复，交由调用方只重试剩余部分
+                    print(f"流式请求中断（base={req_base}），已收到 {delivered['count']} 段增量，不再重放: {e}")
+                    raise
                 if attempt_idx < len(request_bases):
                     next_base = request_bases[attempt_idx] if attempt_idx < len(request_bases) else ''
                     print(
@@ -697,7 +936,17 @@ class LLMClient:
         *,
         strict: bool = True,
         allow_json_object_fallback: bool = True,
+        stream: bool = False,
+        array_key: str | None = None,
+        on_item: Optional[Callable[[Any], None]] = None,
     ) -> Dict[str, Any]:
+        """
+        结构化输出请求。
+
+        stream=True 时边接收边用 StreamingJsonItemParser 解析：array_key 指定的数组元素
+        （或顶层对象的成员）一旦完整即回调 on_item，并在返回值 streamed_items 中列出；
+        输出被截断时调用方可只针对未完成的部分重试。
+        """
         attempts: List[Tuple[str, Dict[str, Any] | None]] = [
             (
                 format_name,
@@ -715,9 +964,18 @@ class LLMClient:
 
         last_error: Exception | None = None
         for idx, (format_name, response_format) in enumerate(attempts):
+            item_parser = StreamingJsonItemParser(array_key=array_key, on_item=on_item) if stream else None
             try:
                 request_messages = self._ensure_json_instruction(messages, format_name)
-                response = self.chat(messages=request_messages, response_format=response_format)
+                if item_parser is not None:
+                    response = self.chat(
+                        messages=request_messages,
+                        response_format=response_format,
+                        stream=True,
+                        on_delta=item_parser.feed,
+                    )
+                else:
+                    response = self.chat(messages=request_messages, response_format=response_format)
             except Exception as exc:
                 last_error = exc
                 if (
@@ -745,7 +1003,8 @@ class LLMClient:
                         if schema_error:
                             parse_error = ValueError(f"JSON schema validation failed: {schema_error}")
 
-            if parse_error is not None and idx + 1 < len(attempts):
+            streamed_items = list(item_parser.items) if item_parser is not None else []
+            if parse_error is not None and idx + 1 < len(attempts) and not streamed_items:
                 print(
                     f"[INFO] {format_name} 返回内容未通过 JSON 校验，"
                     f"回退到 {attempts[idx + 1][0]}。"
@@ -756,6 +1015,7 @@ class LLMClient:
             structured["parsed"] = parsed
             structured["parse_error"] = parse_error
             structured["response_format_used"] = format_name
+            structured["streamed_items"] = streamed_items
             return structured
 
         if last_error is not None:
@@ -5,26 +5,34 @@ from __future__ import annotations
 import argparse
 from datetime import datetime, timedelta, timezone
 import os
+import re
 import sys
 from typing import Any, Dict, List
 from urllib.parse import quote
 
-import requests
-
 SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 if SRC_DIR not in sys.path:
     sys.path.insert(0, SRC_DIR)
 
 try:
     from source_config import get_source_backend, load_config_with_source_migration
+    from supabase_http import is_statement_timeout, request_with_retries
 except Exception:  # pragma: no cover - 兼容 package 导入路径
     from src.source_config import get_source_backend, load_config_with_source_migration
+    from src.supabase_http import is_statement_timeout, request_with_retries
 
 
 SCRIPT_DIR = os.path.dirname(__file__)
 ROOT_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, "..", ".."))
 CONFIG_FILE = os.path.join(ROOT_DIR, "config.yaml")
 DEFAULT_TIMEOUT = 60
+DEFAULT_CLEANUP_RPC = "cleanup_old_papers"
+# RPC 每次调用最多删除的行数（服务端 ctid 限量删除）
+DEFAULT_CHUNK_ROWS = 20000
+# 回退路径按 published 时间段直接 DELETE 的初始跨度；语句超时时减半
+DEFAULT_RANGE_DAYS = 30
+MIN_RANGE_SPAN = timedelta(hours=1)
+CLEANUP_STRATEGIES = ("auto", "rpc", "range", "ids")
 
 
 def log(message: str) -> None:
@@ -98,10 +106,12 @@ def fetch_old_paper_ids(
         f"&order=published.asc.nullslast"
         f"&limit={max(int(batch_size or 1), 1)}"
     )
-    resp = requests.get(
+    resp = request_with_retries(
+        "GET",
         endpoint,
         headers=_headers(service_key, schema=schema),
         timeout=max(int(timeout or DEFAULT_TIMEOUT), 1),
+        log_prefix="[Cleanup]",
     )
     if resp.status_code >= 300:
         raise RuntimeError(f"查询待清理论文失败：HTTP {resp.status_code} {resp.text[:200]}")
@@ -132,68 +142,310 @@ def delete_papers_by_ids(
         return 0
     encoded_ids = ",".join(quote(item, safe="") for item in safe_ids)
     endpoint = f"{_base_rest(url)}/{papers_table}?id=in.({encoded_ids})"
-    resp = requests.delete(
+    resp = request_with_retries(
+        "DELETE",
         endpoint,
         headers=_headers(service_key, schema=schema, prefer="return=minimal"),
         timeout=max(int(timeout or DEFAULT_TIMEOUT), 1),
+        log_prefix="[Cleanup]",
     )
     if resp.status_code >= 300:
         raise RuntimeError(f"删除旧论文失败：HTTP {resp.status_code} {resp.text[:200]}")
     return len(safe_ids)
 
 
-def cleanup_old_papers(
+def _parse_content_range_total(value: Any) -> int | None:
+    matched = re.search(r"/(\d+)\s*$", _norm(value))
+    return int(matched.group(1)) if matched else None
+
+
+def _is_missing_rpc(status_code: int, text: str) -> bool:
+    return status_code == 404 or "PGRST202" in str(text or "")
+
+
+def _is_unsupported_schema(text: str) -> bool:
+    return "cleanup_old_papers: unsupported schema" in str(text or "")
+
+
+def count_old_papers(
     *,
     url: str,
     service_key: str,
     papers_table: str,
     schema: str,
-    retention_days: int,
-    batch_size: int = 500,
+    cutoff_iso: str,
     timeout: int = DEFAULT_TIMEOUT,
-    dry_run: bool = False,
-) -> Dict[str, Any]:
-    safe_days = max(int(retention_days or 1), 1)
-    cutoff_dt = datetime.now(timezone.utc) - timedelta(days=safe_days)
+) -> int:
+    """dry-run：Prefer: count=exact 只取总数，不拉取任何行。"""
+    endpoint = (
+        f"{_base_rest(url)}/{papers_table}"
+        f"?select=id"
+        f"&published=lt.{quote(cutoff_iso, safe='')}"
+        f"&limit=1"
+    )
+    headers = {**_headers(service_key, schema=schema, prefer="count=exact"), "Range": "0-0"}
+    resp = request_with_retries(
+        "GET",
+        endpoint,
+        headers=headers,
+        timeout=max(int(timeout or DEFAULT_TIMEOUT), 1),
+        log_prefix="[Cleanup]",
+    )
+    if resp.status_code >= 300:
+        raise RuntimeError(f"统计待清理论文失败：HTTP {resp.status_code} {resp.text[:200]}")
+    total = _parse_content_range_total(resp.headers.get("Content-Range"))
+    if total is None:
+        raise RuntimeError("统计待清理论文失败：缺少可解析的 Content-Range")
+    return total
+
+
+def delete_old_papers_via_rpc(
+    *,
+    url: str,
+    service_key: str,
+    papers_table: str,
+    schema: str,
+    cutoff_iso: str,
+    chunk_rows: int,
+    rpc_name: str = DEFAULT_CLEANUP_RPC,
+    timeout: int = DEFAULT_TIMEOUT,
+) -> int | None:
+    """
+    调用 sql/cleanup_old_papers.sql 删除一批最旧的过期行；RPC 不存在或不允许该 schema 时返回 None。
+    函数建在 public 下，论文表所在 schema 通过 target_schema 参数传入（public 时省略，兼容旧版函数）。
+    """
+    payload: Dict[str, Any] = {
+        "target_table": papers_table,
+        "cutoff": cutoff_iso,
+        "max_rows": max(int(chunk_rows or 1), 1),
+    }
+    safe_schema = _norm(schema) or "public"
+    if safe_schema != "public":
+        payload["target_schema"] = safe_schema
+    resp = request_with_retries(
+        "POST",
+        f"{_base_rest(url)}/rpc/{rpc_name}",
+        headers={**_headers(service_key, schema="public"), "Content-Type": "application/json"},
+        json=payload,
+        timeout=max(int(timeout or DEFAULT_TIMEOUT), 1),
+        log_prefix="[Cleanup]",
+    )
+    if _is_missing_rpc(resp.status_code, resp.text):
+        return None
+    if _is_unsupported_schema(resp.text):
+        log(f"[Cleanup] 清理 RPC 不允许 schema={safe_schema}（见 sql/cleanup_old_papers.sql 的 allowed_schemas）")
+        return None
+    if resp.status_code >= 300:
+        raise RuntimeError(f"清理 RPC 调用失败：HTTP {resp.status_code} {resp.text[:200]}")
+    try:
+        return int(resp.json() or 0)
+    except Exception as exc:
+        raise RuntimeError(f"清理 RPC 返回值异常：{resp.text[:200]}") from exc
+
+
+def fetch_oldest_published(
+    *,
+    url: str,
+    service_key: str,
+    papers_table: str,
+    schema: str,
+    cutoff_iso: str,
+    timeout: int = DEFAULT_TIMEOUT,
+) -> datetime | None:
+    endpoint = (
+        f"{_base_rest(url)}/{papers_table}"
+        f"?select=published"
+        f"&published=lt.{quote(cutoff_iso, safe='')}"
+        f"&order=published.asc"
+        f"&limit=1"
+    )
+    resp = request_with_retries(
+        "GET",
+        endpoint,
+        headers=_headers(service_key, schema=schema),
+        timeout=max(int(timeout or DEFAULT_TIMEOUT), 1),
+        log_prefix="[Cleanup]",
+    )
+    if resp.status_code >= 300:
+        raise RuntimeError(f"查询最旧论文失败：HTTP {resp.status_code} {resp.text[:200]}")
+    rows = resp.json() or []
+    if not rows or not isinstance(rows[0], dict):
+        return None
+    text = _norm(rows[0].get("published")).replace("Z", "+00:00")
+    try:
+        dt = datetime.fromisoformat(text)
+    except Exception:
+        return None
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def delete_papers_in_range(
+    *,
+    url: str,
+    service_key: str,
+    papers_table: str,
+    schema: str,
+    end_iso: str,
+    start_iso: str = "",
+    timeout: int = DEFAULT_TIMEOUT,
+) -> int:
+    """
+    published < end_iso（且 >= start_iso）的行一条 DELETE 删除，
+    通过 Prefer: count=exact 从 Content-Range 读回删除行数。语句超时时抛出 TimeoutError。
+    """
+    endpoint = f"{_base_rest(url)}/{papers_table}?published=lt.{quote(end_iso, safe='')}"
+    if start_iso:
+        endpoint += f"&published=gte.{quote(start_iso, safe='')}"
+    resp = request_with_retries(
+        "DELETE",
+        endpoint,
+        headers=_headers(service_key, schema=schema, prefer="return=minimal,count=exact"),
+        timeout=max(int(timeout or DEFAULT_TIMEOUT), 1),
+        log_prefix="[Cleanup]",
+    )
+    if is_statement_timeout(resp):
+        raise TimeoutError(f"删除旧论文语句超时：{start_iso or '-inf'} ~ {end_iso}")
+    if resp.status_code >= 300:
+        raise RuntimeError(f"删除旧论文失败：HTTP {resp.status_code} {resp.text[:200]}")
+    return int(_parse_content_range_total(resp.headers.get("Content-Range")) or 0)
+
+
+def _cleanup_by_rpc(*, chunk_rows: int, **kwargs: Any) -> tuple[int, int] | None:
+    deleted = 0
+    batches = 0
+    while True:
+        removed = delete_old_papers_via_rpc(chunk_rows=chunk_rows, **kwargs)
+        if removed is None:
+            return None
+        batches += 1
+        deleted += removed
+        log(f"[Cleanup] rpc batch={batches} deleted={removed} total={deleted}")
+        if removed < max(int(chunk_rows or 1), 1):
+            return deleted, batches
+
+
+def _cleanup_by_range(*, cutoff_dt: datetime, range_days: int, **kwargs: Any) -> tuple[int, int]:
     cutoff_iso = cutoff_dt.isoformat()
+    oldest = fetch_oldest_published(cutoff_iso=cutoff_iso, **kwargs)
+    if oldest is None:
+        return 0, 0
+    span = timedelta(days=max(int(range_days or 1), 1))
+    deleted = 0
+    batches = 0
+    lower: datetime | None = None
+    upper_start = oldest
+    while True:
+        upper = min(upper_start + span, cutoff_dt)
+        try:
+            removed = delete_papers_in_range(
+                end_iso=upper.isoformat(),
+                start_iso=lower.isoformat() if lower else "",
+                **kwargs,
+            )
+        except TimeoutError as exc:
+            if span <= MIN_RANGE_SPAN:
+                raise RuntimeError(f"{exc}（已缩小到最小时间段）") from exc
+            span = max(span / 2, MIN_RANGE_SPAN)
+            log(f"[Cleanup] {exc}，时间段缩小为 {span}")
+            continue
+        batches += 1
+        deleted += removed
+        log(f"[Cleanup] range batch={batches} published<{upper.isoformat()} deleted={removed} total={deleted}")
+        if upper >= cutoff_dt:
+            return deleted, batches
+        lower = upper
+        upper_start = upper
+
 
+def _cleanup_by_ids(*, batch_size: int, cutoff_iso: str, **kwargs: Any) -> tuple[int, int]:
     deleted = 0
     batches = 0
     while True:
-        ids = fetch_old_paper_ids(
-            url=url,
-            service_key=service_key,
-            papers_table=papers_table,
-            schema=schema,
-            cutoff_iso=cutoff_iso,
-            batch_size=batch_size,
-            timeout=timeout,
-        )
+        ids = fetch_old_paper_ids(cutoff_iso=cutoff_iso, batch_size=batch_size, **kwargs)
         if not ids:
-            break
+            return deleted, batches
         batches += 1
         log(
             f"[Cleanup] batch={batches} cutoff={cutoff_iso} "
             f"matched={len(ids)} sample={ids[:3]}"
         )
-        if dry_run:
-            deleted += len(ids)
-            break
-        deleted += delete_papers_by_ids(
-            url=url,
-            service_key=service_key,
-            papers_table=papers_table,
-            schema=schema,
-            ids=ids,
-            timeout=timeout,
-        )
+        deleted += delete_papers_by_ids(ids=ids, **kwargs)
+
+
+def cleanup_old_papers(
+    *,
+    url: str,
+    service_key: str,
+    papers_table: str,
+    schema: str,
+    retention_days: int,
+    batch_size: int = 500,
+    timeout: int = DEFAULT_TIMEOUT,
+    dry_run: bool = False,
+    strategy: str = "auto",
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    range_days: int = DEFAULT_RANGE_DAYS,
+) -> Dict[str, Any]:
+    """
+    删除 published 早于保留期的论文，返回删除统计：
+    - dry_run：Prefer: count=exact 只统计将被删除的行数
+    - rpc：服务端 cleanup_old_papers 按 chunk_rows 限量删除，直到不足一批
+    - range：RPC 不存在时按 published 时间段直接 DELETE（语句超时自动缩小时间段）
+    - ids：旧流程（先查 id 再 id=in.(...) 删除），仅在显式指定时使用
+    """
+    safe_days = max(int(retention_days or 1), 1)
+    cutoff_dt = datetime.now(timezone.utc) - timedelta(days=safe_days)
+    cutoff_iso = cutoff_dt.isoformat()
+    mode = _norm(strategy).lower() or "auto"
+    if mode not in CLEANUP_STRATEGIES:
+        raise ValueError(f"未知清理策略：{strategy}（可选 {', '.join(CLEANUP_STRATEGIES)}）")
+    conn = {
+        "url": url,
+        "service_key": service_key,
+        "papers_table": papers_table,
+        "schema": schema,
+        "timeout": timeout,
+    }
+
+    if dry_run:
+        matched = count_old_papers(cutoff_iso=cutoff_iso, **conn)
+        log(f"[Cleanup] dry-run cutoff={cutoff_iso} matched={matched}")
+        return {
+            "cutoff_iso": cutoff_iso,
+            "retention_days": safe_days,
+            "deleted": matched,
+            "batches": 0,
+            "dry_run": True,
+            "strategy": "count",
+        }
+
+    result: tuple[int, int] | None = None
+    used = mode
+    if mode in ("auto", "rpc"):
+        result = _cleanup_by_rpc(chunk_rows=chunk_rows, cutoff_iso=cutoff_iso, **conn)
+        used = "rpc"
+        if result is None:
+            if mode == "rpc":
+                raise RuntimeError(
+                    f"清理 RPC 不可用（未部署，或 schema={schema} 不在 allowed_schemas 中），"
+                    "请先执行 sql/cleanup_old_papers.sql"
+                )
+            log(f"[Cleanup] 清理 RPC 不可用（未部署，或 schema={schema} 不在 allowed_schemas 中），回退为按时间段删除")
+    if result is None and mode in ("auto", "range"):
+        result = _cleanup_by_range(cutoff_dt=cutoff_dt, range_days=range_days, **conn)
+        used = "range"
+    if result is None:
+        result = _cleanup_by_ids(batch_size=batch_size, cutoff_iso=cutoff_iso, **conn)
+        used = "ids"
+    deleted, batches = result
 
     return {
         "cutoff_iso": cutoff_iso,
         "retention_days": safe_days,
         "deleted": deleted,
         "batches": batches,
-        "dry_run": dry_run,
+        "dry_run": False,
+        "strategy": used,
     }
 
 
@@ -205,9 +457,12 @@ def main() -> None:
     parser.add_argument("--papers-table", type=str, default=os.getenv("SUPABASE_PAPERS_TABLE", ""))
     parser.add_argument("--schema", type=str, default=os.getenv("SUPABASE_SCHEMA", "public"))
     parser.add_argument("--retention-days", type=int, default=45)
-    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=500, help="ids 策略每批查询 / 删除的 id 数。")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS, help="RPC 每次调用最多删除的行数。")
+    parser.add_argument("--range-days", type=int, default=DEFAULT_RANGE_DAYS, help="按时间段删除时的初始跨度（天）。")
+    parser.add_argument("--strategy", choices=CLEANUP_STRATEGIES, default="auto")
     parser.add_argument("--timeout", type=int, default=DEFAULT_TIMEOUT)
-    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--dry-run", action="store_true", help="只用 count=exact 统计将被删除的行数。")
     args = parser.parse_args()
 
     backend_key = _norm(args.backend_key) or "arxiv"
@@ -223,7 +478,7 @@ def main() -> None:
 
     log(
         f"[Cleanup] backend={backend_key} table={config['papers_table']} schema={config['schema']} "
-        f"retention_days={args.retention_days} batch_size={args.batch_size} dry_run={args.dry_run}"
+        f"retention_days={args.retention_days} strategy={args.strategy} dry_run={args.dry_run}"
     )
     result = cleanup_old_papers(
         url=config["url"],
@@ -234,10 +489,13 @@ def main() -> None:
         batch_size=args.batch_size,
         timeout=args.timeout,
         dry_run=bool(args.dry_run),
+        strategy=args.strategy,
+        chunk_rows=args.chunk_rows,
+        range_days=args.range_days,
     )
     log(
         f"[Cleanup] done deleted={result['deleted']} batches={result['batches']} "
-        f"cutoff={result['cutoff_iso']}"
+        f"strategy={result['strategy']} cutoff={result['cutoff_iso']}"
     )
 
 
@@ -5,13 +5,18 @@ from __future__ import annotations
 
 import argparse
 from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+import hashlib
 import json
 import os
 import sys
 import time
 from datetime import datetime, timezone
-from typing import Any, Dict, Iterator, List, Tuple
-import requests
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+from urllib.parse import quote
+try:
+    import numpy as np
+except Exception:  # pragma: no cover
+    np = None
 try:
     import torch
 except Exception:  # pragma: no cover
@@ -22,6 +27,10 @@ if SRC_DIR not in sys.path:
     sys.path.insert(0, SRC_DIR)
 
 from model_loader import load_sentence_transformer
+try:
+    from supabase_http import request_counts, request_with_retries
+except Exception:  # pragma: no cover
+    from src.supabase_http import request_counts, request_with_retries
 try:
     from source_config import get_source_backend
 except Exception:  # pragma: no cover
@@ -39,6 +48,24 @@ TODAY_STR = str(os.getenv("DPR_RUN_DATE") or "").strip() or datetime.now(timezon
 CONFIG_FILE = os.path.join(ROOT_DIR, "config.yaml")
 DEFAULT_EMBED_MODEL = "BAAI/bge-small-en-v1.5"
 SYNC_START_TS = time.time()
+# 参与内容哈希的字段（不含 updated_at / embedding_*）；任一变化都视为“已变更”
+# content_hash 表示“库中 embedding 所对应的内容”，只随 embedding 一起写入
+CONTENT_HASH_FIELDS = (
+    "title",
+    "abstract",
+    "authors",
+    "primary_category",
+    "categories",
+    "published",
+    "link",
+    "source",
+    "pdf_url",
+)
+EXISTING_STATE_CHUNK_SIZE = 150
+# 归一化向量分量在 [-1, 1]，6 位小数已远超 float32 检索所需精度，比 8 位少约 20% 字节
+EMBEDDING_LITERAL_DECIMALS = 6
+# 单个 upsert 请求体的目标字节数（未压缩）；行数上限仍由 --upsert-batch-size 控制
+DEFAULT_UPSERT_MAX_BYTES = 4 * 1024 * 1024
 
 
 def log(msg: str) -> None:
@@ -182,8 +209,26 @@ def build_embedding_text(row: Dict[str, Any]) -> str:
     return ""
 
 
-def to_pgvector_literal(vec: List[float]) -> str:
-    return "[" + ",".join(f"{float(x):.8f}" for x in vec) + "]"
+def to_pgvector_literal(vec: List[float], decimals: int = EMBEDDING_LITERAL_DECIMALS) -> str:
+    return to_pgvector_literals([vec], decimals=decimals)[0]
+
+
+def to_pgvector_literals(matrix: Any, decimals: int = EMBEDDING_LITERAL_DECIMALS) -> List[str]:
+    """
+    整块 embedding 矩阵一次性转成 pgvector 文本字面量。
+    每行只做一次 C 层的 % 格式化（而不是逐个分量 f-string + join）。
+    """
+    if np is not None:
+        arr = np.asarray(matrix, dtype=np.float32)
+        if arr.ndim == 1:
+            arr = arr.reshape(1, -1)
+        rows = arr.tolist()
+        dim = int(arr.shape[1]) if arr.ndim == 2 else 0
+    else:
+        rows = [[float(x) for x in vec] for vec in matrix]
+        dim = len(rows[0]) if rows else 0
+    row_fmt = "[" + ",".join([f"%.{max(int(decimals), 1)}f"] * dim) + "]"
+    return [row_fmt % tuple(vec) for vec in rows]
 
 
 def configure_local_embedding_runtime(reserve_upload_cpus: int) -> Tuple[int, int]:
@@ -295,9 +340,9 @@ def iter_embedded_row_chunks(
             if len(emb) != len(rows_chunk):
                 raise RuntimeError("embedding 输出长度与输入分片不一致")
             dim = chunk_dim
+            literals = to_pgvector_literals(emb)
             for local_idx, row in enumerate(rows_chunk):
-                vec = emb[local_idx].tolist()
-                row["embedding"] = to_pgvector_literal(vec)
+                row["embedding"] = literals[local_idx]
                 row["embedding_model"] = model_name
                 row["embedding_dim"] = dim
                 row["embedding_updated_at"] = now_iso
@@ -331,9 +376,9 @@ def iter_embedded_row_chunks(
             if len(emb) != len(rows_chunk):
                 raise RuntimeError("embedding 输出长度与输入分片不一致")
             dim = chunk_dim
+            literals = to_pgvector_literals(emb)
             for local_idx, row in enumerate(rows_chunk):
-                vec = emb[local_idx].tolist()
-                row["embedding"] = to_pgvector_literal(vec)
+                row["embedding"] = literals[local_idx]
                 row["embedding_model"] = model_name
                 row["embedding_dim"] = dim
                 row["embedding_updated_at"] = now_iso
@@ -429,9 +474,125 @@ def normalize_paper(x: Dict[str, Any]) -> Dict[str, Any] | None:
     pdf_url = _norm(x.get("pdf_url"))
     if pdf_url:
         row["pdf_url"] = pdf_url
+    row["content_hash"] = compute_content_hash(row)
     return row
 
 
+def compute_content_hash(row: Dict[str, Any]) -> str:
+    payload = {field: row.get(field) for field in CONTENT_HASH_FIELDS}
+    text = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _quote_in_value(value: str) -> str:
+    text = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return quote(f'"{text}"', safe="")
+
+
+def _is_missing_column_error(status_code: int, text: str) -> bool:
+    """仅把“content_hash 列不存在”（42703 / PostgREST schema cache 的 PGRST204）识别为缺列。"""
+    if status_code != 400:
+        return False
+    body = str(text or "")
+    try:
+        payload = json.loads(body)
+    except Exception:
+        payload = None
+    if isinstance(payload, dict):
+        code = _norm(payload.get("code"))
+        message = f"{_norm(payload.get('message'))} {_norm(payload.get('details'))}"
+        return code in ("42703", "PGRST204") and "content_hash" in message
+    return "42703" in body and "content_hash" in body
+
+
+def fetch_existing_row_state(
+    *,
+    url: str,
+    service_key: str,
+    table: str,
+    ids: List[str],
+    schema: str = "public",
+    timeout: int = 30,
+    chunk_size: int = EXISTING_STATE_CHUNK_SIZE,
+) -> Tuple[Dict[str, Dict[str, str]], bool]:
+    """
+    按 id 批量读取库中已有行的 (content_hash, embedding_model)。
+    返回 (state_by_id, supported)；表缺少 content_hash 列时 supported=False（调用方应全量同步）。
+    """
+    rest = _base_rest(url)
+    safe_chunk = max(int(chunk_size or 1), 1)
+    state: Dict[str, Dict[str, str]] = {}
+    for i in range(0, len(ids), safe_chunk):
+        chunk = ids[i : i + safe_chunk]
+        in_list = ",".join(_quote_in_value(pid) for pid in chunk)
+        endpoint = f"{rest}/{table}?select=id,content_hash,embedding_model&id=in.({in_list})"
+        resp = request_with_retries(
+            "GET",
+            endpoint,
+            headers=_headers(service_key, schema=schema),
+            timeout=max(int(timeout or 30), 1),
+            log_prefix="[Supabase] existing-state",
+        )
+        if _is_missing_column_error(resp.status_code, resp.text):
+            log(f"[WARN] {table} 缺少 content_hash 列（请执行 sql/create_*_schema.sql），本次全量同步")
+            return {}, False
+        if resp.status_code >= 300:
+            raise RuntimeError(f"读取已有行状态失败：HTTP {resp.status_code} {resp.text[:200]}")
+        for item in resp.json() or []:
+            if not isinstance(item, dict):
+                continue
+            pid = _norm(item.get("id"))
+            if pid:
+                state[pid] = {
+                    "content_hash": _norm(item.get("content_hash")),
+                    "embedding_model": _norm(item.get("embedding_model")),
+                }
+    return state, True
+
+
+def plan_incremental_sync(
+    rows: List[Dict[str, Any]],
+    existing: Dict[str, Dict[str, str]],
+    *,
+    with_embeddings: bool,
+    model_name: str,
+) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+    """
+    只保留需要上传的行：
+    - new：库中不存在
+    - changed：content_hash 不同（含旧行没有哈希）
+    - model_changed：内容未变但 embedding_model 与本次不同（仅 --with-embeddings）
+    其余行内容与向量都已是最新，直接跳过（也不刷新 updated_at）。
+    --no-embeddings 时上传的行不带 content_hash（见 detach_content_hash），
+    库中哈希仍指向旧 embedding 的内容，后续 --with-embeddings 会把它识别为 changed 并重算向量。
+    """
+    stats = {"new": 0, "changed": 0, "model_changed": 0, "unchanged": 0}
+    todo: List[Dict[str, Any]] = []
+    for row in rows:
+        prev = existing.get(_norm(row.get("id")))
+        if prev is None:
+            stats["new"] += 1
+        elif prev.get("content_hash") != row.get("content_hash"):
+            stats["changed"] += 1
+        elif with_embeddings and prev.get("embedding_model") != _norm(model_name):
+            stats["model_changed"] += 1
+        else:
+            stats["unchanged"] += 1
+            continue
+        todo.append(row)
+    return todo, stats
+
+
+def detach_content_hash(rows: List[Dict[str, Any]]) -> None:
+    """
+    从待上传行中移除 content_hash。
+    merge-duplicates 会保留未发送的列：不刷新 embedding 却写入新哈希，
+    会让内容已变的行在之后的 --with-embeddings 运行中被误判为未变化而永远不重算向量。
+    """
+    for row in rows:
+        row.pop("content_hash", None)
+
+
 def deduplicate_rows_by_id(rows: List[Dict[str, Any]]) -> tuple[List[Dict[str, Any]], int]:
     seen = set()
     out: List[Dict[str, Any]] = []
@@ -451,6 +612,45 @@ def deduplicate_rows_by_id(rows: List[Dict[str, Any]]) -> tuple[List[Dict[str, A
     return out, duplicates
 
 
+def serialize_rows(rows: List[Dict[str, Any]]) -> List[bytes]:
+    """每行只序列化一次；批次请求体直接拼接这些字节，拆分重试时也不再重复 json.dumps。"""
+    return [json.dumps(row, ensure_ascii=False, separators=(",", ":")).encode("utf-8") for row in rows]
+
+
+def plan_upsert_batches(row_sizes: Sequence[int], *, max_rows: int, max_bytes: int) -> List[Tuple[int, int]]:
+    """
+    按请求体字节数切分批次，返回 [from, to) 区间列表：
+    累计字节（含 JSON 数组的括号与逗号）超过 max_bytes 或行数达到 max_rows 时开新批；
+    单行本身超过预算时独占一批。
+    """
+    safe_rows = max(int(max_rows or 1), 1)
+    safe_bytes = max(int(max_bytes or 1), 1)
+    batches: List[Tuple[int, int]] = []
+    start = 0
+    size = 2
+    for idx, n in enumerate(row_sizes):
+        extra = int(n) + (1 if idx > start else 0)
+        if idx > start and (idx - start >= safe_rows or size + extra > safe_bytes):
+            batches.append((start, idx))
+            start = idx
+            size = 2
+            extra = int(n)
+        size += extra
+    if start < len(row_sizes):
+        batches.append((start, len(row_sizes)))
+    return batches
+
+
+def resolve_gzip_upload(default: bool = False) -> bool:
+    # 与共享 HTTP 客户端共用同一个开关，避免两个开关叠加导致请求体被重复压缩
+    raw = _norm(os.getenv("DPR_SUPABASE_GZIP_REQUESTS")).lower()
+    if raw in ("1", "true", "yes", "on"):
+        return True
+    if raw in ("0", "false", "no", "off"):
+        return False
+    return default
+
+
 def upsert_papers(
     *,
     url: str,
@@ -462,105 +662,96 @@ def upsert_papers(
     timeout: int = 30,
     retries: int = 3,
     retry_wait: float = 2.0,
+    max_batch_bytes: int = DEFAULT_UPSERT_MAX_BYTES,
+    gzip_body: bool = False,
 ) -> None:
     rest = _base_rest(url)
     endpoint = f"{rest}/{table}?on_conflict=id"
     total = len(rows)
     if total == 0:
         return
+    encoded = serialize_rows(rows)
+    batches = plan_upsert_batches(
+        [len(b) for b in encoded],
+        max_rows=batch_size,
+        max_bytes=max_batch_bytes,
+    )
     log(
         "[Supabase] 开始同步参数："
         f" table={table}, schema={schema}, total={total}, "
-        f"batch_size={batch_size}, timeout={timeout}s, retries={retries}, retry_wait={retry_wait}s"
+        f"batch_size={batch_size}, max_batch_bytes={max_batch_bytes}, batches={len(batches)}, "
+        f"gzip={bool(gzip_body)}, timeout={timeout}s, retries={retries}, retry_wait={retry_wait}s"
     )
 
     max_attempts = max(int(retries or 0), 0) + 1
     uploaded = 0
-    batch_index = 0
-    batch_total = (total + batch_size - 1) // batch_size
-
-    def _post_chunk(chunk: List[Dict[str, Any]]) -> int:
-        last_error: Exception | None = None
-        for attempt in range(1, max_attempts + 1):
-            try:
-                payload_size = len(json.dumps(chunk, ensure_ascii=False, separators=(",", ":")))
-                start_t = time.time()
-                resp = requests.post(
-                    endpoint,
-                    headers=_headers(service_key, "resolution=merge-duplicates", schema=schema),
-                    data=json.dumps(chunk, ensure_ascii=False, separators=(",", ":")),
-                    timeout=max(int(timeout or 30), 1),
-                )
-                spent_ms = int((time.time() - start_t) * 1000)
-                if resp.status_code >= 300:
-                    raise RuntimeError(f"HTTP {resp.status_code} {resp.text[:200]}")
-                log(
-                    f"[Supabase] upsert 成功: rows={len(chunk)}, bytes={payload_size}, "
-                    f"status={resp.status_code}, cost={spent_ms}ms"
-                )
-                return attempt
-            except Exception as e:
-                last_error = e
-                if attempt >= max_attempts:
-                    break
-                wait_s = max(float(retry_wait or 0.0), 0.0) * attempt
-                log(
-                    f"[WARN] upsert 批次失败（rows={len(chunk)}, batch_index={batch_index}, "
-                    f"sample_ids={_brief_row_ids(chunk)}），准备重试 "
-                    f"(attempt={attempt}/{max_attempts}, wait={wait_s:.1f}s): {e}"
-                )
-                if wait_s > 0:
-                    time.sleep(wait_s)
-        if last_error is not None:
-            raise last_error
-
-    def _upsert_with_split(chunk: List[Dict[str, Any]], depth: int = 0) -> None:
+    headers = _headers(service_key, "resolution=merge-duplicates", schema=schema)
+
+    def _post_chunk(lo: int, hi: int) -> None:
+        chunk = rows[lo:hi]
+        raw = b"[" + b",".join(encoded[lo:hi]) + b"]"
+        start_t = time.time()
+        # 网络异常 / 5xx 由共享客户端按指数退避重试；仍失败时交给上层拆分
+        resp = request_with_retries(
+            "POST",
+            endpoint,
+            headers=headers,
+            data=raw,
+            gzip_body=gzip_body,
+            timeout=max(int(timeout or 30), 1),
+            retries=max_attempts - 1,
+            retry_wait_seconds=retry_wait,
+            log_prefix=f"[Supabase] upsert(rows={len(chunk)}, sample_ids={_brief_row_ids(chunk)})",
+        )
+        spent_ms = int((time.time() - start_t) * 1000)
+        if resp.status_code >= 300:
+            raise RuntimeError(f"HTTP {resp.status_code} {resp.text[:200]}")
+        log(
+            f"[Supabase] upsert 成功: rows={len(chunk)}, bytes={len(raw)}, "
+            f"status={resp.status_code}, cost={spent_ms}ms"
+        )
+
+    def _upsert_with_split(lo: int, hi: int, depth: int = 0) -> None:
         nonlocal uploaded
-        if not chunk:
+        if hi <= lo:
             return
         try:
-            used_attempt = _post_chunk(chunk)
-            uploaded += len(chunk)
+            _post_chunk(lo, hi)
+            uploaded += hi - lo
             log(
                 f"[Supabase] upsert papers: {uploaded}/{total} "
-                f"(batch={len(chunk)}, attempt={used_attempt}/{max_attempts}, depth={depth})"
+                f"(batch={hi - lo}, depth={depth})"
             )
             return
         except Exception as e:
-            if len(chunk) <= 1:
-                pid = _norm((chunk[0] or {}).get("id")) if chunk else ""
+            if hi - lo <= 1:
+                pid = _norm((rows[lo] or {}).get("id"))
                 raise RuntimeError(
                     f"upsert papers 最小分片仍失败：id={pid or '<unknown>'}, error={e}"
                 ) from e
-            mid = max(len(chunk) // 2, 1)
-            left = chunk[:mid]
-            right = chunk[mid:]
+            mid = lo + max((hi - lo) // 2, 1)
             log(
                 f"[WARN] upsert 批次失败，自动拆分重试 "
-                f"(size={len(chunk)}, depth={depth}, left={len(left)}, right={len(right)}): {e}"
-            )
-            _upsert_with_split(left, depth + 1)
-            _upsert_with_split(right, depth + 1)
-
-    for i in range(0, total, batch_size):
-        batch_index += 1
-        chunk = rows[i : i + batch_size]
-        batch_start = i + 1
-        batch_end = min(i + batch_size, total)
-        if batch_size > 0:
-            log(
-                f"[Supabase] 上传进度：第 {batch_index}/{batch_total} 批，"
-                f"覆盖范围 {batch_start}-{batch_end}，ids={_brief_row_ids(chunk)}"
+                f"(size={hi - lo}, depth={depth}, left={mid - lo}, right={hi - mid}): {e}"
             )
+            _upsert_with_split(lo, mid, depth + 1)
+            _upsert_with_split(mid, hi, depth + 1)
+
+    for batch_index, (lo, hi) in enumerate(batches, start=1):
+        log(
+            f"[Supabase] 上传进度：第 {batch_index}/{len(batches)} 批，"
+            f"覆盖范围 {lo + 1}-{hi}，ids={_brief_row_ids(rows[lo:hi])}"
+        )
         try:
-            _upsert_with_split(chunk, depth=0)
+            _upsert_with_split(lo, hi, depth=0)
         except Exception as e:
             raise RuntimeError(
-                f"upsert papers 失败：offset={i}, batch={len(chunk)}, error={e}"
+                f"upsert papers 失败：offset={lo}, batch={hi - lo}, error={e}"
             ) from e
 
     cost_sec = max(time.time() - SYNC_START_TS, 0.0)
     log(f"[Supabase] 全量同步结束：成功上报 {uploaded} 条，共耗时 {cost_sec:.1f}s")
+    log(f"[Supabase] 请求统计：{request_counts()}")
 
 
 def _wait_upload_futures(pending: List[Future[None]], *, drain_all: bool = False) -> List[Future[None]]:
@@ -594,6 +785,8 @@ def stream_embed_and_upsert(
     upsert_timeout: int,
     upsert_retries: int,
     upsert_retry_wait: float,
+    upsert_max_bytes: int = DEFAULT_UPSERT_MAX_BYTES,
+    upsert_gzip: bool = False,
 ) -> int:
     total_rows = len(rows or [])
     if total_rows <= 0:
@@ -637,6 +830,8 @@ def stream_embed_and_upsert(
                     timeout=upsert_timeout,
                     retries=upsert_retries,
                     retry_wait=upsert_retry_wait,
+                    max_batch_bytes=upsert_max_bytes,
+                    gzip_body=upsert_gzip,
                 )
             )
         pending = _wait_upload_futures(pending, drain_all=True)
@@ -671,10 +866,31 @@ def main() -> None:
     parser.add_argument("--upsert-timeout", type=int, default=120)
     parser.add_argument("--upsert-retries", type=int, default=5)
     parser.add_argument("--upsert-retry-wait", type=float, default=2.0)
+    parser.add_argument(
+        "--upsert-max-bytes",
+        type=int,
+        default=DEFAULT_UPSERT_MAX_BYTES,
+        help="单个 upsert 请求体的目标字节数（未压缩），按字节而非行数切批。",
+    )
+    parser.add_argument(
+        "--upsert-gzip",
+        dest="upsert_gzip",
+        action="store_true",
+        default=resolve_gzip_upload(),
+        help="以 Content-Encoding: gzip 发送 upsert 请求体（需网关支持解压；也可设 DPR_SUPABASE_GZIP_REQUESTS=1）。",
+    )
     parser.add_argument("--with-embeddings", dest="with_embeddings", action="store_true", default=True)
     parser.add_argument("--no-embeddings", dest="with_embeddings", action="store_false")
     parser.add_argument("--stream-upsert", dest="stream_upsert", action="store_true", default=False)
     parser.add_argument("--no-stream-upsert", dest="stream_upsert", action="store_false")
+    parser.add_argument(
+        "--skip-unchanged",
+        dest="skip_unchanged",
+        action="store_true",
+        default=True,
+        help="按 content_hash / embedding_model 跳过库中已是最新的行（默认开启）。",
+    )
+    parser.add_argument("--full-sync", dest="skip_unchanged", action="store_false", help="强制全量编码并上传。")
     parser.add_argument("--local-maintain-mode", action="store_true")
     parser.add_argument("--mode", type=str, default="standard")
     args = parser.parse_args()
@@ -704,9 +920,40 @@ def main() -> None:
     if not rows:
         raise RuntimeError(f"原始文件无有效论文记录：{raw_path}")
 
+    model_name = resolve_embed_model(args.embed_model) if args.with_embeddings else ""
+    # --full-sync 时只探测一行，确认表上有 content_hash 列
+    row_ids = [_norm(r.get("id")) for r in rows]
+    existing, supported = fetch_existing_row_state(
+        url=url,
+        service_key=key,
+        table=papers_table,
+        ids=row_ids if args.skip_unchanged else row_ids[:1],
+        schema=_norm(args.schema),
+        timeout=max(int(args.upsert_timeout or 1), 1),
+    )
+    if not supported:
+        detach_content_hash(rows)
+    elif args.skip_unchanged:
+        total_before = len(rows)
+        rows, plan_stats = plan_incremental_sync(
+            rows,
+            existing,
+            with_embeddings=bool(args.with_embeddings),
+            model_name=model_name,
+        )
+        log(
+            f"[INFO] 增量同步：共 {total_before} 篇，新增 {plan_stats['new']}，内容变更 {plan_stats['changed']}，"
+            f"模型变更 {plan_stats['model_changed']}，未变化跳过 {plan_stats['unchanged']}"
+        )
+        if not rows:
+            log("[OK] Supabase 同步完成：全部论文未变化，无需上传")
+            return
+    if not args.with_embeddings:
+        # 本次不刷新 embedding：哈希只随 embedding 一起写入
+        detach_content_hash(rows)
+
     try:
         if args.with_embeddings:
-            model_name = resolve_embed_model(args.embed_model)
             if args.embed_local_only:
                 embed_cpus, reserved_cpus = configure_local_embedding_runtime(args.reserve_upload_cpus)
                 log(
@@ -741,6 +988,8 @@ def main() -> None:
                     upsert_timeout=max(int(args.upsert_timeout or 1), 1),
                     upsert_retries=max(int(args.upsert_retries or 0), 0),
                     upsert_retry_wait=max(float(args.upsert_retry_wait or 0.0), 0.0),
+                    upsert_max_bytes=max(int(args.upsert_max_bytes or 1), 1),
+                    upsert_gzip=bool(args.upsert_gzip),
                 )
             else:
                 attach_embeddings(
@@ -768,6 +1017,8 @@ def main() -> None:
                 timeout=max(int(args.upsert_timeout or 1), 1),
                 retries=max(int(args.upsert_retries or 0), 0),
                 retry_wait=max(float(args.upsert_retry_wait or 0.0), 0.0),
+                max_batch_bytes=max(int(args.upsert_max_bytes or 1), 1),
+                gzip_body=bool(args.upsert_gzip),
             )
         log(f"[OK] Supabase 同步完成：{len(rows)} 篇")
     except Exception as e:
@@ -0,0 +1,261 @@
+"""
+进程内线程安全的指标注册表。
+
+- 计数器 / 延迟直方图均按 labels（provider、model、stage 等）分桶，所有更新持有同一把锁
+- stage 由各 Step 入口通过 configure_run_metrics 设定，自动附加到每条指标
+- maybe_log_summary 按时间间隔输出一行紧凑汇总，避免并发下多行日志交错
+- 进程退出时把快照（含各 Step 写入的吞吐信息）写入 run archive 下的 JSON
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+LATENCY_BUCKETS: Tuple[float, ...] = (0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+DEFAULT_SUMMARY_INTERVAL_SECONDS = 30.0
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def resolve_summary_interval(default: float = DEFAULT_SUMMARY_INTERVAL_SECONDS) -> float:
+    raw = os.getenv("DPR_METRICS_SUMMARY_SECONDS")
+    if not raw:
+        return default
+    try:
+        return max(0.0, float(raw))
+    except Exception:
+        return default
+
+
+class _Histogram:
+    __slots__ = ("count", "total", "min", "max", "bucket_counts")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+        self.bucket_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        for idx, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                self.bucket_counts[idx] += 1
+                return
+        self.bucket_counts[-1] += 1
+
+    def quantile(self, q: float) -> float:
+        """按桶上界估算分位数（落在最后一个开区间桶时返回 max）。"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for idx, bucket_count in enumerate(self.bucket_counts):
+            seen += bucket_count
+            if seen >= target:
+                if idx < len(LATENCY_BUCKETS):
+                    return min(LATENCY_BUCKETS[idx], self.max)
+                return self.max
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        buckets = {f"le_{bound:g}": count for bound, count in zip(LATENCY_BUCKETS, self.bucket_counts)}
+        buckets["le_inf"] = self.bucket_counts[-1]
+        return {
+            "count": self.count,
+            "sum": round(self.total, 4),
+            "min": round(self.min, 4) if self.count else 0.0,
+            "max": round(self.max, 4),
+            "avg": round(self.total / self.count, 4) if self.count else 0.0,
+            "p50": round(self.quantile(0.5), 4),
+            "p95": round(self.quantile(0.95), 4),
+            "buckets": buckets,
+        }
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, LabelKey], float] = {}
+        self._histograms: Dict[Tuple[str, LabelKey], _Histogram] = {}
+        self._info: Dict[str, Any] = {}
+        self._default_labels: Dict[str, str] = {}
+        self._started_at = time.time()
+        self._last_summary_at = time.time()
+
+    def _key(self, name: str, labels: Dict[str, Any]) -> Tuple[str, LabelKey]:
+        merged = dict(self._default_labels)
+        merged.update({k: str(v) for k, v in labels.items() if v is not None})
+        return name, tuple(sorted(merged.items()))
+
+    def set_default_labels(self, **labels: Any) -> None:
+        with self._lock:
+            self._default_labels = {k: str(v) for k, v in labels.items() if v is not None}
+
+    def inc(self, name: str, value: float = 1, **labels: Any) -> None:
+        with self._lock:
+            key = self._key(name, labels)
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        with self._lock:
+            key = self._key(name, labels)
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = _Histogram()
+            hist.observe(float(value))
+
+    @contextmanager
+    def timer(self, name: str, **labels: Any) -> Iterator[None]:
+        """把 with 块的耗时记入直方图 name（异常退出也记录）。"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def set_info(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._info[key] = value
+
+    def counter_total(self, name: str) -> float:
+        with self._lock:
+            return sum(value for (metric, _), value in self._counters.items() if metric == name)
+
+    def histogram_sum(self, name: str) -> float:
+        with self._lock:
+            return sum(hist.total for (metric, _), hist in self._histograms.items() if metric == name)
+
+    def histogram_sums_by(self, name: str, label: str) -> Dict[str, float]:
+        """按某个 label 汇总直方图 name 的累计值（例如按 stage 统计各阶段忙碌秒数）。"""
+        out: Dict[str, float] = {}
+        with self._lock:
+            for (metric, labels), hist in self._histograms.items():
+                if metric != name:
+                    continue
+                value = dict(labels).get(label, "")
+                out[value] = out.get(value, 0.0) + hist.total
+        return out
+
+    def reset(self, names: Optional[List[str]] = None) -> None:
+        with self._lock:
+            if names is None:
+                self._counters.clear()
+                self._histograms.clear()
+                self._info.clear()
+                self._started_at = time.time()
+                return
+            wanted = set(names)
+            self._counters = {k: v for k, v in self._counters.items() if k[0] not in wanted}
+            self._histograms = {k: v for k, v in self._histograms.items() if k[0] not in wanted}
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            elapsed = time.time() - self._started_at
+            return {
+                "generated_at": datetime.now(timezone.utc).isoformat(),
+                "elapsed_seconds": round(elapsed, 3),
+                "labels": dict(self._default_labels),
+                "info": dict(self._info),
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in sorted(self._counters.items())
+                ],
+                "histograms": [
+                    {"name": name, "labels": dict(labels), **hist.to_dict()}
+                    for (name, labels), hist in sorted(self._histograms.items(), key=lambda item: item[0])
+                ],
+            }
+
+    def summary_line(self) -> str:
+        with self._lock:
+            calls = sum(v for (n, _), v in self._counters.items() if n == "llm_calls")
+            errors = sum(v for (n, _), v in self._counters.items() if n == "llm_errors")
+            prompt = sum(v for (n, _), v in self._counters.items() if n == "llm_tokens_prompt")
+            completion = sum(
+                v for (n, _), v in self._counters.items() if n in ("llm_tokens_content", "llm_tokens_thinking")
+            )
+            cache_hit = sum(v for (n, _), v in self._counters.items() if n == "llm_tokens_cache_hit")
+            merged = _Histogram()
+            for (n, _), hist in self._histograms.items():
+                if n != "llm_latency_seconds":
+                    continue
+                merged.count += hist.count
+                merged.total += hist.total
+                merged.max = max(merged.max, hist.max)
+                merged.bucket_counts = [a + b for a, b in zip(merged.bucket_counts, hist.bucket_counts)]
+            elapsed = max(1e-6, time.time() - self._started_at)
+            stage = self._default_labels.get("stage", "-")
+        hit_rate = cache_hit / prompt * 100.0 if prompt else 0.0
+        return (
+            f"[metrics][{stage}] llm_calls={int(calls)} errors={int(errors)} "
+            f"rate={calls / elapsed * 60:.1f}/min tokens_in={int(prompt)} tokens_out={int(completion)} "
+            f"cache_hit={hit_rate:.1f}% p50={merged.quantile(0.5):.2f}s p95={merged.quantile(0.95):.2f}s "
+            f"elapsed={elapsed:.0f}s"
+        )
+
+    def maybe_log_summary(
+        self,
+        interval: Optional[float] = None,
+        printer: Callable[[str], None] = print,
+    ) -> bool:
+        """距上次输出超过 interval 秒才打印一行汇总；并发调用时只有一个线程会输出。"""
+        wait = resolve_summary_interval() if interval is None else interval
+        now = time.time()
+        with self._lock:
+            if now - self._last_summary_at < wait:
+                return False
+            self._last_summary_at = now
+        printer(self.summary_line())
+        return True
+
+    def dump_json(self, path: str) -> str:
+        payload = self.snapshot()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+        return path
+
+
+REGISTRY = MetricsRegistry()
+_exit_dump_lock = threading.Lock()
+_exit_dump_paths: List[str] = []
+
+
+def _dump_at_exit() -> None:
+    with _exit_dump_lock:
+        paths = list(_exit_dump_paths)
+    if not paths:
+        return
+    print(REGISTRY.summary_line(), flush=True)
+    for path in paths:
+        try:
+            REGISTRY.dump_json(path)
+            print(f"[metrics] saved: {path}", flush=True)
+        except Exception as exc:
+            print(f"[metrics] failed to save {path}: {exc}", flush=True)
+
+
+def configure_run_metrics(stage: str, dump_path: Optional[str] = None) -> MetricsRegistry:
+    """
+    由各 Step 入口调用：设置 stage 标签，并在进程退出时把快照写入 dump_path。
+    """
+    REGISTRY.set_default_labels(stage=stage)
+    if dump_path:
+        with _exit_dump_lock:
+            if not _exit_dump_paths:
+                atexit.register(_dump_at_exit)
+            if dump_path not in _exit_dump_paths:
+                _exit_dump_paths.append(dump_path)
+    return REGISTRY
@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+# Supabase 论文行的本地 sqlite 读穿缓存（按 updated_at 增量同步）
+
+"""
+每天的召回窗口与前一天大部分重叠，但 fetch_papers_by_date_range 每次都会把整个窗口的
+元数据（可选含 embedding）重新拉一遍。这里把 Supabase 论文行镜像到本地 sqlite：
+
+- papers：按 (scope, id) 存一行归一化后的论文 JSON，附 published 时间戳与 updated_at
+- sync_state：每个 scope 一段“已完整镜像”的 published 区间 [covered_start, covered_end)，
+  以及上次同步的时间点 last_sync（下次只拉覆盖区间内 updated_at >= last_sync 的增量）
+- scope 由 cache_scope(url, schema, table) 生成：多个 Supabase 项目 / schema 共用一个缓存文件时互不干扰
+
+读取窗口时：先做增量同步，再补拉窗口中尚未覆盖的部分（最多首尾两段），最后从本地返回。
+服务端删除的行不会被同步（清理只删除过期论文，窗口外的行不会被读到）。
+
+环境变量：
+- DPR_PAPER_CACHE_PATH：缓存文件路径；未设置时不启用缓存
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+from contextlib import closing
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+_SCHEMA = """
+create table if not exists papers (
+    tbl text not null,
+    id text not null,
+    published_ts real,
+    updated_at text,
+    row_json text not null,
+    primary key (tbl, id)
+);
+create index if not exists papers_tbl_published_idx on papers (tbl, published_ts);
+create index if not exists papers_id_idx on papers (id);
+create table if not exists sync_state (
+    tbl text primary key,
+    covered_start real not null,
+    covered_end real not null,
+    last_sync text not null,
+    with_embedding integer not null default 0
+);
+"""
+
+# 缓存文件格式版本：v2 起 tbl 列存 scope（url + schema + 表名），旧版按表名存的数据整体丢弃
+CACHE_SCHEMA_VERSION = 2
+
+_EMBEDDING_DEFAULTS = {"embedding": None, "embedding_model": "", "embedding_dim": 0, "embedding_updated_at": ""}
+
+
+def resolve_paper_cache_path() -> str:
+    raw = str(os.getenv("DPR_PAPER_CACHE_PATH") or "").strip()
+    return os.path.expanduser(raw) if raw else ""
+
+
+def cache_scope(url: str, schema: str, table: str) -> str:
+    """缓存分区键：Supabase 项目地址（去掉 /rest/v1 与末尾斜杠）+ schema + 表名。"""
+    base = str(url or "").strip().rstrip("/")
+    if base.endswith("/rest/v1"):
+        base = base[: -len("/rest/v1")]
+    return f"{base}|{str(schema or 'public').strip() or 'public'}|{str(table or '').strip()}"
+
+
+def _ts(dt: datetime) -> float:
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+@dataclass
+class SyncState:
+    covered_start: float
+    covered_end: float
+    last_sync: str
+    with_embedding: bool
+
+    def touches(self, start_ts: float, end_ts: float) -> bool:
+        """窗口与已覆盖区间重叠或首尾相接（可以合并成一段连续区间）。"""
+        return start_ts <= self.covered_end and end_ts >= self.covered_start
+
+
+class PaperCache:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)) or ".", exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.executescript(_SCHEMA)
+            version = int(conn.execute("pragma user_version").fetchone()[0] or 0)
+            if version != CACHE_SCHEMA_VERSION:
+                conn.execute("delete from papers")
+                conn.execute("delete from sync_state")
+                conn.execute(f"pragma user_version = {CACHE_SCHEMA_VERSION}")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get_state(self, scope: str) -> Optional[SyncState]:
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "select covered_start, covered_end, last_sync, with_embedding from sync_state where tbl = ?",
+                (scope,),
+            ).fetchone()
+        if not row:
+            return None
+        return SyncState(float(row[0]), float(row[1]), str(row[2] or ""), bool(row[3]))
+
+    def set_state(self, scope: str, state: SyncState) -> None:
+        with self._lock, closing(self._connect()) as conn, conn:
+            conn.execute(
+                "insert or replace into sync_state (tbl, covered_start, covered_end, last_sync, with_embedding) "
+                "values (?, ?, ?, ?, ?)",
+                (scope, state.covered_start, state.covered_end, state.last_sync, int(state.with_embedding)),
+            )
+
+    def reset(self, scope: str) -> None:
+        """丢弃某个 scope 的覆盖区间（下次读取时整窗重拉）。"""
+        with self._lock, closing(self._connect()) as conn, conn:
+            conn.execute("delete from sync_state where tbl = ?", (scope,))
+
+    def prune_outside(self, scope: str, start_ts: float, end_ts: float) -> int:
+        with self._lock, closing(self._connect()) as conn, conn:
+            cur = conn.execute(
+                "delete from papers where tbl = ? and (published_ts is null or published_ts < ? or published_ts >= ?)",
+                (scope, start_ts, end_ts),
+            )
+            return int(cur.rowcount or 0)
+
+    def upsert(self, scope: str, rows: Iterable[Dict[str, Any]], *, parse_ts) -> int:
+        """
+        写入归一化后的论文行。parse_ts(value) -> datetime | None 用于解析 published。
+        已有 embedding 的行被不含 embedding 的新行覆盖时保留旧 embedding（模型未变时仍可复用）。
+        """
+        payload: List[Tuple[str, str, Optional[float], str, str]] = []
+        for row in rows:
+            pid = str(row.get("id") or "").strip()
+            if not pid:
+                continue
+            dt = parse_ts(row.get("published"))
+            payload.append(
+                (
+                    scope,
+                    pid,
+                    _ts(dt) if dt else None,
+                    str(row.get("updated_at") or ""),
+                    json.dumps(row, ensure_ascii=False),
+                )
+            )
+        if not payload:
+            return 0
+        with self._lock, closing(self._connect()) as conn, conn:
+            for tbl, pid, published_ts, updated_at, row_json in payload:
+                new_row = json.loads(row_json)
+                if new_row.get("embedding") is None:
+                    old = conn.execute("select row_json from papers where tbl = ? and id = ?", (tbl, pid)).fetchone()
+                    if old:
+                        old_row = json.loads(old[0])
+                        if old_row.get("embedding") is not None:
+                            for key in _EMBEDDING_DEFAULTS:
+                                new_row[key] = old_row.get(key)
+                            row_json = json.dumps(new_row, ensure_ascii=False)
+                conn.execute(
+                    "insert or replace into papers (tbl, id, published_ts, updated_at, row_json) values (?, ?, ?, ?, ?)",
+                    (tbl, pid, published_ts, updated_at, row_json),
+                )
+        return len(payload)
+
+    def read_window(
+        self,
+        scope: str,
+        start_dt: datetime,
+        end_dt: datetime,
+        *,
+        include_embedding: bool,
+        limit: int,
+    ) -> List[Dict[str, Any]]:
+        """按 published 倒序（同刻再按 id 倒序）返回窗口内的缓存行，与远端 keyset 顺序一致。"""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "select row_json from papers where tbl = ? and published_ts >= ? and published_ts < ? "
+                "order by published_ts desc, id desc limit ?",
+                (scope, _ts(start_dt), _ts(end_dt), max(int(limit), 0)),
+            ).fetchall()
+        out: List[Dict[str, Any]] = []
+        for (row_json,) in rows:
+            item = json.loads(row_json)
+            if not include_embedding:
+                item.update(_EMBEDDING_DEFAULTS)
+            out.append(item)
+        return out
+
+    def get_papers(self, paper_ids: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        """按 id 跨表查找缓存行（不含 embedding），供 Step 6 / 会议侧栏补全元数据。"""
+        ids = [str(pid or "").strip() for pid in paper_ids if str(pid or "").strip()]
+        found: Dict[str, Dict[str, Any]] = {}
+        if not ids:
+            return found
+        with closing(self._connect()) as conn:
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                marks = ",".join("?" for _ in chunk)
+                for pid, row_json in conn.execute(
+                    f"select id, row_json from papers where id in ({marks}) order by updated_at", chunk
+                ):
+                    item = json.loads(row_json)
+                    item.update(_EMBEDDING_DEFAULTS)
+                    found[str(pid)] = item
+        return found
+
+
+_cache_lock = threading.Lock()
+_cache: PaperCache | None = None
+_cache_path = ""
+
+
+def get_paper_cache() -> PaperCache | None:
+    """进程内共享的论文缓存；DPR_PAPER_CACHE_PATH 未设置或打开失败时返回 None。"""
+    global _cache, _cache_path
+    path = resolve_paper_cache_path()
+    if not path:
+        return None
+    with _cache_lock:
+        if _cache is None or _cache_path != path:
+            try:
+                _cache = PaperCache(path)
+                _cache_path = path
+            except Exception as exc:
+                print(f"[WARN] 本地论文缓存不可用（{path}）：{exc}", flush=True)
+                return None
+        return _cache
+
+
+def lookup_cached_papers(paper_ids: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+    cache = get_paper_cache()
+    if cache is None:
+        return {}
+    try:
+        return cache.get_papers(paper_ids)
+    except Exception as exc:
+        print(f"[WARN] 读取本地论文缓存失败：{exc}", flush=True)
+        return {}
@@ -12,9 +12,23 @@ import tempfile
 from typing import Any, Dict, List, Tuple
 
 import fitz
-import requests
 from PIL import Image
 
+try:
+    from pdf_cache import fetch_pdf_bytes, pdf_file
+except Exception:  # pragma: no cover
+    from src.pdf_cache import fetch_pdf_bytes, pdf_file
+
+try:
+    from cpu_pool import run_cpu
+except Exception:  # pragma: no cover
+    from src.cpu_pool import run_cpu
+
+try:
+    from papercropper_worker import PaperCropperUnavailable, get_papercropper_pool
+except Exception:  # pragma: no cover
+    from src.papercropper_worker import PaperCropperUnavailable, get_papercropper_pool
+
 
 MIN_FIGURE_WIDTH = 240
 MIN_FIGURE_HEIGHT = 180
@@ -55,6 +69,14 @@ def _absolute_tables_dir(docs_dir: str, source_key: str, asset_key: str) -> str:
     return os.path.join(docs_dir, "assets", "tables", source_key, _safe_asset_key(asset_key))
 
 
+def paper_media_meta_paths(docs_dir: str, source_key: str, asset_key: str) -> Tuple[str, str]:
+    """图 / 表 meta.json 路径；文件存在表示该论文已完成过一次抽取（结果可能为空）。"""
+    return (
+        os.path.join(_absolute_dir(docs_dir, source_key, asset_key), "meta.json"),
+        os.path.join(_absolute_tables_dir(docs_dir, source_key, asset_key), "meta.json"),
+    )
+
+
 def _load_cached_media(meta_path: str, key: str) -> List[Dict[str, Any]]:
     if not os.path.exists(meta_path):
         return []
@@ -138,13 +160,8 @@ def _papercropper_was_configured() -> bool:
 
 
 def _download_pdf_bytes(pdf_url: str, timeout: int = 90) -> bytes:
-    resp = requests.get(
-        str(pdf_url or "").strip(),
-        headers={"User-Agent": "Mozilla/5.0"},
-        timeout=max(int(timeout or 1), 1),
-    )
-    resp.raise_for_status()
-    return resp.content
+    # 经由共享 PDF 缓存：正文回退抽取与图表抽取不再重复下载同一 PDF
+    return fetch_pdf_bytes(pdf_url, timeout=timeout)
 
 
 def _truthy_env(name: str) -> bool:
@@ -272,6 +289,65 @@ def _collect_papercropper_pngs(
     return items
 
 
+def _run_papercropper_subprocess(
+    python_path: str,
+    script_path: str,
+    model_path: str,
+    pdf_path: str,
+    output_dir: str,
+    *,
+    timeout: int,
+    options: List[str],
+) -> Tuple[str, bool]:
+    """旧路径：为单篇 PDF 起一个 extract.py 子进程，返回 (输出日志, 是否成功)。"""
+    conf, imgsz, dpi, png_dpi, batch_size, padding = options
+    cmd = [
+        python_path,
+        script_path,
+        "--pdf",
+        pdf_path,
+        "--model",
+        model_path,
+        "--output",
+        output_dir,
+        "--formats",
+        "png",
+        "--targets",
+        "figure,table",
+        "--conf",
+        conf,
+        "--imgsz",
+        imgsz,
+        "--dpi",
+        dpi,
+        "--png-dpi",
+        png_dpi,
+        "--batch-size",
+        batch_size,
+        "--padding",
+        padding,
+    ]
+    try:
+        proc = subprocess.run(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            timeout=max(timeout, 30),
+            check=False,
+        )
+    except subprocess.TimeoutExpired:
+        _warn_papercropper(f"执行超时（>{max(timeout, 30)}s），改用备用图片提取器。")
+        return "", False
+    run_log = "\n".join([proc.stdout or "", proc.stderr or ""])
+    if proc.returncode != 0:
+        detail = _tail_log_text(run_log)
+        suffix = f"；输出：{detail}" if detail else ""
+        _warn_papercropper(f"执行失败 returncode={proc.returncode}{suffix}")
+        return run_log, False
+    return run_log, True
+
+
 def _extract_media_with_papercropper(
     pdf_path: str,
     figure_output_dir: str,
@@ -294,49 +370,41 @@ def _extract_media_with_papercropper(
     padding = str(os.getenv("PAPERCROPPER_PADDING") or "2.0")
 
     with tempfile.TemporaryDirectory(prefix="papercropper_") as tmp_root:
-        cmd = [
+        run_log = ""
+        handled = False
+        # 优先交给常驻 worker（模型只加载一次）；worker 不可用时退回每篇一个子进程
+        pool = get_papercropper_pool(
             python_path,
-            script_path,
-            "--pdf",
-            pdf_path,
-            "--model",
             model_path,
-            "--output",
-            tmp_root,
-            "--formats",
-            "png",
-            "--targets",
-            "figure,table",
-            "--conf",
-            conf,
-            "--imgsz",
-            imgsz,
-            "--dpi",
-            dpi,
-            "--png-dpi",
-            png_dpi,
-            "--batch-size",
-            batch_size,
-            "--padding",
-            padding,
-        ]
-        try:
-            proc = subprocess.run(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                timeout=max(timeout, 30),
-                check=False,
+            {"conf": conf, "imgsz": imgsz, "dpi": dpi, "png_dpi": png_dpi, "batch_size": batch_size, "padding": padding},
+        )
+        if pool is not None:
+            try:
+                reply = pool.extract(pdf_path, tmp_root, timeout=max(timeout, 30))
+            except TimeoutError:
+                _warn_papercropper(f"执行超时（>{max(timeout, 30)}s），改用备用图片提取器。")
+                return [], []
+            except PaperCropperUnavailable as exc:
+                _warn_papercropper(f"常驻 worker 不可用，改为单次子进程：{_tail_log_text(str(exc))}")
+            else:
+                if not reply.get("ok"):
+                    _warn_papercropper(f"执行失败：{_tail_log_text(str(reply.get('error') or ''))}")
+                    return [], []
+                handled = True
+                run_log = f"batch_jobs={reply.get('batch_jobs')} batch_seconds={reply.get('batch_seconds')}"
+
+        if not handled:
+            run_log, ok = _run_papercropper_subprocess(
+                python_path,
+                script_path,
+                model_path,
+                pdf_path,
+                tmp_root,
+                timeout=timeout,
+                options=[conf, imgsz, dpi, png_dpi, batch_size, padding],
             )
-        except subprocess.TimeoutExpired:
-            _warn_papercropper(f"执行超时（>{max(timeout, 30)}s），改用备用图片提取器。")
-            return [], []
-        if proc.returncode != 0:
-            detail = _tail_log_text("\n".join([proc.stdout or "", proc.stderr or ""]))
-            suffix = f"；输出：{detail}" if detail else ""
-            _warn_papercropper(f"执行失败 returncode={proc.returncode}{suffix}")
-            return [], []
+            if not ok:
+                return [], []
 
         doc_output = os.path.join(tmp_root, os.path.splitext(os.path.basename(pdf_path))[0])
         figures = _collect_papercropper_pngs(
@@ -358,7 +426,7 @@ def _extract_media_with_papercropper(
         if tables:
             _save_tables_meta(os.path.join(table_output_dir, "meta.json"), tables, extractor="papercropper")
         if not figures and not tables:
-            detail = _tail_log_text("\n".join([proc.stdout or "", proc.stderr or ""]))
+            detail = _tail_log_text(run_log)
             suffix = f"；输出：{detail}" if detail else ""
             _warn_papercropper(f"执行完成但未产出 figure/table{suffix}")
         else:
@@ -366,6 +434,17 @@ def _extract_media_with_papercropper(
         return figures, tables
 
 
+def extract_pdf_text(pdf_path: str) -> str:
+    doc = fitz.open(pdf_path)
+    texts = []
+    try:
+        for page in doc:
+            texts.append(page.get_text("text"))
+    finally:
+        doc.close()
+    return "\n\n".join(texts)
+
+
 def extract_figures_from_pdf(
     pdf_path: str,
     output_dir: str,
@@ -471,8 +550,7 @@ def ensure_paper_media(
     table_dir = _absolute_tables_dir(docs_dir, source_key, asset_key)
     figure_relative_prefix = _relative_prefix(source_key, asset_key)
     table_relative_prefix = _relative_tables_prefix(source_key, asset_key)
-    figure_meta_path = os.path.join(figure_dir, "meta.json")
-    table_meta_path = os.path.join(table_dir, "meta.json")
+    figure_meta_path, table_meta_path = paper_media_meta_paths(docs_dir, source_key, asset_key)
     if not force:
         cached_figures = _load_cached_figures(figure_meta_path)
         cached_tables = _load_cached_tables(table_meta_path)
@@ -481,13 +559,9 @@ def ensure_paper_media(
         if (cached_figures or os.path.exists(figure_meta_path)) and os.path.exists(table_meta_path):
             return cached_figures, cached_tables
 
-    pdf_bytes = _download_pdf_bytes(pdf_url)
-    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=True) as tmp_pdf:
-        tmp_pdf.write(pdf_bytes)
-        tmp_pdf.flush()
-
+    with pdf_file(pdf_url) as pdf_path:
         figures, tables = _extract_media_with_papercropper(
-            tmp_pdf.name,
+            pdf_path,
             figure_dir,
             figure_relative_prefix,
             table_dir,
@@ -496,4 +570,5 @@ def ensure_paper_media(
         if figures or tables:
             return figures, tables
 
-        return extract_figures_from_pdf(tmp_pdf.name, figure_dir, figure_relative_prefix), []
+        # 图片解码 + WEBP 编码是纯 CPU 工作，交给进程池，避免与 LLM 线程争抢 GIL
+        return run_cpu("figure_extract", extract_figures_from_pdf, pdf_path, figure_dir, figure_relative_prefix), []
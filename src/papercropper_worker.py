@@ -0,0 +1,479 @@
+#!/usr/bin/env python
+# PaperCropper 常驻 worker：模型只加载一次，跨论文按页批量推理
+
+"""
+旧流程每篇 PDF 都起一个 extract.py 子进程，每次都重新加载 DocLayout-YOLO 模型。
+这里把它换成常驻 worker（每次 Step 6 / 会议运行启动一次）：
+
+- worker 端（以 PaperCropper 的 Python 解释器运行本文件）：加载 YOLOv10 模型后输出 ready，
+  之后从 stdin 逐行读取 JSON 任务 {"id", "pdf", "output"}；一次取走所有已到达的任务，
+  逐个回报 {"event": "accepted", "id", "batch"}，再把它们的页面拼成一个页面序列按 batch_size
+  批量推理，裁剪 figure / table 写成 <output>/<pdf 文件名>/Figures_png|Tables_png/*.png
+  （与 extract.py 的输出布局一致），每篇处理完在 stdout 回一行 JSON
+- 客户端（PaperCropperPool）：懒启动 PAPERCROPPER_WORKERS 个 worker（默认 1，0 关闭），
+  按在途任务数挑选 worker，读线程按 id 分发结果；worker 启动失败或中途退出时抛
+  PaperCropperUnavailable，由调用方退回"每篇一个子进程"的旧路径
+- 超时：每篇的处理时限从 worker 接手（accepted）开始计，同批 n 篇共用 n 倍时限；排队等待
+  按前面的任务数放宽。超时只让这一篇失败：该 worker 不再接新任务（关闭 stdin，已排队的任务
+  照常完成后自行退出），后续任务由新 worker 处理
+"""
+
+from __future__ import annotations
+
+import argparse
+import atexit
+import json
+import os
+import select
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+try:
+    from metrics import REGISTRY as METRICS
+except Exception:  # pragma: no cover - 兼容 package 导入路径（worker 端也可能没有 metrics）
+    try:
+        from src.metrics import REGISTRY as METRICS
+    except Exception:
+        METRICS = None
+
+
+WORKER_SCRIPT = os.path.abspath(__file__)
+DEFAULT_START_TIMEOUT_SECONDS = 300
+DEFAULT_MAX_JOBS_PER_BATCH = 4
+STDERR_TAIL_LINES = 40
+TARGET_DIRS = {"figure": "Figures_png", "table": "Tables_png"}
+
+
+class PaperCropperUnavailable(RuntimeError):
+    """worker 无法启动或已退出：调用方应退回每篇一个子进程的旧路径。"""
+
+
+# ---------------------------------------------------------------------------
+# 客户端
+# ---------------------------------------------------------------------------
+
+
+class PaperCropperWorker:
+    def __init__(self, cmd: Sequence[str], *, start_timeout: float = DEFAULT_START_TIMEOUT_SECONDS) -> None:
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Future] = {}
+        self._stderr_tail: deque = deque(maxlen=STDERR_TAIL_LINES)
+        self._accepted: Dict[str, threading.Event] = {}
+        self._batch_sizes: Dict[str, int] = {}
+        self._ready = threading.Event()
+        self._start_error = ""
+        self.alive = True
+        self.retired = False
+        self.proc = subprocess.Popen(
+            list(cmd),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+        )
+        threading.Thread(target=self._read_stdout, name="papercropper-stdout", daemon=True).start()
+        threading.Thread(target=self._read_stderr, name="papercropper-stderr", daemon=True).start()
+        if not self._ready.wait(max(float(start_timeout), 1.0)):
+            self.close()
+            raise PaperCropperUnavailable(f"worker 启动超时（>{start_timeout:.0f}s）")
+        if self._start_error:
+            self.close()
+            raise PaperCropperUnavailable(self._start_error)
+
+    @property
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def stderr_tail(self) -> str:
+        return "\n".join(self._stderr_tail)
+
+    def _read_stderr(self) -> None:
+        assert self.proc.stderr is not None
+        for line in self.proc.stderr:
+            self._stderr_tail.append(line.rstrip("\n"))
+
+    def _read_stdout(self) -> None:
+        assert self.proc.stdout is not None
+        for line in self.proc.stdout:
+            try:
+                msg = json.loads(line)
+            except Exception:
+                continue
+            if msg.get("event") == "ready":
+                self._ready.set()
+                continue
+            if msg.get("event") == "error":
+                self._start_error = str(msg.get("error") or "worker 启动失败")
+                self._ready.set()
+                continue
+            if msg.get("event") == "accepted":
+                job_id = str(msg.get("id") or "")
+                with self._lock:
+                    accepted = self._accepted.get(job_id)
+                    if accepted is not None:
+                        self._batch_sizes[job_id] = max(int(msg.get("batch") or 1), 1)
+                if accepted is not None:
+                    accepted.set()
+                continue
+            with self._lock:
+                future = self._pending.pop(str(msg.get("id") or ""), None)
+            if future is not None and not future.done():
+                future.set_result(msg)
+        # stdout 关闭：worker 已退出，所有在途任务失败
+        self.proc.wait()
+        self.alive = False
+        if not self._ready.is_set():
+            self._start_error = self._start_error or f"worker 提前退出 returncode={self.proc.returncode}"
+            self._ready.set()
+        detail = self.stderr_tail()[-2000:]
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            waiting = list(self._accepted.values())
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(PaperCropperUnavailable(f"worker 已退出 returncode={self.proc.returncode}：{detail}"))
+        # 先让任务失败再唤醒等待接手的调用方，调用方据此区分“worker 退出”与“排队超时”
+        for accepted in waiting:
+            accepted.set()
+
+    def submit(self, pdf_path: str, output_dir: str) -> Tuple[str, Future]:
+        job_id = uuid.uuid4().hex
+        future: Future = Future()
+        with self._lock:
+            if not self.alive or self.retired:
+                raise PaperCropperUnavailable("worker 已退出")
+            self._pending[job_id] = future
+            self._accepted[job_id] = threading.Event()
+        try:
+            assert self.proc.stdin is not None
+            self.proc.stdin.write(json.dumps({"id": job_id, "pdf": pdf_path, "output": output_dir}) + "\n")
+            self.proc.stdin.flush()
+        except Exception as exc:
+            self.forget(job_id)
+            self.alive = False
+            raise PaperCropperUnavailable(f"无法向 worker 发送任务：{exc}") from exc
+        return job_id, future
+
+    def wait_accepted(self, job_id: str, timeout: float) -> Optional[int]:
+        """等待 worker 接手任务，返回同批任务数；超时返回 None（worker 退出时立即返回）。"""
+        with self._lock:
+            accepted = self._accepted.get(job_id)
+        if accepted is None or not accepted.wait(max(float(timeout), 0.0)):
+            return None
+        with self._lock:
+            return self._batch_sizes.get(job_id)
+
+    def forget(self, job_id: str) -> None:
+        """丢弃任务的登记；已放弃的任务之后到达的结果会被忽略。"""
+        with self._lock:
+            self._pending.pop(job_id, None)
+            self._accepted.pop(job_id, None)
+            self._batch_sizes.pop(job_id, None)
+
+    def retire(self) -> None:
+        """不再接新任务：关闭 stdin，worker 处理完已排队的任务后自行退出（不影响其它在途任务）。"""
+        with self._lock:
+            self.retired = True
+        try:
+            if self.proc.stdin:
+                self.proc.stdin.close()
+        except Exception:
+            pass
+
+    def close(self) -> None:
+        self.alive = False
+        try:
+            if self.proc.stdin:
+                self.proc.stdin.close()
+        except Exception:
+            pass
+        try:
+            self.proc.wait(timeout=10)
+        except Exception:
+            self.proc.kill()
+
+
+class PaperCropperPool:
+    def __init__(self, cmd: Sequence[str], *, workers: int = 1, start_timeout: float = DEFAULT_START_TIMEOUT_SECONDS) -> None:
+        self.cmd = list(cmd)
+        self.size = max(int(workers or 1), 1)
+        self.start_timeout = start_timeout
+        self._workers: List[PaperCropperWorker] = []
+        self._retired: List[PaperCropperWorker] = []
+        self._lock = threading.Lock()
+        self.broken = ""
+
+    def _pick_worker(self) -> PaperCropperWorker:
+        with self._lock:
+            if self.broken:
+                raise PaperCropperUnavailable(self.broken)
+            self._workers = [w for w in self._workers if w.alive and not w.retired]
+            idle = [w for w in self._workers if w.pending == 0]
+            if not idle and len(self._workers) < self.size:
+                try:
+                    worker = PaperCropperWorker(self.cmd, start_timeout=self.start_timeout)
+                except PaperCropperUnavailable as exc:
+                    # 启动失败（缺依赖 / 模型损坏）后本次运行不再重试，直接走旧路径
+                    self.broken = str(exc)
+                    raise
+                self._workers.append(worker)
+                return worker
+            if not self._workers:
+                raise PaperCropperUnavailable("没有可用的 worker")
+            return min(self._workers, key=lambda w: w.pending)
+
+    def _retire(self, worker: PaperCropperWorker) -> None:
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+                self._retired.append(worker)
+        worker.retire()
+
+    def extract(self, pdf_path: str, output_dir: str, *, timeout: float) -> Dict[str, Any]:
+        """
+        提交一篇 PDF 并等待结果；超时抛 TimeoutError。
+        时限从 worker 接手任务开始计（同批 n 篇为 n 倍），排队时长按前面的任务数放宽；
+        超时的 worker 不再接新任务，但不打断其它在途任务。
+        """
+        worker = self._pick_worker()
+        per_job = max(float(timeout), 1.0)
+        ahead = worker.pending
+        job_id, future = worker.submit(pdf_path, output_dir)
+        try:
+            batch = worker.wait_accepted(job_id, per_job * (ahead + 1))
+            if batch is None and not future.done():
+                self._retire(worker)
+                raise TimeoutError(f"PaperCropper 任务排队超时（前面 {ahead} 个任务）")
+            started = time.perf_counter()
+            try:
+                reply = future.result(timeout=per_job * max(batch or 1, 1))
+            except TimeoutError:
+                self._retire(worker)
+                raise
+        finally:
+            worker.forget(job_id)
+        if METRICS is not None:
+            METRICS.observe("papercropper_job_seconds", time.perf_counter() - started)
+        return reply
+
+    def close(self) -> None:
+        with self._lock:
+            workers, self._workers = self._workers + self._retired, []
+            self._retired = []
+        for worker in workers:
+            worker.close()
+
+
+_pool_lock = threading.Lock()
+_pool: PaperCropperPool | None = None
+_pool_key: Tuple[str, ...] = ()
+
+
+def resolve_worker_count() -> int:
+    raw = os.getenv("PAPERCROPPER_WORKERS")
+    if raw is None or not str(raw).strip():
+        return 1
+    try:
+        return max(int(raw), 0)
+    except Exception:
+        return 1
+
+
+def build_worker_cmd(python_path: str, model_path: str, options: Dict[str, str]) -> List[str]:
+    cmd = [python_path, WORKER_SCRIPT, "--model", model_path]
+    for key in ("conf", "imgsz", "dpi", "png_dpi", "batch_size", "padding"):
+        if key in options:
+            cmd.extend([f"--{key.replace('_', '-')}", str(options[key])])
+    return cmd
+
+
+def get_papercropper_pool(python_path: str, model_path: str, options: Dict[str, str]) -> PaperCropperPool | None:
+    """进程内共享的 worker 池；PAPERCROPPER_WORKERS=0 或模型文件不存在时返回 None。"""
+    global _pool, _pool_key
+    workers = resolve_worker_count()
+    if workers <= 0 or not model_path or not os.path.exists(model_path):
+        return None
+    cmd = build_worker_cmd(python_path, model_path, options)
+    key = tuple(cmd) + (str(workers),)
+    with _pool_lock:
+        if _pool is not None and _pool_key == key and _pool.broken:
+            # 本次运行已确认 worker 起不来：不再重试，也不重复告警
+            return None
+        if _pool is None or _pool_key != key:
+            if _pool is not None:
+                _pool.close()
+            start_timeout = float(os.getenv("PAPERCROPPER_WORKER_START_TIMEOUT") or DEFAULT_START_TIMEOUT_SECONDS)
+            _pool = PaperCropperPool(cmd, workers=workers, start_timeout=start_timeout)
+            _pool_key = key
+        return _pool
+
+
+def reset_papercropper_pool() -> None:
+    global _pool, _pool_key
+    with _pool_lock:
+        pool, _pool, _pool_key = _pool, None, ()
+    if pool is not None:
+        pool.close()
+
+
+atexit.register(reset_papercropper_pool)
+
+
+# ---------------------------------------------------------------------------
+# worker 端
+# ---------------------------------------------------------------------------
+
+
+class _LineReader:
+    """基于 fd 的行读取：阻塞读第一行，之后非阻塞地把已到达的任务一次取完。"""
+
+    def __init__(self, fd: int) -> None:
+        self.fd = fd
+        self.buf = b""
+        self.eof = False
+
+    def readline(self, block: bool) -> Optional[str]:
+        while b"\n" not in self.buf and not self.eof:
+            if not block and not select.select([self.fd], [], [], 0)[0]:
+                return None
+            chunk = os.read(self.fd, 65536)
+            if not chunk:
+                self.eof = True
+                break
+            self.buf += chunk
+        if b"\n" in self.buf:
+            line, self.buf = self.buf.split(b"\n", 1)
+            return line.decode("utf-8")
+        if self.buf:
+            line, self.buf = self.buf, b""
+            return line.decode("utf-8")
+        return None
+
+
+def _run_jobs(model: Any, jobs: List[Dict[str, Any]], args: argparse.Namespace) -> List[Dict[str, Any]]:
+    import fitz
+    from PIL import Image
+
+    replies: Dict[int, Dict[str, Any]] = {}
+    docs: Dict[int, Any] = {}
+    pages: List[Tuple[int, int]] = []
+    started = time.perf_counter()
+    for idx, job in enumerate(jobs):
+        replies[idx] = {"id": job.get("id"), "ok": True, "figures": 0, "tables": 0}
+        try:
+            doc = fitz.open(job["pdf"])
+        except Exception as exc:
+            replies[idx].update(ok=False, error=f"无法打开 PDF：{exc}")
+            continue
+        docs[idx] = doc
+        stem = os.path.splitext(os.path.basename(job["pdf"]))[0]
+        for sub in TARGET_DIRS.values():
+            os.makedirs(os.path.join(job["output"], stem, sub), exist_ok=True)
+        pages.extend((idx, pno) for pno in range(len(doc)))
+
+    scale = 72.0 / float(args.dpi)
+    batch = max(int(args.batch_size), 1)
+    # 不同论文的页面拼在同一序列里按 batch 推理，小论文也能填满一个 batch
+    for start in range(0, len(pages), batch):
+        chunk = [(idx, pno) for idx, pno in pages[start : start + batch] if replies[idx]["ok"]]
+        if not chunk:
+            continue
+        try:
+            images = []
+            for idx, pno in chunk:
+                pix = docs[idx][pno].get_pixmap(dpi=int(args.dpi))
+                images.append(Image.frombytes("RGB", (pix.width, pix.height), pix.samples))
+            preds = model.predict(images, imgsz=int(args.imgsz), conf=float(args.conf), verbose=False)
+            for (idx, pno), pred in zip(chunk, preds):
+                page = docs[idx][pno]
+                stem = os.path.splitext(os.path.basename(jobs[idx]["pdf"]))[0]
+                names = getattr(pred, "names", {}) or {}
+                boxes = pred.boxes
+                for k, (xyxy, cls) in enumerate(zip(boxes.xyxy.tolist(), boxes.cls.tolist()), start=1):
+                    label = str(names.get(int(cls), "")).strip().lower()
+                    if label not in TARGET_DIRS:
+                        continue
+                    x0, y0, x1, y1 = (float(v) * scale for v in xyxy)
+                    pad = float(args.padding)
+                    rect = fitz.Rect(x0 - pad, y0 - pad, x1 + pad, y1 + pad) & page.rect
+                    if rect.is_empty:
+                        continue
+                    crop = page.get_pixmap(dpi=int(args.png_dpi), clip=rect)
+                    out_path = os.path.join(jobs[idx]["output"], stem, TARGET_DIRS[label], f"page{pno + 1:03d}-{k:02d}.png")
+                    crop.save(out_path)
+                    replies[idx][f"{label}s"] += 1
+        except Exception as exc:
+            for idx, _ in chunk:
+                replies[idx].update(ok=False, error=f"{type(exc).__name__}: {exc}")
+
+    for doc in docs.values():
+        doc.close()
+    elapsed = round(time.perf_counter() - started, 3)
+    for reply in replies.values():
+        reply["batch_jobs"] = len(jobs)
+        reply["batch_seconds"] = elapsed
+    return [replies[idx] for idx in range(len(jobs))]
+
+
+def _worker_main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="PaperCropper 常驻 worker（由 paper_figures 启动）")
+    parser.add_argument("--model", required=True)
+    parser.add_argument("--conf", default="0.4")
+    parser.add_argument("--imgsz", default="1024")
+    parser.add_argument("--dpi", default="200")
+    parser.add_argument("--png-dpi", dest="png_dpi", default="260")
+    parser.add_argument("--batch-size", dest="batch_size", default="4")
+    parser.add_argument("--padding", default="2.0")
+    parser.add_argument("--max-jobs", dest="max_jobs", type=int, default=DEFAULT_MAX_JOBS_PER_BATCH)
+    args = parser.parse_args(argv)
+
+    # 协议走原 stdout；模型库的打印全部改道到 stderr，避免污染协议
+    proto = os.fdopen(os.dup(1), "w", buffering=1, encoding="utf-8")
+    os.dup2(2, 1)
+    sys.stdout = sys.stderr
+
+    def send(msg: Dict[str, Any]) -> None:
+        proto.write(json.dumps(msg, ensure_ascii=False) + "\n")
+        proto.flush()
+
+    try:
+        from doclayout_yolo import YOLOv10
+
+        model = YOLOv10(args.model)
+    except Exception as exc:
+        send({"event": "error", "error": f"{type(exc).__name__}: {exc}"})
+        return 1
+    send({"event": "ready"})
+
+    reader = _LineReader(sys.stdin.fileno())
+    while True:
+        line = reader.readline(block=True)
+        if line is None:
+            return 0
+        jobs: List[Dict[str, Any]] = []
+        while line is not None:
+            if line.strip():
+                try:
+                    jobs.append(json.loads(line))
+                except Exception:
+                    pass
+            if len(jobs) >= max(args.max_jobs, 1):
+                break
+            line = reader.readline(block=False)
+        if jobs:
+            for job in jobs:
+                send({"event": "accepted", "id": job.get("id"), "batch": len(jobs)})
+            for reply in _run_jobs(model, jobs, args):
+                send(reply)
+
+
+if __name__ == "__main__":
+    raise SystemExit(_worker_main())
@@ -0,0 +1,314 @@
+#!/usr/bin/env python
+# PDF 本地缓存：正文抽取 / 图表抽取 / 会议精读共用，同一 PDF 只下载一次
+
+"""
+Step 6 同一篇论文的 PDF 会被多次下载：ensure_text_content 的 Jina 失败回退、
+paper_figures.ensure_paper_media 的图表抽取、会议链路 ensure_conference_media。
+这里提供一个按内容寻址的磁盘缓存：
+
+- urls/<sha1(规范化 URL)>.json：URL → 内容哈希、ETag / Last-Modified、抓取时间
+- objects/<sha256(内容)>.pdf：PDF 本体（不同 URL 指向同一内容时只存一份）
+- 超过 TTL 的条目用 If-None-Match / If-Modified-Since 条件请求复核，304 直接续期
+- 总大小超过上限时按最近使用时间（mtime）淘汰最旧对象
+- 同一 URL 并发请求只下载一次：进程内按 key 加锁，跨进程用 fcntl 文件锁
+
+环境变量：
+- DPR_PDF_CACHE_DIR：缓存目录（默认 ~/.cache/dpr/pdf；设为 off 关闭缓存）
+- DPR_PDF_CACHE_MAX_MB：缓存上限，默认 2048
+- DPR_PDF_CACHE_TTL_HOURS：超过该时长才做条件复核，默认 168
+"""
+
+from __future__ import annotations
+
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+import requests
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "dpr", "pdf")
+DEFAULT_MAX_MB = 2048
+DEFAULT_TTL_HOURS = 168
+# 最近 10 分钟内用过的对象不参与淘汰（可能正被其它线程 / 子进程按路径读取）
+EVICT_MIN_IDLE_SECONDS = 600
+USER_AGENT = "Mozilla/5.0"
+
+
+def _env_int(name: str, default: int) -> int:
+    raw = os.getenv(name)
+    if not raw:
+        return default
+    try:
+        return max(int(raw), 0)
+    except Exception:
+        return default
+
+
+def normalize_pdf_url(url: str) -> str:
+    """
+    规范化 PDF URL 作为缓存键：
+    - scheme / host 小写，去掉 fragment 与默认端口
+    - arXiv 的 abs 页面、export 镜像与 .pdf 后缀统一成 https://arxiv.org/pdf/<id>
+    """
+    text = str(url or "").strip()
+    if not text:
+        return ""
+    parts = urlsplit(text)
+    scheme = (parts.scheme or "https").lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and not ((scheme == "http" and parts.port == 80) or (scheme == "https" and parts.port == 443)):
+        host = f"{host}:{parts.port}"
+    path = parts.path or "/"
+    if host in ("arxiv.org", "www.arxiv.org", "export.arxiv.org"):
+        host = "arxiv.org"
+        scheme = "https"
+        if path.startswith("/abs/"):
+            path = "/pdf/" + path[len("/abs/"):]
+        if path.startswith("/pdf/") and path.endswith(".pdf"):
+            path = path[: -len(".pdf")]
+    return urlunsplit((scheme, host, path, parts.query, ""))
+
+
+class KeyedLocks:
+    """按键的进程内互斥锁；记录等待 / 持有者个数，最后一个释放时删除该键，字典不随 URL 数增长。"""
+
+    def __init__(self) -> None:
+        self._entries: Dict[str, list] = {}
+        self._guard = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._guard:
+            return len(self._entries)
+
+    @contextmanager
+    def hold(self, key: str) -> Iterator[None]:
+        with self._guard:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = [threading.Lock(), 0]
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._guard:
+                entry[1] -= 1
+                if entry[1] <= 0:
+                    self._entries.pop(key, None)
+
+
+class PdfCache:
+    def __init__(
+        self,
+        root: str,
+        *,
+        max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024,
+        ttl_seconds: float = DEFAULT_TTL_HOURS * 3600,
+        fetcher: Callable[..., Any] | None = None,
+    ) -> None:
+        self.root = root
+        self.max_bytes = max(int(max_bytes), 0)
+        self.ttl_seconds = max(float(ttl_seconds), 0.0)
+        self._fetch = fetcher or requests.get
+        self._objects_dir = os.path.join(root, "objects")
+        self._urls_dir = os.path.join(root, "urls")
+        self._locks_dir = os.path.join(root, "locks")
+        for path in (self._objects_dir, self._urls_dir, self._locks_dir):
+            os.makedirs(path, exist_ok=True)
+        self._key_locks = KeyedLocks()
+        self._evict_lock = threading.Lock()
+
+    # ---- 路径与元数据 ----
+    def _url_key(self, norm_url: str) -> str:
+        return hashlib.sha1(norm_url.encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self._urls_dir, f"{key}.json")
+
+    def object_path(self, content_hash: str) -> str:
+        return os.path.join(self._objects_dir, f"{content_hash}.pdf")
+
+    def _load_entry(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._entry_path(key), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except Exception:
+            return None
+        if not isinstance(entry, dict) or not os.path.exists(self.object_path(str(entry.get("content_hash") or ""))):
+            return None
+        return entry
+
+    def _save_entry(self, key: str, entry: Dict[str, Any]) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=self._urls_dir, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, self._entry_path(key))
+
+    def _store_object(self, content: bytes) -> str:
+        content_hash = hashlib.sha256(content).hexdigest()
+        path = self.object_path(content_hash)
+        if not os.path.exists(path):
+            fd, tmp_path = tempfile.mkstemp(dir=self._objects_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        return content_hash
+
+    @contextmanager
+    def _single_flight(self, key: str) -> Iterator[None]:
+        with self._key_locks.hold(key):
+            with open(os.path.join(self._locks_dir, f"{key}.lock"), "w") as lock_fd:
+                fcntl.flock(lock_fd, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_fd, fcntl.LOCK_UN)
+
+    # ---- 对外接口 ----
+    def get_path(self, url: str, *, timeout: int = 90) -> str:
+        """返回缓存中的 PDF 路径；未命中或过期时下载 / 条件复核。"""
+        norm_url = normalize_pdf_url(url)
+        if not norm_url:
+            raise ValueError("pdf_url 不能为空")
+        key = self._url_key(norm_url)
+        with self._single_flight(key):
+            entry = self._load_entry(key)
+            now = time.time()
+            if entry and now - float(entry.get("checked_at") or 0) < self.ttl_seconds:
+                path = self.object_path(entry["content_hash"])
+                os.utime(path, None)
+                return path
+
+            headers = {"User-Agent": USER_AGENT}
+            if entry and entry.get("etag"):
+                headers["If-None-Match"] = str(entry["etag"])
+            if entry and entry.get("last_modified"):
+                headers["If-Modified-Since"] = str(entry["last_modified"])
+            resp = self._fetch(str(url).strip(), headers=headers, timeout=max(int(timeout or 1), 1))
+            if entry and resp.status_code == 304:
+                entry["checked_at"] = now
+                self._save_entry(key, entry)
+                path = self.object_path(entry["content_hash"])
+                os.utime(path, None)
+                return path
+            resp.raise_for_status()
+            content = resp.content or b""
+            content_hash = self._store_object(content)
+            resp_headers = getattr(resp, "headers", None) or {}
+            self._save_entry(
+                key,
+                {
+                    "url": norm_url,
+                    "content_hash": content_hash,
+                    "size": len(content),
+                    "etag": resp_headers.get("ETag") or "",
+                    "last_modified": resp_headers.get("Last-Modified") or "",
+                    "fetched_at": now,
+                    "checked_at": now,
+                },
+            )
+        self.evict()
+        return self.object_path(content_hash)
+
+    def get_bytes(self, url: str, *, timeout: int = 90) -> bytes:
+        with open(self.get_path(url, timeout=timeout), "rb") as f:
+            return f.read()
+
+    def evict(self) -> int:
+        """总大小超过上限时按 mtime（最近使用）从旧到新删除对象，返回删除个数。"""
+        if self.max_bytes <= 0:
+            return 0
+        with self._evict_lock:
+            items = []
+            total = 0
+            for name in os.listdir(self._objects_dir):
+                if not name.endswith(".pdf"):
+                    continue
+                path = os.path.join(self._objects_dir, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                items.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+            if total <= self.max_bytes:
+                return 0
+            removed = 0
+            cutoff = time.time() - EVICT_MIN_IDLE_SECONDS
+            for mtime, size, path in sorted(items):
+                if total <= self.max_bytes or mtime >= cutoff:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                removed += 1
+            # urls/ 中指向已删除对象的条目在下次读取时按未命中处理
+            return removed
+
+
+_cache_lock = threading.Lock()
+_cache: PdfCache | None = None
+
+
+def get_pdf_cache() -> PdfCache | None:
+    """进程内共享的 PDF 缓存；DPR_PDF_CACHE_DIR=off 或目录不可写时返回 None。"""
+    global _cache
+    raw_dir = str(os.getenv("DPR_PDF_CACHE_DIR") or "").strip()
+    if raw_dir.lower() in ("0", "off", "false", "none"):
+        return None
+    root = os.path.expanduser(raw_dir) if raw_dir else DEFAULT_CACHE_DIR
+    with _cache_lock:
+        if _cache is None or _cache.root != root:
+            try:
+                _cache = PdfCache(
+                    root,
+                    max_bytes=_env_int("DPR_PDF_CACHE_MAX_MB", DEFAULT_MAX_MB) * 1024 * 1024,
+                    ttl_seconds=_env_int("DPR_PDF_CACHE_TTL_HOURS", DEFAULT_TTL_HOURS) * 3600,
+                )
+            except Exception as exc:
+                print(f"[WARN] PDF 缓存不可用（{root}）：{exc}", flush=True)
+                return None
+        return _cache
+
+
+def fetch_pdf_bytes(url: str, *, timeout: int = 90) -> bytes:
+    cache = get_pdf_cache()
+    if cache is not None:
+        return cache.get_bytes(url, timeout=timeout)
+    resp = requests.get(str(url or "").strip(), headers={"User-Agent": USER_AGENT}, timeout=max(int(timeout or 1), 1))
+    resp.raise_for_status()
+    return resp.content
+
+
+@contextmanager
+def pdf_file(url: str, *, timeout: int = 90) -> Iterator[str]:
+    """
+    以本地文件路径的形式提供 PDF：命中缓存时直接给缓存对象路径（只读使用），
+    关闭缓存时下载到临时文件并在退出时删除。
+    """
+    cache = get_pdf_cache()
+    if cache is not None:
+        yield cache.get_path(url, timeout=timeout)
+        return
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=True) as tmp_pdf:
+        tmp_pdf.write(fetch_pdf_bytes(url, timeout=timeout))
+        tmp_pdf.flush()
+        yield tmp_pdf.name
+
+
+def prefetch_pdf(url: str, *, timeout: int = 90) -> bool:
+    """提前把 PDF 拉进缓存（流水线的下载阶段用）；缓存关闭时什么也不做并返回 False。"""
+    cache = get_pdf_cache()
+    if cache is None or not str(url or "").strip():
+        return False
+    cache.get_path(url, timeout=timeout)
+    return True
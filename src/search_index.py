@@ -0,0 +1,285 @@
+#!/usr/bin/env python
+# docs 站点的预构建搜索索引：按月分片的倒排表 + 一份小清单，前端按需加载分片
+
+"""
+数据来源为 Step 6 每天写出的 papers.meta.json（不再读论文 md），产物放在 docs/_search/ 下，
+随 docs 一起提交并由 GitHub Pages 静态托管：
+
+- manifest.json：{"version", "fields", "shards": {YYYYMM: {"file", "count", "hash", "days": {...}}}}
+  days[key] 记录该日 papers.meta.json 的 sha256，用于增量判断
+- <YYYYMM>.json：{"version", "month", "docs": [[id, title, date, tags]], "terms": {token: [doc 下标...]}}
+  id 即论文路由（YYYYMM/DD/xxx），前端可直接拼出 #/ 链接；terms 覆盖标题 / 摘要 / 标签
+
+增量：只有日期的 papers.meta.json 内容哈希变化、日期新增或删除时才重新解析并重建对应月份分片。
+调用方传入本次改写过的日期（changed_days）时，只对这些日期与清单中尚未记录的日期计算哈希，
+其余日期沿用清单里的记录，启动 I/O 不随历史归档增长；全量重算只在 rehash_all 时进行。
+清单里不记录 mtime（git checkout 会重置 mtime，记录了反而每次运行都产生差异）；
+分片与清单内容未变时不重写文件，避免无意义的提交。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    from docs_catalog import DocsCatalog, day_key_path
+except Exception:  # pragma: no cover - 兼容 python -m src.xxx 的导入方式
+    from src.docs_catalog import DocsCatalog, day_key_path
+
+SEARCH_INDEX_VERSION = 1
+SEARCH_DIRNAME = "_search"
+SEARCH_MANIFEST_FILENAME = "manifest.json"
+DAY_META_FILENAME = "papers.meta.json"
+SEARCH_FIELDS = ("title_en", "abstract_en", "tags")
+
+_LATIN_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#.\-]*[a-z0-9+#]|[a-z0-9]")
+_CJK_RUN_RE = re.compile(r"[一-鿿]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in into is it its of on or our that the their this to via we with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    搜索分词：英文 / 数字按词切分并小写（保留 3d-gs、c++ 这类连接符），去掉停用词与单字符；
+    中文按相邻二字切分（单字串保留原字）。返回去重后的 token，保持首次出现顺序。
+    前端对查询词需使用同样的规则。
+    """
+    raw = str(text or "").lower()
+    tokens: List[str] = []
+    for m in _LATIN_TOKEN_RE.finditer(raw):
+        tok = m.group(0)
+        if len(tok) < 2 or tok in _STOPWORDS:
+            continue
+        tokens.append(tok)
+        if "-" in tok or "." in tok:
+            tokens.extend(p for p in re.split(r"[-.]", tok) if len(p) >= 2 and p not in _STOPWORDS)
+    for m in _CJK_RUN_RE.finditer(raw):
+        run = m.group(0)
+        if len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i : i + 2] for i in range(len(run) - 1))
+    return list(dict.fromkeys(tokens))
+
+
+def _tag_labels(tags: Any) -> List[str]:
+    """papers.meta.json 的 tags 为 "kind:label, kind:label" 形式，只取 label。"""
+    if isinstance(tags, list):
+        items = [str(t) for t in tags]
+    else:
+        items = [t for t in str(tags or "").split(",")]
+    labels: List[str] = []
+    for item in items:
+        label = item.split(":", 1)[1] if ":" in item else item
+        label = label.strip()
+        if label:
+            labels.append(label)
+    return labels
+
+
+def build_month_shard(month: str, day_papers: Iterable[Tuple[str, List[Dict[str, Any]]]]) -> Dict[str, Any]:
+    """把一个月内各日期的 papers 条目汇总成分片；日期按从新到旧排列，同一路由只保留一次。"""
+    docs: List[List[str]] = []
+    terms: Dict[str, List[int]] = {}
+    seen: set = set()
+    for _key, papers in sorted(day_papers, key=lambda kv: kv[0], reverse=True):
+        for paper in papers:
+            doc_id = str(paper.get("paper_id") or "").strip()
+            if not doc_id or doc_id in seen:
+                continue
+            seen.add(doc_id)
+            labels = _tag_labels(paper.get("tags"))
+            title = str(paper.get("title_en") or "").strip()
+            idx = len(docs)
+            docs.append([doc_id, title, str(paper.get("date") or "").strip(), ", ".join(labels)])
+            text = " ".join([title, str(paper.get("abstract_en") or ""), " ".join(labels)])
+            for tok in tokenize(text):
+                terms.setdefault(tok, []).append(idx)
+    return {
+        "version": SEARCH_INDEX_VERSION,
+        "month": month,
+        "docs": docs,
+        "terms": {tok: terms[tok] for tok in sorted(terms)},
+    }
+
+
+def _shard_month(key: str) -> str:
+    # 单日 YYYYMMDD 与区间 YYYYMMDD-YYYYMMDD 都按起始月份归档
+    return key[:6]
+
+
+def _sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _atomic_write_json(path: str, payload: Any, *, indent: Optional[int] = None) -> None:
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    if indent is None:
+        text = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+    else:
+        text = json.dumps(payload, ensure_ascii=False, indent=indent, sort_keys=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".search.", suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(text + "\n")
+    os.replace(tmp_path, path)
+
+
+class SearchIndex:
+    def __init__(self, docs_dir: str) -> None:
+        self.docs_dir = docs_dir
+        self.dir = os.path.join(docs_dir, SEARCH_DIRNAME)
+        self.manifest_path = os.path.join(self.dir, SEARCH_MANIFEST_FILENAME)
+        self.shards: Dict[str, Dict[str, Any]] = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception:
+            return {}
+        if (
+            not isinstance(data, dict)
+            or data.get("version") != SEARCH_INDEX_VERSION
+            or list(data.get("fields") or []) != list(SEARCH_FIELDS)
+            or not isinstance(data.get("shards"), dict)
+        ):
+            # 分词规则或字段变化后旧分片整体作废
+            return {}
+        return {str(k): v for k, v in data["shards"].items() if isinstance(v, dict)}
+
+    def _meta_path(self, key: str) -> str:
+        return os.path.join(self.docs_dir, day_key_path(key), DAY_META_FILENAME)
+
+    def _day_hash(self, key: str) -> Optional[str]:
+        try:
+            return _sha256_file(self._meta_path(key))
+        except OSError:
+            return None
+
+    def _load_day_papers(self, key: str) -> List[Dict[str, Any]]:
+        try:
+            with open(self._meta_path(key), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception:
+            return []
+        papers = data.get("papers") if isinstance(data, dict) else None
+        return [p for p in papers or [] if isinstance(p, dict)]
+
+    def _recorded_hashes(self) -> Dict[str, str]:
+        recorded: Dict[str, str] = {}
+        for entry in self.shards.values():
+            days = entry.get("days")
+            if isinstance(days, dict):
+                recorded.update({str(k): str(v) for k, v in days.items() if v})
+        return recorded
+
+    def update(
+        self,
+        day_keys: Iterable[str],
+        *,
+        changed_days: Optional[Iterable[str]] = None,
+        force: bool = False,
+    ) -> List[str]:
+        """
+        按日期列表增量更新分片，返回重建的月份列表。
+        日期列表通常来自 DocsCatalog（只含真实存在的日期目录）。
+        changed_days 为 None 时重新哈希全部日期；否则只哈希其中的日期与清单未记录的日期。
+        """
+        recorded = {} if changed_days is None else self._recorded_hashes()
+        changed = {str(k) for k in changed_days or ()}
+        months: Dict[str, Dict[str, str]] = {}
+        for key in day_keys:
+            key = str(key)
+            digest = recorded.get(key) if key not in changed else None
+            if digest is None:
+                digest = self._day_hash(key)
+            if digest is not None:
+                months.setdefault(_shard_month(key), {})[key] = digest
+
+        rebuilt: List[str] = []
+        for month in sorted(set(self.shards) - set(months)):
+            self._remove_shard_file(self.shards.pop(month))
+            rebuilt.append(month)
+
+        for month, days in sorted(months.items()):
+            previous = self.shards.get(month) or {}
+            shard_file = os.path.join(self.dir, f"{month}.json")
+            if not force and previous.get("days") == days and os.path.exists(shard_file):
+                continue
+            shard = build_month_shard(month, ((k, self._load_day_papers(k)) for k in days))
+            digest = hashlib.sha256(
+                json.dumps(shard, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
+            ).hexdigest()[:16]
+            if digest != previous.get("hash") or not os.path.exists(shard_file):
+                _atomic_write_json(shard_file, shard)
+            self.shards[month] = {
+                "file": f"{month}.json",
+                "count": len(shard["docs"]),
+                "hash": digest,
+                "days": days,
+            }
+            rebuilt.append(month)
+        return rebuilt
+
+    def _remove_shard_file(self, entry: Dict[str, Any]) -> None:
+        name = str(entry.get("file") or "")
+        if not name:
+            return
+        try:
+            os.remove(os.path.join(self.dir, name))
+        except OSError:
+            pass
+
+    def manifest_payload(self) -> Dict[str, Any]:
+        return {
+            "version": SEARCH_INDEX_VERSION,
+            "fields": list(SEARCH_FIELDS),
+            "total": sum(int(s.get("count") or 0) for s in self.shards.values()),
+            "shards": self.shards,
+        }
+
+    def save(self) -> bool:
+        """写出 manifest.json；与磁盘上一致时不重写，返回是否写入。"""
+        payload = self.manifest_payload()
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                if json.load(f) == payload:
+                    return False
+        except Exception:
+            pass
+        _atomic_write_json(self.manifest_path, payload, indent=1)
+        return True
+
+
+def update_search_index(
+    docs_dir: str,
+    catalog: Optional[DocsCatalog] = None,
+    *,
+    changed_days: Optional[Iterable[str]] = None,
+    rehash_all: bool = False,
+    force: bool = False,
+) -> List[str]:
+    """
+    根据 docs 目录索引增量更新搜索分片并保存清单，返回重建的月份。
+    changed_days 为本次改写了 papers.meta.json 的日期；未传或 rehash_all 时重新哈希全部日期。
+    """
+    active = catalog or DocsCatalog.open(docs_dir)
+    index = SearchIndex(docs_dir)
+    rebuilt = index.update(
+        active.day_keys(newest_first=False),
+        changed_days=None if rehash_all else changed_days,
+        force=force,
+    )
+    index.save()
+    return rebuilt
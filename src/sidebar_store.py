@@ -0,0 +1,367 @@
+#!/usr/bin/env python
+# 侧边栏分片存储：每天 / 每个会议一个 JSON 分片，_sidebar.md 由分片组装
+
+"""
+docs/_sidebar.md 原先由日报 Step 6 与会议工作流各自整体读入、按行扫描定位区块、
+再在 fcntl 锁下整体重写；历史越长越慢，并行的会议工作流还会互相等待、在 git 上冲突。
+这里把侧边栏拆成结构化分片，放在 _sidebar.md 同级的 _sidebar/ 目录：
+
+- daily/<date>.json：{"date", "label", "deep": [item], "quick": [item]}
+- conference/<key>.json：{"key", "label", "topics": [{"marker", "label", "items": [item]}]}
+- item：{"href", "title", "payload"}（payload 即 data-sidebar-item 的 JSON）；
+  无法解析的历史行原样保存为 {"line": ...}
+
+写入方只原子替换自己的分片（不同日期 / 会议互不影响，也不需要全局锁），随后调用
+SidebarStore.assemble 重新渲染 _sidebar.md：Daily Papers 按日期倒序，Conference Papers
+按会议名、年份倒序；首页 / 教程等其它顶层条目保留 _sidebar.md 原有内容。
+首次使用时把现有 _sidebar.md 中的日期块与会议块导入为分片（已有分片的不覆盖）。
+"""
+
+from __future__ import annotations
+
+import html
+import json
+import os
+import re
+import tempfile
+from typing import Any, Dict, List, Optional, Tuple
+
+STORE_DIRNAME = "_sidebar"
+STORE_VERSION = 1
+DAILY_HEADING = "* Daily Papers"
+CONFERENCE_HEADING = "* Conference Papers"
+ITEM_CLASS = "dpr-sidebar-item-link dpr-sidebar-item-structured"
+
+_HREF_RE = re.compile(r'href="([^"]+)"')
+_PAYLOAD_RE = re.compile(r'data-sidebar-item="([^"]*)"')
+_TITLE_RE = re.compile(r">([^<]*)</a>\s*$")
+_DATE_MARKER_RE = re.compile(r"<!--dpr-date:([^>]+)-->")
+_CONFERENCE_MARKER_RE = re.compile(r"<!--dpr-conference:([^>]+)-->")
+_TOPIC_MARKER_RE = re.compile(r"(<!--dpr-conference-topic:[^>]+-->)")
+_COMMENT_RE = re.compile(r"<!--.*?-->")
+
+
+# ---- 单条论文 ----
+def parse_sidebar_item_line(line: str) -> Dict[str, Any]:
+    """把一行侧边栏论文链接解析成 item；不是结构化链接时原样保留。"""
+    text = line.strip()
+    href = _HREF_RE.search(text)
+    payload = _PAYLOAD_RE.search(text)
+    title = _TITLE_RE.search(text)
+    if "dpr-sidebar-item-structured" in text and href and payload and title:
+        try:
+            data = json.loads(html.unescape(payload.group(1)))
+        except Exception:
+            data = None
+        if isinstance(data, dict):
+            return {
+                "href": html.unescape(href.group(1)),
+                "title": html.unescape(title.group(1)),
+                "payload": data,
+            }
+    return {"line": re.sub(r"^\*\s+", "", text)}
+
+
+def render_sidebar_item(item: Dict[str, Any], indent: str = "      ") -> str:
+    if "line" in item:
+        return f"{indent}* {item['line']}\n"
+    payload = html.escape(json.dumps(item.get("payload") or {}, ensure_ascii=False), quote=True)
+    return (
+        f"{indent}* "
+        f'<a class="{ITEM_CLASS}" href="{html.escape(str(item.get("href") or ""), quote=True)}" '
+        f'data-sidebar-item="{payload}">{html.escape(str(item.get("title") or ""))}</a>\n'
+    )
+
+
+def sidebar_item_href(item: Dict[str, Any]) -> str:
+    if "line" in item:
+        match = _HREF_RE.search(str(item["line"]))
+        return html.unescape(match.group(1)) if match else ""
+    return str(item.get("href") or "")
+
+
+# ---- 旧格式 _sidebar.md 解析（仅用于导入与保留顶层条目） ----
+def split_top_level_sections(lines: List[str]) -> List[Tuple[str, List[str]]]:
+    """按顶层条目（以 '* ' 开头的行）切分，返回 [(顶层行去掉换行, 该段全部行)]；首段可能是空标题。"""
+    sections: List[Tuple[str, List[str]]] = []
+    for line in lines:
+        if line.startswith("* ") or not sections:
+            sections.append((line.rstrip("\n") if line.startswith("* ") else "", [line]))
+        else:
+            sections[-1][1].append(line)
+    return sections
+
+
+def split_second_level_blocks(section_lines: List[str]) -> List[List[str]]:
+    """把某个顶层段落（不含顶层行）切成以 '  * ' 开头的二级块。"""
+    blocks: List[List[str]] = []
+    for line in section_lines:
+        if line.startswith("  * ") and not line.startswith("    * "):
+            blocks.append([line])
+        elif blocks:
+            blocks[-1].append(line)
+    return blocks
+
+
+def extract_day_block_papers(block_lines: List[str]) -> Tuple[List[str], List[str]]:
+    """从日期块中按分区提取论文链接行，返回 (deep_lines, quick_lines)。"""
+    deep_lines: List[str] = []
+    quick_lines: List[str] = []
+    current = "deep"
+    for line in block_lines:
+        if "精读区" in line:
+            current = "deep"
+            continue
+        if "速读区" in line:
+            current = "quick"
+            continue
+        if 'href="#/' in line and line.strip().startswith("*"):
+            if current == "quick":
+                quick_lines.append(line)
+            else:
+                deep_lines.append(line)
+    return deep_lines, quick_lines
+
+
+def _heading_label(line: str) -> str:
+    return html.unescape(re.sub(r"^\s*\*\s*", "", _COMMENT_RE.sub("", line)).strip())
+
+
+def parse_day_block(block: List[str]) -> Optional[Dict[str, Any]]:
+    heading = block[0]
+    label = _heading_label(heading)
+    marker = _DATE_MARKER_RE.search(heading)
+    date = marker.group(1).strip() if marker else re.sub(r"\D", "", label)
+    if not date:
+        return None
+    deep_lines, quick_lines = extract_day_block_papers(block[1:])
+    return {
+        "date": date,
+        "label": label or date,
+        "deep": [parse_sidebar_item_line(line) for line in deep_lines],
+        "quick": [parse_sidebar_item_line(line) for line in quick_lines],
+    }
+
+
+def parse_conference_block(block: List[str]) -> Optional[Dict[str, Any]]:
+    heading = block[0]
+    marker = _CONFERENCE_MARKER_RE.search(heading)
+    if not marker:
+        return None
+    topics: List[Dict[str, Any]] = []
+    for line in block[1:]:
+        topic_marker = _TOPIC_MARKER_RE.search(line)
+        if topic_marker and "dpr-sidebar-item-link" not in line:
+            topics.append({"marker": topic_marker.group(1), "label": _heading_label(line), "items": []})
+        elif "dpr-sidebar-item-link" in line:
+            if not topics:
+                topics.append({"marker": "", "label": "General", "items": []})
+            topics[-1]["items"].append(parse_sidebar_item_line(line))
+    return {"key": marker.group(1).strip(), "label": _heading_label(heading), "topics": topics}
+
+
+# ---- 渲染 ----
+def render_day_block(fragment: Dict[str, Any]) -> List[str]:
+    date = str(fragment.get("date") or "")
+    label = str(fragment.get("label") or "").strip() or date
+    lines = [f"  * {label} <!--dpr-date:{date}-->\n"]
+    for section, heading in (("deep", "精读区"), ("quick", "速读区")):
+        items = fragment.get(section) or []
+        if items:
+            lines.append(f"    * {heading}\n")
+            lines.extend(render_sidebar_item(item) for item in items)
+    return lines
+
+
+def render_conference_block(fragment: Dict[str, Any]) -> List[str]:
+    key = str(fragment.get("key") or "")
+    lines = [f"  * {fragment.get('label') or key} <!--dpr-conference:{key}-->\n"]
+    for topic in fragment.get("topics") or []:
+        items = topic.get("items") or []
+        if not items:
+            continue
+        marker = str(topic.get("marker") or "")
+        label = html.escape(str(topic.get("label") or "General"))
+        lines.append(f"    * {label} {marker}\n" if marker else f"    * {label}\n")
+        lines.extend(render_sidebar_item(item) for item in items)
+    return lines
+
+
+def conference_sort_key(fragment: Dict[str, Any]) -> Tuple[str, int, int, int, str]:
+    """会议块排序：会议名升序；同名按最新年份倒序，单年份排在跨年份组合之前。"""
+    key = str(fragment.get("key") or "")
+    label = str(fragment.get("label") or "")
+    conf = key.split("-")[0] if key else label.split()[0] if label else ""
+    years = [int(item) for item in re.findall(r"(?:19|20)\d{2}", key or label)]
+    latest_year = max(years) if years else 0
+    earliest_year = min(years) if years else 0
+    is_range = 1 if len(set(years)) > 1 else 0
+    return (conf.upper(), -latest_year, is_range, -earliest_year, key or label)
+
+
+# ---- 分片存储 ----
+def _safe_name(key: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]+", "-", str(key or "")).strip("-.") or "unnamed"
+
+
+def _write_atomic(path: str, text: str) -> None:
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+class SidebarStore:
+    def __init__(self, sidebar_path: str) -> None:
+        self.sidebar_path = str(sidebar_path)
+        self.root = os.path.join(os.path.dirname(self.sidebar_path) or ".", STORE_DIRNAME)
+
+    def _dir(self, kind: str) -> str:
+        return os.path.join(self.root, kind)
+
+    def fragment_path(self, kind: str, key: str) -> str:
+        return os.path.join(self._dir(kind), f"{_safe_name(key)}.json")
+
+    def load(self, kind: str, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.fragment_path(kind, key), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception:
+            return None
+        return data if isinstance(data, dict) else None
+
+    def save(self, kind: str, key: str, fragment: Dict[str, Any]) -> bool:
+        """原子写入分片；内容未变化时不落盘，返回是否写入。"""
+        text = json.dumps(fragment, ensure_ascii=False, indent=1) + "\n"
+        path = self.fragment_path(kind, key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                if f.read() == text:
+                    return False
+        except OSError:
+            pass
+        _write_atomic(path, text)
+        return True
+
+    def fragments(self, kind: str) -> List[Dict[str, Any]]:
+        out: List[Dict[str, Any]] = []
+        try:
+            names = sorted(os.listdir(self._dir(kind)))
+        except OSError:
+            return out
+        for name in names:
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self._dir(kind), name), "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except Exception:
+                continue
+            if isinstance(data, dict):
+                out.append(data)
+        return out
+
+    def _signature(self) -> Tuple[Tuple[str, int], ...]:
+        entries = []
+        for kind in ("daily", "conference"):
+            try:
+                with os.scandir(self._dir(kind)) as it:
+                    for entry in it:
+                        if entry.name.endswith(".json"):
+                            entries.append((f"{kind}/{entry.name}", entry.stat().st_mtime_ns))
+            except OSError:
+                continue
+        return tuple(sorted(entries))
+
+    def _read_sidebar_lines(self) -> List[str]:
+        try:
+            with open(self.sidebar_path, "r", encoding="utf-8") as f:
+                return f.readlines()
+        except OSError:
+            return []
+
+    def ensure_migrated(self) -> None:
+        """首次使用时把现有 _sidebar.md 的日期块 / 会议块导入为分片（已有同名分片的跳过）。"""
+        marker_path = os.path.join(self.root, "store.json")
+        if os.path.exists(marker_path):
+            return
+        for heading, section_lines in split_top_level_sections(self._read_sidebar_lines()):
+            if heading.strip() == DAILY_HEADING:
+                kind, parse, key_field = "daily", parse_day_block, "date"
+            elif heading.strip() == CONFERENCE_HEADING:
+                kind, parse, key_field = "conference", parse_conference_block, "key"
+            else:
+                continue
+            for block in split_second_level_blocks(section_lines[1:]):
+                fragment = parse(block)
+                if fragment and self.load(kind, fragment[key_field]) is None:
+                    self.save(kind, fragment[key_field], fragment)
+        _write_atomic(marker_path, json.dumps({"version": STORE_VERSION}) + "\n")
+
+    def render(self) -> str:
+        days = sorted(self.fragments("daily"), key=lambda f: str(f.get("date") or ""), reverse=True)
+        conferences = sorted(self.fragments("conference"), key=conference_sort_key)
+        daily_lines = [f"{DAILY_HEADING}\n"]
+        for fragment in days:
+            daily_lines.extend(render_day_block(fragment))
+        conference_lines = [f"{CONFERENCE_HEADING}\n"]
+        for fragment in conferences:
+            conference_lines.extend(render_conference_block(fragment))
+
+        out: List[str] = []
+
+        def emit_conference() -> None:
+            if out and out[-1].strip():
+                out.append("\n")
+            out.extend(conference_lines)
+
+        seen_daily = seen_conference = False
+        for heading, section_lines in split_top_level_sections(self._read_sidebar_lines()):
+            name = heading.strip()
+            if name == DAILY_HEADING:
+                if conferences and not seen_conference:
+                    emit_conference()
+                    seen_conference = True
+                out.extend(daily_lines)
+                seen_daily = True
+            elif name == CONFERENCE_HEADING:
+                if conferences and not seen_conference:
+                    # 原段落末尾的空行属于下一段之前的分隔，保留
+                    out.extend(conference_lines)
+                    out.extend(line for line in section_lines[1:] if not line.strip())
+                    seen_conference = True
+            else:
+                out.extend(section_lines)
+        if not out:
+            out.append("* [首页](/)\n")
+        if conferences and not seen_conference:
+            emit_conference()
+        if days and not seen_daily:
+            out.extend(daily_lines)
+        return "".join(out)
+
+    def assemble(self, *, max_attempts: int = 5) -> bool:
+        """
+        由分片重新渲染 _sidebar.md，返回文件是否发生变化。
+        写入后再比对分片签名：若渲染开始后有其它写入方保存了分片（其组装可能先于本次写入完成，
+        被本次的旧文本覆盖），则重新渲染并写入。分片签名在本次写入后不再变化时，
+        此前保存的分片都已包含在文件中；之后才保存分片的写入方会自行再组装一次。
+        """
+        self.ensure_migrated()
+        changed = False
+        for _ in range(max(int(max_attempts), 1)):
+            before = self._signature()
+            text = self.render()
+            try:
+                with open(self.sidebar_path, "r", encoding="utf-8") as f:
+                    current = f.read()
+            except OSError:
+                current = None
+            if current != text:
+                _write_atomic(self.sidebar_path, text)
+                changed = True
+            if self._signature() == before:
+                break
+        return changed
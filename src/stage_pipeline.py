@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# 多阶段生产者 / 消费者流水线（有界队列 + 每阶段独立并发）
+
+"""
+把"逐条串行做完所有步骤"的处理改成若干阶段：每个阶段有自己的工作线程数，
+阶段之间用有界队列衔接。慢的阶段（例如下载 PDF）只会让自己的队列积压，
+不会让下游阶段（例如 LLM）的线程空等；队列满时上游自动阻塞，内存占用有上限。
+
+- stage.fn(job) 返回交给下一阶段的对象；返回 None 表示该条目到此结束（不再向下游传递）
+- 任一阶段抛异常：该条目记为失败并调用 on_error，其它条目不受影响
+- 最后一个阶段的返回值按完成顺序交给 on_result（在工作线程中调用，需自行保证线程安全）
+- 每阶段的忙碌秒数 / 处理条数 / 失败数记入 pipeline_stage_seconds 等指标并随结果返回
+"""
+
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+try:
+    from metrics import REGISTRY as METRICS
+except Exception:  # pragma: no cover - 兼容 package 导入路径
+    from src.metrics import REGISTRY as METRICS
+
+
+PIPELINE_STAGE_METRIC = "pipeline_stage_seconds"
+_STOP = object()
+
+
+@dataclass
+class Stage:
+    name: str
+    fn: Callable[[Any], Any]
+    workers: int = 1
+
+
+def run_stages(
+    items: Iterable[Any],
+    stages: List[Stage],
+    *,
+    queue_size: int = 8,
+    on_result: Optional[Callable[[int, Any], None]] = None,
+    on_error: Optional[Callable[[int, Any, str, BaseException], None]] = None,
+    pipeline: str = "",
+) -> Dict[str, Dict[str, float]]:
+    """
+    运行流水线直到所有条目流过（或失败于）全部阶段，返回各阶段统计：
+    {stage: {"items": 已处理条数, "errors": 失败数, "busy_seconds": 忙碌秒数, "workers": 线程数}}。
+    on_result / on_error 收到的 index 是条目在 items 中的序号。
+    """
+    if not stages:
+        raise ValueError("stages 不能为空")
+    bound = max(int(queue_size or 1), 1)
+    queues: List[queue.Queue] = [queue.Queue(maxsize=bound) for _ in stages]
+    stats: Dict[str, Dict[str, float]] = {
+        stage.name: {"items": 0, "errors": 0, "busy_seconds": 0.0, "workers": max(int(stage.workers or 1), 1)}
+        for stage in stages
+    }
+    stats_lock = threading.Lock()
+    remaining = [max(int(stage.workers or 1), 1) for stage in stages]
+
+    def _forward(pos: int, payload: Any) -> None:
+        if pos + 1 < len(stages):
+            queues[pos + 1].put(payload)
+        elif on_result is not None and payload is not _STOP:
+            on_result(payload[0], payload[1])
+
+    def _worker(pos: int) -> None:
+        stage = stages[pos]
+        while True:
+            payload = queues[pos].get()
+            if payload is _STOP:
+                with stats_lock:
+                    remaining[pos] -= 1
+                    last = remaining[pos] == 0
+                # 本阶段最后一个线程退出时，向下游每个线程发一个结束标记
+                if last and pos + 1 < len(stages):
+                    for _ in range(remaining[pos + 1]):
+                        queues[pos + 1].put(_STOP)
+                return
+            index, job = payload
+            started = time.perf_counter()
+            try:
+                out = stage.fn(job)
+            except Exception as exc:
+                elapsed = time.perf_counter() - started
+                with stats_lock:
+                    stats[stage.name]["errors"] += 1
+                    stats[stage.name]["busy_seconds"] += elapsed
+                METRICS.observe(PIPELINE_STAGE_METRIC, elapsed, pipeline=pipeline, stage=stage.name)
+                if on_error is not None:
+                    on_error(index, job, stage.name, exc)
+                continue
+            elapsed = time.perf_counter() - started
+            with stats_lock:
+                stats[stage.name]["items"] += 1
+                stats[stage.name]["busy_seconds"] += elapsed
+            METRICS.observe(PIPELINE_STAGE_METRIC, elapsed, pipeline=pipeline, stage=stage.name)
+            if out is None:
+                continue
+            try:
+                _forward(pos, (index, out))
+            except Exception as exc:
+                # on_result 出错不能让工作线程退出，否则结束标记无法传递、流水线会卡住
+                if on_error is not None:
+                    on_error(index, out, stage.name, exc)
+
+    threads: List[threading.Thread] = []
+    for pos, stage in enumerate(stages):
+        for n in range(remaining[pos]):
+            thread = threading.Thread(target=_worker, args=(pos,), name=f"{pipeline or 'pipeline'}-{stage.name}-{n}", daemon=True)
+            thread.start()
+            threads.append(thread)
+
+    # 生产者：在调用线程里投递；第一段队列满时阻塞，形成背压
+    for index, item in enumerate(items):
+        queues[0].put((index, item))
+    for _ in range(remaining[0]):
+        queues[0].put(_STOP)
+    for thread in threads:
+        thread.join()
+
+    for name, entry in stats.items():
+        entry["busy_seconds"] = round(entry["busy_seconds"], 3)
+    return stats
+
+
+def format_stage_stats(stats: Dict[str, Dict[str, float]], wall_seconds: float) -> str:
+    """一行紧凑描述：每阶段 条数/失败/忙碌秒数/线程利用率。"""
+    parts = []
+    for name, entry in stats.items():
+        workers = max(int(entry.get("workers") or 1), 1)
+        util = entry["busy_seconds"] / (wall_seconds * workers) * 100.0 if wall_seconds > 0 else 0.0
+        parts.append(
+            f"{name}[x{workers}]={int(entry['items'])}ok/{int(entry['errors'])}err "
+            f"{entry['busy_seconds']:.1f}s util={util:.0f}%"
+        )
+    return " ".join(parts)
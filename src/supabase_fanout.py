@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# Supabase RPC 扇出执行器：有界并发地执行 (query × 时间分片) RPC
+
+"""
+Step 2.1 / 2.2 的召回按 query × 时间分片逐个调用 RPC，串行时总耗时是所有往返之和。
+这里提供一个共享的扇出执行器：
+
+- fan_out：按输入顺序派发任务，最多 max_workers 个同时在途，结果与输入顺序对齐；
+  某个结果满足 stop_when（如 57014 语句超时）后不再派发新任务，已在途的任务照常完成
+- rpc_slot：进程级 RPC 并发上限（DPR_SUPABASE_RPC_CONCURRENCY，默认 4）。
+  query 层与分片层嵌套扇出时，真正同时打到数据库的请求数仍受它约束
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, TypeVar
+
+T = TypeVar("T")
+
+DEFAULT_RPC_CONCURRENCY = 4
+
+_slots_lock = threading.Lock()
+_rpc_slots: threading.BoundedSemaphore | None = None
+
+
+def resolve_rpc_concurrency(default: int = DEFAULT_RPC_CONCURRENCY) -> int:
+    raw = os.getenv("DPR_SUPABASE_RPC_CONCURRENCY")
+    if not raw:
+        return default
+    try:
+        return max(int(raw), 1)
+    except Exception:
+        return default
+
+
+def _get_rpc_slots() -> threading.BoundedSemaphore:
+    global _rpc_slots
+    if _rpc_slots is not None:
+        return _rpc_slots
+    with _slots_lock:
+        if _rpc_slots is None:
+            _rpc_slots = threading.BoundedSemaphore(resolve_rpc_concurrency())
+    return _rpc_slots
+
+
+def reset_rpc_slots() -> None:
+    """丢弃进程级并发上限（测试修改环境变量后使用）。"""
+    global _rpc_slots
+    with _slots_lock:
+        _rpc_slots = None
+
+
+@contextmanager
+def rpc_slot() -> Iterator[None]:
+    """占用一个 RPC 并发名额；包住真正发请求的那一层调用。"""
+    slots = _get_rpc_slots()
+    slots.acquire()
+    try:
+        yield
+    finally:
+        slots.release()
+
+
+def is_statement_timeout_message(msg: str) -> bool:
+    return "57014" in str(msg or "")
+
+
+def fan_out(
+    tasks: Sequence[Callable[[], T]],
+    *,
+    max_workers: int | None = None,
+    stop_when: Callable[[T], bool] | None = None,
+) -> List[Optional[T]]:
+    """
+    有界并发执行 tasks，返回与 tasks 对齐的结果列表；
+    触发 stop_when 之后未派发的任务结果为 None。任务抛出的异常原样向上传播。
+    """
+    results: List[Optional[T]] = [None] * len(tasks)
+    if not tasks:
+        return results
+    workers = max(1, min(int(max_workers or resolve_rpc_concurrency()), len(tasks)))
+
+    if workers == 1:
+        for idx, task in enumerate(tasks):
+            results[idx] = task()
+            if stop_when is not None and stop_when(results[idx]):
+                break
+        return results
+
+    stopped = False
+    next_idx = 0
+    pending: Dict[Future, int] = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while pending or (not stopped and next_idx < len(tasks)):
+            while not stopped and next_idx < len(tasks) and len(pending) < workers:
+                pending[pool.submit(tasks[next_idx])] = next_idx
+                next_idx += 1
+            done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            for fut in done:
+                idx = pending.pop(fut)
+                results[idx] = fut.result()
+                if stop_when is not None and stop_when(results[idx]):
+                    stopped = True
+    return results
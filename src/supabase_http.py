@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+# Supabase REST / RPC 共享 HTTP 客户端（连接池 + 重试 + 请求计数）
+
+"""
+所有访问 Supabase PostgREST / RPC 的代码统一走这里：
+
+- 进程内复用一个带连接池的 keep-alive `requests.Session`，避免每次请求重新握手
+- 指数退避 + 抖动重试（网络异常、429、5xx）；PostgreSQL 语句超时（57014）不重试
+- 响应默认协商 gzip；请求体在 DPR_SUPABASE_GZIP_REQUESTS 打开且足够大时 gzip 压缩
+- 按 endpoint（表名 / rpc 名）统计请求数、状态与耗时，写入 metrics 注册表
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    from metrics import REGISTRY as METRICS
+except Exception:  # pragma: no cover - 兼容 package 导入路径
+    from src.metrics import REGISTRY as METRICS
+
+
+DEFAULT_RETRIES = 3
+DEFAULT_RETRY_WAIT_SECONDS = 1.0
+MAX_RETRY_WAIT_SECONDS = 30.0
+DEFAULT_POOL_SIZE = 32
+GZIP_MIN_BYTES = 64 * 1024
+
+# PostgreSQL error code for "canceling statement due to statement timeout"
+PG_STATEMENT_TIMEOUT_CODE = "57014"
+
+_session_lock = threading.Lock()
+_session: requests.Session | None = None
+_counts_lock = threading.Lock()
+_request_counts: Dict[Tuple[str, str], int] = {}
+
+
+def _env_int(name: str, default: int) -> int:
+    raw = os.getenv(name)
+    if not raw:
+        return default
+    try:
+        return max(int(raw), 1)
+    except Exception:
+        return default
+
+
+def _env_flag(name: str) -> bool:
+    return str(os.getenv(name) or "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def get_session() -> requests.Session:
+    """返回进程内共享的 Session（懒加载；连接池大小可用 DPR_SUPABASE_POOL_SIZE 调整）。"""
+    global _session
+    if _session is not None:
+        return _session
+    with _session_lock:
+        if _session is None:
+            pool_size = _env_int("DPR_SUPABASE_POOL_SIZE", DEFAULT_POOL_SIZE)
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update({"Accept-Encoding": "gzip, deflate", "Connection": "keep-alive"})
+            _session = session
+    return _session
+
+
+def reset_session() -> None:
+    """关闭并丢弃共享 Session（测试或 fork 之后使用）。"""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            try:
+                _session.close()
+            except Exception:
+                pass
+        _session = None
+
+
+def is_statement_timeout(resp: requests.Response) -> bool:
+    """判断响应是否为 PostgreSQL 语句超时（error code 57014）。"""
+    try:
+        body = json.loads(resp.text or "")
+        return isinstance(body, dict) and body.get("code") == PG_STATEMENT_TIMEOUT_CODE
+    except Exception:
+        return False
+
+
+def endpoint_label(url: str) -> str:
+    """
+    把 URL 归一成计数用的 endpoint 名：
+    - .../rest/v1/arxiv_papers?select=... -> rest:arxiv_papers
+    - .../rest/v1/rpc/match_xxx           -> rpc:match_xxx
+    - 其它（如 management API）           -> host + path
+    """
+    parts = urlsplit(str(url or ""))
+    path = parts.path or ""
+    marker = "/rest/v1/"
+    if marker in path:
+        tail = path.split(marker, 1)[1].strip("/")
+        if tail.startswith("rpc/"):
+            return f"rpc:{tail[4:]}"
+        return f"rest:{tail or '-'}"
+    return f"{parts.netloc}{path}" or "-"
+
+
+def backoff_delay(attempt: int, base: float, cap: float = MAX_RETRY_WAIT_SECONDS) -> float:
+    """第 attempt 次失败后的等待：base * 2^(attempt-1)，取 [d/2, d] 之间的随机值，避免并发请求同步重试。"""
+    safe_base = max(float(base or 0.0), 0.0)
+    if safe_base <= 0:
+        return 0.0
+    delay = min(safe_base * (2 ** max(int(attempt) - 1, 0)), max(float(cap), 0.0))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def _is_retryable_status(status_code: int) -> bool:
+    return status_code == 429 or status_code >= 500
+
+
+def _record(label: str, method: str, status: str, spent: float) -> None:
+    with _counts_lock:
+        key = (label, method)
+        _request_counts[key] = _request_counts.get(key, 0) + 1
+    METRICS.inc("supabase_requests", endpoint=label, method=method, status=status)
+    METRICS.observe("supabase_request_seconds", spent, endpoint=label, method=method)
+
+
+def request_counts() -> Dict[str, int]:
+    """返回 {"METHOD endpoint": 次数}，用于日志汇总。"""
+    with _counts_lock:
+        return {f"{method} {label}": count for (label, method), count in sorted(_request_counts.items())}
+
+
+def _encode_body(
+    headers: Dict[str, str],
+    json_body: Any,
+    data: Any,
+    gzip_body: bool | None,
+) -> Tuple[Dict[str, str], Any]:
+    if json_body is not None:
+        data = json.dumps(json_body, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        headers = {"Content-Type": "application/json", **headers}
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    use_gzip = _env_flag("DPR_SUPABASE_GZIP_REQUESTS") if gzip_body is None else bool(gzip_body)
+    if use_gzip and isinstance(data, (bytes, bytearray)) and len(data) >= GZIP_MIN_BYTES:
+        data = gzip.compress(bytes(data), compresslevel=5)
+        headers = {**headers, "Content-Encoding": "gzip"}
+    return headers, data
+
+
+def request_with_retries(
+    method: str,
+    url: str,
+    *,
+    headers: Dict[str, str],
+    timeout: int,
+    retries: int = DEFAULT_RETRIES,
+    retry_wait_seconds: float = DEFAULT_RETRY_WAIT_SECONDS,
+    log_prefix: str = "Supabase",
+    json: Any = None,
+    data: Any = None,
+    gzip_body: bool | None = None,
+    **kwargs: Any,
+) -> requests.Response:
+    """
+    通过共享 Session 发请求：
+    - 网络异常 / 429 / 5xx 按指数退避重试，最后一次仍是错误状态时原样返回响应
+    - 57014 语句超时直接返回（服务端配置限制，重试不会改善）
+    - 请求体只序列化一次，重试时复用
+    """
+    safe_method = method.upper()
+    label = endpoint_label(url)
+    send_headers, body = _encode_body(dict(headers or {}), json, data, gzip_body)
+    attempts = max(int(retries), 0) + 1
+    last_err: Exception | None = None
+    msg = ""
+    for attempt in range(1, attempts + 1):
+        started = time.time()
+        try:
+            resp = get_session().request(
+                safe_method,
+                url,
+                headers=send_headers,
+                data=body,
+                timeout=timeout,
+                **kwargs,
+            )
+            _record(label, safe_method, str(resp.status_code), time.time() - started)
+            if not _is_retryable_status(resp.status_code) or attempt >= attempts:
+                return resp
+            if is_statement_timeout(resp):
+                print(f"[WARN] {log_prefix} 检测到数据库语句超时 (57014)，跳过重试。", flush=True)
+                return resp
+            msg = f"{log_prefix} 状态码重试 ({attempt}/{attempts})：HTTP {resp.status_code}"
+            print(f"[WARN] {msg}", flush=True)
+        except Exception as e:
+            _record(label, safe_method, "error", time.time() - started)
+            last_err = e
+            msg = f"{log_prefix} 异常重试 ({attempt}/{attempts})：{e}"
+            print(f"[WARN] {msg}", flush=True)
+        if attempt >= attempts:
+            if last_err is not None:
+                raise last_err
+            raise RuntimeError(msg)
+        time.sleep(backoff_delay(attempt, retry_wait_seconds))
+    raise RuntimeError(f"{log_prefix} 请求重试失败")
@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+# Supabase RPC 时间分片自适应：按观测到的延迟 / 语句超时调整每张表的分片天数
+
+"""
+Step 2.1 / 2.2 的 Supabase 召回把时间窗口切成若干分片逐片查询。固定 7 天分片
+对小表太碎、对大表又容易触发 57014；这里按 RPC（即按表）记住“合适的分片天数”：
+
+- 首次运行从较大的分片开始（DEFAULT_INITIAL_SHARD_DAYS）
+- 分片超时（57014）或耗时超过延迟目标时缩小（至多减半，且不超过失败分片的一半）
+- 分片明显快于延迟目标时逐步放大，上限为初始分片天数；同一次运行内缩小过的 RPC
+  不再放大，避免在“超时 → 放大 → 再超时”之间来回震荡
+- 结果写入 archive/supabase_shard_state.json，下次运行直接沿用
+
+环境变量：
+- DPR_SUPABASE_SHARD_DAYS：固定分片天数（关闭自适应，便于排查问题）
+- DPR_SUPABASE_SHARD_LATENCY_SECONDS：单个分片的延迟目标，默认 8 秒
+- DPR_SUPABASE_SHARD_STATE_FILE：状态文件路径
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict
+
+SCRIPT_DIR = os.path.dirname(__file__)
+ROOT_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))
+DEFAULT_STATE_FILE = os.path.join(ROOT_DIR, "archive", "supabase_shard_state.json")
+
+DEFAULT_INITIAL_SHARD_DAYS = 30
+DEFAULT_MIN_SHARD_DAYS = 1
+DEFAULT_LATENCY_TARGET_SECONDS = 8.0
+GROWTH_FACTOR = 1.5
+
+
+def _env_float(name: str, default: float) -> float:
+    raw = os.getenv(name)
+    if not raw:
+        return default
+    try:
+        return max(float(raw), 0.1)
+    except Exception:
+        return default
+
+
+def resolve_fixed_shard_days() -> int | None:
+    raw = str(os.getenv("DPR_SUPABASE_SHARD_DAYS") or "").strip()
+    if not raw:
+        return None
+    try:
+        return max(int(raw), 1)
+    except Exception:
+        return None
+
+
+def tuner_key(kind: str, rpc_name: str) -> str:
+    """状态键：检索类型 + RPC 名（每个 RPC 对应一张表 / 视图）。"""
+    return f"{str(kind or '').strip()}:{str(rpc_name or '').strip()}"
+
+
+def window_span_days(start_dt: datetime, end_dt: datetime) -> int:
+    seconds = max((end_dt - start_dt).total_seconds(), 0.0)
+    return max(int(math.ceil(seconds / 86400.0)), 1)
+
+
+class ShardSizeTuner:
+    def __init__(
+        self,
+        path: str | None = DEFAULT_STATE_FILE,
+        *,
+        initial_days: int = DEFAULT_INITIAL_SHARD_DAYS,
+        min_days: int = DEFAULT_MIN_SHARD_DAYS,
+        latency_target: float = DEFAULT_LATENCY_TARGET_SECONDS,
+        fixed_days: int | None = None,
+    ) -> None:
+        self.path = path
+        self.initial_days = max(int(initial_days), 1)
+        self.min_days = max(min(int(min_days), self.initial_days), 1)
+        self.latency_target = max(float(latency_target), 0.1)
+        self.fixed_days = fixed_days
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = self._load()
+        self._shrunk: set[str] = set()
+        self._dirty = False
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                payload = json.load(f) or {}
+        except Exception:
+            return {}
+        shards = payload.get("shards") if isinstance(payload, dict) else None
+        if not isinstance(shards, dict):
+            return {}
+        return {str(k): dict(v) for k, v in shards.items() if isinstance(v, dict)}
+
+    def shard_days(self, key: str) -> int:
+        if self.fixed_days:
+            return self.fixed_days
+        with self._lock:
+            entry = self._entries.get(key) or {}
+        try:
+            days = int(entry.get("shard_days") or self.initial_days)
+        except Exception:
+            days = self.initial_days
+        return min(max(days, self.min_days), self.initial_days)
+
+    def record(self, key: str, *, span_days: int, elapsed: float, timed_out: bool = False) -> int:
+        """
+        记录一次分片查询的观测结果，返回更新后的分片天数：
+        - 超时 / 超过延迟目标：缩小到 min(当前, 失败分片的一半)
+        - 耗时低于目标一半、分片已达当前大小且本次运行未缩小过：放大 GROWTH_FACTOR 倍
+        """
+        current = self.shard_days(key)
+        if self.fixed_days:
+            return current
+        span = max(int(span_days or 1), 1)
+        with self._lock:
+            if timed_out or elapsed > self.latency_target:
+                new_days = max(min(current, span // 2), self.min_days)
+                self._shrunk.add(key)
+            elif elapsed < self.latency_target / 2 and span >= current and key not in self._shrunk:
+                new_days = min(int(math.ceil(current * GROWTH_FACTOR)), self.initial_days)
+            else:
+                new_days = current
+            entry = self._entries.setdefault(key, {})
+            entry["last_latency_seconds"] = round(float(elapsed), 3)
+            if timed_out:
+                entry["timeouts"] = int(entry.get("timeouts") or 0) + 1
+            if new_days != entry.get("shard_days"):
+                entry["shard_days"] = new_days
+                entry["updated_at"] = datetime.now(timezone.utc).isoformat()
+            self._dirty = True
+        return new_days
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {k: dict(v) for k, v in self._entries.items()}
+
+    def save(self) -> bool:
+        if not self.path or self.fixed_days:
+            return False
+        with self._lock:
+            if not self._dirty:
+                return False
+            payload = {"version": 1, "shards": {k: dict(v) for k, v in sorted(self._entries.items())}}
+            self._dirty = False
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+        return True
+
+
+_tuner_lock = threading.Lock()
+_tuner: ShardSizeTuner | None = None
+
+
+def get_shard_tuner() -> ShardSizeTuner:
+    """进程内共享的分片调节器（懒加载，按环境变量配置）。"""
+    global _tuner
+    if _tuner is not None:
+        return _tuner
+    with _tuner_lock:
+        if _tuner is None:
+            _tuner = ShardSizeTuner(
+                os.getenv("DPR_SUPABASE_SHARD_STATE_FILE") or DEFAULT_STATE_FILE,
+                latency_target=_env_float("DPR_SUPABASE_SHARD_LATENCY_SECONDS", DEFAULT_LATENCY_TARGET_SECONDS),
+                fixed_days=resolve_fixed_shard_days(),
+            )
+    return _tuner
+
+
+def reset_shard_tuner() -> None:
+    """丢弃共享调节器（测试修改环境变量后使用）。"""
+    global _tuner
+    with _tuner_lock:
+        _tuner = None
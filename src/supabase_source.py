@@ -3,9 +3,11 @@
 
 from __future__ import annotations
 
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta, timezone, datetime
 from typing import Any, Dict, List, Tuple
 from urllib.parse import quote
+import os
 import re
 import requests
 import time
@@ -15,23 +17,34 @@ try:
 except Exception:  # pragma: no cover - 兼容 package 导入路径
     from src.source_config import get_source_backend
 
+try:
+    from metrics import REGISTRY as METRICS
+    from paper_cache import PaperCache, SyncState, cache_scope, get_paper_cache
+    from supabase_http import is_statement_timeout, request_with_retries
+except Exception:  # pragma: no cover - 兼容 package 导入路径
+    from src.metrics import REGISTRY as METRICS
+    from src.paper_cache import PaperCache, SyncState, cache_scope, get_paper_cache
+    from src.supabase_http import is_statement_timeout, request_with_retries
+
 
 DEFAULT_TIMEOUT = 20
 _DEFAULT_SUPABASE_RETRY = 3
 _DEFAULT_SUPABASE_RETRY_WAIT_SECONDS = 1.0
-
-# PostgreSQL error code for "canceling statement due to statement timeout"
-_PG_STATEMENT_TIMEOUT_CODE = "57014"
+# 按时间窗口拉取时的并发分区数（1 = 不分区，顺序 keyset 翻页）
+DEFAULT_FETCH_PARTITIONS = 1
+MAX_FETCH_PARTITIONS = 16
+_FETCH_PAGE_SIZE = 1000
+_PAPER_SELECT_FIELDS = "id,title,abstract,authors,primary_category,categories,published,updated_at,link,source"
+_PAPER_EMBEDDING_FIELDS = "embedding,embedding_model,embedding_dim,embedding_updated_at"
+# 增量同步单次最多拉取的行数；超过时视为缓存过旧，整窗重拉
+_DELTA_MAX_ROWS = 20000
+# updated_at 由写入端在构造行时生成、提交可能更晚，增量起点向前留足余量（重复行按 id 覆盖）
+_DELTA_SAFETY_MARGIN = timedelta(hours=12)
 
 
 def _is_statement_timeout(resp: requests.Response) -> bool:
     """判断响应是否为 PostgreSQL 语句超时（error code 57014）。"""
-    try:
-        import json as _json
-        body = _json.loads(resp.text or "")
-        return isinstance(body, dict) and body.get("code") == _PG_STATEMENT_TIMEOUT_CODE
-    except Exception:
-        return False
+    return is_statement_timeout(resp)
 
 
 def _parse_datetime_like(value: Any) -> datetime | None:
@@ -148,9 +161,40 @@ def get_supabase_read_config(config: Dict[str, Any]) -> Dict[str, Any]:
         "vector_rpc": vector_rpc,
         "vector_rpc_exact": _norm(sb.get("vector_rpc_exact")),
         "bm25_rpc": _norm(sb.get("bm25_rpc") or "match_arxiv_papers_bm25"),
+        "use_batch_rpc": bool(sb.get("use_batch_rpc", False)),
+        "vector_rpc_batch": _norm(sb.get("vector_rpc_batch")),
+        "bm25_rpc_batch": _norm(sb.get("bm25_rpc_batch")),
     }
 
 
+def batch_rpc_enabled(backend_conf: Dict[str, Any] | None = None) -> bool:
+    """
+    批量多查询 RPC 开关：source backend 配置 use_batch_rpc: true，或环境变量 DPR_SUPABASE_BATCH_RPC=1。
+    需要先在数据库执行 sql/match_papers_batch.sql（向量）与 sql/match_papers_bm25_batch.sql（BM25）。
+    """
+    raw = str(os.getenv("DPR_SUPABASE_BATCH_RPC") or "").strip().lower()
+    if raw in ("0", "false", "no", "off"):
+        return False
+    if raw in ("1", "true", "yes", "on"):
+        return True
+    return bool((backend_conf or {}).get("use_batch_rpc", False))
+
+
+def resolve_batch_rpc_name(backend_conf: Dict[str, Any] | None, base_rpc: str, key: str = "vector_rpc_batch") -> str:
+    """批量 RPC 名：优先取配置中的 key，否则约定为 `<单查询 RPC>_batch`。"""
+    configured = _norm((backend_conf or {}).get(key))
+    if configured:
+        return configured
+    base = _norm(base_rpc)
+    return f"{base}_batch" if base else ""
+
+
+def is_missing_rpc_message(msg: str) -> bool:
+    """PostgREST 找不到函数时返回 404 / PGRST202，用于自动回退到逐查询调用。"""
+    text = str(msg or "")
+    return "HTTP 404" in text or "PGRST202" in text
+
+
 def _build_headers(api_key: str, schema: str = "public") -> Dict[str, str]:
     headers = {
         "apikey": api_key,
@@ -209,35 +253,17 @@ def _request_with_retries(
     log_prefix: str = "Supabase",
     **kwargs: Any,
 ) -> requests.Response:
-  attempts = max(int(retries), 0) + 1
-  last_err: Exception | None = None
-  for attempt in range(1, attempts + 1):
-    try:
-      resp = requests.request(
-        method.upper(),
-        url,
-        headers=headers,
-        timeout=timeout,
-        **kwargs,
-      )
-      if resp.status_code < 500 or attempt >= attempts:
-        return resp
-      # 语句超时（57014）是服务端配置限制，重试不会改善
-      if _is_statement_timeout(resp):
-        print(f"[WARN] {log_prefix} 检测到数据库语句超时 (57014)，跳过重试。", flush=True)
-        return resp
-      msg = f"{log_prefix} 状态码重试 ({attempt}/{attempts})：HTTP {resp.status_code}"
-      print(f"[WARN] {msg}", flush=True)
-    except Exception as e:
-      last_err = e
-      msg = f"{log_prefix} 异常重试 ({attempt}/{attempts})：{e}"
-      print(f"[WARN] {msg}", flush=True)
-    if attempt >= attempts:
-      if last_err is not None:
-        raise last_err
-      raise RuntimeError(msg)
-    time.sleep(max(float(retry_wait_seconds or 0.0), 0.0))
-  raise RuntimeError(f"{log_prefix} 请求重试失败")
+  # 统一走共享连接池客户端（keep-alive、指数退避、57014 不重试、按 endpoint 计数）
+  return request_with_retries(
+    method,
+    url,
+    headers=headers,
+    timeout=timeout,
+    retries=retries,
+    retry_wait_seconds=retry_wait_seconds,
+    log_prefix=log_prefix,
+    **kwargs,
+  )
 
 
 def fetch_recent_papers(
@@ -272,6 +298,157 @@ def fetch_recent_papers(
     )
 
 
+def resolve_fetch_partitions(default: int = DEFAULT_FETCH_PARTITIONS) -> int:
+    raw = os.getenv("DPR_SUPABASE_FETCH_PARTITIONS")
+    if not raw:
+        return max(int(default or 1), 1)
+    try:
+        return min(max(int(raw), 1), MAX_FETCH_PARTITIONS)
+    except Exception:
+        return max(int(default or 1), 1)
+
+
+def split_time_range(start_dt: datetime, end_dt: datetime, partitions: int) -> List[Tuple[datetime, datetime]]:
+    """
+    把 [start_dt, end_dt) 均分成 partitions 个左闭右开子区间（按时间倒序返回，与 published.desc 对齐）。
+    """
+    n = max(int(partitions or 1), 1)
+    if end_dt <= start_dt or n <= 1:
+        return [(start_dt, end_dt)]
+    step = (end_dt - start_dt) / n
+    bounds = [start_dt + step * i for i in range(n)] + [end_dt]
+    ranges = [(bounds[i], bounds[i + 1]) for i in range(n) if bounds[i] < bounds[i + 1]]
+    return list(reversed(ranges))
+
+
+def _quote_filter_value(value: str) -> str:
+    """
+    PostgREST 的 or=(...) 里，含 , . : ( ) 的值需要用双引号包裹；整体再做 URL 编码。
+    """
+    text = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return quote(f'"{text}"', safe="")
+
+
+def _build_keyset_cursor_filter(last_published: str, last_id: str) -> str:
+    """
+    keyset 翻页条件（与 order=published.desc,id.desc 对应）：
+      published < last_published OR (published = last_published AND id < last_id)
+    """
+    pub = _quote_filter_value(last_published)
+    pid = _quote_filter_value(last_id)
+    return f"&or=(published.lt.{pub},and(published.eq.{pub},id.lt.{pid}))"
+
+
+def _response_size(resp: Any) -> int:
+    try:
+        return len(resp.content or b"")
+    except Exception:
+        return len(str(getattr(resp, "text", "") or "").encode("utf-8"))
+
+
+def _fetch_range_keyset(
+    *,
+    rest: str,
+    papers_table: str,
+    select_fields: str,
+    start_dt: datetime,
+    end_dt: datetime,
+    headers: Dict[str, str],
+    timeout: int,
+    max_rows: int,
+    per_page: int,
+    label: str = "",
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any], str]:
+    """
+    在单个时间子区间内按 (published, id) 做 keyset 翻页。
+    相比 offset 翻页，每一页都是一次索引范围扫描，越往后不会越慢。
+    返回 (rows, stats, error)；error 为空串表示成功。
+    """
+    start_iso_q = quote(start_dt.isoformat().replace("+00:00", "Z"), safe="")
+    end_iso_q = quote(end_dt.isoformat().replace("+00:00", "Z"), safe="")
+    base = (
+        f"{rest}/{papers_table}"
+        f"?select={select_fields}"
+        f"&published=gte.{start_iso_q}"
+        f"&published=lt.{end_iso_q}"
+        f"&order=published.desc,id.desc"
+    )
+    rows_out: List[Dict[str, Any]] = []
+    stats: Dict[str, Any] = {"pages": 0, "rows": 0, "bytes": 0, "page_latency_seconds": []}
+    cursor = ""
+    while len(rows_out) < max_rows:
+        page_limit = min(per_page, max_rows - len(rows_out))
+        endpoint = f"{base}{cursor}&limit={int(page_limit)}"
+        page_started = time.time()
+        resp = _request_with_retries(
+          "GET",
+          endpoint,
+          headers=headers,
+          timeout=timeout,
+          retries=_DEFAULT_SUPABASE_RETRY,
+          retry_wait_seconds=_DEFAULT_SUPABASE_RETRY_WAIT_SECONDS,
+          log_prefix="[Supabase]",
+        )
+        latency = time.time() - page_started
+        if resp.status_code >= 300:
+            return (rows_out, stats, f"papers 查询失败：HTTP {resp.status_code} {resp.text[:200]}")
+        rows = resp.json() or []
+        if not isinstance(rows, list):
+            return (rows_out, stats, "papers 查询结果格式异常")
+        size = _response_size(resp)
+        stats["pages"] += 1
+        stats["rows"] += len(rows)
+        stats["bytes"] += size
+        stats["page_latency_seconds"].append(round(latency, 3))
+        METRICS.observe("supabase_page_seconds", latency, table=papers_table)
+        METRICS.inc("supabase_rows", len(rows), table=papers_table)
+        METRICS.inc("supabase_bytes", size, table=papers_table)
+        print(
+            f"[Supabase] page{label} #{stats['pages']}: rows={len(rows)} bytes={size} latency={latency:.2f}s",
+            flush=True,
+        )
+        if not rows:
+            break
+        rows_out.extend(rows)
+        if len(rows) < page_limit:
+            break
+        last = rows[-1] if isinstance(rows[-1], dict) else {}
+        last_published = _norm(last.get("published"))
+        last_id = _norm(last.get("id"))
+        if not last_published or not last_id:
+            # 游标字段缺失时无法继续 keyset 翻页，宁可少拿也不要死循环
+            break
+        cursor = _build_keyset_cursor_filter(last_published, last_id)
+    return (rows_out, stats, "")
+
+
+def _normalize_paper_row(r: Dict[str, Any], include_embedding: bool) -> Dict[str, Any] | None:
+    pid = _norm(r.get("id"))
+    if not pid:
+        return None
+    emb_dim = 0
+    try:
+        emb_dim = int(r.get("embedding_dim") or 0)
+    except Exception:
+        emb_dim = 0
+    return {
+        "id": pid,
+        "source": _norm(r.get("source") or "supabase"),
+        "title": _norm(r.get("title")),
+        "abstract": _norm(r.get("abstract")),
+        "authors": r.get("authors") if isinstance(r.get("authors"), list) else [],
+        "primary_category": _norm(r.get("primary_category")) or None,
+        "categories": r.get("categories") if isinstance(r.get("categories"), list) else [],
+        "published": _norm(r.get("published")),
+        "updated_at": _norm(r.get("updated_at")),
+        "link": _norm(r.get("link")),
+        "embedding": _parse_embedding(r.get("embedding")) if include_embedding else None,
+        "embedding_model": _norm(r.get("embedding_model")) if include_embedding else "",
+        "embedding_dim": emb_dim if include_embedding else 0,
+        "embedding_updated_at": _norm(r.get("embedding_updated_at")) if include_embedding else "",
+    }
+
+
 def fetch_papers_by_date_range(
     *,
     url: str,
@@ -284,11 +461,17 @@ def fetch_papers_by_date_range(
     max_rows: int = 20000,
     time_fields: tuple[str, ...] = ("published",),
     include_embedding: bool = False,
+    partitions: int | None = None,
+    use_cache: bool = True,
 ) -> Tuple[List[Dict[str, Any]], str]:
     """
     按明确时间区间拉取论文：
     - published >= start_dt
     - published < end_dt
+    - 按 (published, id) keyset 翻页（order=published.desc,id.desc），避免 OFFSET 扫描
+    - partitions > 1 时把窗口均分成 N 个子区间并发拉取，再按 published/id 倒序合并
+    - 设置 DPR_PAPER_CACHE_PATH 时走本地 sqlite 读穿缓存：只增量拉取 updated_at 变化的行
+      与窗口中尚未缓存的部分（见 paper_cache.py）；缓存出错时回退到整窗拉取
     """
     if start_dt.tzinfo is None:
         start_dt = start_dt.replace(tzinfo=timezone.utc)
@@ -299,92 +482,309 @@ def fetch_papers_by_date_range(
     if end_dt <= start_dt:
         return ([], "时间窗口非法：end_dt <= start_dt")
 
-    # 避免 +00:00 在 URL 中被当成空格，统一转 Z 并编码
-    start_iso_q = quote(start_dt.isoformat().replace("+00:00", "Z"), safe="")
-    end_iso_q = quote(end_dt.isoformat().replace("+00:00", "Z"), safe="")
+    fetch_kwargs = dict(
+        url=url,
+        api_key=api_key,
+        papers_table=papers_table,
+        schema=schema,
+        timeout=timeout,
+        max_rows=max_rows,
+        partitions=partitions,
+    )
+    cache = get_paper_cache() if use_cache else None
+    if cache is not None:
+        try:
+            return _fetch_papers_via_cache(
+                cache, start_dt=start_dt, end_dt=end_dt, include_embedding=include_embedding, **fetch_kwargs
+            )
+        except Exception as e:
+            print(f"[Supabase] 本地论文缓存读取失败，回退整窗拉取：{e}", flush=True)
+    out, msg, _ok = _fetch_papers_remote(
+        start_dt=start_dt, end_dt=end_dt, include_embedding=include_embedding, **fetch_kwargs
+    )
+    return (out, msg)
+
 
+def _fetch_papers_remote(
+    *,
+    url: str,
+    api_key: str,
+    papers_table: str,
+    start_dt: datetime,
+    end_dt: datetime,
+    schema: str,
+    timeout: int,
+    max_rows: int,
+    include_embedding: bool,
+    partitions: int | None,
+) -> Tuple[List[Dict[str, Any]], str, bool]:
+    """整窗远端拉取，返回 (rows, msg, ok)。"""
     rest = _base_rest_url(url)
-    per_page = min(max(int(max_rows or 1), 1), 1000)
-    fetched = 0
-    offset = 0
-    all_rows: List[Dict[str, Any]] = []
+    limit_rows = max(int(max_rows or 1), 1)
+    per_page = min(limit_rows, _FETCH_PAGE_SIZE)
+    select_fields = _PAPER_SELECT_FIELDS
+    if include_embedding:
+        select_fields += f",{_PAPER_EMBEDDING_FIELDS}"
+    n_parts = resolve_fetch_partitions() if partitions is None else min(max(int(partitions or 1), 1), MAX_FETCH_PARTITIONS)
+    ranges = split_time_range(start_dt, end_dt, n_parts)
+    headers = _build_headers(api_key, schema)
+    safe_timeout = max(int(timeout or DEFAULT_TIMEOUT), 1)
+
+    def _fetch(idx: int, sub_start: datetime, sub_end: datetime):
+        return _fetch_range_keyset(
+            rest=rest,
+            papers_table=papers_table,
+            select_fields=select_fields,
+            start_dt=sub_start,
+            end_dt=sub_end,
+            headers=headers,
+            timeout=safe_timeout,
+            max_rows=limit_rows,
+            per_page=per_page,
+            label=f"[{idx + 1}/{len(ranges)}]" if len(ranges) > 1 else "",
+        )
+
+    started = time.time()
     try:
-        while fetched < int(max_rows):
-            page_limit = min(per_page, int(max_rows) - fetched)
-            select_fields = (
-                "id,title,abstract,authors,primary_category,categories,published,updated_at,link,source"
-            )
-            if include_embedding:
-                select_fields += ",embedding,embedding_model,embedding_dim,embedding_updated_at"
-            endpoint = (
-                f"{rest}/{papers_table}"
-                f"?select={select_fields}"
-                f"&published=gte.{start_iso_q}"
-                f"&published=lt.{end_iso_q}"
-                f"&order=published.desc"
-                f"&limit={int(page_limit)}"
-                f"&offset={int(offset)}"
-            )
-            resp = _request_with_retries(
-              "GET",
-              endpoint,
-              headers=_build_headers(api_key, schema),
-              timeout=max(int(timeout or DEFAULT_TIMEOUT), 1),
-              retries=_DEFAULT_SUPABASE_RETRY,
-              retry_wait_seconds=_DEFAULT_SUPABASE_RETRY_WAIT_SECONDS,
-              log_prefix="[Supabase]",
-            )
-            if resp.status_code >= 300:
-                return ([], f"papers 查询失败：HTTP {resp.status_code} {resp.text[:200]}")
-            rows = resp.json() or []
-            if not isinstance(rows, list):
-                return ([], "papers 查询结果格式异常")
-            if not rows:
-                break
+        if len(ranges) == 1:
+            results = [_fetch(0, ranges[0][0], ranges[0][1])]
+        else:
+            with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+                futures = [executor.submit(_fetch, idx, sub_start, sub_end) for idx, (sub_start, sub_end) in enumerate(ranges)]
+                results = [future.result() for future in futures]
+
+        all_rows: List[Dict[str, Any]] = []
+        pages = 0
+        total_bytes = 0
+        latencies: List[float] = []
+        for rows, stats, err in results:
+            if err:
+                return ([], err, False)
             all_rows.extend(rows)
-            got = len(rows)
-            fetched += got
-            offset += got
-            # 最后一页（不足页大小）即可结束
-            if got < page_limit:
-                break
+            pages += int(stats.get("pages") or 0)
+            total_bytes += int(stats.get("bytes") or 0)
+            latencies.extend(stats.get("page_latency_seconds") or [])
 
         out: List[Dict[str, Any]] = []
+        seen: set[str] = set()
         for r in all_rows:
             if not isinstance(r, dict):
                 continue
-            pid = _norm(r.get("id"))
-            if not pid:
+            item = _normalize_paper_row(r, include_embedding)
+            if item is None or item["id"] in seen:
                 continue
-            emb_dim = 0
-            try:
-                emb_dim = int(r.get("embedding_dim") or 0)
-            except Exception:
-                emb_dim = 0
-            out.append(
-                {
-                    "id": pid,
-                    "source": _norm(r.get("source") or "supabase"),
-                    "title": _norm(r.get("title")),
-                    "abstract": _norm(r.get("abstract")),
-                    "authors": r.get("authors") if isinstance(r.get("authors"), list) else [],
-                    "primary_category": _norm(r.get("primary_category")) or None,
-                    "categories": r.get("categories") if isinstance(r.get("categories"), list) else [],
-                    "published": _norm(r.get("published")),
-                    "updated_at": _norm(r.get("updated_at")),
-                    "link": _norm(r.get("link")),
-                    "embedding": _parse_embedding(r.get("embedding")) if include_embedding else None,
-                    "embedding_model": _norm(r.get("embedding_model")) if include_embedding else "",
-                    "embedding_dim": emb_dim if include_embedding else 0,
-                    "embedding_updated_at": _norm(r.get("embedding_updated_at")) if include_embedding else "",
-                }
-            )
+            seen.add(item["id"])
+            out.append(item)
+        if len(ranges) > 1:
+            # 子区间按时间倒序排列，各自已是 (published, id) 倒序；这里再做一次稳定排序兜底
+            out.sort(key=lambda item: (item.get("published") or "", item.get("id") or ""), reverse=True)
+        out = out[:limit_rows]
+        elapsed = time.time() - started
+        avg_latency = sum(latencies) / len(latencies) if latencies else 0.0
+        max_latency = max(latencies) if latencies else 0.0
         return (
             out,
-            f"papers 查询成功：{len(out)} 条（分页，offset 到 {offset}，window={start_dt.isoformat()}~{end_dt.isoformat()}）",
+            f"papers 查询成功：{len(out)} 条（keyset 分页 {pages} 页，分区 {len(ranges)}，"
+            f"{total_bytes / 1024:.1f} KiB，页延迟 avg={avg_latency:.2f}s max={max_latency:.2f}s，"
+            f"耗时 {elapsed:.2f}s，window={start_dt.isoformat()}~{end_dt.isoformat()}）",
+            True,
         )
     except Exception as e:
-        return ([], f"papers 查询异常：{e}")
+        return ([], f"papers 查询异常：{e}", False)
+
+
+def _build_delta_cursor_filter(last_updated_at: str, last_id: str) -> str:
+    """增量翻页条件（与 order=updated_at.asc,id.asc 对应）。"""
+    upd = _quote_filter_value(last_updated_at)
+    pid = _quote_filter_value(last_id)
+    return f"&or=(updated_at.gt.{upd},and(updated_at.eq.{upd},id.gt.{pid}))"
+
+
+def _fetch_delta_keyset(
+    *,
+    rest: str,
+    papers_table: str,
+    select_fields: str,
+    since: str,
+    published_start: datetime,
+    published_end: datetime,
+    headers: Dict[str, str],
+    timeout: int,
+    max_rows: int,
+    per_page: int,
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any], str]:
+    """
+    按 (updated_at, id) keyset 翻页拉取 updated_at >= since 的行；
+    只限已覆盖的 published 区间 [published_start, published_end)，区间外的更新与缓存无关。
+    """
+    since_q = quote(_norm(since).replace("+00:00", "Z"), safe="")
+    start_q = quote(published_start.isoformat().replace("+00:00", "Z"), safe="")
+    end_q = quote(published_end.isoformat().replace("+00:00", "Z"), safe="")
+    base = (
+        f"{rest}/{papers_table}"
+        f"?select={select_fields}"
+        f"&updated_at=gte.{since_q}"
+        f"&published=gte.{start_q}"
+        f"&published=lt.{end_q}"
+        f"&order=updated_at.asc,id.asc"
+    )
+    rows_out: List[Dict[str, Any]] = []
+    stats: Dict[str, Any] = {"pages": 0, "rows": 0, "bytes": 0}
+    cursor = ""
+    while len(rows_out) < max_rows:
+        page_limit = min(per_page, max_rows - len(rows_out))
+        resp = _request_with_retries(
+            "GET",
+            f"{base}{cursor}&limit={int(page_limit)}",
+            headers=headers,
+            timeout=timeout,
+            retries=_DEFAULT_SUPABASE_RETRY,
+            retry_wait_seconds=_DEFAULT_SUPABASE_RETRY_WAIT_SECONDS,
+            log_prefix="[Supabase Delta]",
+        )
+        if resp.status_code >= 300:
+            return (rows_out, stats, f"增量查询失败：HTTP {resp.status_code} {resp.text[:200]}")
+        rows = resp.json() or []
+        if not isinstance(rows, list):
+            return (rows_out, stats, "增量查询结果格式异常")
+        size = _response_size(resp)
+        stats["pages"] += 1
+        stats["rows"] += len(rows)
+        stats["bytes"] += size
+        METRICS.inc("supabase_rows", len(rows), table=papers_table)
+        METRICS.inc("supabase_bytes", size, table=papers_table)
+        if not rows:
+            break
+        rows_out.extend(rows)
+        if len(rows) < page_limit:
+            break
+        last = rows[-1] if isinstance(rows[-1], dict) else {}
+        last_updated = _norm(last.get("updated_at"))
+        last_id = _norm(last.get("id"))
+        if not last_updated or not last_id:
+            return (rows_out, stats, "增量查询缺少 updated_at/id 游标字段")
+        cursor = _build_delta_cursor_filter(last_updated, last_id)
+    return (rows_out, stats, "")
+
+
+def _fetch_papers_via_cache(
+    cache: PaperCache,
+    *,
+    url: str,
+    api_key: str,
+    papers_table: str,
+    start_dt: datetime,
+    end_dt: datetime,
+    schema: str,
+    timeout: int,
+    max_rows: int,
+    include_embedding: bool,
+    partitions: int | None,
+) -> Tuple[List[Dict[str, Any]], str]:
+    """
+    读穿缓存：
+    1) 窗口与已覆盖区间相交时，先按 updated_at 拉已覆盖区间内的增量并写入缓存；
+    2) 只远端拉取窗口中未覆盖的首尾两段（与已覆盖区间不相交时整窗拉取并替换覆盖区间）；
+    3) 从缓存按 published/id 倒序返回窗口内的行。
+    """
+    started = time.time()
+    limit_rows = max(int(max_rows or 1), 1)
+    start_ts = start_dt.timestamp()
+    end_ts = end_dt.timestamp()
+    scope = cache_scope(url, schema, papers_table)
+    state = cache.get_state(scope)
+    if state is not None and include_embedding and not state.with_embedding:
+        state = None
+    if state is not None and not state.touches(start_ts, end_ts):
+        state = None
+    with_embedding = include_embedding or bool(state and state.with_embedding)
+    select_fields = _PAPER_SELECT_FIELDS + (f",{_PAPER_EMBEDDING_FIELDS}" if with_embedding else "")
+    safe_timeout = max(int(timeout or DEFAULT_TIMEOUT), 1)
+
+    delta_count = 0
+    if state is not None:
+        sync_mark = (datetime.now(timezone.utc) - _DELTA_SAFETY_MARGIN).isoformat()
+        rows, _stats, err = _fetch_delta_keyset(
+            rest=_base_rest_url(url),
+            papers_table=papers_table,
+            select_fields=select_fields,
+            since=state.last_sync,
+            published_start=datetime.fromtimestamp(state.covered_start, tz=timezone.utc),
+            published_end=datetime.fromtimestamp(state.covered_end, tz=timezone.utc),
+            headers=_build_headers(api_key, schema),
+            timeout=safe_timeout,
+            max_rows=_DELTA_MAX_ROWS,
+            per_page=_FETCH_PAGE_SIZE,
+        )
+        if err or len(rows) >= _DELTA_MAX_ROWS:
+            print(f"[Supabase] 本地缓存增量同步放弃，整窗重拉：{err or f'增量超过 {_DELTA_MAX_ROWS} 行'}", flush=True)
+            cache.reset(scope)
+            state = None
+        else:
+            normalized = [_normalize_paper_row(r, with_embedding) for r in rows if isinstance(r, dict)]
+            delta_count = cache.upsert(scope, [r for r in normalized if r], parse_ts=_parse_datetime_like)
+            state.last_sync = sync_mark
+
+    if state is None:
+        sync_mark = (datetime.now(timezone.utc) - _DELTA_SAFETY_MARGIN).isoformat()
+        segments = [(start_dt, end_dt)]
+        new_state = SyncState(start_ts, end_ts, sync_mark, with_embedding)
+    else:
+        segments = []
+        covered_start = datetime.fromtimestamp(state.covered_start, tz=timezone.utc)
+        covered_end = datetime.fromtimestamp(state.covered_end, tz=timezone.utc)
+        if start_dt < covered_start:
+            segments.append((start_dt, covered_start))
+        if end_dt > covered_end:
+            segments.append((covered_end, end_dt))
+        new_state = SyncState(
+            min(state.covered_start, start_ts),
+            max(state.covered_end, end_ts),
+            state.last_sync,
+            state.with_embedding,
+        )
+
+    fetched = 0
+    complete = True
+    for seg_start, seg_end in segments:
+        rows, msg, ok = _fetch_papers_remote(
+            url=url,
+            api_key=api_key,
+            papers_table=papers_table,
+            start_dt=seg_start,
+            end_dt=seg_end,
+            schema=schema,
+            timeout=timeout,
+            max_rows=limit_rows,
+            include_embedding=with_embedding,
+            partitions=partitions,
+        )
+        if not ok:
+            if state is not None:
+                # 增量已写入缓存，推进 last_sync；未覆盖的段下次再补
+                cache.set_state(scope, state)
+            return ([], msg)
+        # 触顶说明该段没拉全，不能把它记为已覆盖
+        if len(rows) >= limit_rows:
+            complete = False
+        fetched += cache.upsert(scope, rows, parse_ts=_parse_datetime_like)
+
+    if state is None and complete:
+        # 覆盖区间被替换：清掉区间外的旧行，避免缓存无限增长
+        cache.prune_outside(scope, new_state.covered_start, new_state.covered_end)
+    if complete:
+        cache.set_state(scope, new_state)
+    else:
+        cache.reset(scope)
+
+    out = cache.read_window(scope, start_dt, end_dt, include_embedding=include_embedding, limit=limit_rows)
+    METRICS.inc("paper_cache_rows", len(out), table=papers_table)
+    METRICS.inc("paper_cache_fetched_rows", fetched + delta_count, table=papers_table)
+    return (
+        out,
+        f"papers 查询成功：{len(out)} 条（本地缓存，增量 {delta_count} 条，补拉 {fetched} 条 / {len(segments)} 段，"
+        f"耗时 {time.time() - started:.2f}s，window={start_dt.isoformat()}~{end_dt.isoformat()}）",
+    )
 
 
 def _parse_content_range_total(value: Any) -> int | None:
@@ -543,30 +943,128 @@ def match_papers_by_embedding(
         for r in rows:
             if not isinstance(r, dict):
                 continue
-            pid = _norm(r.get("id"))
-            if not pid:
+            item = _normalize_vector_row(r)
+            if item is not None:
+                out.append(item)
+        return (out, f"rpc 查询成功：{len(out)} 条")
+    except Exception as e:
+        return ([], f"rpc 查询异常：{e}")
+
+
+def _normalize_vector_row(r: Dict[str, Any]) -> Dict[str, Any] | None:
+    pid = _norm(r.get("id"))
+    if not pid:
+        return None
+    try:
+        sim_f = float(r.get("similarity"))
+    except Exception:
+        sim_f = 0.0
+    out = {
+        "id": pid,
+        "title": _norm(r.get("title")),
+        "abstract": _norm(r.get("abstract")),
+        "published": _norm(r.get("published")) or None,
+        "link": _norm(r.get("link")) or None,
+        "pdf_url": _norm(r.get("pdf_url")) or None,
+        "authors": r.get("authors") if isinstance(r.get("authors"), list) else [],
+        "primary_category": _norm(r.get("primary_category")) or None,
+        "categories": r.get("categories") if isinstance(r.get("categories"), list) else [],
+        "source": _norm(r.get("source") or "supabase") or "supabase",
+        "similarity": sim_f,
+    }
+    # 统一会议 RPC 额外返回的会议字段原样保留
+    for key in ("conference_key", "conference_year", "conference_pair", "source_table"):
+        if key in r:
+            out[key] = r.get(key)
+    return out
+
+
+def match_papers_by_embedding_batch(
+    *,
+    url: str,
+    api_key: str,
+    rpc_name: str,
+    query_embeddings: List[List[float]],
+    match_count: int | List[int],
+    schema: str = "public",
+    timeout: int = DEFAULT_TIMEOUT,
+    start_dt: datetime | None = None,
+    end_dt: datetime | None = None,
+    time_fields: tuple[str, ...] = ("published",),
+    filter_sources: List[str] | None = None,
+    extra_payload: Dict[str, Any] | None = None,
+) -> Tuple[List[List[Dict[str, Any]]], str]:
+    """
+    调用批量向量 RPC（见 sql/match_papers_batch.sql），一次窗口扫描服务所有查询。
+    约定 RPC 参数：
+      - query_embeddings: jsonb（二维数组）
+      - match_counts: int[]（每个查询各自的条数）/ match_count: int（缺省条数）
+      - filter_published_start / filter_published_end（可选）
+    返回值按输入顺序给出每个查询的结果列表；失败时返回空列表与错误信息。
+    """
+    safe_rpc = _norm(rpc_name)
+    vectors = [[float(x) for x in (vec or [])] for vec in (query_embeddings or [])]
+    if not safe_rpc or not vectors or any(not vec for vec in vectors):
+        return ([], "query embeddings 为空")
+    if isinstance(match_count, list):
+        counts = [max(int(c or 1), 1) for c in match_count]
+        if len(counts) != len(vectors):
+            return ([], "match_count 数量与查询数不一致")
+    else:
+        counts = [max(int(match_count or 1), 1)] * len(vectors)
+    endpoint = f"{_base_rest_url(url)}/rpc/{safe_rpc}"
+    payload: Dict[str, Any] = {
+        "query_embeddings": vectors,
+        "match_counts": counts,
+        "match_count": max(counts),
+        **_build_date_filter_payload(start_dt, end_dt),
+    }
+    if isinstance(filter_sources, list) and filter_sources:
+        payload["filter_sources"] = [str(item).strip() for item in filter_sources if str(item).strip()]
+    if isinstance(extra_payload, dict):
+        payload.update({key: value for key, value in extra_payload.items() if key})
+    try:
+        resp = _request_with_retries(
+            "POST",
+            endpoint,
+            headers={
+                **_build_headers(api_key, schema),
+                "Content-Type": "application/json",
+            },
+            json=payload,
+            timeout=max(int(timeout or DEFAULT_TIMEOUT), 1),
+            retries=_DEFAULT_SUPABASE_RETRY,
+            retry_wait_seconds=_DEFAULT_SUPABASE_RETRY_WAIT_SECONDS,
+            log_prefix="[Supabase RPC batch]",
+        )
+        if resp.status_code >= 300:
+            return ([], f"rpc 查询失败：HTTP {resp.status_code} {resp.text[:200]}")
+        rows = resp.json() or []
+        if not isinstance(rows, list):
+            return ([], "rpc 查询结果格式异常")
+        rows = _filter_rows_by_window(
+            rows,
+            start_dt=start_dt,
+            end_dt=end_dt,
+            time_fields=time_fields,
+        )
+        out: List[List[Dict[str, Any]]] = [[] for _ in vectors]
+        for r in rows:
+            if not isinstance(r, dict):
                 continue
-            sim = r.get("similarity")
             try:
-                sim_f = float(sim)
+                q_idx = int(r.get("query_index"))
             except Exception:
-                sim_f = 0.0
-            out.append(
-                {
-                    "id": pid,
-                    "title": _norm(r.get("title")),
-                    "abstract": _norm(r.get("abstract")),
-                    "published": _norm(r.get("published")) or None,
-                    "link": _norm(r.get("link")) or None,
-                    "pdf_url": _norm(r.get("pdf_url")) or None,
-                    "authors": r.get("authors") if isinstance(r.get("authors"), list) else [],
-                    "primary_category": _norm(r.get("primary_category")) or None,
-                    "categories": r.get("categories") if isinstance(r.get("categories"), list) else [],
-                    "source": _norm(r.get("source") or "supabase") or "supabase",
-                    "similarity": sim_f,
-                }
-            )
-        return (out, f"rpc 查询成功：{len(out)} 条")
+                continue
+            if q_idx < 0 or q_idx >= len(vectors):
+                continue
+            item = _normalize_vector_row(r)
+            if item is not None:
+                out[q_idx].append(item)
+        for bucket in out:
+            bucket.sort(key=lambda item: -float(item.get("similarity") or 0.0))
+        total = sum(len(bucket) for bucket in out)
+        return (out, f"rpc 查询成功：{total} 条（批量 {len(vectors)} 个查询）")
     except Exception as e:
         return ([], f"rpc 查询异常：{e}")
 
@@ -640,25 +1138,123 @@ def match_papers_by_bm25(
         for r in rows:
             if not isinstance(r, dict):
                 continue
-            pid = _norm(r.get("id"))
-            if not pid:
-                continue
-            out.append(
-                {
-                    "id": pid,
-                    "title": _norm(r.get("title")),
-                    "abstract": _norm(r.get("abstract")),
-                    "published": _norm(r.get("published")) or None,
-                    "link": _norm(r.get("link")) or None,
-                    "pdf_url": _norm(r.get("pdf_url")) or None,
-                    "authors": r.get("authors") if isinstance(r.get("authors"), list) else [],
-                    "primary_category": _norm(r.get("primary_category")) or None,
-                    "categories": r.get("categories") if isinstance(r.get("categories"), list) else [],
-                    "source": _norm(r.get("source") or "supabase") or "supabase",
-                    "score": r.get("score"),
-                    "similarity": r.get("similarity"),
-                }
-            )
+            item = _normalize_bm25_row(r)
+            if item is not None:
+                out.append(item)
         return (out, f"rpc 查询成功：{len(out)} 条")
     except Exception as e:
         return ([], f"rpc 查询异常：{e}")
+
+
+def _normalize_bm25_row(r: Dict[str, Any]) -> Dict[str, Any] | None:
+    pid = _norm(r.get("id"))
+    if not pid:
+        return None
+    out = {
+        "id": pid,
+        "title": _norm(r.get("title")),
+        "abstract": _norm(r.get("abstract")),
+        "published": _norm(r.get("published")) or None,
+        "link": _norm(r.get("link")) or None,
+        "pdf_url": _norm(r.get("pdf_url")) or None,
+        "authors": r.get("authors") if isinstance(r.get("authors"), list) else [],
+        "primary_category": _norm(r.get("primary_category")) or None,
+        "categories": r.get("categories") if isinstance(r.get("categories"), list) else [],
+        "source": _norm(r.get("source") or "supabase") or "supabase",
+        "score": r.get("score"),
+        "similarity": r.get("similarity"),
+    }
+    for key in ("conference_key", "conference_year", "conference_pair", "source_table"):
+        if key in r:
+            out[key] = r.get(key)
+    return out
+
+
+def match_papers_by_bm25_batch(
+    *,
+    url: str,
+    api_key: str,
+    rpc_name: str,
+    query_texts: List[str],
+    match_count: int | List[int],
+    schema: str = "public",
+    timeout: int = DEFAULT_TIMEOUT,
+    start_dt: datetime | None = None,
+    end_dt: datetime | None = None,
+    time_fields: tuple[str, ...] = ("published",),
+    filter_sources: List[str] | None = None,
+    extra_payload: Dict[str, Any] | None = None,
+) -> Tuple[List[List[Dict[str, Any]]], str]:
+    """
+    调用批量 BM25 RPC（见 sql/match_papers_bm25_batch.sql），一次候选扫描服务所有查询。
+    约定 RPC 参数：
+      - query_texts: text[]
+      - match_counts: int[]（每个查询各自的条数）/ match_count: int（缺省条数）
+      - filter_published_start / filter_published_end（可选）
+    返回值按输入顺序给出每个查询的结果列表；失败时返回空列表与错误信息。
+    """
+    safe_rpc = _norm(rpc_name)
+    texts = [_norm(text) for text in (query_texts or [])]
+    if not safe_rpc or not texts or any(not text for text in texts):
+        return ([], "query_texts 为空")
+    if isinstance(match_count, list):
+        counts = [max(int(c or 1), 1) for c in match_count]
+        if len(counts) != len(texts):
+            return ([], "match_count 数量与查询数不一致")
+    else:
+        counts = [max(int(match_count or 1), 1)] * len(texts)
+    endpoint = f"{_base_rest_url(url)}/rpc/{safe_rpc}"
+    payload: Dict[str, Any] = {
+        "query_texts": texts,
+        "match_counts": counts,
+        "match_count": max(counts),
+        **_build_date_filter_payload(start_dt, end_dt),
+    }
+    if isinstance(filter_sources, list) and filter_sources:
+        payload["filter_sources"] = [str(item).strip() for item in filter_sources if str(item).strip()]
+    if isinstance(extra_payload, dict):
+        payload.update({key: value for key, value in extra_payload.items() if key})
+    try:
+        resp = _request_with_retries(
+            "POST",
+            endpoint,
+            headers={
+                **_build_headers(api_key, schema),
+                "Content-Type": "application/json",
+            },
+            json=payload,
+            timeout=max(int(timeout or DEFAULT_TIMEOUT), 1),
+            retries=_DEFAULT_SUPABASE_RETRY,
+            retry_wait_seconds=_DEFAULT_SUPABASE_RETRY_WAIT_SECONDS,
+            log_prefix="[Supabase RPC batch]",
+        )
+        if resp.status_code >= 300:
+            return ([], f"rpc 查询失败：HTTP {resp.status_code} {resp.text[:200]}")
+        rows = resp.json() or []
+        if not isinstance(rows, list):
+            return ([], "rpc 查询结果格式异常")
+        rows = _filter_rows_by_window(
+            rows,
+            start_dt=start_dt,
+            end_dt=end_dt,
+            time_fields=time_fields,
+        )
+        out: List[List[Dict[str, Any]]] = [[] for _ in texts]
+        for r in rows:
+            if not isinstance(r, dict):
+                continue
+            try:
+                q_idx = int(r.get("query_index"))
+            except Exception:
+                continue
+            if q_idx < 0 or q_idx >= len(texts):
+                continue
+            item = _normalize_bm25_row(r)
+            if item is not None:
+                out[q_idx].append(item)
+        for bucket in out:
+            bucket.sort(key=lambda item: -float(item.get("score") or 0.0))
+        total = sum(len(bucket) for bucket in out)
+        return (out, f"rpc 查询成功：{total} 条（批量 {len(texts)} 个查询）")
+    except Exception as e:
+        return ([], f"rpc 查询异常：{e}")
@@ -0,0 +1,21 @@
+"""测试共用：固定 Supabase 时间分片天数。"""
+
+import os
+import sys
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+from supabase_shard_tuner import reset_shard_tuner  # noqa: E402
+
+
+def pin_shard_days(testcase: unittest.TestCase, days: int = 7) -> None:
+    """分片大小会跨用例自适应学习；断言具体窗口的用例固定分片天数。"""
+    env = patch.dict(os.environ, {"DPR_SUPABASE_SHARD_DAYS": str(days)})
+    env.start()
+    testcase.addCleanup(env.stop)
+    reset_shard_tuner()
+    testcase.addCleanup(reset_shard_tuner)
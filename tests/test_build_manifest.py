@@ -0,0 +1,77 @@
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+from build_manifest import BuildManifest, build_manifest_path, hash_payload  # noqa: E402
+
+
+class BuildManifestTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.docs = tmp.name
+        self.path = build_manifest_path(self.docs, "20260306")
+        self.md = os.path.join(self.docs, "202603", "06", "p1.md")
+        os.makedirs(os.path.dirname(self.md))
+        with open(self.md, "w", encoding="utf-8") as f:
+            f.write("# Paper\n")
+
+    def _manifest(self, template="1"):
+        return BuildManifest(self.path, docs_dir=self.docs, template_version=template)
+
+    def test_hash_ignores_runtime_keys_and_key_order(self):
+        a = {"id": "1", "llm_score": 7, "_glance_overview": "x"}
+        b = {"llm_score": 7, "id": "1"}
+        self.assertEqual(hash_payload(a), hash_payload(b))
+        self.assertNotEqual(hash_payload(a), hash_payload({"id": "1", "llm_score": 8}))
+        self.assertTrue(self.path.endswith(os.path.join("202603", "06", "_build_manifest.json")))
+
+    def test_paper_fresh_until_input_or_output_changes(self):
+        manifest = self._manifest()
+        manifest.record_paper("202603/06/p1", "h1", {"md": self.md, "txt": os.path.join(self.docs, "missing.txt")})
+        self.assertTrue(manifest.save())
+
+        reloaded = self._manifest()
+        self.assertTrue(reloaded.paper_is_fresh("202603/06/p1", "h1"))
+        self.assertFalse(reloaded.paper_is_fresh("202603/06/p1", "h2"))
+
+        # 仅 mtime 变化（内容相同）仍视为未变化；内容被改则失效
+        os.utime(self.md, None)
+        self.assertTrue(reloaded.paper_is_fresh("202603/06/p1", "h1"))
+        with open(self.md, "w", encoding="utf-8") as f:
+            f.write("# Edited\n")
+        self.assertFalse(reloaded.paper_is_fresh("202603/06/p1", "h1"))
+        os.remove(self.md)
+        self.assertFalse(reloaded.paper_is_fresh("202603/06/p1", "h1"))
+
+    def test_template_bump_invalidates_everything(self):
+        manifest = self._manifest()
+        manifest.record_paper("202603/06/p1", "h1", {"md": self.md})
+        manifest.record_day("d1", {"md": self.md})
+        manifest.store_meta("202603/06/p1", "k", {"title_en": "Paper"})
+        manifest.save()
+
+        self.assertTrue(self._manifest().day_is_fresh("d1"))
+        self.assertEqual(self._manifest().cached_meta("202603/06/p1", "k"), {"title_en": "Paper"})
+        bumped = self._manifest(template="2")
+        self.assertFalse(bumped.paper_is_fresh("202603/06/p1", "h1"))
+        self.assertFalse(bumped.day_is_fresh("d1"))
+        self.assertIsNone(bumped.cached_meta("202603/06/p1", "k"))
+
+    def test_content_hash_reuses_recorded_fingerprint(self):
+        manifest = self._manifest()
+        manifest.record_paper("202603/06/p1", "h1", {"md": self.md})
+        recorded = manifest.data["papers"]["202603/06/p1"]["outputs"]["202603/06/p1.md"]["sha256"]
+        self.assertEqual(manifest.content_hash("202603/06/p1", self.md), recorded)
+        self.assertTrue(manifest.save())
+        # 没有新变化时不重写清单文件
+        self.assertFalse(manifest.save())
+
+
+if __name__ == "__main__":
+    unittest.main()
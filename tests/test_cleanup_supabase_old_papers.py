@@ -1,8 +1,11 @@
 import importlib.util
+import json
 import pathlib
 import sys
 import unittest
+from datetime import datetime, timedelta, timezone
 from unittest.mock import patch
+from urllib.parse import parse_qs, urlsplit
 
 
 def _load_module(module_name: str, path: pathlib.Path):
@@ -13,6 +16,17 @@ def _load_module(module_name: str, path: pathlib.Path):
     return mod
 
 
+class _Resp:
+    def __init__(self, status_code, payload, headers=None):
+        self.status_code = status_code
+        self._payload = payload
+        self.text = json.dumps(payload)
+        self.headers = headers or {}
+
+    def json(self):
+        return self._payload
+
+
 class CleanupSupabaseOldPapersTest(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
@@ -51,6 +65,7 @@ class CleanupSupabaseOldPapersTest(unittest.TestCase):
                 schema="public",
                 retention_days=45,
                 batch_size=2,
+                strategy="ids",
             )
 
         self.assertEqual(result["deleted"], 3)
@@ -59,24 +74,132 @@ class CleanupSupabaseOldPapersTest(unittest.TestCase):
         self.assertEqual(delete_calls[0]["ids"], ["p1", "p2"])
         self.assertEqual(delete_calls[1]["ids"], ["p3"])
 
-    def test_cleanup_old_papers_dry_run_stops_after_first_batch(self):
-        with patch.object(self.mod, "fetch_old_paper_ids", return_value=["p1", "p2"]), patch.object(
-            self.mod, "delete_papers_by_ids"
-        ) as delete_mock:
+    def test_cleanup_old_papers_dry_run_only_counts(self):
+        calls = []
+
+        def fake_request(method, endpoint, **kwargs):
+            calls.append((method, endpoint, kwargs["headers"]))
+            return _Resp(206, [{"id": "p1"}], headers={"Content-Range": "0-0/123456"})
+
+        with patch.object(self.mod, "request_with_retries", side_effect=fake_request):
             result = self.mod.cleanup_old_papers(
                 url="https://example.supabase.co",
                 service_key="service-key",
                 papers_table="arxiv_papers",
                 schema="public",
                 retention_days=45,
-                batch_size=2,
                 dry_run=True,
             )
 
-        self.assertEqual(result["deleted"], 2)
-        self.assertEqual(result["batches"], 1)
-        delete_mock.assert_not_called()
+        self.assertEqual(result["deleted"], 123456)
+        self.assertEqual(result["batches"], 0)
+        self.assertEqual(len(calls), 1)
+        method, endpoint, headers = calls[0]
+        self.assertEqual(method, "GET")
+        self.assertIn("published=lt.", endpoint)
+        self.assertEqual(headers["Prefer"], "count=exact")
+
+    def test_cleanup_old_papers_loops_rpc_until_short_batch(self):
+        payloads = []
+        returns = iter([1000, 1000, 17])
+
+        def fake_request(method, endpoint, **kwargs):
+            self.assertEqual(method, "POST")
+            self.assertTrue(endpoint.endswith("/rest/v1/rpc/cleanup_old_papers"))
+            payloads.append(kwargs["json"])
+            return _Resp(200, next(returns))
+
+        with patch.object(self.mod, "request_with_retries", side_effect=fake_request):
+            result = self.mod.cleanup_old_papers(
+                url="https://example.supabase.co",
+                service_key="service-key",
+                papers_table="arxiv_papers",
+                schema="public",
+                retention_days=45,
+                chunk_rows=1000,
+            )
+
+        self.assertEqual(result["deleted"], 2017)
+        self.assertEqual(result["batches"], 3)
+        self.assertEqual(result["strategy"], "rpc")
+        self.assertEqual(payloads[0]["target_table"], "arxiv_papers")
+        self.assertEqual(payloads[0]["max_rows"], 1000)
+        self.assertNotIn("target_schema", payloads[0])
+
+    def test_cleanup_rpc_passes_non_public_schema_as_argument(self):
+        calls = []
+
+        def fake_request(method, endpoint, **kwargs):
+            calls.append(kwargs)
+            return _Resp(200, 3)
+
+        with patch.object(self.mod, "request_with_retries", side_effect=fake_request):
+            result = self.mod.cleanup_old_papers(
+                url="https://example.supabase.co",
+                service_key="service-key",
+                papers_table="arxiv_papers",
+                schema="papers_data",
+                retention_days=45,
+                strategy="rpc",
+                chunk_rows=1000,
+            )
+
+        self.assertEqual(result["strategy"], "rpc")
+        self.assertEqual(result["deleted"], 3)
+        # 函数建在 public 下；论文表所在 schema 作为参数交给函数按 allow-list 校验
+        self.assertEqual(calls[0]["headers"]["Content-Profile"], "public")
+        self.assertEqual(calls[0]["json"]["target_schema"], "papers_data")
+
+    def test_cleanup_rpc_rejected_schema_is_reported_in_rpc_mode(self):
+        def fake_request(method, endpoint, **kwargs):
+            return _Resp(400, {"code": "P0001", "message": "cleanup_old_papers: unsupported schema papers_data"})
+
+        with patch.object(self.mod, "request_with_retries", side_effect=fake_request):
+            with self.assertRaisesRegex(RuntimeError, "allowed_schemas"):
+                self.mod.cleanup_old_papers(
+                    url="https://example.supabase.co",
+                    service_key="service-key",
+                    papers_table="arxiv_papers",
+                    schema="papers_data",
+                    retention_days=45,
+                    strategy="rpc",
+                )
+
+    def test_cleanup_old_papers_falls_back_to_range_delete_and_halves_on_timeout(self):
+        now = datetime.now(timezone.utc)
+        oldest = (now - timedelta(days=60) + timedelta(minutes=1)).isoformat()
+        deletes = []
+
+        def fake_request(method, endpoint, **kwargs):
+            if method == "POST":
+                return _Resp(404, {"code": "PGRST202", "message": "Could not find the function"})
+            if method == "GET":
+                return _Resp(200, [{"published": oldest}])
+            params = parse_qs(urlsplit(endpoint).query)
+            bounds = sorted(params["published"])
+            deletes.append(bounds)
+            self.assertIn("count=exact", kwargs["headers"]["Prefer"])
+            if len(deletes) == 1:
+                return _Resp(500, {"code": "57014", "message": "canceling statement due to statement timeout"})
+            return _Resp(204, None, headers={"Content-Range": "*/10"})
+
+        with patch.object(self.mod, "request_with_retries", side_effect=fake_request):
+            result = self.mod.cleanup_old_papers(
+                url="https://example.supabase.co",
+                service_key="service-key",
+                papers_table="arxiv_papers",
+                schema="public",
+                retention_days=45,
+                range_days=10,
+            )
 
+        self.assertEqual(result["strategy"], "range")
+        # 首段超时 -> 缩小为 5 天后重试；60-45=15 天的过期区间共 3 段
+        self.assertEqual(len(deletes), 4)
+        self.assertEqual(len(deletes[1]), 1)
+        self.assertTrue(all(len(bounds) == 2 for bounds in deletes[2:]))
+        self.assertEqual(result["batches"], 3)
+        self.assertEqual(result["deleted"], 30)
 
 if __name__ == "__main__":
     unittest.main()
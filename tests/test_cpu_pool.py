@@ -0,0 +1,48 @@
+import math
+import os
+import sys
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+import cpu_pool  # noqa: E402
+from metrics import REGISTRY as METRICS  # noqa: E402
+
+
+class CpuPoolTest(unittest.TestCase):
+    def setUp(self):
+        METRICS.reset(["cpu_task_seconds", "cpu_queue_wait_seconds", "cpu_pool_fallbacks"])
+        self.addCleanup(cpu_pool.reset_cpu_pool)
+
+    def test_runs_in_worker_process_and_records_timings(self):
+        with patch.dict(os.environ, {"DPR_CPU_WORKERS": "1"}):
+            self.assertEqual(cpu_pool.run_cpu("factorial", math.factorial, 20), math.factorial(20))
+            pid = cpu_pool.run_cpu("getpid", os.getpid)
+        self.assertNotEqual(pid, os.getpid())
+        sums = METRICS.histogram_sums_by("cpu_task_seconds", "task")
+        self.assertEqual(set(sums), {"factorial", "getpid"})
+        self.assertIn("getpid", METRICS.histogram_sums_by("cpu_queue_wait_seconds", "task"))
+
+    def test_zero_workers_runs_inline(self):
+        with patch.dict(os.environ, {"DPR_CPU_WORKERS": "0"}):
+            self.assertIsNone(cpu_pool.get_cpu_pool())
+            self.assertEqual(cpu_pool.run_cpu("getpid", os.getpid), os.getpid())
+
+    def test_unpicklable_callable_falls_back_to_thread(self):
+        with patch.dict(os.environ, {"DPR_CPU_WORKERS": "1"}):
+            result = cpu_pool.run_cpu("local", lambda x: x * 2, 21)
+        self.assertEqual(result, 42)
+        self.assertEqual(METRICS.counter_total("cpu_pool_fallbacks"), 1)
+
+    def test_task_errors_propagate(self):
+        with patch.dict(os.environ, {"DPR_CPU_WORKERS": "1"}):
+            with self.assertRaises(ValueError):
+                cpu_pool.run_cpu("factorial", math.factorial, -1)
+        self.assertEqual(METRICS.counter_total("cpu_pool_fallbacks"), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
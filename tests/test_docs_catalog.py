@@ -0,0 +1,105 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+import docs_catalog  # noqa: E402
+
+
+def _touch(path: Path, text: str = "x") -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+
+
+class DocsCatalogTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.docs = Path(tmp.name)
+        _touch(self.docs / "202606" / "24" / "2606.00001v1-a.md")
+        _touch(self.docs / "202606" / "24" / "README.md")
+        _touch(self.docs / "202606" / "24" / "_daily_state.json")
+        _touch(self.docs / "202605" / "01" / "2605.00002v1-b.md")
+        _touch(self.docs / "20260101-20260107" / "README.md")
+        _touch(self.docs / "conference" / "icml-2025" / "x.md")
+
+    def test_open_builds_and_persists_catalog(self):
+        catalog = docs_catalog.DocsCatalog.open(str(self.docs))
+        self.assertEqual(catalog.day_keys(), ["20260624", "20260501", "20260101-20260107"])
+        self.assertEqual(catalog.days["20260624"]["papers"], ["2606.00001v1-a.md"])
+        self.assertTrue(catalog.days["20260624"]["readme"])
+        self.assertFalse(catalog.days["20260501"]["readme"])
+        self.assertEqual(catalog.days["20260101-20260107"]["path"], "20260101-20260107")
+        self.assertTrue(catalog.save())
+        data = json.loads((self.docs / "_catalog.json").read_text(encoding="utf-8"))
+        self.assertEqual(set(data["days"]), set(catalog.days))
+
+    def test_sync_only_scans_new_days(self):
+        docs_catalog.DocsCatalog.open(str(self.docs)).save()
+        _touch(self.docs / "202606" / "25" / "2606.00003v1-c.md")
+        (self.docs / "202605" / "01" / "2605.00002v1-b.md").unlink()
+        (self.docs / "202605" / "01").rmdir()
+
+        scanned = []
+        original = docs_catalog.DocsCatalog.refresh_day
+
+        def spy(self, key):
+            scanned.append(key)
+            return original(self, key)
+
+        with patch.object(docs_catalog.DocsCatalog, "refresh_day", spy):
+            catalog = docs_catalog.DocsCatalog.open(str(self.docs))
+        self.assertEqual(scanned, ["20260625"])
+        self.assertNotIn("20260501", catalog.days)
+        self.assertEqual(catalog.days["20260625"]["papers"], ["2606.00003v1-c.md"])
+
+    def test_sync_rescans_known_days_changed_after_save(self):
+        docs_catalog.DocsCatalog.open(str(self.docs)).save()
+        _touch(self.docs / "202605" / "01" / "README.md")
+        (self.docs / "202606" / "24" / "2606.00001v1-a.md").unlink()
+
+        scanned = []
+        original = docs_catalog.DocsCatalog.refresh_day
+
+        def spy(self, key):
+            scanned.append(key)
+            return original(self, key)
+
+        with patch.object(docs_catalog.DocsCatalog, "refresh_day", spy):
+            catalog = docs_catalog.DocsCatalog.open(str(self.docs))
+            self.assertEqual(scanned, ["20260501", "20260624"])
+            self.assertTrue(catalog.days["20260501"]["readme"])
+            self.assertEqual(catalog.days["20260624"]["papers"], [])
+            self.assertTrue(catalog.save())
+
+            scanned.clear()
+            docs_catalog.DocsCatalog.open(str(self.docs))
+            self.assertEqual(scanned, [])
+
+    def test_rebuild_picks_up_changes_older_than_the_catalog(self):
+        docs_catalog.DocsCatalog.open(str(self.docs)).save()
+        _touch(self.docs / "202605" / "01" / "README.md")
+        # 目录 mtime 早于索引保存时间（如 checkout 顺序导致）时 sync 不会发现，需要 --rebuild-catalog
+        saved_at = os.stat(self.docs / "_catalog.json").st_mtime_ns
+        os.utime(self.docs / "202605" / "01", ns=(saved_at - 10**9, saved_at - 10**9))
+        self.assertFalse(docs_catalog.DocsCatalog.open(str(self.docs)).days["20260501"]["readme"])
+        rebuilt = docs_catalog.DocsCatalog.open(str(self.docs), rebuild=True)
+        self.assertTrue(rebuilt.days["20260501"]["readme"])
+
+    def test_refresh_day_drops_missing_directory(self):
+        catalog = docs_catalog.DocsCatalog.open(str(self.docs))
+        for name in os.listdir(self.docs / "202605" / "01"):
+            (self.docs / "202605" / "01" / name).unlink()
+        (self.docs / "202605" / "01").rmdir()
+        self.assertIsNone(catalog.refresh_day("20260501"))
+        self.assertNotIn("20260501", catalog.days)
+
+
+if __name__ == "__main__":
+    unittest.main()
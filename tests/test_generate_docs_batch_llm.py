@@ -0,0 +1,189 @@
+import importlib.util
+import json
+import sys
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest.mock import patch
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+
+def _load_generate_docs():
+    spec = importlib.util.spec_from_file_location("gen6_batch_mod", ROOT / "src" / "6.generate_docs.py")
+    mod = importlib.util.module_from_spec(spec)
+    assert spec and spec.loader
+    spec.loader.exec_module(mod)
+    return mod
+
+
+def _full_item(pid, **overrides):
+    item = {
+        "id": pid,
+        "title_zh": f"标题{pid}",
+        "abstract_zh": f"摘要{pid}",
+        "tldr": "背景。方法。结果。",
+        "motivation": "动机",
+        "method": "方法",
+        "result": "结果",
+        "conclusion": "结论",
+    }
+    item.update(overrides)
+    return item
+
+
+class FakeClient:
+    def __init__(self, items, finish_reason="stop"):
+        self.kwargs = {}
+        self.items = items
+        self.finish_reason = finish_reason
+        self.calls = []
+
+    def chat_structured(self, messages, schema_name, schema, **kwargs):
+        self.calls.append({"messages": messages, "schema_name": schema_name, "kwargs": kwargs})
+        on_item = kwargs.get("on_item")
+        if on_item is not None:
+            for item in self.items:
+                on_item(item)
+        parsed = {"items": self.items} if self.finish_reason == "stop" else None
+        return {"content": json.dumps(parsed), "parsed": parsed, "parse_error": None, "finish_reason": self.finish_reason}
+
+
+class BatchTranslateGlanceTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.mod = _load_generate_docs()
+
+    def test_pack_respects_budget_and_item_limit(self):
+        batches = self.mod.pack_llm_batches([40, 40, 40, 100, 10, 10], token_budget=100, max_items=2)
+        self.assertEqual(batches, [[0, 1], [2], [3], [4, 5]])
+        # 单篇超预算时独占一批
+        self.assertEqual(self.mod.pack_llm_batches([500, 10], token_budget=100, max_items=8), [[0], [1]])
+
+    def test_batch_returns_only_valid_known_items(self):
+        client = FakeClient(
+            [
+                _full_item("a"),
+                _full_item("b", abstract_zh="  "),
+                _full_item("zzz"),
+                {"id": "c", "tldr": "缺字段"},
+            ]
+        )
+        with patch.object(self.mod, "resolve_stream_enabled", return_value=False):
+            out = self.mod.batch_translate_and_glance(
+                [("a", "A", "abs a"), ("b", "B", "abs b"), ("c", "C", "abs c")],
+                client=client,
+            )
+        self.assertEqual(set(out), {"a"})
+        self.assertEqual(out["a"]["title_zh"], "标题a")
+        self.assertEqual(len(client.calls), 1)
+        payload = json.loads(client.calls[0]["messages"][-1]["content"])
+        self.assertEqual([p["id"] for p in payload], ["a", "b", "c"])
+
+    def test_truncated_stream_keeps_completed_items(self):
+        client = FakeClient([_full_item("a")], finish_reason="length")
+        with patch.object(self.mod, "resolve_stream_enabled", return_value=True):
+            out = self.mod.batch_translate_and_glance([("a", "A", "x"), ("b", "B", "y")], client=client)
+        self.assertEqual(set(out), {"a"})
+        self.assertEqual(client.calls[0]["kwargs"].get("array_key"), "items")
+
+    def test_glance_only_does_not_require_translation(self):
+        item = {k: v for k, v in _full_item("a").items() if k not in ("title_zh", "abstract_zh")}
+        self.assertIsNotNone(self.mod.validate_batch_llm_item(item, with_translation=False))
+        self.assertIsNone(self.mod.validate_batch_llm_item(item, with_translation=True))
+
+    def test_stage_llm_uses_prefill_and_falls_back_per_paper(self):
+        mod = self.mod
+        jobs = []
+        for pid in ("a", "b"):
+            job = mod.PaperJob(
+                paper={"title": pid.upper(), "abstract": "abs"},
+                section="quick",
+                date_str="20260101",
+                docs_dir="/tmp",
+                glance_only=False,
+                force_glance=False,
+                title=pid.upper(),
+                abstract_en="abs",
+                pdf_url="",
+                md_path=f"/tmp/{pid}.md",
+                txt_path=f"/tmp/{pid}.txt",
+                paper_id=pid,
+                existing=False,
+            )
+            jobs.append(job)
+        client = FakeClient([_full_item("a")])
+        with patch.object(mod, "LLM_CLIENT", client), patch.object(mod, "create_llm_client", return_value=client), patch.object(
+            mod, "resolve_stream_enabled", return_value=False
+        ), patch.object(mod, "translate_title_and_abstract_to_zh", return_value=("单篇标题", "单篇摘要")) as single_tr, patch.object(
+            mod, "generate_glance_overview", return_value="单篇速览"
+        ) as single_glance:
+            executor = mod.start_batched_llm_prefill(jobs, batch_size=8, token_budget=10000, workers=1)
+            self.assertIsNotNone(executor)
+            executor.shutdown(wait=True)
+            done = [mod.stage_llm(job) for job in jobs]
+        self.assertIn("标题a", done[0].content)
+        self.assertIn("单篇标题", done[1].content)
+        single_tr.assert_called_once()
+        single_glance.assert_called_once()
+        self.assertEqual(len(client.calls), 1)
+
+    def test_batch_and_stage_calls_share_llm_slots(self):
+        mod = self.mod
+        jobs = [
+            mod.PaperJob(
+                paper={"title": pid.upper(), "abstract": "abs"},
+                section="quick",
+                date_str="20260101",
+                docs_dir="/tmp",
+                glance_only=False,
+                force_glance=False,
+                title=pid.upper(),
+                abstract_en="abs",
+                pdf_url="",
+                md_path=f"/tmp/{pid}.md",
+                txt_path=f"/tmp/{pid}.txt",
+                paper_id=pid,
+                existing=pid in ("x", "y"),
+            )
+            for pid in ("x", "y", "a", "b", "c", "d")
+        ]
+        lock = threading.Lock()
+        active = [0, 0]
+
+        def llm_call(result):
+            def call(*args, **kwargs):
+                with lock:
+                    active[0] += 1
+                    active[1] = max(active[1], active[0])
+                time.sleep(0.05)
+                with lock:
+                    active[0] -= 1
+                return result
+
+            return call
+
+        slots = threading.BoundedSemaphore(2)
+        with patch.object(mod, "LLM_CLIENT", FakeClient([])), patch.object(
+            mod, "batch_translate_and_glance", side_effect=llm_call({})
+        ), patch.object(mod, "translate_title_and_abstract_to_zh", side_effect=llm_call(("标题", "摘要"))), patch.object(
+            mod, "generate_glance_overview", return_value="速览"
+        ), patch.object(mod, "process_paper", side_effect=llm_call(("x", "X"))):
+            executor = mod.start_batched_llm_prefill(jobs, batch_size=2, token_budget=10000, workers=2, llm_slots=slots)
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                done = list(pool.map(lambda job: mod.stage_llm(job, slots), jobs))
+            executor.shutdown(wait=True)
+        self.assertEqual(len(done), 6)
+        # 已有论文的修复与批量请求同时进行：2 个批量线程 + 2 个 LLM 阶段线程，合计仍不超过 2 个名额
+        self.assertLessEqual(active[1], 2)
+
+    def test_prefill_disabled_for_batch_size_one(self):
+        with patch.object(self.mod, "LLM_CLIENT", FakeClient([])):
+            self.assertIsNone(self.mod.start_batched_llm_prefill([], batch_size=1, token_budget=1000, workers=1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,6 +4,7 @@ import sys
 import tempfile
 import unittest
 from pathlib import Path
+from unittest.mock import patch
 
 
 class GenerateDocsMetaParseTest(unittest.TestCase):
@@ -155,6 +156,108 @@ class GenerateDocsMetaParseTest(unittest.TestCase):
         self.assertEqual(len(tables), 1)
         self.assertEqual(tables[0]["url"], "assets/tables/arxiv/1234.5678/table-001.webp")
 
+    def test_missing_paper_outputs_flags_degraded_llm_results(self):
+        degraded = self.mod.build_markdown_content(
+            {"title": "T", "abstract": "A"}, "deep", "", "", []
+        )
+        self.assertEqual(
+            self.mod.missing_paper_outputs(degraded, "deep"),
+            ["title_zh", "abstract_zh", "deep_summary"],
+        )
+        self.assertEqual(self.mod.missing_paper_outputs(degraded, "deep", glance_only=True), [])
+
+        full = self.mod.build_markdown_content({"title": "T", "abstract": "A"}, "quick", "标题", "摘要", [])
+        self.assertEqual(self.mod.missing_paper_outputs(full, "quick"), [])
+        self.assertEqual(self.mod.missing_paper_outputs(full, "deep"), ["deep_summary"])
+        summarized = full + "\n\n## 论文详细总结（自动生成）\n\n总结\n"
+        self.assertEqual(self.mod.missing_paper_outputs(summarized, "deep"), [])
+        legacy = "# T\n# 标题\n\n## 摘要\n摘要\n\n## Abstract\nA\n"
+        self.assertEqual(self.mod.missing_paper_outputs(legacy, "quick"), [])
+
+    def test_missing_paper_outputs_flags_failed_media_extraction(self):
+        paper = {
+            "id": "2601.00001",
+            "title": "T",
+            "abstract": "A",
+            "source": "arxiv",
+            "pdf_url": "https://arxiv.org/pdf/2601.00001",
+        }
+        md = self.mod.build_markdown_content(paper, "quick", "标题", "摘要", [])
+        with tempfile.TemporaryDirectory() as d:
+            job = self.mod.prepare_paper_job(paper, "quick", "20260101", d)
+            Path(job.txt_path).parent.mkdir(parents=True, exist_ok=True)
+            Path(job.txt_path).write_text("full text", encoding="utf-8")
+            expected = self.mod.expected_paper_outputs(job)
+            # 图表下载 / PaperCropper 失败：md 无图表字段，磁盘上也没有 meta.json
+            self.assertEqual(self.mod.missing_paper_outputs(md, "quick", **expected), ["media"])
+
+            figure_meta, _table_meta = expected["media_meta_paths"]
+            Path(figure_meta).parent.mkdir(parents=True, exist_ok=True)
+            Path(figure_meta).write_text('{"figures": []}', encoding="utf-8")
+            self.assertEqual(self.mod.missing_paper_outputs(md, "quick", **expected), [])
+
+            figures = [{"url": "assets/figures/arxiv/x/fig-001.webp"}]
+            with_figures = self.mod.build_markdown_content(paper | {"_figure_assets": figures}, "quick", "标题", "摘要", [])
+            Path(figure_meta).unlink()
+            self.assertEqual(self.mod.missing_paper_outputs(with_figures, "quick", **expected), [])
+
+            other = self.mod.prepare_paper_job(paper | {"source": "openreview"}, "quick", "20260101", d)
+            self.assertEqual(self.mod.expected_paper_outputs(other)["media_meta_paths"], ())
+
+    def test_missing_paper_outputs_flags_missing_full_text(self):
+        paper = {"id": "x", "title": "T", "abstract": "A", "pdf_url": "https://example.com/x.pdf"}
+        md = self.mod.build_markdown_content(paper, "quick", "", "", [])
+        with tempfile.TemporaryDirectory() as d:
+            job = self.mod.prepare_paper_job(paper, "quick", "20260101", d, glance_only=True)
+            expected = self.mod.expected_paper_outputs(job)
+            # --glance-only 运行拉取 .txt 失败时不应被视为完整
+            self.assertEqual(self.mod.missing_paper_outputs(md, "quick", glance_only=True, **expected), ["txt"])
+            Path(job.txt_path).parent.mkdir(parents=True, exist_ok=True)
+            Path(job.txt_path).write_text("full text", encoding="utf-8")
+            self.assertEqual(self.mod.missing_paper_outputs(md, "quick", glance_only=True, **expected), [])
+
+            no_pdf = self.mod.prepare_paper_job({"id": "y", "title": "T"}, "quick", "20260101", d, glance_only=True)
+            self.assertEqual(self.mod.expected_paper_outputs(no_pdf)["txt_path"], "")
+
+    def test_existing_paper_repairs_text_and_media_outside_llm_stage(self):
+        mod = self.mod
+        paper = {
+            "id": "2601.00002",
+            "title": "T",
+            "abstract": "A",
+            "source": "arxiv",
+            "pdf_url": "https://arxiv.org/pdf/2601.00002",
+        }
+        figures = [{"url": "assets/figures/arxiv/2601.00002/fig-001.webp"}]
+        calls = []
+
+        def no_download(*args, **kwargs):
+            raise AssertionError("LLM 阶段不应再下载全文或抽取图表")
+
+        with tempfile.TemporaryDirectory() as d:
+            job = mod.prepare_paper_job(dict(paper), "quick", "20260101", d)
+            Path(job.md_path).parent.mkdir(parents=True, exist_ok=True)
+            Path(job.md_path).write_text(mod.build_markdown_content(paper, "quick", "标题", "摘要", []), encoding="utf-8")
+            job = mod.prepare_paper_job(dict(paper), "quick", "20260101", d)
+            self.assertTrue(job.existing)
+            self.assertTrue(job.needs_media)
+
+            with patch.object(mod, "fetch_text_content", return_value="full text"), patch.object(
+                mod, "prefetch_pdf", side_effect=lambda *a, **k: calls.append("prefetch")
+            ), patch.object(mod, "ensure_paper_media", return_value=(figures, [])):
+                for stage in (mod.stage_fetch, mod.stage_extract, mod.stage_media):
+                    job = stage(job)
+            self.assertEqual(calls, ["prefetch"])
+            self.assertEqual(Path(job.txt_path).read_text(encoding="utf-8"), "full text")
+
+            with patch.object(mod, "ensure_text_content", side_effect=no_download), patch.object(
+                mod, "maybe_generate_paper_media", side_effect=no_download
+            ), patch.object(mod, "generate_glance_overview", return_value=""):
+                mod.stage_llm(job)
+            md = Path(job.md_path).read_text(encoding="utf-8")
+            self.assertIn("figures_json:", md)
+            self.assertEqual(mod.missing_paper_outputs(md, "quick", **mod.expected_paper_outputs(job)), [])
+
     def test_maybe_generate_paper_media_accepts_biorxiv(self):
         calls = []
 
@@ -231,7 +334,8 @@ class GenerateDocsMetaParseTest(unittest.TestCase):
         self.assertIn("**TLDR**", out)
         self.assertIs(captured["client"], fallback_client)
         self.assertEqual(captured["kwargs"]["max_tokens"], 16 * 1024)
-        prompt = captured["messages"][2]["content"]
+        prompt = captured["messages"][1]["content"]
+        self.assertIn('"title": "Title"', captured["messages"][-1]["content"])
         self.assertIn("150-220个中文字符", prompt)
         self.assertIn("30-70个中文字符", prompt)
         self.assertIn("问题背景→核心方法→关键结果→贡献意义", prompt)
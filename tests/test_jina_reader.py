@@ -0,0 +1,120 @@
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+import jina_reader  # noqa: E402
+from metrics import REGISTRY as METRICS  # noqa: E402
+
+
+class FakeResponse:
+    def __init__(self, status_code, text="", headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+
+
+class FakeSession:
+    def __init__(self, responses, delay=0.0):
+        self.responses = list(responses)
+        self.delay = delay
+        self.calls = []
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def get(self, url, headers=None, timeout=None):
+        with self.lock:
+            self.calls.append(url)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            resp = self.responses.pop(0) if len(self.responses) > 1 else self.responses[0]
+        time.sleep(self.delay)
+        with self.lock:
+            self.in_flight -= 1
+        if isinstance(resp, Exception):
+            raise resp
+        return resp
+
+    def close(self):
+        pass
+
+
+class JinaReaderTest(unittest.TestCase):
+    def setUp(self):
+        METRICS.reset(["jina_requests", "jina_request_seconds"])
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def _reader(self, session, **kwargs):
+        kwargs.setdefault("per_minute", 0)
+        kwargs.setdefault("retry_wait_seconds", 0)
+        return jina_reader.JinaReader(cache_dir=self.tmp.name, session=session, **kwargs)
+
+    def test_success_is_cached_on_disk_across_url_variants(self):
+        session = FakeSession([FakeResponse(200, "# Title\nbody")])
+        reader = self._reader(session)
+        self.assertEqual(reader.fetch("https://arxiv.org/pdf/2401.00001"), "# Title\nbody")
+        # 新实例（模拟下一次 workflow 运行）+ abs 形式的 URL 命中同一缓存
+        again = self._reader(FakeSession([FakeResponse(500)]))
+        self.assertEqual(again.fetch("https://arxiv.org/abs/2401.00001"), "# Title\nbody")
+        self.assertEqual(len(session.calls), 1)
+        # 一次真实请求 + 一次缓存命中
+        self.assertEqual(METRICS.counter_total("jina_requests"), 2)
+
+    def test_failures_are_negatively_cached(self):
+        session = FakeSession([FakeResponse(503, "busy")])
+        reader = self._reader(session)
+        self.assertIsNone(reader.fetch("https://example.org/a.pdf", max_retries=2))
+        self.assertEqual(len(session.calls), 2)
+        self.assertIsNone(reader.fetch("https://example.org/a.pdf"))
+        self.assertEqual(len(session.calls), 2)
+        self.assertTrue(self._reader(FakeSession([FakeResponse(200, "x")])).recently_failed("https://example.org/a.pdf"))
+
+    def test_client_error_is_not_retried(self):
+        session = FakeSession([FakeResponse(422, "bad pdf")])
+        self.assertIsNone(self._reader(session).fetch("https://example.org/b.pdf", max_retries=3))
+        self.assertEqual(len(session.calls), 1)
+
+    def test_rate_limit_defers_next_request(self):
+        session = FakeSession([FakeResponse(429, headers={"Retry-After": "0.2"}), FakeResponse(200, "ok")])
+        reader = self._reader(session)
+        started = time.monotonic()
+        self.assertEqual(reader.fetch("https://example.org/c.pdf"), "ok")
+        self.assertGreaterEqual(time.monotonic() - started, 0.19)
+
+    def test_concurrency_cap_and_single_flight(self):
+        session = FakeSession([FakeResponse(200, "md")], delay=0.05)
+        reader = self._reader(session, concurrency=2)
+        urls = [f"https://example.org/{i % 4}.pdf" for i in range(12)]
+        threads = [threading.Thread(target=reader.fetch, args=(u,)) for u in urls]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertLessEqual(session.max_in_flight, 2)
+        self.assertEqual(len(session.calls), 4)
+        self.assertEqual(len(reader._key_locks), 0)
+
+    def test_rate_limiter_spaces_requests(self):
+        limiter = jina_reader.RateLimiter(per_minute=600)
+        started = time.monotonic()
+        for _ in range(3):
+            limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - started, 0.19)
+
+    def test_shared_reader_honours_cache_off(self):
+        self.addCleanup(jina_reader.reset_jina_reader)
+        jina_reader.reset_jina_reader()
+        with patch.dict("os.environ", {"DPR_JINA_CACHE_DIR": "off"}):
+            self.assertIsNone(jina_reader.get_jina_reader().cache_dir)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+import importlib.util
+import json
+import pathlib
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+
+def _load_module(module_name: str, path: pathlib.Path):
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    mod = importlib.util.module_from_spec(spec)
+    assert spec and spec.loader
+    spec.loader.exec_module(mod)
+    return mod
+
+
+class LlmRefineMemoTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        root = pathlib.Path(__file__).resolve().parents[1]
+        src_dir = root / "src"
+        if str(src_dir) not in sys.path:
+            sys.path.insert(0, str(src_dir))
+        cls.mod = _load_module("llm_refine_mod_memo", src_dir / "4.llm_refine_papers.py")
+
+    def _write_input(self, tmpdir: pathlib.Path) -> pathlib.Path:
+        payload = {
+            "papers": [
+                {"id": "p-1", "title": "Paper One", "abstract": "About symbolic regression."},
+                {"id": "p-2", "title": "Paper Two", "abstract": "About protein folding."},
+            ],
+            "queries": [
+                {
+                    "type": "llm_query",
+                    "query_text": "symbolic regression",
+                    "ranked": [
+                        {"paper_id": "p-1", "star_rating": 5},
+                        {"paper_id": "p-2", "star_rating": 5},
+                    ],
+                }
+            ],
+        }
+        path = tmpdir / "input.json"
+        path.write_text(json.dumps(payload), encoding="utf-8")
+        return path
+
+    def _run(self, tmpdir: pathlib.Path, input_path: pathlib.Path, judged: list, model: str = "m-1") -> dict:
+        def fake_filter_batch(batch_idx, batch, *args, **kwargs):
+            judged.extend(doc["id"] for doc in batch)
+            return batch_idx, batch, [
+                {"id": doc["id"], "score": 8, "matched_requirement_index": 1, "title_zh": "标题"}
+                for doc in batch
+            ]
+
+        output_path = tmpdir / "output.json"
+        with patch.object(self.mod, "_filter_batch", side_effect=fake_filter_batch), patch.dict(
+            "os.environ", {"DEEPSEEK_API_KEY": "test-key"}
+        ):
+            self.mod.process_file(
+                input_path=str(input_path),
+                output_path=str(output_path),
+                config_path=str(tmpdir / "missing-config.yaml"),
+                min_star=4,
+                batch_size=10,
+                max_chars=850,
+                filter_model=model,
+                max_output_tokens=1024,
+                filter_concurrency=1,
+                memo_path=str(tmpdir / "filter_memo.json"),
+            )
+        return json.loads(output_path.read_text(encoding="utf-8"))
+
+    def test_second_run_reuses_memoized_judgements(self):
+        with tempfile.TemporaryDirectory() as raw_tmp:
+            tmpdir = pathlib.Path(raw_tmp)
+            input_path = self._write_input(tmpdir)
+            judged = []
+
+            first = self._run(tmpdir, input_path, judged)
+            second = self._run(tmpdir, input_path, judged)
+
+            self.assertEqual(sorted(judged), ["p-1", "p-2"])
+            self.assertEqual(first["llm_memo"]["reused"], 0)
+            self.assertEqual(first["llm_memo"]["judged"], 2)
+            self.assertEqual(second["llm_memo"]["reused"], 2)
+            self.assertEqual(second["llm_memo"]["judged"], 0)
+            self.assertEqual(
+                sorted(item["paper_id"] for item in second["llm_ranked"]),
+                ["p-1", "p-2"],
+            )
+            self.assertEqual(second["llm_ranked"][0]["matched_query_text"], "symbolic regression")
+
+    def test_model_change_invalidates_memo(self):
+        with tempfile.TemporaryDirectory() as raw_tmp:
+            tmpdir = pathlib.Path(raw_tmp)
+            input_path = self._write_input(tmpdir)
+            judged = []
+
+            self._run(tmpdir, input_path, judged, model="m-1")
+            out = self._run(tmpdir, input_path, judged, model="m-2")
+
+            self.assertEqual(len(judged), 4)
+            self.assertEqual(out["llm_memo"]["reused"], 0)
+
+    def test_memo_key_depends_on_content_and_requirements(self):
+        reqs = [{"id": "req-1", "query": "a", "tag": "query:a", "kind": "direct", "description_en": "A"}]
+        req_hash = self.mod.requirement_set_hash(reqs)
+        base = self.mod.filter_memo_key("p-1", "Title: A", req_hash, "m")
+
+        self.assertEqual(base, self.mod.filter_memo_key("p-1", "Title: A", req_hash, "m"))
+        self.assertNotEqual(base, self.mod.filter_memo_key("p-1", "Title: B", req_hash, "m"))
+        self.assertNotEqual(
+            base,
+            self.mod.filter_memo_key(
+                "p-1",
+                "Title: A",
+                self.mod.requirement_set_hash(reqs + [{"id": "req-2", "query": "b"}]),
+                "m",
+            ),
+        )
+
+    def test_save_filter_memo_drops_stale_entries(self):
+        with tempfile.TemporaryDirectory() as raw_tmp:
+            memo_path = str(pathlib.Path(raw_tmp) / "memo.json")
+            memo = {
+                "fresh": {"used_at": "20260310", "result": {"paper_id": "p-1"}},
+                "stale": {"used_at": "20260101", "result": {"paper_id": "p-2"}},
+            }
+
+            self.mod.save_filter_memo(memo, memo_path, today="20260315", ttl_days=30)
+
+            self.assertEqual(list(self.mod.load_filter_memo(memo_path)), ["fresh"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,9 @@
 import importlib.util
 import pathlib
 import sys
+import threading
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 
 
 def _load_module(module_name: str, path: pathlib.Path):
@@ -108,6 +110,63 @@ class LlmRefineRecoveryTest(unittest.TestCase):
         self.assertIn((("p-1",), 1), calls)
         self.assertIn((("p-2",), 1), calls)
 
+    def test_recover_docs_concurrently_rebatches_and_bisects_failing_halves(self):
+        docs = [{"id": f"p-{idx}", "content": f"doc{idx}"} for idx in range(1, 6)]
+        calls = []
+        lock = threading.Lock()
+
+        def runner_factory(tag):
+            def runner(batch_docs, attempt, retry_note):
+                doc_ids = tuple(item["id"] for item in batch_docs)
+                with lock:
+                    calls.append((tag, doc_ids, attempt))
+                if "p-2" in doc_ids and len(doc_ids) > 1:
+                    raise ValueError("missing ids=p-2")
+                if doc_ids == ("p-5",):
+                    raise ValueError("always broken")
+                return [self.relevant_result(pid) for pid in doc_ids]
+
+            return runner
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results, failed_ids = self.mod.recover_docs_concurrently(
+                executor,
+                docs,
+                runner_factory,
+                batch_size=4,
+                max_attempts=2,
+            )
+
+        self.assertEqual(sorted(item["id"] for item in results), ["p-1", "p-2", "p-3", "p-4"])
+        self.assertEqual(failed_ids, ["p-5"])
+        batches = {doc_ids: tag for tag, doc_ids, _ in calls}
+        self.assertIn(("p-1", "p-2", "p-3", "p-4"), batches)
+        self.assertIn(("p-3", "p-4"), batches)
+        self.assertIn(("p-2",), batches)
+        self.assertNotIn(("p-3",), batches)
+        self.assertEqual(sum(1 for _, doc_ids, _ in calls if doc_ids == ("p-1", "p-2", "p-3", "p-4")), 1)
+        self.assertEqual(sum(1 for _, doc_ids, _ in calls if doc_ids == ("p-5",)), 2)
+        self.assertEqual(batches[("p-3", "p-4")], "recover_001_right")
+
+    def test_recover_filter_results_retries_only_tail_after_streamed_truncation(self):
+        docs = [{"id": f"p-{idx}", "content": f"doc{idx}"} for idx in range(1, 4)]
+        calls = []
+
+        def runner(batch_docs, attempt, retry_note):
+            doc_ids = tuple(item["id"] for item in batch_docs)
+            calls.append(doc_ids)
+            if len(doc_ids) == 3:
+                raise self.mod.FilterOutputTruncatedError(
+                    "unexpected finish_reason: length",
+                    [self.relevant_result("p-2"), {"id": "p-3"}],
+                )
+            return [self.relevant_result(pid) for pid in doc_ids]
+
+        out = self.mod.recover_filter_results(docs, runner, max_attempts=3, debug_tag="tail_test")
+
+        self.assertEqual([item["id"] for item in out], ["p-1", "p-2", "p-3"])
+        self.assertEqual(calls, [("p-1", "p-2", "p-3"), ("p-1",)])
+
     def test_recover_filter_results_accepts_short_best_effort_fields(self):
         docs = [
             {"id": "p-1", "content": "doc1"},
@@ -181,12 +240,15 @@ class LlmRefineRecoveryTest(unittest.TestCase):
         self.assertEqual(out[0]["title_zh"], "中文标题")
         self.assertIn("论文方法围绕需求", out[0]["method_cn"])
         user_content = captured["messages"][1]["content"]
+        papers_content = captured["messages"][2]["content"]
         self.assertEqual(captured["schema_name"], "rerank_batch")
         self.assertTrue(captured["strict"])
         self.assertTrue(captured["allow_json_object_fallback"])
         self.assertIn("Let me repeat that:", user_content)
         self.assertEqual(user_content.count("User requirements list:"), 2)
-        self.assertEqual(user_content.count("Papers:"), 2)
+        self.assertNotIn("Papers:", user_content)
+        self.assertEqual(papers_content.count("Papers:"), 2)
+        self.assertIn("Let me repeat that:", papers_content)
         self.assertIn("method_cn", user_content)
         self.assertIn("title_zh", user_content)
         self.assertIn("150-220 Chinese characters", user_content)
@@ -194,7 +256,38 @@ class LlmRefineRecoveryTest(unittest.TestCase):
         self.assertIn("length targets are guidance", user_content)
         self.assertIn("same style as a paper-page TLDR abstract", user_content)
         self.assertNotIn("<= 60 Chinese characters", user_content)
-        self.assertTrue(user_content.rstrip().endswith("Output must be strict JSON only, no markdown, no fences, no extra text."))
+        self.assertTrue(papers_content.rstrip().endswith("Output must be strict JSON only, no markdown, no fences, no extra text."))
+
+    def test_call_filter_keeps_shared_prefix_stable_across_batches(self):
+        captured = []
+        test_case = self
+
+        class FakeClient:
+            model = "deepseek-v4-flash"
+
+            def chat_structured(self, messages, schema_name, schema, strict, allow_json_object_fallback):
+                captured.append(messages)
+                doc_id = "p-1" if "p-1" in messages[-1]["content"] else "p-2"
+                return {
+                    "parsed": {"results": [test_case.relevant_result(doc_id)]},
+                    "parse_error": None,
+                    "refusal": "",
+                    "finish_reason": "stop",
+                }
+
+        requirements = [{"id": "req-1", "query": "sr", "tag": "query:sr", "kind": "direct", "description_en": "SR"}]
+        for doc_id in ("p-1", "p-2"):
+            self.mod.call_filter(
+                client=FakeClient(),
+                all_requirements=requirements,
+                docs=[{"id": doc_id, "content": f"Title: {doc_id}"}],
+                debug_dir="",
+                debug_tag="prefix_test",
+                retry_note="retry" if doc_id == "p-2" else "",
+            )
+
+        self.assertEqual(captured[0][:2], captured[1][:2])
+        self.assertNotEqual(captured[0][2], captured[1][2])
 
 
 if __name__ == "__main__":
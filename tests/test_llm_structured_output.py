@@ -1,3 +1,4 @@
+import json
 import sys
 import unittest
 from pathlib import Path
@@ -9,7 +10,8 @@ import requests
 ROOT = Path(__file__).resolve().parents[1]
 sys.path.insert(0, str(ROOT / "src"))
 
-from llm import LLMClient
+import llm
+from llm import LLMClient, StreamingJsonItemParser
 
 
 class LlmStructuredOutputTest(unittest.TestCase):
@@ -184,6 +186,92 @@ class LlmStructuredOutputTest(unittest.TestCase):
         self.assertIsNone(result["parsed"])
         self.assertIsNone(result["parse_error"])
 
+    def _mock_stream_response(self, pieces, finish_reason="stop"):
+        lines = []
+        for piece in pieces:
+            lines.append("data: " + json.dumps({"choices": [{"delta": {"content": piece}, "finish_reason": None}]}))
+        lines.append("data: " + json.dumps({"choices": [{"delta": {}, "finish_reason": finish_reason}]}))
+        lines.append("data: " + json.dumps({
+            "choices": [],
+            "usage": {"prompt_tokens": 3, "completion_tokens": 2, "total_tokens": 5},
+        }))
+        lines.append("data: [DONE]")
+        resp = MagicMock()
+        resp.raise_for_status.return_value = None
+        resp.iter_lines.return_value = iter(lines)
+        return resp
+
+    def test_streaming_parser_emits_array_items_across_chunk_boundaries(self):
+        seen = []
+        parser = StreamingJsonItemParser(array_key="results", on_item=seen.append)
+        text = '{"results": [{"id": "p-1", "note": "a, [b]}"}, {"id": "p-2"}, {"id": "p-'
+        for idx in range(0, len(text), 7):
+            parser.feed(text[idx:idx + 7])
+
+        self.assertEqual(seen, [{"id": "p-1", "note": "a, [b]}"}, {"id": "p-2"}])
+        self.assertEqual(parser.items, seen)
+
+    def test_streaming_parser_emits_top_level_members_without_array_key(self):
+        parser = StreamingJsonItemParser()
+        parser.feed('```json\n{"tldr": "x", "method": {"k": [1, 2]}, "result": "trunc')
+
+        self.assertEqual(parser.items, [{"tldr": "x"}, {"method": {"k": [1, 2]}}])
+
+    @patch("llm.requests.post")
+    def test_chat_structured_stream_hands_items_to_caller_and_keeps_them_on_truncation(self, mock_post):
+        mock_post.return_value = self._mock_stream_response(
+            ['{"results":[{"id":"p-1"}', ',{"id":"p-2"},', '{"id":"p-'],
+            finish_reason="length",
+        )
+        client = LLMClient(
+            api_key="test-key",
+            model="deepseek-v4-flash",
+            base_url="https://api.deepseek.com",
+        )
+        seen = []
+
+        result = client.chat_structured(
+            messages=[{"role": "user", "content": "return JSON"}],
+            schema_name="batch",
+            schema={"type": "object"},
+            stream=True,
+            array_key="results",
+            on_item=seen.append,
+        )
+
+        self.assertTrue(mock_post.call_args.kwargs["json"]["stream"])
+        self.assertTrue(mock_post.call_args.kwargs["stream"])
+        self.assertEqual(seen, [{"id": "p-1"}, {"id": "p-2"}])
+        self.assertEqual(result["streamed_items"], seen)
+        self.assertEqual(result["finish_reason"], "length")
+        self.assertEqual(result["tokens"]["total"], 5)
+        self.assertEqual(mock_post.call_count, 1)
+
+    @patch("llm.requests.post")
+    def test_chat_records_deepseek_prompt_cache_tokens(self, mock_post):
+        resp = self._mock_success_response({"content": "ok"})
+        resp.json.return_value["usage"] = {
+            "prompt_tokens": 100,
+            "completion_tokens": 5,
+            "total_tokens": 105,
+            "prompt_cache_hit_tokens": 64,
+            "prompt_cache_miss_tokens": 36,
+        }
+        mock_post.return_value = resp
+        client = LLMClient(
+            api_key="test-key",
+            model="deepseek-v4-flash",
+            base_url="https://api.deepseek.com",
+        )
+        llm.reset_global_tokens()
+
+        result = client.chat(messages=[{"role": "user", "content": "hello"}])
+
+        self.assertEqual(result["tokens"]["cache_hit"], 64)
+        self.assertEqual(result["tokens"]["cache_miss"], 36)
+        self.assertEqual(llm.get_global_tokens()["cache_hit"], 64)
+        self.assertEqual(llm.get_global_tokens()["cache_miss"], 36)
+
 
 if __name__ == "__main__":
     unittest.main()
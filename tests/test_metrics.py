@@ -0,0 +1,65 @@
+import json
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+from metrics import MetricsRegistry  # noqa: E402
+
+
+class MetricsRegistryTest(unittest.TestCase):
+    def test_counters_are_thread_safe(self):
+        registry = MetricsRegistry()
+
+        def worker():
+            for _ in range(1000):
+                registry.inc("llm_calls", provider="deepseek", model="m")
+                registry.inc("llm_tokens_prompt", 3, provider="deepseek", model="m")
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(registry.counter_total("llm_calls"), 8000)
+        self.assertEqual(registry.counter_total("llm_tokens_prompt"), 24000)
+
+    def test_default_stage_label_and_histogram(self):
+        registry = MetricsRegistry()
+        registry.set_default_labels(stage="step4")
+        for value in (0.2, 0.4, 3.0):
+            registry.observe("llm_latency_seconds", value, model="m")
+        snap = registry.snapshot()
+        hist = snap["histograms"][0]
+        self.assertEqual(hist["labels"], {"model": "m", "stage": "step4"})
+        self.assertEqual(hist["count"], 3)
+        self.assertAlmostEqual(hist["sum"], 3.6)
+        self.assertEqual(hist["max"], 3.0)
+        self.assertAlmostEqual(registry.histogram_sum("llm_latency_seconds"), 3.6)
+        self.assertIn("[metrics][step4]", registry.summary_line())
+
+    def test_maybe_log_summary_respects_interval(self):
+        registry = MetricsRegistry()
+        lines = []
+        self.assertTrue(registry.maybe_log_summary(interval=0, printer=lines.append))
+        self.assertFalse(registry.maybe_log_summary(interval=3600, printer=lines.append))
+        self.assertEqual(len(lines), 1)
+
+    def test_dump_json_includes_info(self):
+        registry = MetricsRegistry()
+        registry.inc("rerank_docs", 5, model="r")
+        registry.set_info("step3", {"papers": 10})
+        with tempfile.TemporaryDirectory() as tmp:
+            path = registry.dump_json(os.path.join(tmp, "metrics", "step3.json"))
+            with open(path, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+        self.assertEqual(payload["info"]["step3"], {"papers": 10})
+        self.assertEqual(payload["counters"][0]["value"], 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
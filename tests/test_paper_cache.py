@@ -0,0 +1,163 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime, timezone
+from pathlib import Path
+from unittest.mock import patch
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+import paper_cache  # noqa: E402
+import supabase_source  # noqa: E402
+from supabase_source import fetch_papers_by_date_range  # noqa: E402
+
+
+class _Resp:
+    def __init__(self, rows):
+        self.status_code = 200
+        self._rows = rows
+        self.content = json.dumps(rows).encode("utf-8")
+        self.text = self.content.decode("utf-8")
+
+    def json(self):
+        return self._rows
+
+
+def _row(day: int, j: int, updated_at: str, title: str = ""):
+    return {
+        "id": f"2603.{day:02d}{j:03d}",
+        "title": title or f"Paper {day}-{j}",
+        "published": f"2026-03-{day:02d}T00:00:00+00:00",
+        "updated_at": updated_at,
+    }
+
+
+def _fake_server(table, calls):
+    """模拟 PostgREST：published 区间 keyset 翻页 + updated_at 增量翻页（增量同样受 published 区间约束）。"""
+
+    def handler(method, endpoint, **kwargs):
+        params = parse_qsl(urlsplit(endpoint).query, keep_blank_values=True)
+        calls.append(dict(params))
+        gte = lt = since = None
+        cursor = None
+        limit = 1000
+        for key, value in params:
+            if key == "published" and value.startswith("gte."):
+                gte = value[4:].replace("Z", "+00:00")
+            elif key == "published" and value.startswith("lt."):
+                lt = value[3:].replace("Z", "+00:00")
+            elif key == "updated_at":
+                since = value[4:].replace("Z", "+00:00")
+            elif key == "or":
+                parts = unquote(value).split('"')
+                cursor = (parts[1], parts[5])
+            elif key == "limit":
+                limit = int(value)
+        if since is not None:
+            rows = sorted(
+                (r for r in table if r["updated_at"] >= since and gte <= r["published"] < lt),
+                key=lambda r: (r["updated_at"], r["id"]),
+            )
+            if cursor:
+                rows = [r for r in rows if (r["updated_at"], r["id"]) > cursor]
+        else:
+            rows = sorted((r for r in table if gte <= r["published"] < lt), key=lambda r: (r["published"], r["id"]), reverse=True)
+            if cursor:
+                rows = [r for r in rows if (r["published"], r["id"]) < cursor]
+        return _Resp([dict(r) for r in rows[:limit]])
+
+    return handler
+
+
+class PaperCacheFetchTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        env = patch.dict(os.environ, {"DPR_PAPER_CACHE_PATH": os.path.join(tmp.name, "papers.sqlite3")})
+        env.start()
+        self.addCleanup(env.stop)
+        page_patch = patch.object(supabase_source, "_FETCH_PAGE_SIZE", 4)
+        page_patch.start()
+        self.addCleanup(page_patch.stop)
+        # 已有行都在很久以前写入，增量同步不应再拉到它们
+        self.table = [_row(day, j, "2026-03-12T00:00:00+00:00") for day in range(1, 11) for j in range(2)]
+        self.calls = []
+
+    def _fetch(self, start_day: int, end_day: int, url: str = "https://example.supabase.co"):
+        with patch.object(supabase_source, "_request_with_retries", side_effect=_fake_server(self.table, self.calls)):
+            return fetch_papers_by_date_range(
+                url=url,
+                api_key="k",
+                papers_table="arxiv_papers",
+                start_dt=datetime(2026, 3, start_day, tzinfo=timezone.utc),
+                end_dt=datetime(2026, 3, end_day, tzinfo=timezone.utc),
+            )
+
+    def _remote(self, start_day: int, end_day: int):
+        with patch.object(supabase_source, "_request_with_retries", side_effect=_fake_server(self.table, [])):
+            return fetch_papers_by_date_range(
+                url="https://example.supabase.co",
+                api_key="k",
+                papers_table="arxiv_papers",
+                start_dt=datetime(2026, 3, start_day, tzinfo=timezone.utc),
+                end_dt=datetime(2026, 3, end_day, tzinfo=timezone.utc),
+                use_cache=False,
+            )
+
+    def test_second_run_only_fetches_delta_and_uncovered_tail(self):
+        first, msg = self._fetch(1, 11)
+        self.assertIn("本地缓存", msg)
+        self.assertEqual(len(first), 20)
+
+        now_iso = datetime.now(timezone.utc).isoformat()
+        self.table.append(_row(11, 0, now_iso))
+        self.table.append(_row(11, 1, now_iso))
+        self.table[0] = _row(1, 0, now_iso, title="Paper 1-0 (v2)")
+        self.calls.clear()
+
+        second, msg = self._fetch(2, 12)
+
+        expected, _ = self._remote(2, 12)
+        self.assertEqual([p["id"] for p in second], [p["id"] for p in expected])
+        self.assertEqual(second, expected)
+        # 增量只拉已覆盖区间 [3-1, 3-11) 内的 1 行更新；3-11 的新行由补拉 [3-11, 3-12) 这一段带回
+        delta_rows = [c for c in self.calls if "updated_at" in c]
+        window_calls = [c for c in self.calls if "published" in c and "updated_at" not in c]
+        self.assertTrue(delta_rows)
+        self.assertTrue(window_calls)
+        self.assertIn("增量 1 条", msg)
+        self.assertIn("补拉 2 条 / 1 段", msg)
+
+        third, _ = self._fetch(1, 3)
+        titles = {p["id"]: p["title"] for p in third}
+        self.assertEqual(titles["2603.01000"], "Paper 1-0 (v2)")
+
+    def test_disjoint_window_replaces_coverage_and_lookup_by_id(self):
+        self._fetch(1, 3)
+        self.calls.clear()
+        rows, _ = self._fetch(8, 11)
+
+        self.assertEqual(len(rows), 6)
+        self.assertFalse([c for c in self.calls if "updated_at" in c])
+        found = paper_cache.lookup_cached_papers(["2603.09001", "2603.01000", "missing"])
+        self.assertEqual(set(found), {"2603.09001"})
+        self.assertIsNone(found["2603.09001"]["embedding"])
+
+    def test_coverage_is_scoped_by_project(self):
+        self._fetch(1, 11)
+        self.calls.clear()
+        rows, msg = self._fetch(2, 11, url="https://other.supabase.co")
+
+        self.assertEqual(len(rows), 18)
+        # 另一个项目没有覆盖区间：不做增量，整窗远端拉取
+        self.assertFalse([c for c in self.calls if "updated_at" in c])
+        self.assertIn("增量 0 条", msg)
+        self.assertIn("补拉 18 条 / 1 段", msg)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,150 @@
+import os
+import sys
+import tempfile
+import textwrap
+import threading
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from PIL import Image
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+import paper_figures  # noqa: E402
+import papercropper_worker  # noqa: E402
+from papercropper_worker import PaperCropperPool, PaperCropperUnavailable  # noqa: E402
+
+# 模拟 worker：启动时打印 ready，逐个接手任务（accepted），按文件名模拟耗时后写一张 figure PNG 并回报（记录自身 pid）
+FAKE_WORKER = textwrap.dedent(
+    """
+    import json, os, sys, time
+    from PIL import Image
+    if os.environ.get("FAKE_WORKER_FAIL"):
+        print(json.dumps({"event": "error", "error": "ModuleNotFoundError: doclayout_yolo"}), flush=True)
+        sys.exit(1)
+    print(json.dumps({"event": "ready"}), flush=True)
+    for line in sys.stdin:
+        job = json.loads(line)
+        print(json.dumps({"event": "accepted", "id": job["id"], "batch": 1}), flush=True)
+        name = os.path.basename(job["pdf"])
+        time.sleep(3.0 if name.startswith("slow") else 0.6 if name.startswith("busy") else 0.0)
+        stem = os.path.splitext(os.path.basename(job["pdf"]))[0]
+        out = os.path.join(job["output"], stem, "Figures_png")
+        os.makedirs(out, exist_ok=True)
+        Image.new("RGB", (400, 300), (10, 20, 30)).save(os.path.join(out, "page001-01.png"))
+        print(json.dumps({"id": job["id"], "ok": True, "figures": 1, "tables": 0, "pid": os.getpid()}), flush=True)
+    """
+)
+
+
+class PaperCropperWorkerTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = Path(tmp.name)
+        self.script = self.tmp / "fake_worker.py"
+        self.script.write_text(FAKE_WORKER, encoding="utf-8")
+        self.pdf = self.tmp / "paper.pdf"
+        self.pdf.write_bytes(b"%PDF-1.4\n")
+
+    def test_pool_reuses_one_worker_for_many_jobs(self):
+        pool = PaperCropperPool([sys.executable, str(self.script)], workers=1, start_timeout=30)
+        self.addCleanup(pool.close)
+        replies = []
+
+        def _job(i):
+            out = self.tmp / f"out{i}"
+            replies.append(pool.extract(str(self.pdf), str(out), timeout=30))
+
+        threads = [threading.Thread(target=_job, args=(i,)) for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(replies), 4)
+        self.assertTrue(all(r["ok"] for r in replies))
+        self.assertEqual(len({r["pid"] for r in replies}), 1)
+
+    def test_timeout_starts_when_worker_accepts_the_job(self):
+        pool = PaperCropperPool([sys.executable, str(self.script)], workers=1, start_timeout=30)
+        self.addCleanup(pool.close)
+        pdf = self.tmp / "busy.pdf"
+        pdf.write_bytes(b"%PDF-1.4\n")
+        replies = []
+
+        def _job(i):
+            replies.append(pool.extract(str(pdf), str(self.tmp / f"busy{i}"), timeout=1))
+
+        # 单个 worker 串行处理 3 篇（每篇 0.6s）：最后一篇从提交算起超过 1s，但处理本身未超时
+        threads = [threading.Thread(target=_job, args=(i,)) for i in range(3)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(replies), 3)
+        self.assertTrue(all(r["ok"] for r in replies))
+
+    def test_timeout_fails_only_that_job_without_killing_the_worker(self):
+        pool = PaperCropperPool([sys.executable, str(self.script)], workers=1, start_timeout=30)
+        self.addCleanup(pool.close)
+        slow = self.tmp / "slow.pdf"
+        slow.write_bytes(b"%PDF-1.4\n")
+
+        with self.assertRaises(TimeoutError):
+            pool.extract(str(slow), str(self.tmp / "slow"), timeout=1)
+        stalled = pool._retired[0]
+
+        reply = pool.extract(str(self.pdf), str(self.tmp / "after"), timeout=30)
+        self.assertTrue(reply["ok"])
+        self.assertNotEqual(reply["pid"], stalled.proc.pid)
+        # 超时的 worker 没有被 kill：处理完手头任务后正常退出
+        self.assertEqual(stalled.proc.wait(timeout=10), 0)
+
+    def test_startup_failure_marks_pool_broken(self):
+        with patch.dict(os.environ, {"FAKE_WORKER_FAIL": "1"}):
+            pool = PaperCropperPool([sys.executable, str(self.script)], workers=1, start_timeout=30)
+            with self.assertRaises(PaperCropperUnavailable):
+                pool.extract(str(self.pdf), str(self.tmp / "out"), timeout=30)
+        self.assertIn("doclayout_yolo", pool.broken)
+        with self.assertRaises(PaperCropperUnavailable):
+            pool.extract(str(self.pdf), str(self.tmp / "out"), timeout=30)
+
+    def test_extract_media_uses_worker_instead_of_subprocess(self):
+        model = self.tmp / "model.pt"
+        model.write_bytes(b"weights")
+        pool = PaperCropperPool([sys.executable, str(self.script)], workers=1, start_timeout=30)
+        self.addCleanup(pool.close)
+
+        def _no_subprocess(*args, **kwargs):
+            raise AssertionError("不应再为单篇 PDF 起子进程")
+
+        with patch.object(paper_figures, "_resolve_papercropper", return_value=(sys.executable, "/tmp/extract.py", str(model))), patch.object(
+            paper_figures, "get_papercropper_pool", return_value=pool
+        ), patch.object(paper_figures.subprocess, "run", side_effect=_no_subprocess):
+            figures, tables = paper_figures._extract_media_with_papercropper(
+                str(self.pdf),
+                str(self.tmp / "figures"),
+                "assets/figures/arxiv/sample",
+                str(self.tmp / "tables"),
+                "assets/tables/arxiv/sample",
+            )
+        self.assertEqual(len(figures), 1)
+        self.assertEqual(tables, [])
+        with Image.open(self.tmp / "figures" / "fig-001.webp") as img:
+            self.assertEqual(img.size, (400, 300))
+
+    def test_pool_disabled_without_model_or_by_env(self):
+        self.addCleanup(papercropper_worker.reset_papercropper_pool)
+        self.assertIsNone(papercropper_worker.get_papercropper_pool(sys.executable, str(self.tmp / "missing.pt"), {}))
+        model = self.tmp / "model.pt"
+        model.write_bytes(b"weights")
+        with patch.dict(os.environ, {"PAPERCROPPER_WORKERS": "0"}):
+            self.assertIsNone(papercropper_worker.get_papercropper_pool(sys.executable, str(model), {}))
+        cmd_pool = papercropper_worker.get_papercropper_pool(sys.executable, str(model), {"dpi": "150"})
+        self.assertIn("--dpi", cmd_pool.cmd)
+
+
+if __name__ == "__main__":
+    unittest.main()
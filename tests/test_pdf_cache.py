@@ -0,0 +1,116 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+import pdf_cache  # noqa: E402
+from pdf_cache import PdfCache, normalize_pdf_url  # noqa: E402
+
+
+class _Resp:
+    def __init__(self, status_code=200, content=b"", headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+
+class _Server:
+    def __init__(self, content=b"%PDF-1.7 body", etag='"v1"', delay=0.0):
+        self.content = content
+        self.etag = etag
+        self.delay = delay
+        self.calls = []
+
+    def __call__(self, url, headers=None, timeout=None):
+        self.calls.append((url, dict(headers or {})))
+        if self.delay:
+            time.sleep(self.delay)
+        if (headers or {}).get("If-None-Match") == self.etag:
+            return _Resp(304)
+        return _Resp(200, self.content, {"ETag": self.etag})
+
+
+class PdfCacheTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = tmp.name
+
+    def test_normalize_unifies_arxiv_variants(self):
+        expected = "https://arxiv.org/pdf/2603.01234v2"
+        for url in [
+            "https://arxiv.org/abs/2603.01234v2",
+            "http://export.arxiv.org/pdf/2603.01234v2.pdf",
+            "HTTPS://www.ArXiv.org/pdf/2603.01234v2#page=3",
+        ]:
+            self.assertEqual(normalize_pdf_url(url), expected)
+        self.assertEqual(normalize_pdf_url("https://Example.com:443/a.pdf?x=1"), "https://example.com/a.pdf?x=1")
+
+    def test_hit_skips_network_and_stale_entry_revalidates(self):
+        server = _Server()
+        cache = PdfCache(self.root, ttl_seconds=3600, fetcher=server)
+
+        first = cache.get_bytes("https://arxiv.org/abs/2603.00001")
+        second = cache.get_bytes("https://arxiv.org/pdf/2603.00001.pdf")
+        self.assertEqual(first, second)
+        self.assertEqual(len(server.calls), 1)
+
+        cache.ttl_seconds = 0
+        self.assertEqual(cache.get_bytes("https://arxiv.org/pdf/2603.00001"), first)
+        self.assertEqual(len(server.calls), 2)
+        self.assertEqual(server.calls[1][1].get("If-None-Match"), '"v1"')
+
+        server.content, server.etag = b"%PDF-1.7 revised", '"v2"'
+        self.assertEqual(cache.get_bytes("https://arxiv.org/pdf/2603.00001"), b"%PDF-1.7 revised")
+
+    def test_concurrent_requests_download_once(self):
+        server = _Server(delay=0.05)
+        cache = PdfCache(self.root, fetcher=server)
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(cache.get_path("https://example.com/a.pdf")))
+            for _ in range(5)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(server.calls), 1)
+        self.assertEqual(len(set(results)), 1)
+        # 单飞结束后按 URL 的锁随之释放，不随处理过的 URL 数增长
+        self.assertEqual(len(cache._key_locks), 0)
+
+    def test_evicts_least_recently_used_objects(self):
+        server = _Server()
+        cache = PdfCache(self.root, max_bytes=25, fetcher=server)
+        old_path = cache.get_path("https://example.com/old.pdf")
+        long_ago = time.time() - 3600
+        os.utime(old_path, (long_ago, long_ago))
+
+        server.content = b"%PDF-1.7 newer body"
+        new_path = cache.get_path("https://example.com/new.pdf")
+
+        self.assertFalse(os.path.exists(old_path))
+        self.assertTrue(os.path.exists(new_path))
+        # 对象被淘汰后再次请求按未命中重新下载
+        cache.get_path("https://example.com/old.pdf")
+        self.assertEqual(len(server.calls), 3)
+
+    def test_off_value_disables_cache(self):
+        os.environ["DPR_PDF_CACHE_DIR"] = "off"
+        self.addCleanup(os.environ.pop, "DPR_PDF_CACHE_DIR", None)
+        self.assertIsNone(pdf_cache.get_pdf_cache())
+
+
+if __name__ == "__main__":
+    unittest.main()
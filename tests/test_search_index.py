@@ -0,0 +1,126 @@
+import json
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+import search_index  # noqa: E402
+
+
+def _write_day(docs: Path, key: str, papers) -> None:
+    day_dir = docs / key[:6] / key[6:]
+    day_dir.mkdir(parents=True, exist_ok=True)
+    (day_dir / "README.md").write_text("# day\n", encoding="utf-8")
+    payload = {"label": key, "date": key, "count": len(papers), "papers": papers, "errors": []}
+    (day_dir / "papers.meta.json").write_text(json.dumps(payload), encoding="utf-8")
+
+
+def _paper(route: str, title: str, abstract: str = "", tags: str = "") -> dict:
+    return {"paper_id": route, "title_en": title, "abstract_en": abstract, "tags": tags, "date": "2026-06-24"}
+
+
+class TokenizeTest(unittest.TestCase):
+    def test_latin_words_and_cjk_bigrams(self):
+        tokens = search_index.tokenize("The 3D-GS model for 高斯泼溅 and C++")
+        self.assertIn("3d-gs", tokens)
+        self.assertIn("3d", tokens)
+        self.assertIn("gs", tokens)
+        self.assertIn("model", tokens)
+        self.assertIn("c++", tokens)
+        self.assertIn("高斯", tokens)
+        self.assertIn("泼溅", tokens)
+        self.assertNotIn("the", tokens)
+        self.assertEqual(len(tokens), len(set(tokens)))
+
+
+class SearchIndexTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.docs = Path(tmp.name)
+        _write_day(
+            self.docs,
+            "20260624",
+            [_paper("202606/24/a", "Diffusion Planning", "We study robots.", "keyword:robotics, query:扩散规划")],
+        )
+        _write_day(self.docs, "20260501", [_paper("202605/01/b", "Sparse Attention")])
+
+    def _shard(self, month: str) -> dict:
+        return json.loads((self.docs / "_search" / f"{month}.json").read_text(encoding="utf-8"))
+
+    def test_builds_month_shards_and_manifest(self):
+        rebuilt = search_index.update_search_index(str(self.docs))
+        self.assertEqual(rebuilt, ["202605", "202606"])
+        manifest = json.loads((self.docs / "_search" / "manifest.json").read_text(encoding="utf-8"))
+        self.assertEqual(manifest["total"], 2)
+        self.assertEqual(set(manifest["shards"]), {"202605", "202606"})
+        shard = self._shard("202606")
+        self.assertEqual(shard["docs"][0][0], "202606/24/a")
+        self.assertEqual(shard["docs"][0][3], "robotics, 扩散规划")
+        for tok in ("diffusion", "robots", "robotics", "扩散"):
+            self.assertEqual(shard["terms"][tok], [0])
+
+    def test_unchanged_days_are_not_reparsed(self):
+        search_index.update_search_index(str(self.docs))
+        _write_day(self.docs, "20260625", [_paper("202606/25/c", "Graph Transformers")])
+        loaded = []
+        original = search_index.SearchIndex._load_day_papers
+
+        def spy(self, key):
+            loaded.append(key)
+            return original(self, key)
+
+        with patch.object(search_index.SearchIndex, "_load_day_papers", spy):
+            rebuilt = search_index.update_search_index(str(self.docs))
+        self.assertEqual(rebuilt, ["202606"])
+        self.assertEqual(sorted(loaded), ["20260624", "20260625"])
+        self.assertEqual([d[0] for d in self._shard("202606")["docs"]], ["202606/25/c", "202606/24/a"])
+
+        with patch.object(search_index.SearchIndex, "_load_day_papers", spy):
+            loaded.clear()
+            self.assertEqual(search_index.update_search_index(str(self.docs)), [])
+        self.assertEqual(loaded, [])
+
+    def test_only_changed_days_are_rehashed(self):
+        search_index.update_search_index(str(self.docs))
+        _write_day(self.docs, "20260501", [_paper("202605/01/b", "Sparse Attention Revisited")])
+        _write_day(self.docs, "20260625", [_paper("202606/25/c", "Graph Transformers")])
+        hashed = []
+        original = search_index.SearchIndex._day_hash
+
+        def spy(self, key):
+            hashed.append(key)
+            return original(self, key)
+
+        with patch.object(search_index.SearchIndex, "_day_hash", spy):
+            rebuilt = search_index.update_search_index(str(self.docs), changed_days=["20260625"])
+        # 已记录且未声明改动的日期不再读取；未记录的新日期照常哈希
+        self.assertEqual(rebuilt, ["202606"])
+        self.assertEqual(hashed, ["20260625"])
+        self.assertEqual(self._shard("202605")["docs"][0][1], "Sparse Attention")
+
+        with patch.object(search_index.SearchIndex, "_day_hash", spy):
+            hashed.clear()
+            rebuilt = search_index.update_search_index(str(self.docs), changed_days=["20260625"], rehash_all=True)
+        self.assertEqual(rebuilt, ["202605"])
+        self.assertEqual(sorted(hashed), ["20260501", "20260624", "20260625"])
+        self.assertEqual(self._shard("202605")["docs"][0][1], "Sparse Attention Revisited")
+
+    def test_removed_month_drops_shard(self):
+        search_index.update_search_index(str(self.docs))
+        for path in sorted((self.docs / "202605").rglob("*"), reverse=True):
+            path.unlink() if path.is_file() else path.rmdir()
+        (self.docs / "202605").rmdir()
+        rebuilt = search_index.update_search_index(str(self.docs))
+        self.assertEqual(rebuilt, ["202605"])
+        self.assertFalse((self.docs / "_search" / "202605.json").exists())
+        manifest = json.loads((self.docs / "_search" / "manifest.json").read_text(encoding="utf-8"))
+        self.assertEqual(set(manifest["shards"]), {"202606"})
+
+
+if __name__ == "__main__":
+    unittest.main()
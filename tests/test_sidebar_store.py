@@ -0,0 +1,125 @@
+import json
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+import sidebar_store  # noqa: E402
+
+ITEM_LINE = (
+    '      * <a class="dpr-sidebar-item-link dpr-sidebar-item-structured" href="#/202606/24/a" '
+    'data-sidebar-item="{&quot;title&quot;: &quot;A &amp; B&quot;, &quot;link&quot;: &quot;https://arxiv.org/abs/a&quot;, '
+    '&quot;score&quot;: &quot;8.0&quot;, &quot;tags&quot;: []}">A &amp; B</a>\n'
+)
+
+LEGACY_SIDEBAR = (
+    "* [首页](/)\n"
+    "\n"
+    "* Conference Papers\n"
+    "  * ICML 2025 <!--dpr-conference:icml-2025-->\n"
+    "    * rl <!--dpr-conference-topic:icml-2025:query-rl-->\n"
+    + ITEM_LINE.replace("#/202606/24/a", "#/conference/icml-2025/x")
+    + "* Daily Papers\n"
+    "  * 2026-06-23 <!--dpr-date:20260623-->\n"
+    "    * 速读区\n"
+    + ITEM_LINE.replace("#/202606/24/a", "#/202606/23/q")
+    + "  * 2026-06-24\n"
+    "    * [日报](202606/24/README)\n"
+    + ITEM_LINE
+)
+
+
+class SidebarStoreTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.sidebar = Path(tmp.name) / "_sidebar.md"
+
+    def test_item_line_round_trips(self):
+        item = sidebar_store.parse_sidebar_item_line(ITEM_LINE)
+        self.assertEqual(item["title"], "A & B")
+        self.assertEqual(list(item["payload"]), ["title", "link", "score", "tags"])
+        self.assertEqual(sidebar_store.render_sidebar_item(item), ITEM_LINE)
+
+    def test_migrates_legacy_sidebar_and_sorts_days(self):
+        self.sidebar.write_text(LEGACY_SIDEBAR, encoding="utf-8")
+        store = sidebar_store.SidebarStore(str(self.sidebar))
+        store.assemble()
+
+        root = self.sidebar.parent / "_sidebar"
+        self.assertTrue((root / "daily" / "20260624.json").exists())
+        self.assertTrue((root / "conference" / "icml-2025.json").exists())
+        text = self.sidebar.read_text(encoding="utf-8")
+        self.assertTrue(text.startswith("* [首页](/)\n\n* Conference Papers\n"))
+        self.assertIn("    * rl <!--dpr-conference-topic:icml-2025:query-rl-->\n", text)
+        # 新日期在前；历史无 marker 的日期块补上 marker；遗留“日报”入口被清理
+        self.assertLess(text.index("<!--dpr-date:20260624-->"), text.index("<!--dpr-date:20260623-->"))
+        self.assertNotIn("[日报]", text)
+        self.assertIn("    * 速读区\n" + ITEM_LINE.replace("#/202606/24/a", "#/202606/23/q"), text)
+        # 再次组装不改变文件
+        self.assertFalse(sidebar_store.SidebarStore(str(self.sidebar)).assemble())
+
+    def test_writers_only_touch_their_fragment(self):
+        self.sidebar.write_text("* [首页](/)\n* Daily Papers\n", encoding="utf-8")
+        store = sidebar_store.SidebarStore(str(self.sidebar))
+        store.ensure_migrated()
+        item = sidebar_store.parse_sidebar_item_line(ITEM_LINE)
+        store.save("daily", "20260624", {"date": "20260624", "label": "2026-06-24", "deep": [item], "quick": []})
+        store.save(
+            "conference",
+            "neurips-2024",
+            {"key": "neurips-2024", "label": "NEURIPS 2024", "topics": [{"marker": "", "label": "llm", "items": [item]}]},
+        )
+        store.save(
+            "conference",
+            "iclr-2025",
+            {"key": "iclr-2025", "label": "ICLR 2025", "topics": [{"marker": "", "label": "rl", "items": [item]}]},
+        )
+        daily_path = self.sidebar.parent / "_sidebar" / "daily" / "20260624.json"
+        before = daily_path.stat().st_mtime_ns
+        self.assertFalse(store.save("daily", "20260624", json.loads(daily_path.read_text(encoding="utf-8"))))
+        self.assertEqual(daily_path.stat().st_mtime_ns, before)
+
+        self.assertTrue(store.assemble())
+        text = self.sidebar.read_text(encoding="utf-8")
+        self.assertLess(text.index("ICLR 2025"), text.index("NEURIPS 2024"))
+        self.assertLess(text.index("* Conference Papers"), text.index("* Daily Papers"))
+        self.assertIn("    * 精读区\n", text)
+        self.assertNotIn("速读区", text)
+
+    def test_stale_write_after_concurrent_assemble_is_redone(self):
+        self.sidebar.write_text("* [首页](/)\n* Daily Papers\n", encoding="utf-8")
+        writer_a = sidebar_store.SidebarStore(str(self.sidebar))
+        writer_b = sidebar_store.SidebarStore(str(self.sidebar))
+        writer_a.ensure_migrated()
+        item = sidebar_store.parse_sidebar_item_line(ITEM_LINE)
+        writer_a.save("daily", "20260623", {"date": "20260623", "label": "2026-06-23", "deep": [item], "quick": []})
+
+        real_write = sidebar_store._write_atomic
+        calls = []
+
+        def interleaved_write(path, text):
+            calls.append(text)
+            if len(calls) == 1:
+                # A 已渲染完但尚未写入时，B 保存分片并完成组装；随后 A 的旧文本落盘
+                writer_b.save(
+                    "daily", "20260624", {"date": "20260624", "label": "2026-06-24", "deep": [item], "quick": []}
+                )
+                writer_b.assemble()
+            real_write(path, text)
+
+        with patch.object(sidebar_store, "_write_atomic", side_effect=interleaved_write):
+            self.assertTrue(writer_a.assemble())
+
+        self.assertNotIn("2026-06-24", calls[0])
+        text = self.sidebar.read_text(encoding="utf-8")
+        self.assertIn("<!--dpr-date:20260623-->", text)
+        self.assertIn("<!--dpr-date:20260624-->", text)
+
+
+if __name__ == "__main__":
+    unittest.main()
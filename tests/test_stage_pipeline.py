@@ -0,0 +1,95 @@
+import sys
+import threading
+import time
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+from stage_pipeline import Stage, format_stage_stats, run_stages  # noqa: E402
+
+
+class StagePipelineTest(unittest.TestCase):
+    def test_items_flow_through_all_stages_and_failures_are_isolated(self):
+        results = {}
+        errors = []
+
+        def parse(x):
+            if x == 3:
+                raise ValueError("bad item")
+            return x * 10
+
+        def skip_zero(x):
+            return None if x == 0 else x + 1
+
+        stats = run_stages(
+            range(6),
+            [Stage("parse", parse, 2), Stage("skip", skip_zero, 3), Stage("sink", lambda x: x, 1)],
+            queue_size=1,
+            on_result=lambda i, v: results.__setitem__(i, v),
+            on_error=lambda i, job, stage, exc: errors.append((i, stage, str(exc))),
+        )
+
+        self.assertEqual(results, {1: 11, 2: 21, 4: 41, 5: 51})
+        self.assertEqual(errors, [(3, "parse", "bad item")])
+        self.assertEqual(stats["parse"]["items"], 5)
+        self.assertEqual(stats["parse"]["errors"], 1)
+        self.assertEqual(stats["sink"]["items"], 4)
+        self.assertIn("parse[x2]=5ok/1err", format_stage_stats(stats, 1.0))
+
+    def test_slow_upstream_item_does_not_block_downstream_stage(self):
+        release = threading.Event()
+        finished = []
+
+        def fetch(x):
+            if x == 0:
+                release.wait(5)
+            return x
+
+        def llm(x):
+            finished.append(x)
+            if len(finished) == 3:
+                release.set()
+            return x
+
+        started = time.perf_counter()
+        run_stages(range(4), [Stage("fetch", fetch, 2), Stage("llm", llm, 1)], queue_size=2)
+        self.assertLess(time.perf_counter() - started, 4)
+        # 卡住的第 0 篇最后才进入 LLM 阶段，其余论文先行
+        self.assertEqual(finished[-1], 0)
+        self.assertEqual(sorted(finished), [0, 1, 2, 3])
+
+    def test_queue_bound_applies_backpressure(self):
+        in_flight = []
+        peak = [0]
+        lock = threading.Lock()
+        gate = threading.Semaphore(0)
+
+        def produce(x):
+            with lock:
+                in_flight.append(x)
+                peak[0] = max(peak[0], len(in_flight))
+            return x
+
+        def consume(x):
+            gate.acquire(timeout=5)
+            with lock:
+                in_flight.remove(x)
+            return x
+
+        def releaser():
+            for _ in range(10):
+                time.sleep(0.01)
+                gate.release()
+
+        t = threading.Thread(target=releaser)
+        t.start()
+        run_stages(range(10), [Stage("produce", produce, 1), Stage("consume", consume, 1)], queue_size=2)
+        t.join()
+        # 下游 1 个在处理 + 队列 2 个 + 上游手里 1 个
+        self.assertLessEqual(peak[0], 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -33,6 +33,7 @@ from supabase_source import (
     match_papers_by_embedding,
     match_papers_by_bm25,
 )
+from shard_pinning import pin_shard_days  # noqa: E402
 
 
 def _load_module(module_name: str, path: Path):
@@ -85,12 +86,13 @@ class IsStatementTimeoutTest(unittest.TestCase):
 class RequestWithRetriesTimeoutTest(unittest.TestCase):
     """_request_with_retries should not retry on statement timeout."""
 
-    @patch("supabase_source.requests.request")
-    def test_no_retry_on_statement_timeout(self, mock_request):
+    @patch("supabase_http.get_session")
+    def test_no_retry_on_statement_timeout(self, mock_get_session):
         timeout_body = '{"code":"57014","message":"canceling statement due to statement timeout"}'
         resp = MagicMock()
         resp.status_code = 500
         resp.text = timeout_body
+        mock_request = mock_get_session.return_value.request
         mock_request.return_value = resp
 
         result = _request_with_retries(
@@ -104,11 +106,12 @@ class RequestWithRetriesTimeoutTest(unittest.TestCase):
         self.assertEqual(mock_request.call_count, 1)
         self.assertEqual(result.status_code, 500)
 
-    @patch("supabase_source.requests.request")
-    def test_retries_on_non_timeout_500(self, mock_request):
+    @patch("supabase_http.get_session")
+    def test_retries_on_non_timeout_500(self, mock_get_session):
         resp = MagicMock()
         resp.status_code = 500
         resp.text = '{"message":"internal error"}'
+        mock_request = mock_get_session.return_value.request
         mock_request.return_value = resp
 
         result = _request_with_retries(
@@ -289,6 +292,9 @@ class SupabaseBm25ShardFallbackTest(unittest.TestCase):
             ROOT / "src" / "2.1.retrieval_papers_bm25.py",
         )
 
+    def setUp(self):
+        pin_shard_days(self)
+
     def test_split_supabase_time_window_uses_seven_day_shards(self):
         start_dt = datetime(2026, 3, 1, tzinfo=timezone.utc)
         end_dt = datetime(2026, 3, 31, tzinfo=timezone.utc)
@@ -404,6 +410,9 @@ class SupabaseVectorExactShardFallbackTest(unittest.TestCase):
             ROOT / "src" / "2.2.retrieval_papers_embedding.py",
         )
 
+    def setUp(self):
+        pin_shard_days(self)
+
     def test_split_supabase_time_window_uses_seven_day_shards(self):
         start_dt = datetime(2026, 3, 1, tzinfo=timezone.utc)
         end_dt = datetime(2026, 3, 31, tzinfo=timezone.utc)
@@ -0,0 +1,425 @@
+import importlib.util
+import os
+import sys
+import threading
+import time
+import unittest
+from datetime import datetime, timezone
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+import supabase_fanout  # noqa: E402
+from supabase_source import match_papers_by_bm25_batch, match_papers_by_embedding_batch  # noqa: E402
+from shard_pinning import pin_shard_days  # noqa: E402
+
+
+def _load_module(module_name: str, path: Path):
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    mod = importlib.util.module_from_spec(spec)
+    assert spec and spec.loader
+    sys.modules[module_name] = mod
+    spec.loader.exec_module(mod)
+    return mod
+
+
+def _row(pid: str, sim: float, query_index: int | None = None) -> dict:
+    row = {"id": pid, "title": pid, "abstract": "", "published": "2026-03-03T00:00:00+00:00", "similarity": sim}
+    if query_index is not None:
+        row["query_index"] = query_index
+    return row
+
+
+class MatchPapersByEmbeddingBatchTest(unittest.TestCase):
+    @patch("supabase_source._request_with_retries")
+    def test_groups_rows_by_query_index(self, mock_req):
+        resp = MagicMock()
+        resp.status_code = 200
+        resp.json.return_value = [_row("a", 0.5, 0), _row("b", 0.9, 1), _row("c", 0.8, 0)]
+        mock_req.return_value = resp
+
+        rows_by_query, msg = match_papers_by_embedding_batch(
+            url="https://example.supabase.co",
+            api_key="k",
+            rpc_name="match_arxiv_papers_exact_batch",
+            query_embeddings=[[0.1, 0.2], [0.3, 0.4]],
+            match_count=[5, 3],
+        )
+
+        self.assertIn("rpc 查询成功", msg)
+        self.assertEqual([r["id"] for r in rows_by_query[0]], ["c", "a"])
+        self.assertEqual([r["id"] for r in rows_by_query[1]], ["b"])
+        payload = mock_req.call_args.kwargs["json"]
+        self.assertEqual(payload["query_embeddings"], [[0.1, 0.2], [0.3, 0.4]])
+        self.assertEqual(payload["match_counts"], [5, 3])
+        self.assertTrue(mock_req.call_args.args[1].endswith("/rpc/match_arxiv_papers_exact_batch"))
+
+
+class MatchPapersByBm25BatchTest(unittest.TestCase):
+    @patch("supabase_source._request_with_retries")
+    def test_groups_rows_by_query_index_and_sorts_by_score(self, mock_req):
+        resp = MagicMock()
+        resp.status_code = 200
+        resp.json.return_value = [
+            {**_row("a", 0.0, 0), "score": 0.2},
+            {**_row("b", 0.0, 1), "score": 0.4, "conference_pair": "iclr:2025"},
+            {**_row("c", 0.0, 0), "score": 0.3},
+        ]
+        mock_req.return_value = resp
+
+        rows_by_query, msg = match_papers_by_bm25_batch(
+            url="https://example.supabase.co",
+            api_key="k",
+            rpc_name="match_arxiv_papers_bm25_batch",
+            query_texts=["graph", "agent"],
+            match_count=4,
+        )
+
+        self.assertIn("rpc 查询成功", msg)
+        self.assertEqual([r["id"] for r in rows_by_query[0]], ["c", "a"])
+        self.assertEqual(rows_by_query[1][0]["conference_pair"], "iclr:2025")
+        payload = mock_req.call_args.kwargs["json"]
+        self.assertEqual(payload["query_texts"], ["graph", "agent"])
+        self.assertEqual(payload["match_counts"], [4, 4])
+
+
+class Bm25StepBatchRpcTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.mod = _load_module("bm25_mod_for_batch", ROOT / "src" / "2.1.retrieval_papers_bm25.py")
+
+    def setUp(self):
+        pin_shard_days(self)
+
+    def _queries(self):
+        return [
+            {"type": "keyword", "tag": "A", "paper_tag": "keyword:A", "query_text": "graph", "paper_sources": ["arxiv"]},
+            {"type": "keyword", "tag": "B", "paper_tag": "keyword:B", "query_text": "agent", "paper_sources": ["biorxiv"]},
+        ]
+
+    def _conf(self):
+        return {
+            "url": "https://example.supabase.co",
+            "anon_key": "k",
+            "bm25_rpc": "match_multi_source_papers_bm25",
+            "schema": "public",
+            "use_batch_rpc": True,
+        }
+
+    def test_one_batch_call_per_shard_and_source_group(self):
+        calls = []
+
+        def fake_batch(**kwargs):
+            calls.append(kwargs)
+            day = kwargs["start_dt"].day
+            return ([[{**_row(f"{kwargs['query_texts'][0]}-{day}", 0.0), "score": float(day)}]], "rpc 查询成功：1 条")
+
+        with patch.object(self.mod, "match_papers_by_bm25_batch", side_effect=fake_batch), patch.object(
+            self.mod, "match_papers_by_bm25"
+        ) as single:
+            result = self.mod.rank_papers_for_queries_via_supabase(
+                self._queries(),
+                3,
+                self._conf(),
+                start_dt=datetime(2026, 3, 1, tzinfo=timezone.utc),
+                end_dt=datetime(2026, 3, 15, tzinfo=timezone.utc),
+                query_filter_sources=True,
+            )
+            single.assert_not_called()
+
+        # 2 个来源分组 × 2 个 7 天分片
+        self.assertEqual(len(calls), 4)
+        self.assertEqual(calls[0]["rpc_name"], "match_multi_source_papers_bm25_batch")
+        self.assertEqual(calls[0]["filter_sources"], ["arxiv"])
+        self.assertEqual(list(result["queries"][0]["sim_scores"].keys()), ["graph-8", "graph-1"])
+        self.assertEqual(list(result["queries"][1]["sim_scores"].keys()), ["agent-8", "agent-1"])
+
+    def test_failed_shard_falls_back_per_query_for_that_shard_only(self):
+        def fake_batch(**kwargs):
+            if kwargs["start_dt"].day == 8:
+                return ([], "rpc 查询失败：HTTP 500 boom")
+            return ([[{**_row(f"{q}-batch", 0.0), "score": 1.0}] for q in kwargs["query_texts"]], "rpc 查询成功：2 条")
+
+        single_calls = []
+
+        def fake_single(**kwargs):
+            single_calls.append(kwargs)
+            return ([{**_row(f"{kwargs['query_text']}-single", 0.0), "score": 2.0}], "rpc 查询成功：1 条")
+
+        with patch.object(self.mod, "match_papers_by_bm25_batch", side_effect=fake_batch) as batch, patch.object(
+            self.mod, "match_papers_by_bm25", side_effect=fake_single
+        ):
+            result = self.mod.rank_papers_for_queries_via_supabase(
+                self._queries(),
+                3,
+                self._conf(),
+                start_dt=datetime(2026, 3, 1, tzinfo=timezone.utc),
+                end_dt=datetime(2026, 3, 15, tzinfo=timezone.utc),
+            )
+
+        self.assertEqual(batch.call_count, 2)
+        # 只有失败的分片（3/8 ~ 3/15）逐查询重跑，成功分片的结果保留
+        self.assertEqual(len(single_calls), 2)
+        self.assertEqual({c["start_dt"].day for c in single_calls}, {8})
+        self.assertEqual(single_calls[0]["rpc_name"], "match_multi_source_papers_bm25")
+        self.assertEqual(list(result["queries"][0]["sim_scores"].keys()), ["graph-single", "graph-batch"])
+        self.assertEqual(list(result["queries"][1]["sim_scores"].keys()), ["agent-single", "agent-batch"])
+
+    def test_batch_shards_fan_out_under_rpc_slots(self):
+        lock = threading.Lock()
+        state = {"active": 0, "peak": 0}
+
+        def fake_batch(**kwargs):
+            with lock:
+                state["active"] += 1
+                state["peak"] = max(state["peak"], state["active"])
+            time.sleep(0.05)
+            with lock:
+                state["active"] -= 1
+            return ([[], []], "rpc 查询成功：0 条")
+
+        with patch.dict(os.environ, {"DPR_SUPABASE_RPC_CONCURRENCY": "2"}), patch.object(
+            self.mod, "match_papers_by_bm25_batch", side_effect=fake_batch
+        ) as batch:
+            supabase_fanout.reset_rpc_slots()
+            self.addCleanup(supabase_fanout.reset_rpc_slots)
+            self.mod.rank_papers_for_queries_via_supabase(
+                self._queries(),
+                3,
+                self._conf(),
+                start_dt=datetime(2026, 3, 1, tzinfo=timezone.utc),
+                end_dt=datetime(2026, 3, 29, tzinfo=timezone.utc),
+            )
+        self.assertEqual(batch.call_count, 4)
+        # 4 个分片并发派发，但同时在途的 RPC 不超过进程级上限
+        self.assertEqual(state["peak"], 2)
+
+    def test_missing_batch_rpc_falls_back_to_per_query_calls(self):
+        with patch.object(
+            self.mod,
+            "match_papers_by_bm25_batch",
+            return_value=([], 'rpc 查询失败：HTTP 404 {"code":"PGRST202"}'),
+        ) as batch, patch.object(
+            self.mod, "match_papers_by_bm25", return_value=([{**_row("x", 0.0), "score": 1.0}], "rpc 查询成功：1 条")
+        ) as single:
+            result = self.mod.rank_papers_for_queries_via_supabase(self._queries(), 3, self._conf())
+        self.assertEqual(batch.call_count, 1)
+        self.assertEqual(single.call_count, 2)
+        self.assertEqual(result["total_hits"], 2)
+
+
+class EmbeddingStepBatchRpcTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.mod = _load_module("embedding_mod_for_batch", ROOT / "src" / "2.2.retrieval_papers_embedding.py")
+
+    def setUp(self):
+        pin_shard_days(self)
+
+    def _queries(self):
+        return [
+            {"type": "keyword", "tag": "A", "paper_tag": "keyword:A", "query_text": "a", "query_embedding": [0.1, 0.2]},
+            {"type": "keyword", "tag": "B", "paper_tag": "keyword:B", "query_text": "b", "query_embedding": [0.3, 0.4]},
+        ]
+
+    def _conf(self):
+        return {
+            "url": "https://example.supabase.co",
+            "anon_key": "k",
+            "vector_rpc_exact": "match_arxiv_papers_exact",
+            "schema": "public",
+            "use_batch_rpc": True,
+        }
+
+    def test_one_batch_call_per_shard_serves_all_queries(self):
+        calls = []
+
+        def fake_batch(**kwargs):
+            calls.append(kwargs)
+            shard = 1 if kwargs["start_dt"].day == 1 else 2
+            return ([[_row(f"a{shard}", 0.5 + shard / 10)], [_row("b", 0.7)]], "rpc 查询成功：2 条")
+
+        with patch.object(self.mod, "match_papers_by_embedding_batch", side_effect=fake_batch), patch.object(
+            self.mod, "match_papers_by_embedding"
+        ) as single:
+            result = self.mod.rank_papers_for_queries_via_supabase(
+                model=None,
+                queries=self._queries(),
+                top_k=3,
+                supabase_conf=self._conf(),
+                start_dt=datetime(2026, 3, 1, tzinfo=timezone.utc),
+                end_dt=datetime(2026, 3, 15, tzinfo=timezone.utc),
+                rpc_name_override="match_arxiv_papers_exact",
+                rpc_mode="exact",
+            )
+            single.assert_not_called()
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(calls[0]["rpc_name"], "match_arxiv_papers_exact_batch")
+        self.assertEqual(list(result["queries"][0]["sim_scores"].keys()), ["a2", "a1"])
+        self.assertEqual(list(result["queries"][1]["sim_scores"].keys()), ["b"])
+
+    def test_failed_shard_falls_back_per_query_for_that_shard_only(self):
+        def fake_batch(**kwargs):
+            if kwargs["start_dt"].day == 1:
+                return ([], "rpc 查询失败：HTTP 500 boom")
+            return ([[_row("a-batch", 0.6)], [_row("b-batch", 0.6)]], "rpc 查询成功：2 条")
+
+        single_calls = []
+
+        def fake_single(**kwargs):
+            single_calls.append(kwargs)
+            name = "a" if kwargs["query_embedding"][0] < 0.2 else "b"
+            return ([_row(f"{name}-single", 0.9)], "rpc 查询成功：1 条")
+
+        with patch.object(self.mod, "match_papers_by_embedding_batch", side_effect=fake_batch) as batch, patch.object(
+            self.mod, "match_papers_by_embedding", side_effect=fake_single
+        ):
+            result = self.mod.rank_papers_for_queries_via_supabase(
+                model=None,
+                queries=self._queries(),
+                top_k=3,
+                supabase_conf=self._conf(),
+                start_dt=datetime(2026, 3, 1, tzinfo=timezone.utc),
+                end_dt=datetime(2026, 3, 15, tzinfo=timezone.utc),
+                rpc_name_override="match_arxiv_papers_exact",
+                rpc_mode="exact",
+            )
+
+        self.assertEqual(batch.call_count, 2)
+        self.assertEqual(len(single_calls), 2)
+        self.assertEqual({c["start_dt"].day for c in single_calls}, {1})
+        self.assertEqual(single_calls[0]["rpc_name"], "match_arxiv_papers_exact")
+        self.assertEqual(list(result["queries"][0]["sim_scores"].keys()), ["a-single", "a-batch"])
+        self.assertEqual(list(result["queries"][1]["sim_scores"].keys()), ["b-single", "b-batch"])
+
+    def test_missing_batch_rpc_falls_back_to_per_query_calls(self):
+        with patch.object(
+            self.mod,
+            "match_papers_by_embedding_batch",
+            return_value=([], 'rpc 查询失败：HTTP 404 {"code":"PGRST202"}'),
+        ), patch.object(
+            self.mod, "match_papers_by_embedding", return_value=([_row("x", 0.9)], "rpc 查询成功：1 条")
+        ) as single:
+            result = self.mod.rank_papers_for_queries_via_supabase(
+                model=None,
+                queries=self._queries(),
+                top_k=3,
+                supabase_conf=self._conf(),
+                rpc_name_override="match_arxiv_papers",
+                rpc_mode="ann",
+            )
+        self.assertEqual(single.call_count, 2)
+        self.assertEqual(result["total_hits"], 2)
+
+
+class ConferenceBatchRpcTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.mod = _load_module("conference_retrieval_for_batch", ROOT / "src" / "conference_retrieval.py")
+
+    def test_unified_embedding_queries_use_single_batch_call(self):
+        queries = [
+            {"tag": "A", "paper_tag": "keyword:A", "query_text": "a", "query_embedding": np.array([0.1, 0.2], dtype=np.float32)},
+            {"tag": "B", "paper_tag": "keyword:B", "query_text": "b", "query_embedding": [0.3, 0.4]},
+        ]
+        config = {
+            "supabase": {"url": "https://example.supabase.co", "anon_key": "k"},
+            "source_backends": {"conference_unified": {"use_batch_rpc": True}},
+        }
+
+        def fake_batch(**kwargs):
+            self.assertEqual(kwargs["rpc_name"], "match_conference_papers_exact_batch")
+            self.assertEqual(kwargs["extra_payload"], {"filter_pairs": ["iclr:2025"]})
+            return ([[_row("p1", 0.9)], [_row("p2", 0.8)]], "rpc 查询成功：2 条")
+
+        with patch.object(self.mod, "match_papers_by_embedding_batch", side_effect=fake_batch) as batch, patch.object(
+            self.mod, "match_papers_by_embedding"
+        ) as single, patch.object(
+            self.mod,
+            "resolve_unified_conference_backend",
+            return_value={"url": "https://example.supabase.co", "anon_key": "k", "use_batch_rpc": True},
+        ):
+            result = self.mod.build_result_for_queries(
+                mode="embedding",
+                queries=queries,
+                conferences=["iclr"],
+                years=[2025],
+                config=config,
+                top_k=5,
+                filter_pairs=["iclr:2025"],
+            )
+            single.assert_not_called()
+        self.assertEqual(batch.call_count, 1)
+        self.assertEqual(list(result["queries"][0]["sim_scores"].keys()), ["p1"])
+        self.assertEqual(list(result["queries"][1]["sim_scores"].keys()), ["p2"])
+
+
+    def test_per_conference_bm25_queries_use_one_batch_call_per_year(self):
+        queries = [
+            {"tag": "A", "paper_tag": "keyword:A", "query_text": "graph"},
+            {"tag": "B", "paper_tag": "keyword:B", "query_text": "agent"},
+        ]
+        backend = {"url": "https://example.supabase.co", "anon_key": "k", "bm25_rpc": "match_iclr_openreview_papers_bm25", "use_batch_rpc": True}
+
+        def fake_batch(**kwargs):
+            self.assertEqual(kwargs["rpc_name"], "match_iclr_openreview_papers_bm25_batch")
+            self.assertEqual(kwargs["query_texts"], ["graph", "agent"])
+            return (
+                [
+                    [{**_row("p1", 0.0), "source": "ICLR-2025-Accepted", "score": 0.9}],
+                    [{**_row("p2", 0.0), "source": "ICLR-2025-Accepted", "score": 0.8}],
+                ],
+                "rpc 查询成功：2 条",
+            )
+
+        with patch.object(self.mod, "match_papers_by_bm25_batch", side_effect=fake_batch) as batch, patch.object(
+            self.mod, "match_papers_by_bm25"
+        ) as single, patch.object(self.mod, "resolve_conference_backend", return_value=backend):
+            result = self.mod.build_result_for_queries(
+                mode="bm25",
+                queries=queries,
+                conferences=["iclr"],
+                years=[2025],
+                config={},
+                top_k=5,
+            )
+            single.assert_not_called()
+        self.assertEqual(batch.call_count, 1)
+        self.assertEqual(list(result["queries"][0]["sim_scores"].keys()), ["p1"])
+        self.assertEqual(list(result["queries"][1]["sim_scores"].keys()), ["p2"])
+
+
+class BatchRpcSqlContractTest(unittest.TestCase):
+    def test_batch_sql_defines_query_index_functions(self):
+        sql = (ROOT / "sql" / "match_papers_batch.sql").read_text(encoding="utf-8").lower()
+        self.assertIn("create or replace function public.match_multi_source_papers_exact_batch(", sql)
+        self.assertIn("create or replace function public.match_conference_papers_exact_batch(", sql)
+        self.assertIn("'match_' || tbl || '_exact_batch'", sql)
+        self.assertIn("query_index int", sql)
+        self.assertIn("as materialized", sql)
+
+    def test_bm25_batch_sql_scans_candidates_once_via_fts_column(self):
+        sql = (ROOT / "sql" / "match_papers_bm25_batch.sql").read_text(encoding="utf-8").lower()
+        self.assertIn("create or replace function public.match_multi_source_papers_bm25_batch(", sql)
+        self.assertIn("create or replace function public.match_conference_papers_bm25_batch(", sql)
+        self.assertIn("'match_' || tbl || '_bm25_batch'", sql)
+        self.assertIn("p.fts @@ any(", sql)
+        self.assertNotIn("to_tsvector", sql)
+
+    def test_schemas_store_fts_column_and_bm25_rpcs_reuse_it(self):
+        for path in sorted((ROOT / "sql").glob("create_*_papers_schema.sql")) + [ROOT / "sql" / "create_papers_schema.sql"]:
+            sql = path.read_text(encoding="utf-8").lower()
+            self.assertIn("add column if not exists fts tsvector", sql, path.name)
+            self.assertIn("using gin (fts)", sql, path.name)
+        for path in sorted((ROOT / "sql").glob("match_*.sql")):
+            sql = path.read_text(encoding="utf-8").lower()
+            self.assertNotIn("to_tsvector", sql, path.name)
+
+
+if __name__ == "__main__":
+    unittest.main()
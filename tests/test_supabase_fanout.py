@@ -0,0 +1,203 @@
+import importlib.util
+import os
+import sys
+import threading
+import time
+import unittest
+from datetime import datetime, timezone
+from pathlib import Path
+from unittest.mock import patch
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+import supabase_fanout  # noqa: E402
+from supabase_fanout import fan_out, rpc_slot  # noqa: E402
+from shard_pinning import pin_shard_days  # noqa: E402
+
+
+def _load_module(module_name: str, path: Path):
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    mod = importlib.util.module_from_spec(spec)
+    assert spec and spec.loader
+    sys.modules[module_name] = mod
+    spec.loader.exec_module(mod)
+    return mod
+
+
+TIMEOUT_MSG = 'rpc 查询失败：HTTP 500 {"code":"57014","message":"canceling statement due to statement timeout"}'
+
+
+class FanOutTest(unittest.TestCase):
+    def test_results_keep_input_order_and_respect_worker_cap(self):
+        lock = threading.Lock()
+        state = {"active": 0, "peak": 0}
+
+        def make_task(value: int, delay: float):
+            def _task():
+                with lock:
+                    state["active"] += 1
+                    state["peak"] = max(state["peak"], state["active"])
+                time.sleep(delay)
+                with lock:
+                    state["active"] -= 1
+                return value
+
+            return _task
+
+        tasks = [make_task(i, 0.03 if i % 2 else 0.01) for i in range(6)]
+        results = fan_out(tasks, max_workers=3)
+
+        self.assertEqual(results, list(range(6)))
+        self.assertLessEqual(state["peak"], 3)
+        self.assertGreaterEqual(state["peak"], 2)
+
+    def test_stop_when_prevents_new_dispatch(self):
+        calls = []
+
+        def make_task(value: int):
+            def _task():
+                calls.append(value)
+                return value
+
+            return _task
+
+        results = fan_out([make_task(i) for i in range(5)], max_workers=1, stop_when=lambda v: v == 1)
+
+        self.assertEqual(calls, [0, 1])
+        self.assertEqual(results, [0, 1, None, None, None])
+
+    def test_rpc_slot_caps_nested_fan_out(self):
+        lock = threading.Lock()
+        state = {"active": 0, "peak": 0}
+
+        def leaf():
+            with rpc_slot():
+                with lock:
+                    state["active"] += 1
+                    state["peak"] = max(state["peak"], state["active"])
+                time.sleep(0.01)
+                with lock:
+                    state["active"] -= 1
+            return 1
+
+        def outer():
+            return sum(fan_out([leaf] * 4, max_workers=4))
+
+        with patch.dict(os.environ, {"DPR_SUPABASE_RPC_CONCURRENCY": "2"}):
+            supabase_fanout.reset_rpc_slots()
+            try:
+                results = fan_out([outer] * 3, max_workers=3)
+            finally:
+                supabase_fanout.reset_rpc_slots()
+
+        self.assertEqual(results, [4, 4, 4])
+        self.assertLessEqual(state["peak"], 2)
+
+
+class Bm25FanOutTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.mod = _load_module("bm25_mod_for_fanout", ROOT / "src" / "2.1.retrieval_papers_bm25.py")
+
+    def setUp(self):
+        pin_shard_days(self)
+
+    def test_statement_timeout_in_one_query_does_not_drop_others(self):
+        queries = [
+            {"type": "keyword", "tag": "A", "paper_tag": "keyword:A", "query_text": "alpha"},
+            {"type": "keyword", "tag": "B", "paper_tag": "keyword:B", "query_text": "beta"},
+            {"type": "keyword", "tag": "C", "paper_tag": "keyword:C", "query_text": "gamma"},
+        ]
+        seen = []
+
+        def fake_match(**kwargs):
+            seen.append(kwargs["query_text"])
+            if kwargs["query_text"] == "beta":
+                return ([], TIMEOUT_MSG)
+            return ([{"id": kwargs["query_text"], "title": "t", "score": 1.0}], "rpc 查询成功：1 条")
+
+        with patch.dict(os.environ, {"DPR_SUPABASE_RPC_CONCURRENCY": "1"}), patch.object(
+            self.mod, "match_papers_by_bm25", side_effect=fake_match
+        ):
+            result = self.mod.rank_papers_for_queries_via_supabase(
+                queries,
+                3,
+                {"url": "https://example.supabase.co", "anon_key": "k", "bm25_rpc": "match_arxiv_papers_bm25"},
+            )
+
+        self.assertEqual(seen, ["alpha", "beta", "gamma"])
+        # 超时的查询仍保留在结果中，只是没有命中
+        self.assertEqual([q["tag"] for q in result["queries"]], ["A", "B", "C"])
+        self.assertEqual(result["queries"][1]["sim_scores"], {})
+        self.assertEqual(list(result["queries"][2]["sim_scores"]), ["gamma"])
+
+    def test_timed_out_sub_shard_does_not_cancel_its_siblings(self):
+        start_dt = datetime(2026, 3, 1, tzinfo=timezone.utc)
+        end_dt = datetime(2026, 3, 8, tzinfo=timezone.utc)
+
+        def fake_match(**kwargs):
+            # 3 月 1~3 日的窗口无论怎么拆都超时；拆分出的其余子分片仍应被查询
+            day = kwargs["start_dt"].day
+            if day < 4:
+                return ([], TIMEOUT_MSG)
+            return ([{"id": f"d{day}", "title": "t", "score": 1.0}], "rpc 查询成功：1 条")
+
+        with patch.dict(os.environ, {"DPR_SUPABASE_RPC_CONCURRENCY": "1"}), patch.object(
+            self.mod, "match_papers_by_bm25", side_effect=fake_match
+        ):
+            supabase_fanout.reset_rpc_slots()
+            try:
+                rows, msg = self.mod.query_supabase_bm25_with_shards(
+                    url="https://example.supabase.co",
+                    api_key="k",
+                    rpc_name="match_arxiv_papers_bm25",
+                    query_text="alpha",
+                    match_count=5,
+                    schema="public",
+                    start_dt=start_dt,
+                    end_dt=end_dt,
+                    time_fields=("published",),
+                )
+            finally:
+                supabase_fanout.reset_rpc_slots()
+
+        self.assertIn("rpc 分片查询成功", msg)
+        self.assertEqual(sorted(r["id"] for r in rows), ["d4", "d7"])
+
+    def test_shards_of_one_query_run_concurrently_and_merge_in_shard_order(self):
+        start_dt = datetime(2026, 3, 1, tzinfo=timezone.utc)
+        end_dt = datetime(2026, 3, 29, tzinfo=timezone.utc)
+        barrier = threading.Barrier(4, timeout=2)
+
+        def fake_match(**kwargs):
+            barrier.wait()
+            day = kwargs["start_dt"].day
+            return ([{"id": "same", "title": f"from-{day}", "score": 0.5}], "rpc 查询成功：1 条")
+
+        with patch.dict(os.environ, {"DPR_SUPABASE_RPC_CONCURRENCY": "4"}), patch.object(
+            self.mod, "match_papers_by_bm25", side_effect=fake_match
+        ):
+            supabase_fanout.reset_rpc_slots()
+            try:
+                rows, msg = self.mod.query_supabase_bm25_with_shards(
+                    url="https://example.supabase.co",
+                    api_key="k",
+                    rpc_name="match_arxiv_papers_bm25",
+                    query_text="alpha",
+                    match_count=3,
+                    schema="public",
+                    start_dt=start_dt,
+                    end_dt=end_dt,
+                    time_fields=("published",),
+                )
+            finally:
+                supabase_fanout.reset_rpc_slots()
+
+        self.assertIn("rpc 分片查询成功", msg)
+        # 同分数时保留最早分片的结果，与串行合并语义一致
+        self.assertEqual(rows[0]["title"], "from-1")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import gzip
+import sys
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+import supabase_http  # noqa: E402
+
+
+def _resp(status_code: int, text: str = "[]") -> MagicMock:
+    resp = MagicMock()
+    resp.status_code = status_code
+    resp.text = text
+    return resp
+
+
+class SupabaseHttpClientTest(unittest.TestCase):
+    def test_endpoint_label_normalizes_rest_and_rpc(self):
+        self.assertEqual(
+            supabase_http.endpoint_label("https://x.supabase.co/rest/v1/arxiv_papers?select=id"),
+            "rest:arxiv_papers",
+        )
+        self.assertEqual(
+            supabase_http.endpoint_label("https://x.supabase.co/rest/v1/rpc/match_arxiv_papers"),
+            "rpc:match_arxiv_papers",
+        )
+
+    def test_backoff_delay_grows_exponentially_with_jitter(self):
+        for attempt, upper in ((1, 1.0), (2, 2.0), (3, 4.0)):
+            delay = supabase_http.backoff_delay(attempt, 1.0)
+            self.assertGreaterEqual(delay, upper / 2)
+            self.assertLessEqual(delay, upper)
+        self.assertLessEqual(supabase_http.backoff_delay(20, 1.0, cap=5.0), 5.0)
+        self.assertEqual(supabase_http.backoff_delay(3, 0), 0.0)
+
+    @patch("supabase_http.time.sleep")
+    @patch("supabase_http.get_session")
+    def test_retries_5xx_then_succeeds_and_counts_requests(self, mock_get_session, _sleep):
+        mock_request = mock_get_session.return_value.request
+        mock_request.side_effect = [_resp(503), _resp(200)]
+        url = "https://x.supabase.co/rest/v1/rpc/count_probe_rpc"
+
+        resp = supabase_http.request_with_retries("POST", url, headers={}, timeout=5, json={"a": 1})
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(mock_request.call_count, 2)
+        self.assertEqual(supabase_http.request_counts()["POST rpc:count_probe_rpc"], 2)
+        sent = mock_request.call_args.kwargs
+        self.assertEqual(sent["data"], b'{"a":1}')
+        self.assertEqual(sent["headers"]["Content-Type"], "application/json")
+
+    @patch("supabase_http.get_session")
+    def test_does_not_retry_4xx(self, mock_get_session):
+        mock_request = mock_get_session.return_value.request
+        mock_request.return_value = _resp(400, '{"message":"bad"}')
+
+        resp = supabase_http.request_with_retries("GET", "https://x/rest/v1/t", headers={}, timeout=5)
+
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(mock_request.call_count, 1)
+
+    @patch("supabase_http.get_session")
+    def test_gzip_large_request_body(self, mock_get_session):
+        mock_request = mock_get_session.return_value.request
+        mock_request.return_value = _resp(201)
+        payload = [{"id": str(i), "abstract": "x" * 200} for i in range(500)]
+
+        supabase_http.request_with_retries(
+            "POST", "https://x/rest/v1/t", headers={}, timeout=5, json=payload, gzip_body=True
+        )
+
+        sent = mock_request.call_args.kwargs
+        self.assertEqual(sent["headers"]["Content-Encoding"], "gzip")
+        self.assertTrue(gzip.decompress(sent["data"]).startswith(b'[{"id":"0"'))
+
+    def test_shared_session_is_reused(self):
+        supabase_http.reset_session()
+        try:
+            self.assertIs(supabase_http.get_session(), supabase_http.get_session())
+        finally:
+            supabase_http.reset_session()
+
+
+if __name__ == "__main__":
+    unittest.main()
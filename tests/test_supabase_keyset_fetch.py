@@ -0,0 +1,145 @@
+import sys
+import unittest
+from datetime import datetime, timezone
+from pathlib import Path
+from unittest.mock import patch
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+import supabase_source  # noqa: E402
+from supabase_source import fetch_papers_by_date_range, split_time_range  # noqa: E402
+
+
+class _Resp:
+    def __init__(self, rows):
+        import json
+
+        self.status_code = 200
+        self._rows = rows
+        self.content = json.dumps(rows).encode("utf-8")
+        self.text = self.content.decode("utf-8")
+
+    def json(self):
+        return self._rows
+
+
+def _make_table(n_days: int = 10, per_day: int = 3):
+    rows = []
+    for day in range(1, n_days + 1):
+        for j in range(per_day):
+            rows.append(
+                {
+                    "id": f"2603.{day:02d}{j:03d}",
+                    "title": f"Paper {day}-{j}",
+                    "published": f"2026-03-{day:02d}T00:00:00+00:00",
+                }
+            )
+    return rows
+
+
+def _fake_server(table, calls):
+    """按 URL 上的 published 区间、keyset 游标与 limit 模拟 PostgREST。"""
+
+    def handler(method, endpoint, **kwargs):
+        calls.append(endpoint)
+        params = parse_qsl(urlsplit(endpoint).query, keep_blank_values=True)
+        assert "offset" not in dict(params)
+        gte = lt = None
+        cursor = None
+        limit = 1000
+        for key, value in params:
+            if key == "published" and value.startswith("gte."):
+                gte = value[4:].replace("Z", "+00:00")
+            elif key == "published" and value.startswith("lt."):
+                lt = value[3:].replace("Z", "+00:00")
+            elif key == "or":
+                parts = unquote(value).split('"')
+                cursor = (parts[1], parts[5])
+            elif key == "limit":
+                limit = int(value)
+        rows = [r for r in table if gte <= r["published"] < lt]
+        rows.sort(key=lambda r: (r["published"], r["id"]), reverse=True)
+        if cursor:
+            rows = [r for r in rows if (r["published"], r["id"]) < cursor]
+        return _Resp(rows[:limit])
+
+    return handler
+
+
+class KeysetFetchTest(unittest.TestCase):
+    def setUp(self):
+        page_patch = patch.object(supabase_source, "_FETCH_PAGE_SIZE", 4)
+        page_patch.start()
+        self.addCleanup(page_patch.stop)
+        self.table = _make_table()
+        self.start = datetime(2026, 3, 1, tzinfo=timezone.utc)
+        self.end = datetime(2026, 3, 11, tzinfo=timezone.utc)
+
+    def test_keyset_pagination_walks_all_rows_without_offset(self):
+        calls = []
+        with patch.object(supabase_source, "_request_with_retries", side_effect=_fake_server(self.table, calls)):
+            papers, msg = fetch_papers_by_date_range(
+                url="https://example.supabase.co",
+                api_key="k",
+                papers_table="arxiv_papers",
+                start_dt=self.start,
+                end_dt=self.end,
+                max_rows=7,
+                partitions=1,
+            )
+        self.assertEqual(len(papers), 7)
+        self.assertEqual(papers[0]["id"], "2603.10002")
+        self.assertIn("order=published.desc,id.desc", calls[0])
+        self.assertNotIn("&or=", calls[0])
+        self.assertIn("&or=", calls[1])
+        self.assertIn("keyset", msg)
+
+    def test_pages_cross_identical_published_values(self):
+        calls = []
+        with patch.object(supabase_source, "_request_with_retries", side_effect=_fake_server(self.table, calls)):
+            with patch.object(supabase_source, "_fetch_range_keyset", wraps=supabase_source._fetch_range_keyset) as spy:
+                papers, _ = fetch_papers_by_date_range(
+                    url="https://example.supabase.co",
+                    api_key="k",
+                    papers_table="arxiv_papers",
+                    start_dt=self.start,
+                    end_dt=self.end,
+                    partitions=1,
+                )
+                spy.assert_called_once()
+        self.assertEqual(len(papers), 30)
+        self.assertEqual(len({p["id"] for p in papers}), 30)
+
+    def test_partitioned_fetch_merges_in_published_order(self):
+        calls = []
+        with patch.object(supabase_source, "_request_with_retries", side_effect=_fake_server(self.table, calls)):
+            papers, msg = fetch_papers_by_date_range(
+                url="https://example.supabase.co",
+                api_key="k",
+                papers_table="arxiv_papers",
+                start_dt=self.start,
+                end_dt=self.end,
+                partitions=4,
+            )
+        self.assertEqual(len(papers), 30)
+        keys = [(p["published"], p["id"]) for p in papers]
+        self.assertEqual(keys, sorted(keys, reverse=True))
+        self.assertGreaterEqual(len(calls), 4)
+        self.assertIn("分区 4", msg)
+
+    def test_split_time_range_returns_descending_contiguous_ranges(self):
+        ranges = split_time_range(self.start, self.end, 2)
+        self.assertEqual(
+            ranges,
+            [
+                (datetime(2026, 3, 6, tzinfo=timezone.utc), self.end),
+                (self.start, datetime(2026, 3, 6, tzinfo=timezone.utc)),
+            ],
+        )
+        self.assertEqual(split_time_range(self.start, self.end, 1), [(self.start, self.end)])
+
+
+if __name__ == "__main__":
+    unittest.main()
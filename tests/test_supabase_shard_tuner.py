@@ -0,0 +1,131 @@
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime, timezone
+from pathlib import Path
+from unittest.mock import patch
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+import supabase_shard_tuner  # noqa: E402
+from supabase_shard_tuner import ShardSizeTuner, reset_shard_tuner, tuner_key  # noqa: E402
+
+
+def _load_module(module_name: str, path: Path):
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    mod = importlib.util.module_from_spec(spec)
+    assert spec and spec.loader
+    sys.modules[module_name] = mod
+    spec.loader.exec_module(mod)
+    return mod
+
+
+TIMEOUT_MSG = 'rpc 查询失败：HTTP 500 {"code":"57014","message":"canceling statement due to statement timeout"}'
+
+
+class ShardSizeTunerTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "shard_state.json")
+
+    def test_starts_large_and_shrinks_on_timeout_or_slow_window(self):
+        tuner = ShardSizeTuner(self.path, initial_days=30, latency_target=5.0)
+        key = tuner_key("bm25", "match_arxiv_papers_bm25")
+        self.assertEqual(tuner.shard_days(key), 30)
+
+        self.assertEqual(tuner.record(key, span_days=30, elapsed=1.0, timed_out=True), 15)
+        self.assertEqual(tuner.record(key, span_days=15, elapsed=9.0), 7)
+        # 比当前分片小的窗口跑得快，不据此放大
+        self.assertEqual(tuner.record(key, span_days=3, elapsed=0.1), 7)
+        # 同一次运行内缩小过，不立即放大
+        self.assertEqual(tuner.record(key, span_days=7, elapsed=0.1), 7)
+
+        tuner.save()
+        next_run = ShardSizeTuner(self.path, initial_days=30, latency_target=5.0)
+        self.assertEqual(next_run.record(key, span_days=7, elapsed=0.1), 11)
+
+    def test_state_persists_per_rpc_and_reloads(self):
+        tuner = ShardSizeTuner(self.path, initial_days=30)
+        tuner.record(tuner_key("vector", "match_arxiv_papers_exact"), span_days=30, elapsed=0.5, timed_out=True)
+        self.assertTrue(tuner.save())
+        self.assertFalse(tuner.save())
+
+        with open(self.path, "r", encoding="utf-8") as f:
+            payload = json.load(f)
+        self.assertEqual(payload["shards"]["vector:match_arxiv_papers_exact"]["shard_days"], 15)
+
+        reloaded = ShardSizeTuner(self.path, initial_days=30)
+        self.assertEqual(reloaded.shard_days(tuner_key("vector", "match_arxiv_papers_exact")), 15)
+        self.assertEqual(reloaded.shard_days(tuner_key("vector", "match_biorxiv_papers_exact")), 30)
+
+    def test_fixed_shard_days_disables_learning_and_saving(self):
+        tuner = ShardSizeTuner(self.path, fixed_days=7)
+        key = tuner_key("bm25", "match_arxiv_papers_bm25")
+        tuner.record(key, span_days=7, elapsed=100.0, timed_out=True)
+        self.assertEqual(tuner.shard_days(key), 7)
+        self.assertFalse(tuner.save())
+        self.assertFalse(os.path.exists(self.path))
+
+
+class AdaptiveShardRecallTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.mod = _load_module("bm25_mod_for_shard_tuner", ROOT / "src" / "2.1.retrieval_papers_bm25.py")
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.state_path = os.path.join(tmp.name, "shard_state.json")
+        env = patch.dict(
+            os.environ,
+            {"DPR_SUPABASE_SHARD_STATE_FILE": self.state_path, "DPR_SUPABASE_RPC_CONCURRENCY": "1"},
+        )
+        env.start()
+        self.addCleanup(env.stop)
+        os.environ.pop("DPR_SUPABASE_SHARD_DAYS", None)
+        reset_shard_tuner()
+        self.addCleanup(reset_shard_tuner)
+
+    def test_long_backfill_bisects_timeouts_and_remembers_smaller_shards(self):
+        start_dt = datetime(2026, 3, 1, tzinfo=timezone.utc)
+        end_dt = datetime(2026, 3, 31, tzinfo=timezone.utc)
+        seen = []
+
+        def fake_match(**kwargs):
+            window = (kwargs["start_dt"], kwargs["end_dt"])
+            seen.append(window)
+            if (window[1] - window[0]).days > 10:
+                return ([], TIMEOUT_MSG)
+            pid = f"p{window[0].day}"
+            return ([{"id": pid, "title": pid, "score": 1.0 / window[0].day}], "rpc 查询成功：1 条")
+
+        queries = [{"type": "keyword", "tag": "A", "paper_tag": "keyword:A", "query_text": "alpha"}]
+        conf = {"url": "https://example.supabase.co", "anon_key": "k", "bm25_rpc": "match_arxiv_papers_bm25"}
+        with patch.object(self.mod, "match_papers_by_bm25", side_effect=fake_match):
+            result = self.mod.rank_papers_for_queries_via_supabase(
+                queries, 10, conf, start_dt=start_dt, end_dt=end_dt
+            )
+
+        # 30 天单分片超时 -> 拆成 15 天仍超时 -> 再拆到 7 天内全部成功
+        self.assertEqual(seen[0], (start_dt, end_dt))
+        self.assertGreater(len(result["queries"][0]["sim_scores"]), 1)
+        tuner = supabase_shard_tuner.get_shard_tuner()
+        remembered = tuner.shard_days(tuner_key("bm25", "match_arxiv_papers_bm25"))
+        self.assertLessEqual(remembered, 10)
+
+        self.mod.save_shard_state()
+        reset_shard_tuner()
+        seen.clear()
+        with patch.object(self.mod, "match_papers_by_bm25", side_effect=fake_match):
+            self.mod.rank_papers_for_queries_via_supabase(queries, 10, conf, start_dt=start_dt, end_dt=end_dt)
+        # 下次运行直接使用记住的分片大小，不再从 30 天窗口开始试
+        self.assertTrue(all((end - start).days <= 10 for start, end in seen))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import importlib.util
+import json
+import pathlib
+import sys
+import unittest
+from unittest.mock import patch
+from urllib.parse import unquote
+
+
+def _load_module(module_name: str, path: pathlib.Path):
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    mod = importlib.util.module_from_spec(spec)
+    assert spec and spec.loader
+    spec.loader.exec_module(mod)
+    return mod
+
+
+class _Resp:
+    def __init__(self, status_code, payload):
+        self.status_code = status_code
+        self._payload = payload
+        self.text = json.dumps(payload)
+
+    def json(self):
+        return self._payload
+
+
+class SyncIncrementalTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        root = pathlib.Path(__file__).resolve().parents[1]
+        src_dir = root / "src"
+        if str(src_dir) not in sys.path:
+            sys.path.insert(0, str(src_dir))
+        cls.mod = _load_module("sync_incremental_mod", src_dir / "maintain" / "sync.py")
+
+    def _row(self, pid, title="T", abstract="A"):
+        return self.mod.normalize_paper({"id": pid, "title": title, "abstract": abstract, "source": "cvpr"})
+
+    def test_content_hash_ignores_updated_at_but_tracks_metadata(self):
+        a = self._row("p1")
+        b = dict(a, updated_at="2000-01-01T00:00:00+00:00")
+        self.assertEqual(self.mod.compute_content_hash(a), self.mod.compute_content_hash(b))
+        self.assertNotEqual(a["content_hash"], self._row("p1", abstract="B")["content_hash"])
+
+    def test_plan_only_keeps_new_changed_and_model_changed_rows(self):
+        rows = [self._row("new"), self._row("changed", title="T2"), self._row("model"), self._row("same")]
+        existing = {
+            "changed": {"content_hash": self._row("changed")["content_hash"], "embedding_model": "m"},
+            "model": {"content_hash": rows[2]["content_hash"], "embedding_model": "old-model"},
+            "same": {"content_hash": rows[3]["content_hash"], "embedding_model": "m"},
+        }
+
+        todo, stats = self.mod.plan_incremental_sync(rows, existing, with_embeddings=True, model_name="m")
+        self.assertEqual([r["id"] for r in todo], ["new", "changed", "model"])
+        self.assertEqual(stats, {"new": 1, "changed": 1, "model_changed": 1, "unchanged": 1})
+
+        todo, stats = self.mod.plan_incremental_sync(rows, existing, with_embeddings=False, model_name="")
+        self.assertEqual([r["id"] for r in todo], ["new", "changed"])
+
+    def test_fetch_existing_state_batches_ids_and_detects_missing_column(self):
+        calls = []
+
+        def fake_request(method, endpoint, **kwargs):
+            calls.append(unquote(endpoint))
+            return _Resp(200, [{"id": "a,1", "content_hash": "h", "embedding_model": "m"}])
+
+        with patch.object(self.mod, "request_with_retries", side_effect=fake_request):
+            state, supported = self.mod.fetch_existing_row_state(
+                url="https://x.supabase.co",
+                service_key="k",
+                table="cvpr_papers",
+                ids=["a,1", "b", "c"],
+                chunk_size=2,
+            )
+        self.assertTrue(supported)
+        self.assertEqual(len(calls), 2)
+        self.assertIn('id=in.("a,1","b")', calls[0])
+        self.assertEqual(state["a,1"], {"content_hash": "h", "embedding_model": "m"})
+
+        missing = _Resp(400, {"code": "42703", "message": "column cvpr_papers.content_hash does not exist"})
+        with patch.object(self.mod, "request_with_retries", return_value=missing):
+            state, supported = self.mod.fetch_existing_row_state(
+                url="https://x.supabase.co", service_key="k", table="cvpr_papers", ids=["a"]
+            )
+        self.assertFalse(supported)
+        self.assertEqual(state, {})
+
+    def test_missing_column_detection_ignores_unrelated_errors(self):
+        other = json.dumps({"code": "22P02", "message": "invalid input syntax", "details": "content_hash=abc"})
+        self.assertFalse(self.mod._is_missing_column_error(400, other))
+        self.assertFalse(self.mod._is_missing_column_error(400, "bad request near content_hash"))
+        self.assertFalse(self.mod._is_missing_column_error(500, json.dumps({"code": "42703", "message": "content_hash"})))
+        cache_miss = json.dumps({"code": "PGRST204", "message": "Could not find the 'content_hash' column"})
+        self.assertTrue(self.mod._is_missing_column_error(400, cache_miss))
+
+    def test_rows_without_embeddings_do_not_advance_content_hash(self):
+        row = self._row("p1", abstract="new abstract")
+        stale = {"p1": {"content_hash": self._row("p1")["content_hash"], "embedding_model": "m"}}
+        todo, _ = self.mod.plan_incremental_sync([row], stale, with_embeddings=False, model_name="")
+        self.mod.detach_content_hash(todo)
+        self.assertNotIn("content_hash", todo[0])
+        # 库中哈希未被覆盖：之后带 embedding 的同步仍会把它当作内容变更重算向量
+        todo, stats = self.mod.plan_incremental_sync(
+            [self._row("p1", abstract="new abstract")], stale, with_embeddings=True, model_name="m"
+        )
+        self.assertEqual(stats["changed"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import gzip
+import importlib.util
+import json
+import pathlib
+import sys
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+
+def _load_module(module_name: str, path: pathlib.Path):
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    mod = importlib.util.module_from_spec(spec)
+    assert spec and spec.loader
+    spec.loader.exec_module(mod)
+    return mod
+
+
+class _Resp:
+    def __init__(self, status_code=201, text=""):
+        self.status_code = status_code
+        self.text = text
+
+
+class SyncUpsertPayloadTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        root = pathlib.Path(__file__).resolve().parents[1]
+        src_dir = root / "src"
+        if str(src_dir) not in sys.path:
+            sys.path.insert(0, str(src_dir))
+        cls.mod = _load_module("sync_upsert_payload_mod", src_dir / "maintain" / "sync.py")
+
+    def test_vectorized_literals_match_per_value_formatting(self):
+        emb = np.array([[0.1, -0.25, 1.0], [0.0, 0.333333333, -1.0]], dtype=np.float32)
+        literals = self.mod.to_pgvector_literals(emb)
+
+        self.assertEqual(len(literals), 2)
+        for vec, literal in zip(emb.tolist(), literals):
+            self.assertEqual(literal, "[" + ",".join(f"{x:.6f}" for x in vec) + "]")
+        self.assertEqual(self.mod.to_pgvector_literal([0.5, -0.5]), "[0.500000,-0.500000]")
+        parsed = json.loads(literals[1])
+        self.assertAlmostEqual(parsed[1], 0.333333, places=6)
+
+    def test_batches_are_sized_by_bytes_and_row_cap(self):
+        plan = self.mod.plan_upsert_batches([10, 10, 10, 50, 10], max_rows=10, max_bytes=35)
+        self.assertEqual(plan, [(0, 3), (3, 4), (4, 5)])
+        plan = self.mod.plan_upsert_batches([1] * 5, max_rows=2, max_bytes=10_000)
+        self.assertEqual(plan, [(0, 2), (2, 4), (4, 5)])
+
+    def test_upsert_posts_gzip_bodies_and_splits_failed_batches(self):
+        rows = [{"id": f"p{i}", "title": "x" * 40_000} for i in range(4)]
+        bodies = []
+
+        def fake_request(method, endpoint, **kwargs):
+            # 请求体只压缩一次：解压一次即得到 JSON
+            self.assertEqual(kwargs["headers"]["Content-Encoding"], "gzip")
+            payload = json.loads(gzip.decompress(kwargs["data"]))
+            bodies.append([r["id"] for r in payload])
+            if len(payload) > 2:
+                return _Resp(413, "payload too large")
+            return _Resp(201)
+
+        with patch("supabase_http.get_session") as mock_get_session, patch.dict(
+            "os.environ", {"DPR_SUPABASE_GZIP_REQUESTS": "1"}
+        ):
+            mock_get_session.return_value.request.side_effect = fake_request
+            self.mod.upsert_papers(
+                url="https://x.supabase.co",
+                service_key="k",
+                table="arxiv_papers",
+                rows=rows,
+                batch_size=100,
+                max_batch_bytes=1 << 20,
+                retries=0,
+                gzip_body=True,
+            )
+
+        self.assertEqual(bodies, [["p0", "p1", "p2", "p3"], ["p0", "p1"], ["p2", "p3"]])
+
+if __name__ == "__main__":
+    unittest.main()